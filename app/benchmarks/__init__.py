@@ -0,0 +1,10 @@
+"""
+Offline benchmarks for the app's entry points.
+
+Run from the app directory:
+
+    python -m benchmarks.run --iterations 50 --concurrency 4
+
+Every external API is replaced by the local stand-ins in stub_server, so
+results are repeatable and cost nothing.
+"""
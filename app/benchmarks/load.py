@@ -0,0 +1,273 @@
+"""
+Headless multi-session load generator for the chat pipeline.
+
+Simulates N concurrent chat sessions, each on its own thread as Streamlit
+runs them, driving utils.chat_pipeline.run_turn, the same path the chat
+interface takes, against the local stand-ins in stub_server. Each session
+holds its own conversation and, with --multi-turn, its own response chain.
+
+Turns are drawn from a query mix of plain chat, weather, file search and
+web search. By default every session sends its next turn --think-time
+seconds after the previous answer (closed loop). With --arrival-rate, turns
+arrive on a Poisson schedule regardless of how fast answers come back (open
+loop); a session still handles one turn at a time, so time a turn spends
+waiting for its session is reported as queueing.
+
+Reports, overall and per query kind: turns, errors, throughput, latency,
+time to first event and queue wait percentiles, plus rate limiter waits and
+the stub's request count.
+
+Usage, from the app directory:
+
+    python -m benchmarks.load --sessions 50 --turns 5 --latency 0.2 --jitter 0.1
+    python -m benchmarks.load --sessions 20 --arrival-rate 10 --mix plain=1,weather=1 --json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import tempfile
+import threading
+from .stub_server import StubServer
+from .run import _configure_environment, _percentile
+
+QUERY_KINDS = ("plain", "weather", "file_search", "web_search")
+DEFAULT_MIX = "plain=40,weather=20,file_search=20,web_search=20"
+
+def parse_mix(text: str) -> dict:
+    """
+    Parse a query mix like "plain=40,weather=20".
+
+    Args:
+        text: Comma-separated kind=weight pairs
+
+    Returns:
+        dict: Weight per query kind
+    """
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in QUERY_KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown query kind {kind!r}, expected one of {', '.join(QUERY_KINDS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+def _place_name(n: int) -> str:
+    """
+    Spell a number as a unique, name-like place, e.g. 27 -> "Loadville Bb".
+    """
+    letters = ""
+    while True:
+        n, rest = divmod(n, 26)
+        letters = chr(ord("a") + rest) + letters
+        if n == 0:
+            return f"Loadville {letters.capitalize()}"
+
+def make_turn(kind: str, n: int, vector_store_id: str) -> tuple:
+    """
+    Build a unique user input and tools config for a query kind.
+
+    Args:
+        kind: Query kind
+        n: Unique turn number, so caches never answer
+        vector_store_id: Vector store for file search turns
+
+    Returns:
+        tuple: (user_input, tools_config)
+    """
+    if kind == "weather":
+        return f"What's the weather in {_place_name(n)}?", {"function_calling": True}
+    if kind == "file_search":
+        return f"What do the documents say about finding {n}?", {"file_search": True, "vector_store_id": vector_store_id}
+    if kind == "web_search":
+        return f"Latest news about subject {n}", {"web_search": True}
+    return f"Explain idea {n} in simple terms", {}
+
+class Session(threading.Thread):
+    """
+    One simulated user, sending turns through the chat pipeline.
+    """
+
+    def __init__(self, index: int, args, vector_store_id: str, counter, started_at: float):
+        super().__init__(name=f"session-{index}", daemon=True)
+        self.args = args
+        self.vector_store_id = vector_store_id
+        self.counter = counter
+        self.started_at = started_at
+        self.random = random.Random(args.seed + index)
+        self.conversation_id = f"load_{index}_{int(started_at)}"
+        self.messages = []
+        self.results = []
+
+    def _arrivals(self):
+        """
+        Scheduled arrival times of this session's turns, None for closed loop.
+        """
+        if not self.args.arrival_rate:
+            return None
+        rate = self.args.arrival_rate / self.args.sessions
+        at = self.started_at
+        arrivals = []
+        for _ in range(self.args.turns):
+            at += self.random.expovariate(rate)
+            arrivals.append(at)
+        return arrivals
+
+    def run(self):
+        from utils import chat_pipeline, conversation_chain
+
+        chain = conversation_chain.new_chain() if self.args.multi_turn else None
+        kinds, weights = zip(*self.args.mix.items())
+        arrivals = self._arrivals()
+        # Stagger closed-loop sessions so they do not all fire at once
+        scheduled = self.started_at + self.random.uniform(0, self.args.think_time)
+
+        for turn in range(self.args.turns):
+            if arrivals is not None:
+                scheduled = arrivals[turn]
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            kind = self.random.choices(kinds, weights)[0]
+            user_input, tools_config = make_turn(kind, next(self.counter), self.vector_store_id)
+            tools_config["multi_turn"] = self.args.multi_turn
+            first_event = []
+            errors = []
+
+            def on_event(event):
+                if not first_event:
+                    first_event.append(time.perf_counter())
+                if event["type"] == "error":
+                    errors.append(event["text"])
+
+            started = time.perf_counter()
+            message = chat_pipeline.run_turn(
+                self.conversation_id, self.messages, user_input, tools_config, chain, on_event=on_event
+            )
+            finished = time.perf_counter()
+
+            self.results.append({
+                "kind": kind,
+                "queue": max(0.0, started - scheduled),
+                "latency": finished - started,
+                "ttft": (first_event[0] - started) if first_event else None,
+                "error": bool(errors) or message["content"].startswith("Error"),
+                "finished": finished,
+            })
+            scheduled = finished + self.args.think_time
+
+def summarize(results: list, elapsed: float) -> dict:
+    """
+    Summarize turn results.
+
+    Args:
+        results: Turn results
+        elapsed: Wall-clock seconds of the run
+
+    Returns:
+        dict: Turns, errors, throughput and percentiles in milliseconds
+    """
+    def ms(values, q):
+        value = _percentile(values, q)
+        return round(value * 1000, 1) if value is not None else None
+
+    latencies = [result["latency"] for result in results]
+    ttfts = [result["ttft"] for result in results if result["ttft"] is not None]
+    queues = [result["queue"] for result in results]
+    return {
+        "turns": len(results),
+        "errors": sum(1 for result in results if result["error"]),
+        "throughput_per_s": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        "latency_p50_ms": ms(latencies, 0.50),
+        "latency_p95_ms": ms(latencies, 0.95),
+        "latency_p99_ms": ms(latencies, 0.99),
+        "ttft_p50_ms": ms(ttfts, 0.50),
+        "ttft_p95_ms": ms(ttfts, 0.95),
+        "queue_p50_ms": ms(queues, 0.50),
+        "queue_p95_ms": ms(queues, 0.95),
+        "queue_p99_ms": ms(queues, 0.99),
+    }
+
+def _print_table(report: dict):
+    rows = {"all": report["overall"], **report["by_kind"]}
+    columns = list(report["overall"])
+    print(f"{'kind':<14}" + "".join(f"{column:>17}" for column in columns))
+    for kind, row in rows.items():
+        print(f"{kind:<14}" + "".join(f"{str(row.get(column)):>17}" for column in columns))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Drive concurrent chat sessions through the turn pipeline against local API stand-ins.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Query mix, default {DEFAULT_MIX}")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Seconds between an answer and the next turn (closed loop)")
+    parser.add_argument("--arrival-rate", type=float, default=0.0, help="Turns per second across all sessions (open loop), 0 for closed loop")
+    parser.add_argument("--multi-turn", action="store_true", help="Chain turns with previous_response_id")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every stub response")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Up to this many extra seconds per stub response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed deltas")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub responses that are 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of stub responses that are 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the query mix and arrivals")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    stub = StubServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, token_delay=args.token_delay, seed=args.seed
+    ).start()
+    work_dir = tempfile.mkdtemp(prefix="rag_agentic_load_")
+    _configure_environment(stub, work_dir)
+
+    from utils import vectorstore_utils, rate_limit, metrics
+
+    try:
+        vector_store_id = vectorstore_utils.create_vector_store("load").get("id")
+        if not vector_store_id:
+            print("Could not create a vector store on the stub server")
+            return 1
+        document = os.path.join(work_dir, "document.txt")
+        with open(document, "w", encoding="utf-8") as f:
+            f.write("Load test document. " * 100)
+        vectorstore_utils.upload_files_to_vector_store([document], vector_store_id)
+
+        # Shared across sessions; next() on a count is atomic
+        counter = itertools.count()
+        started_at = time.perf_counter()
+        sessions = [Session(index, args, vector_store_id, counter, started_at) for index in range(args.sessions)]
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.perf_counter() - started_at
+    finally:
+        stub.stop()
+
+    results = [result for session in sessions for result in session.results]
+    report = {
+        "config": dict(vars(args)),
+        "overall": summarize(results, elapsed),
+        "by_kind": {
+            kind: summarize([result for result in results if result["kind"] == kind], elapsed)
+            for kind in args.mix if any(result["kind"] == kind for result in results)
+        },
+        "rate_limit_waited_s": round(rate_limit.stats()["waited_seconds"], 3),
+        "stub": {"requests": stub.requests, **stub.injected},
+        "openai": metrics.summary(),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report)
+        print(f"\nElapsed: {elapsed:.2f}s, rate limiter waits: {report['rate_limit_waited_s']}s, "
+              f"stub requests: {stub.requests}, injected 500s: {stub.injected['errors']}, "
+              f"injected 429s: {stub.injected['rate_limits']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
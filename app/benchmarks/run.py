@@ -0,0 +1,237 @@
+"""
+Benchmark the app's entry points against local stand-ins.
+
+Starts a StubServer, points the OpenAI client, Nominatim and Open-Meteo at
+it, and drives each entry point with unique inputs, so the response,
+semantic, geocode and forecast caches never short-circuit a call. Reports
+per entry point:
+
+- latency percentiles (p50, p95, p99) and mean, in milliseconds
+- throughput in calls per second at the given concurrency
+- errors, i.e. calls that raised or returned an error result
+- allocations from a separate single-threaded tracemalloc pass: peak traced
+  memory and net allocated blocks per call
+
+Usage, from the app directory:
+
+    python -m benchmarks.run --iterations 50 --concurrency 4 --latency 0.05
+    python -m benchmarks.run --entry weather --rate-limit-rate 0.1 --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from .stub_server import StubServer
+
+ENTRIES = ("use_tool_response", "file_search_response", "upload_files_to_vector_store", "weather")
+ALLOCATION_ITERATIONS = 10
+
+def _configure_environment(stub: StubServer, work_dir: str):
+    """
+    Point the app at the stub and keep its caches in a scratch directory.
+
+    Must run before utils is imported, as its modules read settings at import.
+
+    Args:
+        stub: Running stub server
+        work_dir: Scratch directory for caches and manifests
+    """
+    os.environ.update(stub.env())
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "NOMINATIM_MIN_INTERVAL": "0",
+        "GEOCODE_CACHE_PATH": os.path.join(work_dir, "geocode.sqlite3"),
+        "UPLOAD_MANIFEST_DIR": os.path.join(work_dir, "manifests"),
+        "METADATA_INDEX_PATH": os.path.join(work_dir, "metadata_index.sqlite3"),
+        "CONVERSATION_DB_PATH": os.path.join(work_dir, "conversations.sqlite3"),
+        "LOCAL_VECTOR_STORE_DIR": os.path.join(work_dir, "vector_stores"),
+        "VECTOR_STORE_BACKEND": "hosted",
+        "BULK_UPLOAD_POLL_INTERVAL": "0.01",
+        "OPENAI_BACKOFF_BASE": "0.05",
+        "HTTP_BACKOFF_BASE": "0.05",
+        "TRACE_EXPORTER": "none",
+        "METRICS_FILE": "",
+        "METRICS_PORT": "0",
+    })
+
+def _make_calls(vector_store_id: str, work_dir: str) -> dict:
+    """
+    Build one callable per entry point, taking the iteration number.
+
+    Returns:
+        dict: Callable per entry point name; each returns True on success
+    """
+    from utils import api_utils, vectorstore_utils
+
+    def use_tool_response(i):
+        text, metadata = api_utils.use_tool_response(
+            f"Summarize recent findings on topic {i} and cite sources",
+            {"web_search": True, "file_search": True, "vector_store_id": vector_store_id}
+        )
+        return not text.startswith("Error")
+
+    def file_search_response(i):
+        text, sources = api_utils.file_search_response(f"What does document {i} say about methods?", [vector_store_id])
+        return not text.startswith("Error")
+
+    def upload_files_to_vector_store(i):
+        paths = []
+        for n in range(3):
+            path = os.path.join(work_dir, "uploads", f"doc_{i}_{n}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"Benchmark document {i}.{n} " * 50)
+            paths.append(path)
+        stats = vectorstore_utils.upload_files_to_vector_store(paths, vector_store_id)
+        return stats["failed_uploads"] == 0
+
+    def weather(i):
+        text = api_utils.get_weather(f"Benchtown {i}")
+        return bool(text) and not text.startswith("Error")
+
+    return {
+        "use_tool_response": use_tool_response,
+        "file_search_response": file_search_response,
+        "upload_files_to_vector_store": upload_files_to_vector_store,
+        "weather": weather,
+    }
+
+def _percentile(values: list, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+def _timed(fn, i: int) -> tuple:
+    started = time.perf_counter()
+    try:
+        ok = fn(i)
+    except Exception as e:
+        print(f"Error in benchmark call: {e}")
+        ok = False
+    return time.perf_counter() - started, ok
+
+def run_latency(fn, iterations: int, concurrency: int, offset: int = 0) -> dict:
+    """
+    Time an entry point over many unique inputs.
+
+    Args:
+        fn: Callable taking the iteration number
+        iterations: Number of calls
+        concurrency: Calls in flight at once
+        offset: First iteration number, so passes do not repeat inputs
+
+    Returns:
+        dict: Latency percentiles and mean in ms, throughput and error count
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: _timed(fn, i), range(offset, offset + iterations)))
+    elapsed = time.perf_counter() - started
+    latencies = [seconds * 1000 for seconds, _ in results]
+
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "calls": iterations,
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50_ms": rounded(_percentile(latencies, 0.50)),
+        "p95_ms": rounded(_percentile(latencies, 0.95)),
+        "p99_ms": rounded(_percentile(latencies, 0.99)),
+        "mean_ms": rounded(sum(latencies) / len(latencies)) if latencies else None,
+        "throughput_per_s": round(iterations / elapsed, 2) if elapsed > 0 else None,
+    }
+
+def run_allocations(fn, iterations: int, offset: int) -> dict:
+    """
+    Count allocations of an entry point, one call at a time.
+
+    Args:
+        fn: Callable taking the iteration number
+        iterations: Number of calls
+        offset: First iteration number
+
+    Returns:
+        dict: Peak traced KiB and net allocated blocks per call
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        for i in range(offset, offset + iterations):
+            _timed(fn, i)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    net_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {"peak_kib": round(peak / 1024, 1), "net_blocks_per_call": round(net_blocks / iterations, 1)}
+
+def _print_table(results: dict):
+    columns = ("calls", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_per_s", "peak_kib", "net_blocks_per_call")
+    print(f"{'entry point':<30}" + "".join(f"{column:>20}" for column in columns))
+    for entry, row in results.items():
+        print(f"{entry:<30}" + "".join(f"{str(row.get(column, '-')):>20}" for column in columns))
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark entry points against local API stand-ins.")
+    parser.add_argument("--iterations", type=int, default=50, help="Calls per entry point")
+    parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight at once")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every stub response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per stub response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub responses that are 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of stub responses that are 429s")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed deltas")
+    parser.add_argument("--entry", action="append", choices=ENTRIES, help="Entry point to run, repeatable; defaults to all")
+    parser.add_argument("--no-allocations", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    stub = StubServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, token_delay=args.token_delay
+    ).start()
+    work_dir = tempfile.mkdtemp(prefix="rag_agentic_bench_")
+    os.makedirs(os.path.join(work_dir, "uploads"), exist_ok=True)
+    _configure_environment(stub, work_dir)
+
+    from utils import metrics, vectorstore_utils
+
+    try:
+        vector_store_id = vectorstore_utils.create_vector_store("benchmark").get("id")
+        if not vector_store_id:
+            print("Could not create a vector store on the stub server")
+            return 1
+        calls = _make_calls(vector_store_id, work_dir)
+
+        results = {}
+        for entry in args.entry or ENTRIES:
+            results[entry] = run_latency(calls[entry], args.iterations, args.concurrency)
+            if not args.no_allocations:
+                allocation_iterations = min(args.iterations, ALLOCATION_ITERATIONS)
+                results[entry].update(run_allocations(calls[entry], allocation_iterations, offset=args.iterations))
+    finally:
+        stub.stop()
+
+    report = {
+        "config": vars(args),
+        "stub": {"requests": stub.requests, **stub.injected},
+        "entries": results,
+        "openai": metrics.summary(),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(results)
+        print(f"\nStub requests: {stub.requests}, injected 500s: {stub.injected['errors']}, "
+              f"injected 429s: {stub.injected['rate_limits']}")
+        print(f"OpenAI metrics: {json.dumps(report['openai'])}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
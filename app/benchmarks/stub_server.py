@@ -0,0 +1,502 @@
+"""
+Local stand-ins for the OpenAI, Nominatim and Open-Meteo APIs.
+
+One threaded HTTP server answers:
+
+- /v1/responses (plain and streamed), /v1/chat/completions, /v1/embeddings
+- /v1/files and /v1/vector_stores, with files, file batches and search
+- /search, shaped like Nominatim
+- /v1/forecast, shaped like Open-Meteo, with multi-coordinate requests
+
+Responses are deterministic and just realistic enough for the app's parsing
+paths: function calls for forced get_weather tool choices, file citations
+when file_search is enabled, usage on every response, and x-ratelimit
+headers. Latency, jitter, 5xx error rate and 429 rate are configurable per
+server. Point the app at it with OPENAI_BASE_URL, NOMINATIM_URL and
+OPEN_METEO_URL.
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import secrets
+import threading
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_location_re = re.compile(r"\b(?:in|for|at)\s+([A-Za-z][\w\s,'-]*?)\s*[?.!]*$")
+_filename_re = re.compile(rb'filename="([^"]+)"')
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections under load tests
+    request_queue_size = 256
+    daemon_threads = True
+
+def _stable_random(text: str) -> random.Random:
+    return random.Random(int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16))
+
+def _input_text(model_input) -> str:
+    if isinstance(model_input, str):
+        return model_input
+    parts = []
+    for item in model_input or []:
+        content = item.get("content", "") if isinstance(item, dict) else ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+class StubServer:
+    """
+    Threaded stub server with fault injection.
+
+    Attributes:
+        latency: Seconds added to every response
+        jitter: Up to this many extra seconds, uniformly random
+        error_rate: Share of requests answered with a 500
+        rate_limit_rate: Share of requests answered with a 429
+        token_delay: Seconds between streamed text deltas
+        output_words: Words in each generated answer
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, token_delay: float = 0.0,
+                 output_words: int = 60, seed: int = 0):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind, 0 for any free port
+            latency: Seconds added to every response
+            jitter: Up to this many extra seconds, uniformly random
+            error_rate: Share of requests answered with a 500
+            rate_limit_rate: Share of requests answered with a 429
+            token_delay: Seconds between streamed text deltas
+            output_words: Words in each generated answer
+            seed: Seed for fault injection and jitter
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.token_delay = token_delay
+        self.output_words = output_words
+        self.requests = 0
+        self.injected = {"errors": 0, "rate_limits": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._vector_stores = {}
+        self._batches = {}
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Returns:
+            str: Base URL of the server
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """
+        Environment variables that point the app at this server.
+
+        Returns:
+            dict: OPENAI_BASE_URL, NOMINATIM_URL and OPEN_METEO_URL
+        """
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "NOMINATIM_URL": f"{self.url}/search",
+            "OPEN_METEO_URL": f"{self.url}/v1/forecast",
+        }
+
+    def start(self):
+        """
+        Serve on a background thread.
+
+        Returns:
+            StubServer: self
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _fault(self):
+        """
+        Decide whether to inject a fault and wait out the configured latency.
+
+        Returns:
+            int or None: Status code to fail with, or None to answer normally
+        """
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if roll < self.rate_limit_rate:
+                self.injected["rate_limits"] += 1
+                status = 429
+            elif roll < self.rate_limit_rate + self.error_rate:
+                self.injected["errors"] += 1
+                status = 500
+            else:
+                status = None
+        if delay > 0:
+            time.sleep(delay)
+        return status
+
+    def _words(self, prompt: str) -> list:
+        words = ["Stub", "answer", "about"] + prompt.split()[:8]
+        filler = _stable_random(prompt)
+        vocabulary = ["the", "model", "reports", "that", "data", "shows", "results", "with", "clear", "evidence"]
+        while len(words) < self.output_words:
+            words.append(filler.choice(vocabulary))
+        return words[:self.output_words]
+
+    def _response(self, request: dict) -> dict:
+        text = _input_text(request.get("input"))
+        tools = request.get("tools") or []
+        tool_choice = request.get("tool_choice") or "auto"
+        output = []
+        forced_function = isinstance(tool_choice, dict) and tool_choice.get("type") == "function"
+        if forced_function:
+            match = _location_re.search(text.strip())
+            location = match.group(1).strip() if match else "Paris"
+            output.append({
+                "type": "function_call", "id": f"fc_{secrets.token_hex(8)}", "call_id": f"call_{secrets.token_hex(8)}",
+                "name": tool_choice["name"], "arguments": json.dumps({"location": location}), "status": "completed"
+            })
+        else:
+            annotations = []
+            for tool in tools:
+                if tool.get("type") == "file_search":
+                    output.append({"type": "file_search_call", "id": f"fs_{secrets.token_hex(8)}", "status": "completed", "queries": [text[:200]]})
+                    annotations.append({"type": "file_citation", "file_id": "file-stub", "filename": "stub-document.pdf", "index": 0})
+                elif tool.get("type", "").startswith("web_search"):
+                    output.append({"type": "web_search_call", "id": f"ws_{secrets.token_hex(8)}", "status": "completed"})
+            output.append({
+                "type": "message", "id": f"msg_{secrets.token_hex(8)}", "status": "completed", "role": "assistant",
+                "content": [{"type": "output_text", "text": " ".join(self._words(text)), "annotations": annotations}]
+            })
+        input_tokens = len(text + (request.get("instructions") or "")) // 4
+        output_tokens = self.output_words * 4 // 3
+        return {
+            "id": f"resp_{secrets.token_hex(12)}", "object": "response", "created_at": int(time.time()),
+            "model": request.get("model"), "status": "completed", "output": output, "error": None,
+            "incomplete_details": None, "instructions": request.get("instructions"), "metadata": {},
+            "parallel_tool_calls": True, "temperature": request.get("temperature", 1.0), "tool_choice": tool_choice,
+            "tools": tools, "top_p": 1.0, "previous_response_id": request.get("previous_response_id"),
+            "usage": {
+                "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+                "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0}
+            }
+        }
+
+    def _response_events(self, response: dict):
+        sequence = 0
+
+        def event(event_type, **fields):
+            nonlocal sequence
+            sequence += 1
+            return dict(type=event_type, sequence_number=sequence, **fields)
+
+        yield event("response.created", response=dict(response, status="in_progress", output=[]))
+        for index, item in enumerate(response["output"]):
+            if item["type"] != "message":
+                yield event("response.output_item.added", output_index=index, item=item)
+                yield event("response.output_item.done", output_index=index, item=item)
+                continue
+            content = item["content"][0]
+            yield event("response.output_item.added", output_index=index, item=dict(item, status="in_progress", content=[]))
+            for position, word in enumerate(content["text"].split(" ")):
+                yield event(
+                    "response.output_text.delta", item_id=item["id"], output_index=index, content_index=0,
+                    delta=word if position == 0 else " " + word
+                )
+            for annotation_index, annotation in enumerate(content["annotations"]):
+                yield event(
+                    "response.output_text.annotation.added", item_id=item["id"], output_index=index,
+                    content_index=0, annotation_index=annotation_index, annotation=annotation
+                )
+            yield event("response.output_item.done", output_index=index, item=item)
+        yield event("response.completed", response=response)
+
+    def _chat_completion(self, request: dict) -> dict:
+        text = _input_text(request.get("messages"))
+        prompt_tokens = len(text) // 4
+        completion_tokens = self.output_words * 4 // 3
+        return {
+            "id": f"chatcmpl-{secrets.token_hex(12)}", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(self._words(text))}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    def _chat_chunks(self, completion: dict, include_usage: bool):
+        base = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"], "model": completion["model"]}
+        for position, word in enumerate(completion["choices"][0]["message"]["content"].split(" ")):
+            delta = {"content": word if position == 0 else " " + word}
+            if position == 0:
+                delta["role"] = "assistant"
+            yield dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+        yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if include_usage:
+            yield dict(base, choices=[], usage=completion["usage"])
+
+    def _embeddings(self, request: dict) -> dict:
+        inputs = request.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+        dimensions = request.get("dimensions") or 1536
+        data = []
+        for index, text in enumerate(inputs):
+            generator = _stable_random(str(text))
+            data.append({"object": "embedding", "index": index, "embedding": [generator.gauss(0, 1) for _ in range(dimensions)]})
+        tokens = sum(len(str(text)) for text in inputs) // 4
+        return {"object": "list", "data": data, "model": request.get("model"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def _vector_store_file(self, vs_id: str, file_id: str, attributes: dict = None) -> dict:
+        return {
+            "id": file_id, "object": "vector_store.file", "created_at": int(time.time()), "vector_store_id": vs_id,
+            "status": "completed", "usage_bytes": self._files.get(file_id, {}).get("bytes", 0), "last_error": None,
+            "attributes": attributes or {}
+        }
+
+    def _vector_store(self, vs_id: str) -> dict:
+        store = self._vector_stores[vs_id]
+        count = len(store["files"])
+        return {
+            "id": vs_id, "object": "vector_store", "name": store["name"], "created_at": store["created_at"],
+            "status": "completed", "usage_bytes": 0, "last_active_at": int(time.time()),
+            "file_counts": {"in_progress": 0, "completed": count, "failed": 0, "cancelled": 0, "total": count}
+        }
+
+    def _list(self, items: list) -> dict:
+        return {
+            "object": "list", "data": items, "has_more": False,
+            "first_id": items[0]["id"] if items else None, "last_id": items[-1]["id"] if items else None
+        }
+
+    def _openai(self, method: str, path: str, body: bytes, headers):
+        """
+        Answer an OpenAI API request.
+
+        Returns:
+            tuple: (status, payload) or (status, iterator of SSE payloads)
+        """
+        request = json.loads(body) if body and "json" in (headers.get("Content-Type") or "") else {}
+        parts = path.strip("/").split("/")[1:]
+
+        if parts == ["responses"] and method == "POST":
+            response = self._response(request)
+            return 200, (self._response_events(response) if request.get("stream") else response)
+        if parts == ["chat", "completions"] and method == "POST":
+            completion = self._chat_completion(request)
+            if request.get("stream"):
+                include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+                return 200, self._chat_chunks(completion, include_usage)
+            return 200, completion
+        if parts == ["embeddings"] and method == "POST":
+            return 200, self._embeddings(request)
+
+        with self._lock:
+            if parts == ["files"] and method == "POST":
+                match = _filename_re.search(body)
+                file_id = f"file-{secrets.token_hex(12)}"
+                self._files[file_id] = {
+                    "id": file_id, "object": "file", "bytes": len(body), "created_at": int(time.time()),
+                    "filename": match.group(1).decode("utf-8", "replace") if match else "upload", "purpose": "assistants",
+                    "status": "processed"
+                }
+                return 200, self._files[file_id]
+            if len(parts) == 2 and parts[0] == "files" and method == "DELETE":
+                self._files.pop(parts[1], None)
+                return 200, {"id": parts[1], "object": "file", "deleted": True}
+            if parts == ["vector_stores"] and method == "POST":
+                vs_id = f"vs_{secrets.token_hex(12)}"
+                self._vector_stores[vs_id] = {"name": request.get("name"), "created_at": int(time.time()), "files": {}}
+                return 200, self._vector_store(vs_id)
+            if not parts or parts[0] != "vector_stores" or len(parts) < 2:
+                return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}
+
+            vs_id = parts[1]
+            store = self._vector_stores.get(vs_id)
+            if store is None:
+                return 404, {"error": {"message": f"No vector store found with id '{vs_id}'", "type": "invalid_request_error"}}
+            rest = parts[2:]
+            if not rest and method == "GET":
+                return 200, self._vector_store(vs_id)
+            if rest == ["files"] and method == "POST":
+                store["files"][request["file_id"]] = request.get("attributes") or {}
+                return 200, self._vector_store_file(vs_id, request["file_id"], request.get("attributes"))
+            if rest == ["files"] and method == "GET":
+                return 200, self._list([self._vector_store_file(vs_id, file_id, attrs) for file_id, attrs in store["files"].items()])
+            if len(rest) == 2 and rest[0] == "files":
+                if method == "DELETE":
+                    store["files"].pop(rest[1], None)
+                    return 200, {"id": rest[1], "object": "vector_store.file.deleted", "deleted": True}
+                if method == "POST":
+                    store["files"][rest[1]] = request.get("attributes") or {}
+                return 200, self._vector_store_file(vs_id, rest[1], store["files"].get(rest[1]))
+            if rest == ["file_batches"] and method == "POST":
+                batch_id = f"vsfb_{secrets.token_hex(12)}"
+                for file_id in request.get("file_ids", []):
+                    store["files"][file_id] = request.get("attributes") or {}
+                self._batches[batch_id] = list(request.get("file_ids", []))
+                rest = ["file_batches", batch_id]
+                method = "GET"
+            if len(rest) >= 2 and rest[0] == "file_batches":
+                file_ids = self._batches.get(rest[1], [])
+                if rest[2:] == ["files"]:
+                    return 200, self._list([self._vector_store_file(vs_id, file_id, store["files"].get(file_id)) for file_id in file_ids])
+                count = len(file_ids)
+                return 200, {
+                    "id": rest[1], "object": "vector_store.files_batch", "created_at": int(time.time()),
+                    "vector_store_id": vs_id, "status": "completed",
+                    "file_counts": {"in_progress": 0, "completed": count, "failed": 0, "cancelled": 0, "total": count}
+                }
+            if rest == ["search"] and method == "POST":
+                query = request.get("query") if isinstance(request.get("query"), str) else " ".join(request.get("query") or [])
+                results = [
+                    {
+                        "file_id": file_id, "filename": self._files.get(file_id, {}).get("filename", file_id),
+                        "score": round(1.0 / (rank + 1), 4), "attributes": attrs,
+                        "content": [{"type": "text", "text": f"Excerpt {rank} matching {query[:80]}"}]
+                    }
+                    for rank, (file_id, attrs) in enumerate(list(store["files"].items())[:request.get("max_num_results", 10)])
+                ]
+                return 200, {"object": "vector_store.search_results.page", "search_query": query, "data": results, "has_more": False, "next_page": None}
+        return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}
+
+    def _geocode(self, query: dict):
+        q = (query.get("q") or [""])[0]
+        if not q.strip() or q.lower().startswith("nowhere"):
+            return 200, []
+        generator = _stable_random(q.lower())
+        return 200, [{
+            "lat": f"{generator.uniform(-60, 60):.6f}", "lon": f"{generator.uniform(-180, 180):.6f}",
+            "display_name": f"{q.title()}, Stubland"
+        }]
+
+    def _forecast(self, query: dict):
+        latitudes = (query.get("latitude") or ["0"])[0].split(",")
+        longitudes = (query.get("longitude") or ["0"])[0].split(",")
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+        forecasts = []
+        for lat, lon in zip(latitudes, longitudes):
+            generator = _stable_random(f"{lat},{lon}")
+            forecasts.append({
+                "latitude": float(lat), "longitude": float(lon),
+                "current": {
+                    "temperature_2m": round(generator.uniform(-10, 35), 1),
+                    "weather_code": generator.choice([0, 1, 2, 3, 61, 80]),
+                    "wind_speed_10m": round(generator.uniform(0, 40), 1)
+                },
+                "hourly": {
+                    "time": [(hour.replace(hour=(hour.hour + i) % 24)).strftime("%Y-%m-%dT%H:00") for i in range(24)],
+                    "temperature_2m": [round(generator.uniform(-10, 35), 1) for _ in range(24)],
+                    "precipitation_probability": [generator.randint(0, 100) for _ in range(24)],
+                    "weather_code": [generator.choice([0, 1, 2, 3, 61, 80]) for _ in range(24)]
+                }
+            })
+        return 200, forecasts[0] if len(forecasts) == 1 else forecasts
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload, extra_headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("x-ratelimit-limit-requests", "10000")
+                self.send_header("x-ratelimit-remaining-requests", "9999")
+                self.send_header("x-ratelimit-reset-requests", "6ms")
+                self.send_header("x-ratelimit-limit-tokens", "30000000")
+                self.send_header("x-ratelimit-remaining-tokens", "29990000")
+                self.send_header("x-ratelimit-reset-tokens", "1ms")
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_events(self, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def write_chunk(data: bytes):
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+
+                for event in events:
+                    if stub.token_delay and "delta" in json.dumps(event)[:80]:
+                        time.sleep(stub.token_delay)
+                    name = f"event: {event['type']}\n" if "type" in event else ""
+                    write_chunk(f"{name}data: {json.dumps(event)}\n\n".encode("utf-8"))
+                if "type" not in event:
+                    write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                parsed = urllib.parse.urlsplit(self.path)
+                query = urllib.parse.parse_qs(parsed.query)
+
+                status = stub._fault()
+                if status == 429:
+                    self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                                    {"retry-after-ms": "50", "Retry-After": "0.05"})
+                    return
+                if status == 500:
+                    self._send_json(500, {"error": {"message": "Injected server error (stub)", "type": "server_error"}})
+                    return
+
+                if parsed.path == "/search":
+                    status, payload = stub._geocode(query)
+                elif parsed.path == "/v1/forecast":
+                    status, payload = stub._forecast(query)
+                elif parsed.path.startswith("/v1/"):
+                    status, payload = stub._openai(method, parsed.path, body, self.headers)
+                else:
+                    status, payload = 404, {"error": {"message": f"Unknown path {parsed.path}"}}
+
+                if isinstance(payload, (dict, list)):
+                    self._send_json(status, payload)
+                else:
+                    self._send_events(payload)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+        return Handler
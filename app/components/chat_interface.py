@@ -1,78 +1,72 @@
 import streamlit as st
-from utils.conversation_utils import add_message, get_messages_history
-from utils.api_utils import chat_completion, use_tool_response, get_weather
+import os
+from utils.conversation_utils import get_messages_history, has_earlier_messages, load_earlier_messages, get_response_chain
+from utils.cache_utils import LRUCache, MISSING
+from utils.chat_pipeline import run_turn
+from utils import service_client
 from utils.prompts import SYSTEM_MESSAGE
-import time
-import re
 
-def extract_location(text):
+# Messages rendered per window; "Load earlier messages" widens the window by this much
+CHAT_WINDOW_SIZE = int(os.environ.get("CHAT_WINDOW_SIZE", "20"))
+CHAT_RENDER_CACHE_SIZE = int(os.environ.get("CHAT_RENDER_CACHE_SIZE", "1000"))
+
+# Prepared markdown per stored message, which never changes once added
+_rendered_messages = LRUCache(max_size=CHAT_RENDER_CACHE_SIZE)
+
+def _sources_markdown(source_files):
     """
-    Extract a location from text, particularly for weather queries.
+    Format source files as a markdown list, rendered as one element.
     
     Args:
-        text: Input text containing a potential location
+        source_files: Set or list of file names
         
     Returns:
-        str: Extracted location or empty string if none found
+        str: Sorted bullet list
     """
-    # Convert to lowercase for easier pattern matching
-    text = text.lower().strip()
-    
-    # Define patterns to match common weather query formats
-    patterns = [
-        # Pattern for "weather in X"
-        r"(?:weather|temperature|forecast)(?:\s+in|\s+for|\s+at)?\s+([\w\s,]+)(?:\?|\.)?$",
-        # Pattern for "what is the weather/temperature in X"
-        r"(?:what(?:'s| is)?\s+the\s+(?:weather|temperature|forecast|climate))(?:\s+(?:like|going to be|for))?\s+(?:in|at|for)\s+([\w\s,]+)(?:\?|\.)?$",
-        # Pattern for "how is the weather in X"
-        r"how(?:'s| is)?\s+the\s+(?:weather|temperature)(?:\s+(?:like|going to be))?\s+(?:in|at|for)\s+([\w\s,]+)(?:\?|\.)?$",
-        # Pattern for "current weather in X"
-        r"(?:current|today(?:'s)?)\s+(?:weather|temperature|forecast)(?:\s+(?:in|at|for))?\s+([\w\s,]+)(?:\?|\.)?$",
-        # Direct location with weather terms
-        r"([\w\s,]+)\s+(?:weather|temperature|forecast|climate)(?:\?|\.)?$"
-    ]
-    
-    # Try to match location using the patterns
-    for pattern in patterns:
-        matches = re.search(pattern, text)
-        if matches:
-            location = matches.group(1).strip()
-            # Clean up punctuation and extra spaces
-            location = re.sub(r'[?!.,]$', '', location).strip()
-            return location
-    
-    # If no pattern matched, use a fallback method to extract location
-    # Remove common phrases
-    common_phrases = [
-        "what is the current", "what's the current", "what is the", "what's the",
-        "how is the", "how's the", "current", "today's", "today", 
-        "weather in", "weather for", "weather at", "weather",
-        "temperature in", "temperature for", "temperature at", "temperature",
-        "forecast in", "forecast for", "forecast at", "forecast",
-        "climate in", "climate for", "climate at", "climate",
-        "like in", "like at", "going to be in"
-    ]
-    
-    # Sort by length (descending) to remove longest phrases first
-    common_phrases.sort(key=len, reverse=True)
-    
-    location_text = text
-    for phrase in common_phrases:
-        location_text = location_text.replace(phrase, "").strip()
-    
-    # Clean up the result
-    location_text = re.sub(r'[?!.,]$', '', location_text).strip()
-    
-    return location_text
+    return "\n".join(f"- {file}" for file in sorted(source_files))
 
-def render_chat_interface(tools_config):
+def _message_markdown(message):
     """
-    Render the chat interface with message display and user input handling.
+    Get the markdown for a message body and its sources, cached per message.
     
     Args:
-        tools_config: Dictionary of enabled tools
+        message: Message from the conversation history
+        
+    Returns:
+        tuple: (content, sources markdown or None)
     """
-    # Display chat messages
+    seq = message.get("seq")
+    key = (st.session_state.conversation_id, seq) if seq is not None else (message["role"], message["content"])
+    rendered = _rendered_messages.get(key)
+    if rendered is MISSING:
+        source_files = message.get("metadata", {}).get("source_files") if message["role"] == "assistant" else None
+        rendered = (message["content"], _sources_markdown(source_files) if source_files else None)
+        _rendered_messages.set(key, rendered)
+    return rendered
+
+def _show_earlier_messages():
+    """
+    Widen the history window, paging older messages in from the store when needed.
+    """
+    st.session_state.chat_window += CHAT_WINDOW_SIZE
+    missing = st.session_state.chat_window - len(get_messages_history())
+    if missing > 0 and has_earlier_messages():
+        load_earlier_messages(max(missing, CHAT_WINDOW_SIZE))
+
+@st.fragment
+def render_history():
+    """
+    Render the most recent window of the conversation history.
+    
+    Only the last chat_window messages are drawn, so rerun cost does not grow
+    with the conversation. Paging in earlier messages reruns only this
+    fragment.
+    """
+    # Start each conversation with the default window
+    if st.session_state.get("chat_window_id") != st.session_state.conversation_id:
+        st.session_state.chat_window_id = st.session_state.conversation_id
+        st.session_state.chat_window = CHAT_WINDOW_SIZE
+    
     messages = get_messages_history()
     
     # Display welcome message if it's a new conversation
@@ -80,17 +74,29 @@ def render_chat_interface(tools_config):
         with st.chat_message("assistant"):
             st.markdown("👋 Hello! " + SYSTEM_MESSAGE)
     
-    for message in messages:
+    window = st.session_state.chat_window
+    if len(messages) > window or has_earlier_messages():
+        st.button("Load earlier messages", on_click=_show_earlier_messages)
+    
+    for message in messages[-window:]:
+        content, sources = _message_markdown(message)
         with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+            st.markdown(content)
             
             # Show source files if available
-            if message["role"] == "assistant" and "metadata" in message and "source_files" in message["metadata"]:
-                source_files = message["metadata"]["source_files"]
-                if source_files:
-                    with st.expander("Sources"):
-                        for file in sorted(source_files):
-                            st.write(f"- {file}")
+            if sources:
+                with st.expander("Sources"):
+                    st.markdown(sources)
+
+def render_chat_interface(tools_config):
+    """
+    Render the chat interface with message display and user input handling.
+    
+    Args:
+        tools_config: Dictionary of enabled tools
+    """
+    # Display chat messages
+    render_history()
     
     # User input
     user_input = st.chat_input("Type your message here...")
@@ -100,81 +106,42 @@ def render_chat_interface(tools_config):
         with st.chat_message("user"):
             st.markdown(user_input)
         
-        # Add user message to history
-        add_message("user", user_input)
+        chain = get_response_chain() if tools_config.get("multi_turn") else None
         
         # Get model response
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
             message_placeholder.markdown("Thinking...")
+            response_text = ""
             
-            try:
-                # Check if this might be a weather query
-                is_weather_query = any(keyword in user_input.lower() for keyword in ["weather", "temperature", "forecast", "climate"])
-                
-                # Special case for weather function - try to handle in different ways
-                if tools_config.get("function_calling") and is_weather_query:
-                    # First try with direct location extraction
-                    location = extract_location(user_input)
+            def render_event(event):
+                # Render events as they arrive so time-to-first-token is the latency users see
+                nonlocal response_text
+                if event["type"] == "text":
+                    response_text += event["delta"]
+                    message_placeholder.markdown(response_text + "▌")
+                elif event["type"] == "tool_call" and not response_text:
+                    message_placeholder.markdown(f"Using `{event['name']}`...")
+                elif event["type"] == "done":
+                    # Final update without cursor
+                    message_placeholder.markdown(event["text"])
                     
-                    if location and len(location) > 1:  # Ensure location is not empty or too short
-                        # Try to get weather with the extracted location
-                        try:
-                            response_text = get_weather(location)
-                            metadata = {"function": "weather", "location": location}
-                        except Exception as e:
-                            # If direct extraction fails, fallback to using the tool response system
-                            print(f"Direct weather extraction failed: {e}")
-                            response_text, metadata = use_tool_response(
-                                user_input, 
-                                tools_config,
-                                model=tools_config.get("model", "gpt-4o")
-                            )
+                    # Show source files if available
+                    if event["metadata"].get("source_files"):
+                        with st.expander("Sources"):
+                            st.markdown(_sources_markdown(event["metadata"]["source_files"]))
+                elif event["type"] == "error":
+                    message_placeholder.markdown(event["text"])
+            
+            if service_client.is_enabled():
+                # The service runs and stores the turn; only its stored messages come back
+                for event in service_client.stream_turn(st.session_state.conversation_id, user_input, tools_config):
+                    if event["type"] == "turn_completed":
+                        st.session_state.messages.extend([event["user"], event["assistant"]])
                     else:
-                        # If no location found, use normal tool response
-                        response_text, metadata = use_tool_response(
-                            user_input, 
-                            tools_config,
-                            model=tools_config.get("model", "gpt-4o")
-                        )
-                # If tools are enabled, use them
-                elif any([tools_config.get("web_search"), 
-                       tools_config.get("file_search") and tools_config.get("vector_store_id"),
-                       tools_config.get("function_calling")]):
-                    # Use tools to get response
-                    response_text, metadata = use_tool_response(
-                        user_input, 
-                        tools_config,
-                        model=tools_config.get("model", "gpt-4o")
-                    )
-                else:
-                    # Just use plain chat completion
-                    response_text = chat_completion(
-                        user_input,
-                        model=tools_config.get("model", "gpt-4o")
-                    )
-                    metadata = {}
-                
-                # Display the response with a typing effect
-                full_response = ""
-                for chunk in response_text.split():
-                    full_response += chunk + " "
-                    message_placeholder.markdown(full_response + "▌")
-                    time.sleep(0.01)
-                
-                # Final update without cursor
-                message_placeholder.markdown(response_text)
-                
-                # Show source files if available
-                if "source_files" in metadata and metadata["source_files"]:
-                    with st.expander("Sources"):
-                        for file in sorted(metadata["source_files"]):
-                            st.write(f"- {file}")
-                
-                # Add assistant message to history
-                add_message("assistant", response_text, metadata)
-                
-            except Exception as e:
-                error_message = f"Error: {str(e)}"
-                message_placeholder.markdown(error_message)
-                add_message("assistant", error_message)
+                        render_event(event)
+            else:
+                run_turn(
+                    st.session_state.conversation_id, st.session_state.messages,
+                    user_input, tools_config, chain, on_event=render_event
+                )
@@ -2,8 +2,13 @@ import streamlit as st
 import os
 import tempfile
 from utils.vectorstore_utils import create_vector_store, upload_files_to_vector_store, get_vector_store_details
-from utils.conversation_utils import clear_conversation
+from utils.conversation_utils import clear_conversation, resume_conversation
+from utils.conversation_store import list_conversations, delete_conversation
+from utils.conversation_chain import CONVERSATION_CHAINING
 from utils.prompts import DEVELOPER_PROMPT
+from utils.metrics import summary as metrics_summary
+from utils.rate_limit import stats as rate_limit_stats
+from utils import response_cache
 
 def render_sidebar():
     """
@@ -32,6 +37,29 @@ def render_sidebar():
         clear_conversation()
         st.sidebar.success("Conversation cleared!")
     
+    # Saved conversations
+    with st.sidebar.expander("Conversations"):
+        conversations = list_conversations(limit=20)
+        if conversations:
+            labels = {
+                conversation["id"]: f"{conversation['title'] or conversation['id']} ({conversation['message_count']} messages)"
+                for conversation in conversations
+            }
+            selected_id = st.selectbox("Recent conversations", list(labels), format_func=labels.get)
+            col1, col2 = st.columns(2)
+            if col1.button("Resume"):
+                if resume_conversation(selected_id):
+                    st.rerun()
+                else:
+                    st.error("Conversation not found")
+            if col2.button("Delete"):
+                delete_conversation(selected_id)
+                if selected_id == st.session_state.conversation_id:
+                    clear_conversation()
+                st.rerun()
+        else:
+            st.write("No saved conversations yet")
+    
     # Tools Configuration
     st.sidebar.header("Tool Configuration")
     
@@ -91,6 +119,8 @@ def render_sidebar():
                             stats = upload_files_to_vector_store(file_paths, vector_store_id)
                             if stats["successful_uploads"] > 0:
                                 st.success(f"Successfully uploaded {stats['successful_uploads']} files")
+                            if stats["skipped"] > 0:
+                                st.info(f"Skipped {stats['skipped']} files already in the vector store")
                             if stats["failed_uploads"] > 0:
                                 st.error(f"Failed to upload {stats['failed_uploads']} files")
             
@@ -112,6 +142,33 @@ def render_sidebar():
         value=st.session_state.tools_config.get("function_calling", False)
     )
     
+    # Multi-turn context
+    multi_turn_enabled = st.sidebar.checkbox(
+        "Remember Conversation Context",
+        value=st.session_state.tools_config.get("multi_turn", CONVERSATION_CHAINING),
+        help="Chain turns on the server with previous_response_id instead of resending the transcript"
+    )
+    
+    # Usage statistics for this process
+    with st.sidebar.expander("Usage Stats"):
+        usage = metrics_summary()
+        col1, col2 = st.columns(2)
+        col1.metric("Requests", usage["requests"])
+        col2.metric("Est. Cost", f"${usage['cost_usd']:.4f}")
+        col1.metric("Input Tokens", usage["input_tokens"])
+        col2.metric("Output Tokens", usage["output_tokens"])
+        st.write(f"Cached input tokens: {usage['cached_input_tokens']}")
+        if usage["latency_p50"] is not None:
+            st.write(f"Latency p50/p95: {usage['latency_p50']}s / {usage['latency_p95']}s")
+        if usage["ttft_p50"] is not None:
+            st.write(f"First token p50/p95: {usage['ttft_p50']}s / {usage['ttft_p95']}s")
+        st.write(f"Errors: {usage['errors']}, retries: {usage['retries']}, tool calls: {usage['tool_calls']}")
+        st.write(f"HTTP requests: {usage['http_requests']}, retries: {usage['http_retries']}")
+        st.write(f"Rate limit waits: {rate_limit_stats()['waited_seconds']}s")
+        if response_cache.is_enabled():
+            cache = response_cache.stats()
+            st.write(f"Response cache hits/misses: {cache['hits']} / {cache['misses']}")
+    
     # Developer Information
     with st.sidebar.expander("Developer Information"):
         st.subheader("AI System Prompt")
@@ -123,6 +180,7 @@ def render_sidebar():
         "file_search": file_search_enabled,
         "vector_store_id": vector_store_id,
         "function_calling": function_calling_enabled,
+        "multi_turn": multi_turn_enabled,
         "model": model
     }
     
@@ -3,6 +3,7 @@ import os
 from components.sidebar import render_sidebar
 from components.chat_interface import render_chat_interface
 from utils.conversation_utils import init_session_state
+from utils.metrics import start_server as start_metrics_server
 
 def main():
     # Set page config
@@ -16,6 +17,9 @@ def main():
     # Initialize session state
     init_session_state()
     
+    # Serve Prometheus metrics when METRICS_PORT is set (once per process)
+    start_metrics_server()
+    
     # Apply custom CSS
     with open("assets/styles.css") as f:
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
@@ -0,0 +1,316 @@
+"""
+Headless HTTP service for the assistant, independent of Streamlit.
+
+Exposes the chat turn pipeline, tool responses, file search and vector
+store ingestion over HTTP, and streams chat answers as Server-Sent Events.
+Run from the app directory:
+
+    uvicorn server:app --host 0.0.0.0 --port 8000 --workers 4
+    python server.py
+
+Worker model: each uvicorn worker process runs one event loop. Tool
+responses and file search use the async API functions, so one loop keeps
+many of them in flight. Chat turns and ingestion use the blocking pipeline
+and run on a bounded thread pool of SERVICE_TURN_WORKERS threads. Every
+request that does model or ingestion work, async or not, first takes one of
+SERVICE_TURN_WORKERS + SERVICE_MAX_PENDING admission slots; beyond that
+requests get a 503 with Retry-After instead of queueing without bound.
+Within a worker process, turns of the same conversation run one at a time.
+Worker processes do not coordinate, so with --workers N two turns of one
+conversation can land on different workers and run concurrently; clients
+should wait for a turn to finish before sending the next.
+
+Conversations are read from and written to the shared conversation store.
+Response chains and per-conversation locks are kept per process, for the
+SERVICE_MAX_CONVERSATIONS most recently active conversations and for any
+with a turn in flight. A turn that lands on another worker, or on a
+conversation that was evicted, rebuilds its context from the stored history.
+
+The Streamlit app becomes a thin client of this service when SERVICE_URL is
+set (see utils/service_client.py).
+"""
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+from dotenv import load_dotenv, find_dotenv
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from utils import chat_pipeline, conversation_store, conversation_chain, vectorstore_utils
+from utils.async_api_utils import async_use_tool_response, async_file_search_response
+from utils.client_utils import close_async_client
+from utils.metrics import render_prometheus
+from utils.cache_utils import LRUCache, MISSING
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", "8000"))
+# Worker processes when started with python server.py
+SERVICE_WORKERS = int(os.environ.get("SERVICE_WORKERS", "1"))
+# Threads per process running blocking chat turns and ingestion
+SERVICE_TURN_WORKERS = int(os.environ.get("SERVICE_TURN_WORKERS", "32"))
+# Requests allowed to wait for a thread before new ones are turned away
+SERVICE_MAX_PENDING = int(os.environ.get("SERVICE_MAX_PENDING", "64"))
+# Conversations whose response chain and lock are kept in memory
+SERVICE_MAX_CONVERSATIONS = int(os.environ.get("SERVICE_MAX_CONVERSATIONS", "1024"))
+
+_executor = ThreadPoolExecutor(max_workers=SERVICE_TURN_WORKERS, thread_name_prefix="turn")
+_admission = threading.BoundedSemaphore(SERVICE_TURN_WORKERS + SERVICE_MAX_PENDING)
+# Lock and chain per conversation, for the most recently active ones
+_conversations = LRUCache(max_size=SERVICE_MAX_CONVERSATIONS)
+# Conversations with a turn in flight: [state, turn count]. Their state is
+# kept here even if the cache evicts it, so concurrent turns share one lock.
+_active = {}
+_state_lock = threading.Lock()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    _executor.shutdown(wait=False, cancel_futures=True)
+    await close_async_client()
+
+app = FastAPI(title="RAG Agentic AI Assistant", lifespan=lifespan)
+
+class ChatRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None
+    tools_config: dict = Field(default_factory=dict)
+    stream: bool = True
+
+class ToolResponseRequest(BaseModel):
+    message: str
+    tools_config: dict = Field(default_factory=dict)
+    model: str = "gpt-4o"
+
+class FileSearchRequest(BaseModel):
+    query: str
+    vector_store_ids: list
+    model: str = "gpt-4o-mini"
+
+class VectorStoreRequest(BaseModel):
+    name: str
+
+def _admit():
+    """
+    Reserve a place for a job, or refuse it when the service is saturated.
+    """
+    if not _admission.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Service busy, try again shortly", headers={"Retry-After": "1"})
+
+async def _run_blocking(fn, *args):
+    """
+    Run an admitted blocking job on the turn pool.
+
+    Args:
+        fn: Callable to run
+        *args: Its arguments
+
+    Returns:
+        The callable's result
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _admission.release()
+
+@contextmanager
+def _conversation_state(conversation_id: str):
+    """
+    Hold a conversation's lock and response chain for the length of a turn.
+
+    State is created on first use. While any turn of the conversation is in
+    flight the state stays pinned, so a turn that starts after the cache
+    evicted it still waits on the same lock.
+
+    Yields:
+        tuple: (threading.Lock, chain dict)
+    """
+    with _state_lock:
+        entry = _active.get(conversation_id)
+        if entry is None:
+            state = _conversations.get(conversation_id)
+            if state is MISSING:
+                state = (threading.Lock(), conversation_chain.new_chain())
+            entry = _active[conversation_id] = [state, 0]
+        entry[1] += 1
+        _conversations.set(conversation_id, entry[0])
+    try:
+        yield entry[0]
+    finally:
+        with _state_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _active[conversation_id]
+
+def _turn(conversation_id: str, message: str, tools_config: dict, on_event=None) -> dict:
+    """
+    Run a chat turn on the current thread.
+
+    Returns:
+        dict: The stored user and assistant messages
+    """
+    with _conversation_state(conversation_id) as (lock, chain), lock:
+        if tools_config.get("multi_turn"):
+            # A chain is rebuilt from the whole conversation, summarizing
+            # older turns within its token budget, not from one page of it
+            messages = list(conversation_store.iter_messages(conversation_id))
+        else:
+            # Standalone turns do not read earlier messages
+            messages, chain = [], None
+        assistant = chat_pipeline.run_turn(conversation_id, messages, message, tools_config, chain, on_event=on_event)
+        return {"conversation_id": conversation_id, "user": messages[-2], "assistant": assistant}
+
+def _sse(event_type: str, data) -> str:
+    return f"event: {event_type}\ndata: {conversation_store.dumps(data)}\n\n"
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/v1/chat")
+async def chat(request: ChatRequest):
+    """
+    Run a chat turn through the same pipeline as the Streamlit app.
+
+    Streams text, annotation and tool-call events, then done, then
+    turn_completed with the stored messages. With stream false, returns the
+    stored messages once the turn is finished.
+    """
+    conversation_id = request.conversation_id or conversation_store.new_conversation_id()
+    _admit()
+
+    if not request.stream:
+        return await _run_blocking(_turn, conversation_id, request.message, request.tools_config)
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def on_event(event):
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def run():
+        try:
+            result = _turn(conversation_id, request.message, request.tools_config, on_event)
+            on_event({"type": "turn_completed", **result})
+        except Exception as e:
+            print(f"Error running chat turn: {e}")
+            on_event({"type": "error", "text": f"Error: {str(e)}"})
+        finally:
+            on_event(None)
+
+    # The turn keeps running, and is stored, even if the client disconnects
+    task = asyncio.ensure_future(_run_blocking(run))
+
+    async def events():
+        yield _sse("conversation", {"conversation_id": conversation_id})
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield _sse(event["type"], event)
+        await task
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/v1/responses")
+async def tool_response(request: ToolResponseRequest):
+    """
+    Answer a single message with the enabled tools, without a conversation.
+    """
+    _admit()
+    try:
+        text, metadata = await async_use_tool_response(request.message, request.tools_config, model=request.model)
+    finally:
+        _admission.release()
+    return {"text": text, "metadata": json.loads(conversation_store.dumps(metadata or {}))}
+
+@app.post("/v1/file-search")
+async def file_search(request: FileSearchRequest):
+    """
+    Answer a query from the given vector stores.
+    """
+    _admit()
+    try:
+        text, source_files = await async_file_search_response(request.query, request.vector_store_ids, model=request.model)
+    finally:
+        _admission.release()
+    return {"text": text, "source_files": sorted(source_files)}
+
+@app.get("/v1/conversations")
+async def conversations(limit: int = 20, offset: int = 0):
+    return {"conversations": await asyncio.to_thread(conversation_store.list_conversations, limit, offset)}
+
+@app.get("/v1/conversations/{conversation_id}/messages")
+async def conversation_messages(conversation_id: str, limit: Optional[int] = None, before_seq: Optional[int] = None):
+    if not await asyncio.to_thread(conversation_store.get_conversation, conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    messages = await asyncio.to_thread(conversation_store.load_messages, conversation_id, limit, before_seq)
+    return {"messages": messages}
+
+@app.post("/v1/vector-stores")
+async def create_vector_store(request: VectorStoreRequest):
+    _admit()
+    details = await _run_blocking(vectorstore_utils.create_vector_store, request.name)
+    if not details:
+        raise HTTPException(status_code=502, detail="Could not create vector store")
+    return details
+
+@app.get("/v1/vector-stores/{vector_store_id}")
+async def vector_store_details(vector_store_id: str):
+    details = await asyncio.to_thread(vectorstore_utils.get_vector_store_details, vector_store_id)
+    if not details:
+        raise HTTPException(status_code=404, detail="Vector store not found")
+    return details
+
+@app.post("/v1/vector-stores/{vector_store_id}/files")
+async def upload_files(vector_store_id: str, files: list[UploadFile] = File(...), attributes: str = Form(None)):
+    """
+    Upload files to a vector store.
+
+    attributes is an optional JSON object of metadata, applied to every file.
+    """
+    try:
+        file_metadata = json.loads(attributes) if attributes else None
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"attributes is not valid JSON: {e}")
+    if file_metadata is not None and not isinstance(file_metadata, dict):
+        raise HTTPException(status_code=400, detail="attributes must be a JSON object")
+
+    _admit()
+    upload_dir = tempfile.mkdtemp(prefix="upload_")
+    try:
+        file_paths = []
+        for i, upload in enumerate(files):
+            # One directory per upload, so files with the same name keep their own content
+            file_dir = os.path.join(upload_dir, str(i))
+            os.makedirs(file_dir)
+            file_path = os.path.join(file_dir, os.path.basename(upload.filename or "upload"))
+            with open(file_path, "wb") as f:
+                await asyncio.to_thread(shutil.copyfileobj, upload.file, f)
+            file_paths.append(file_path)
+        file_attributes = {file_path: dict(file_metadata) for file_path in file_paths} if file_metadata else None
+    except Exception:
+        _admission.release()
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise
+    try:
+        stats = await _run_blocking(vectorstore_utils.upload_files_to_vector_store, file_paths, vector_store_id, None, file_attributes)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    return json.loads(conversation_store.dumps(stats))
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("server:app", host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS)
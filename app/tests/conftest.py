@@ -0,0 +1,235 @@
+"""
+Shared test setup.
+
+Every cache, store and index path is pointed at a temporary directory
+before any utils module is imported, since they read their settings at
+import time. Tests never reach the network: OpenAI calls are answered by
+the fake_openai fixture, and the local vector store uses the hashing
+embedder.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import weakref
+import tempfile
+from collections import defaultdict
+from types import SimpleNamespace
+import httpx
+import pytest
+
+_test_dir = tempfile.mkdtemp(prefix="rag_agentic_tests_")
+
+os.environ.update({
+    "OPENAI_API_KEY": "test",
+    "VECTOR_STORE_BACKEND": "local",
+    "LOCAL_EMBEDDER": "hashing",
+    "LOCAL_VECTOR_STORE_DIR": os.path.join(_test_dir, "vector_stores"),
+    "UPLOAD_MANIFEST_DIR": os.path.join(_test_dir, "manifests"),
+    "METADATA_INDEX_PATH": os.path.join(_test_dir, "metadata_index.sqlite3"),
+    "CONVERSATION_DB_PATH": os.path.join(_test_dir, "conversations.sqlite3"),
+    "GEOCODE_CACHE_PATH": os.path.join(_test_dir, "geocode.sqlite3"),
+    "GAZETTEER_DIR": os.path.join(_test_dir, "gazetteer"),
+    "TRACE_FILE": os.path.join(_test_dir, "traces.jsonl"),
+    "TRACE_EXPORTER": "none",
+    "METRICS_FILE": "",
+    "METRICS_PORT": "0",
+    "RESPONSE_CACHE_ENABLED": "false",
+    "SEMANTIC_CACHE_ENABLED": "false",
+    "NOMINATIM_MIN_INTERVAL": "0",
+    "RATE_LIMIT_RPM": "0",
+    "RATE_LIMIT_TPM": "0",
+})
+
+# Tests import utils the way the app does, from the app directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_test_dir, ignore_errors=True)
+
+class FakeOpenAI:
+    """
+    In-process stand-in for the OpenAI API.
+
+    Requests are answered through httpx.MockTransport. Replies can be queued
+    per endpoint ("responses", "chat/completions", "embeddings", ...) as a
+    JSON body, a list of server-sent events or an httpx.Response; without
+    one, a default answer of text is given. Every request is recorded as
+    (endpoint, JSON body).
+    """
+
+    def __init__(self):
+        self.text = "Fake answer"
+        self.requests = []
+        self._replies = defaultdict(list)
+
+    def reply(self, endpoint: str, reply):
+        self._replies[endpoint].append(reply)
+
+    def calls(self, endpoint: str) -> list:
+        return [body for name, body in self.requests if name == endpoint]
+
+    @staticmethod
+    def response(text: str = "Fake answer", function_calls=(), filenames=(), response_id: str = None) -> dict:
+        output = [
+            {"type": "function_call", "id": f"fc_{i}", "call_id": f"call_{i}", "name": name,
+             "arguments": json.dumps(arguments), "status": "completed"}
+            for i, (name, arguments) in enumerate(function_calls)
+        ]
+        if filenames:
+            output.append({"type": "file_search_call", "id": "fs_1", "status": "completed", "queries": [text]})
+        if not function_calls:
+            output.append({
+                "type": "message", "id": "msg_1", "status": "completed", "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": [
+                    {"type": "file_citation", "file_id": f"file_{i}", "filename": filename, "index": 0}
+                    for i, filename in enumerate(filenames)
+                ]}]
+            })
+        return {
+            "id": response_id or f"resp_{time.monotonic_ns()}", "object": "response", "created_at": int(time.time()),
+            "status": "completed", "model": "gpt-4o", "output": output,
+            "usage": {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15,
+                      "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0}}
+        }
+
+    @staticmethod
+    def response_events(response: dict) -> list:
+        events = []
+        for index, item in enumerate(response["output"]):
+            if item["type"] != "message":
+                events.append({"type": "response.output_item.added", "output_index": index, "item": item})
+                events.append({"type": "response.output_item.done", "output_index": index, "item": item})
+                continue
+            content = item["content"][0]
+            for position, word in enumerate(content["text"].split(" ")):
+                events.append({"type": "response.output_text.delta", "item_id": item["id"], "output_index": index,
+                               "content_index": 0, "delta": word if position == 0 else " " + word})
+            for annotation_index, annotation in enumerate(content["annotations"]):
+                events.append({"type": "response.output_text.annotation.added", "item_id": item["id"], "output_index": index,
+                               "content_index": 0, "annotation_index": annotation_index, "annotation": annotation})
+        events.append({"type": "response.completed", "response": response})
+        return events
+
+    @staticmethod
+    def chat_completion(text: str = "Fake answer") -> dict:
+        return {
+            "id": "chatcmpl-1", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+        }
+
+    @staticmethod
+    def chat_chunks(text: str = "Fake answer") -> list:
+        base = {"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": int(time.time()), "model": "gpt-4o"}
+        chunks = [
+            dict(base, choices=[{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}])
+            for i, word in enumerate(text.split(" "))
+        ]
+        chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        chunks.append(dict(base, choices=[], usage={"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}))
+        return chunks
+
+    @staticmethod
+    def error(status_code: int, message: str, code: str = None, param: str = None) -> httpx.Response:
+        return httpx.Response(status_code, json={"error": {
+            "message": message, "type": "invalid_request_error", "code": code, "param": param
+        }})
+
+    def _default(self, endpoint: str, body: dict):
+        if endpoint == "responses":
+            response = self.response(self.text)
+            return self.response_events(response) if body.get("stream") else response
+        if endpoint == "chat/completions":
+            return self.chat_chunks(self.text) if body.get("stream") else self.chat_completion(self.text)
+        if endpoint == "embeddings":
+            inputs = [body["input"]] if isinstance(body["input"], str) else body["input"]
+            return {"object": "list", "model": body.get("model"), "usage": {"prompt_tokens": 1, "total_tokens": 1}, "data": [
+                {"object": "embedding", "index": i, "embedding": [float(len(text)), 1.0, float(i)]} for i, text in enumerate(inputs)
+            ]}
+        return self.error(404, f"No fake for {endpoint}")
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.split("/v1/", 1)[-1]
+        content = request.read()
+        body = json.loads(content) if content and "json" in request.headers.get("content-type", "") else {}
+        self.requests.append((endpoint, body))
+        reply = self._replies[endpoint].pop(0) if self._replies[endpoint] else self._default(endpoint, body)
+        if isinstance(reply, httpx.Response):
+            return reply
+        if isinstance(reply, list):
+            stream = "".join(
+                (f"event: {event['type']}\n" if "type" in event else "") + f"data: {json.dumps(event)}\n\n"
+                for event in reply
+            ) + ("data: [DONE]\n\n" if endpoint == "chat/completions" else "")
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=stream.encode("utf-8"))
+        return httpx.Response(200, json=reply)
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """
+    Answer every OpenAI call, sync and async, with a FakeOpenAI.
+    """
+    from utils import client_utils
+    fake = FakeOpenAI()
+    transport_httpx = SimpleNamespace(
+        Limits=httpx.Limits, Timeout=httpx.Timeout,
+        Client=lambda **kwargs: httpx.Client(transport=httpx.MockTransport(fake), **kwargs),
+        AsyncClient=lambda **kwargs: httpx.AsyncClient(transport=httpx.MockTransport(fake), **kwargs),
+    )
+    monkeypatch.setattr(client_utils, "httpx", transport_httpx)
+    monkeypatch.setattr(client_utils, "_http_client", None)
+    monkeypatch.setattr(client_utils, "_client", None)
+    monkeypatch.setattr(client_utils, "_async_clients", weakref.WeakKeyDictionary())
+    return fake
+
+def write_pdf(path, pages: list):
+    """
+    Write a minimal PDF with one line of text per page.
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    content += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    content += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """
+    Build text PDFs in the test's temporary directory.
+    """
+    return lambda name, pages: write_pdf(tmp_path / name, pages)
+
+@pytest.fixture
+def exported_traces():
+    """
+    Collect the traces finished during a test.
+    """
+    from utils import tracing
+    exporter = tracing.MemoryExporter()
+    tracing.add_exporter(exporter)
+    yield exporter.traces
+    tracing.remove_exporter(exporter)
@@ -0,0 +1,34 @@
+import os
+import sys
+import json
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run_benchmarks(*args):
+    # The benchmark configures its environment before importing utils, so it runs in its own process
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--json", *args],
+        cwd=APP_DIR, capture_output=True, text=True, timeout=300
+    )
+    assert completed.returncode == 0, completed.stderr
+    # Progress lines, such as building the gazetteer index, come before the report
+    return json.loads(completed.stdout[completed.stdout.index("{\n"):])
+
+def test_every_entry_point_runs_against_the_stub():
+    report = _run_benchmarks("--iterations", "3", "--concurrency", "2", "--no-allocations")
+
+    assert set(report["entries"]) == {"use_tool_response", "file_search_response", "upload_files_to_vector_store", "weather"}
+    for entry in report["entries"].values():
+        assert entry["calls"] == 3
+        assert entry["errors"] == 0
+        assert entry["p50_ms"] <= entry["p95_ms"] <= entry["p99_ms"]
+    assert report["stub"]["requests"] > 0
+    assert report["openai"]["requests"] > 0
+
+def test_allocation_pass_reports_per_call_blocks():
+    report = _run_benchmarks("--iterations", "2", "--entry", "weather")
+
+    assert list(report["entries"]) == ["weather"]
+    assert report["entries"]["weather"]["peak_kib"] > 0
+    assert "net_blocks_per_call" in report["entries"]["weather"]
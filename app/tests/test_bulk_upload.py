@@ -0,0 +1,220 @@
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+from utils import bulk_upload, http_utils, rate_limit
+
+class FakeStoreClient:
+    """
+    In-memory stand-in for the files and vector store endpoints the bulk uploader uses.
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.upload_errors = []
+        self.file_status = {}
+        self.batches = {}
+        self.polls_until_done = 1
+        self.attributes = {}
+        self.updating = 0
+        self.peak_updating = 0
+        self.deleted = []
+        self.detached = []
+        self.calls = []
+        self.files = SimpleNamespace(create=self.create_file, delete=self.delete_file)
+        self.vector_stores = SimpleNamespace(
+            file_batches=SimpleNamespace(create=self.create_batch, retrieve=self.retrieve_batch, list_files=self.list_files),
+            files=SimpleNamespace(update=self.update_file, delete=self.detach_file),
+        )
+
+    def create_file(self, file, purpose):
+        with self.lock:
+            self.calls.append("files.create")
+            if self.upload_errors:
+                raise self.upload_errors.pop(0)
+            return SimpleNamespace(id=f"file-{next(self.ids)}")
+
+    def delete_file(self, file_id):
+        self.deleted.append(file_id)
+
+    def create_batch(self, vector_store_id, file_ids):
+        batch_id = f"vsfb_{len(self.batches) + 1}"
+        self.batches[batch_id] = {"file_ids": list(file_ids), "polls": 0}
+        return SimpleNamespace(id=batch_id, status="in_progress")
+
+    def retrieve_batch(self, batch_id, vector_store_id):
+        self.calls.append("file_batches.retrieve")
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        done = self.polls_until_done is not None and batch["polls"] >= self.polls_until_done
+        return SimpleNamespace(id=batch_id, status="completed" if done else "in_progress")
+
+    def list_files(self, batch_id, vector_store_id, limit, after=None):
+        self.calls.append("file_batches.list_files")
+        batch = self.batches[batch_id]
+        done = self.polls_until_done is not None and batch["polls"] >= self.polls_until_done
+        file_ids = batch["file_ids"]
+        start = file_ids.index(after) + 1 if after else 0
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(
+                    id=file_id,
+                    status=self.file_status.get(file_id, "completed") if done else "in_progress",
+                    last_error=SimpleNamespace(message="Unsupported file") if self.file_status.get(file_id) == "failed" else None
+                )
+                for file_id in file_ids[start:start + limit]
+            ],
+            has_more=start + limit < len(file_ids)
+        )
+
+    def update_file(self, file_id, vector_store_id, attributes):
+        with self.lock:
+            self.updating += 1
+            self.peak_updating = max(self.peak_updating, self.updating)
+        time.sleep(0.01)
+        with self.lock:
+            self.updating -= 1
+            self.attributes[file_id] = attributes
+
+    def detach_file(self, vector_store_id, file_id):
+        self.detached.append(file_id)
+
+def _rate_limit_error():
+    response = httpx.Response(429, headers={"Retry-After": "0"}, request=httpx.Request("POST", "https://api.openai.com/v1/files"))
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeStoreClient()
+    monkeypatch.setattr(bulk_upload, "get_client", lambda: fake)
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_POLL_INTERVAL", 0)
+    monkeypatch.setattr(http_utils, "HTTP_BACKOFF_BASE", 0.001)
+    return fake
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"paper{i}.pdf"
+        path.write_bytes(b"%PDF" + bytes(100 * i))
+        paths.append(str(path))
+    return paths
+
+def test_uploads_attach_in_batches_and_wait_for_indexing(client, files, monkeypatch):
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_BATCH_SIZE", 2)
+
+    report = bulk_upload.upload_files(files, "vs_1")
+
+    results = dict(report["results"])
+    assert [results[path]["status"] for path in files] == ["success"] * 3
+    assert all(results[path]["indexing_seconds"] is not None for path in files)
+    assert [len(batch["file_ids"]) for batch in client.batches.values()] == [2, 1]
+    assert report["batch_ids"] == ["vsfb_1", "vsfb_2"]
+
+def test_throttled_uploads_retry_and_halve_concurrency(client, files):
+    client.upload_errors = [_rate_limit_error()]
+
+    report = bulk_upload.upload_files(files[:1], "vs_1")
+
+    assert report["results"][0][1]["status"] == "success"
+    assert report["throttled"] == 1
+    assert client.calls.count("files.create") == 2
+
+def test_retried_uploads_reserve_the_request_budget_once(client, files, monkeypatch):
+    reserved = []
+    monkeypatch.setattr(rate_limit, "reserve", lambda estimated_tokens=0: reserved.append(estimated_tokens) or 0.0)
+    client.upload_errors = [_rate_limit_error(), _rate_limit_error()]
+    limiter = bulk_upload.AdaptiveLimiter(4, 1, 64)
+
+    file_id, _ = bulk_upload._upload_file(files[0], limiter)
+
+    assert file_id == "file-1"
+    assert client.calls.count("files.create") == 3
+    assert len(reserved) == 1
+    assert limiter.throttled == 2
+    assert limiter.in_flight == 0
+
+def test_uploads_that_keep_failing_are_reported(client, files, monkeypatch):
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_MAX_RETRIES", 1)
+    client.upload_errors = [_rate_limit_error(), _rate_limit_error()]
+
+    report = bulk_upload.upload_files(files[:1], "vs_1")
+
+    assert report["results"][0][1]["status"] == "failed"
+    assert client.batches == {}
+
+def test_failed_indexing_detaches_and_deletes_the_file(client, files):
+    client.file_status["file-2"] = "failed"
+
+    results = dict(bulk_upload.upload_files(files[:2], "vs_1")["results"])
+
+    failed = [result for result in results.values() if result["status"] == "failed"]
+    assert [result["error"] for result in failed] == ["Unsupported file"]
+    assert client.detached == client.deleted == ["file-2"]
+
+def test_indexing_timeouts_detach_and_delete_the_files(client, files, monkeypatch):
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_POLL_TIMEOUT", 0.05)
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_POLL_MAX_INTERVAL", 0.01)
+    client.polls_until_done = None
+
+    results = dict(bulk_upload.upload_files(files[:1], "vs_1")["results"])
+
+    assert results[files[0]]["error"] == "Timed out waiting for indexing"
+    assert client.detached == client.deleted == ["file-1"]
+
+def test_attributes_are_set_on_attached_files(client, files):
+    bulk_upload.upload_files(files[:1], "vs_1", {files[0]: {"year": 2016}})
+
+    assert client.attributes == {"file-1": {"year": 2016}}
+
+def test_attribute_updates_run_concurrently_under_the_limiter(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_INITIAL_CONCURRENCY", 4)
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_MAX_CONCURRENCY", 4)
+    paths = []
+    for i in range(12):
+        path = tmp_path / f"item{i}.txt"
+        path.write_text(f"item {i}")
+        paths.append(str(path))
+
+    bulk_upload.upload_files(paths, "vs_1", {path: {"index": i} for i, path in enumerate(paths)})
+
+    assert len(client.attributes) == 12
+    assert 1 < client.peak_updating <= 4
+
+def test_only_finished_batches_are_listed(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_upload, "BULK_UPLOAD_BATCH_SIZE", 250)
+    client.polls_until_done = 3
+    paths = []
+    for i in range(250):
+        path = tmp_path / f"item{i}.txt"
+        path.write_text(f"item {i}")
+        paths.append(str(path))
+
+    report = bulk_upload.upload_files(paths, "vs_1")
+
+    assert all(result["status"] == "success" for _, result in report["results"])
+    assert client.calls.count("file_batches.retrieve") == 3
+    # 250 files at 100 per page, listed once the batch is done
+    assert client.calls.count("file_batches.list_files") == 3
+
+def test_limiter_grows_in_slow_start_and_halves_on_throttle():
+    limiter = bulk_upload.AdaptiveLimiter(4, 1, 64)
+    for _ in range(4):
+        limiter.on_success(0.1, 1024 * 1024)
+    assert limiter.limit == 8
+
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    limiter.on_success(0.1, 1024 * 1024)
+    assert limiter.limit == pytest.approx(4.25)
+
+def test_limiter_backs_off_when_latency_inflates():
+    limiter = bulk_upload.AdaptiveLimiter(4, 1, 64)
+    limiter.on_success(0.1, 1024 * 1024)
+    limiter.on_success(10, 1024 * 1024)
+
+    assert limiter.limit == 4
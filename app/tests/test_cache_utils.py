@@ -0,0 +1,77 @@
+import time
+import threading
+import pytest
+from utils.cache_utils import LRUCache, MISSING, SingleFlight
+
+def test_lru_evicts_the_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+def test_lru_caches_none_and_expires_entries():
+    cache = LRUCache(ttl=60)
+    cache.set("none", None)
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("none") is None
+    assert cache.get("short") is MISSING
+    assert cache.get("short", "default") == "default"
+    assert len(cache) == 1
+
+def test_lru_delete_and_clear():
+    cache = LRUCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.delete("a")
+    cache.delete("missing")
+
+    assert cache.get("a") is MISSING
+    cache.clear()
+    assert len(cache) == 0
+
+def test_single_flight_runs_concurrent_calls_once():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return "forecast"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("paris", fetch)))
+    leader.start()
+    started.wait(1)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("paris", fetch))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.shared < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert results == ["forecast"] * 5
+    assert len(calls) == 1
+    assert flight.shared == 4
+
+def test_single_flight_shares_errors_and_forgets_finished_calls():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("upstream down")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "recovered") == "recovered"
@@ -0,0 +1,52 @@
+from streamlit.testing.v1 import AppTest
+from utils import conversation_store
+
+def _history_app():
+    import streamlit as st
+    from utils.conversation_utils import init_session_state, resume_conversation
+    from components.chat_interface import render_history
+
+    init_session_state()
+    if not st.session_state.get("resumed"):
+        resume_conversation(st.session_state.seed_id, page_size=30)
+        st.session_state.resumed = True
+    render_history()
+
+def _conversation(message_count):
+    conversation_id = conversation_store.new_conversation_id()
+    for i in range(message_count):
+        role = "user" if i % 2 == 0 else "assistant"
+        metadata = {"source_files": ["b.pdf", "a.pdf"]} if role == "assistant" else None
+        conversation_store.append_message(conversation_id, {"role": role, "content": f"message {i}", "metadata": metadata})
+    return conversation_id
+
+def _run(conversation_id):
+    app = AppTest.from_function(_history_app)
+    app.session_state["seed_id"] = conversation_id
+    return app.run()
+
+def _rendered(app):
+    return [message.markdown[0].value for message in app.chat_message]
+
+def test_only_the_latest_window_is_rendered():
+    app = _run(_conversation(50))
+
+    assert not app.exception
+    assert _rendered(app) == [f"message {i}" for i in range(30, 50)]
+    assert app.expander[0].markdown[0].value == "- a.pdf\n- b.pdf"
+
+def test_loading_earlier_messages_pages_in_from_the_store():
+    app = _run(_conversation(50))
+
+    app.button[0].click().run()
+    assert _rendered(app) == [f"message {i}" for i in range(10, 50)]
+
+    app.button[0].click().run()
+    assert _rendered(app) == [f"message {i}" for i in range(0, 50)]
+    assert not app.button
+
+def test_short_conversations_have_no_paging_button():
+    app = _run(_conversation(4))
+
+    assert _rendered(app) == [f"message {i}" for i in range(4)]
+    assert not app.button
@@ -0,0 +1,35 @@
+import pytest
+from utils import chat_pipeline, conversation_store
+
+def test_turn_streams_events_and_stores_both_messages(fake_openai, exported_traces):
+    conversation_id = conversation_store.new_conversation_id()
+    messages, events = [], []
+
+    answer = chat_pipeline.run_turn(conversation_id, messages, "Hi there", {}, on_event=events.append)
+
+    assert [event["type"] for event in events] == ["text", "text", "done"]
+    assert answer["content"] == "Fake answer"
+    assert [message["role"] for message in messages] == ["user", "assistant"]
+    stored = conversation_store.load_messages(conversation_id)
+    assert [message["content"] for message in stored] == ["Hi there", "Fake answer"]
+    assert stored[0]["metadata"]["trace_id"] == stored[1]["metadata"]["trace_id"] == exported_traces[0][-1]["trace_id"]
+    assert [span["name"] for span in exported_traces[0]][-2:] == ["render", "turn"]
+
+def test_plain_turns_use_chat_completions_and_tool_turns_use_responses(fake_openai):
+    chat_pipeline.run_turn(conversation_store.new_conversation_id(), [], "Hi", {})
+    chat_pipeline.run_turn(conversation_store.new_conversation_id(), [], "News today", {"web_search": True})
+
+    assert [name for name, _ in fake_openai.requests] == ["chat/completions", "responses"]
+
+def test_failed_turns_store_the_error_as_the_answer(monkeypatch):
+    def failing_events(*args, **kwargs):
+        raise RuntimeError("backend down")
+        yield
+
+    monkeypatch.setattr(chat_pipeline, "get_response_events", failing_events)
+    events = []
+
+    answer = chat_pipeline.run_turn(conversation_store.new_conversation_id(), [], "Hi", {}, on_event=events.append)
+
+    assert answer["content"] == "Error: backend down"
+    assert events == [{"type": "error", "text": "Error: backend down"}]
@@ -0,0 +1,62 @@
+import asyncio
+from utils import client_utils, async_api_utils
+
+def test_sync_client_is_shared(fake_openai):
+    assert client_utils.get_client() is client_utils.get_client()
+
+def test_new_api_key_reuses_the_connection_pool(fake_openai, monkeypatch):
+    client = client_utils.get_client()
+    pool = client_utils._http_client
+
+    monkeypatch.setenv("OPENAI_API_KEY", "other")
+    other = client_utils.get_client()
+
+    assert other is not client
+    assert other.api_key == "other"
+    assert client_utils._http_client is pool
+
+def test_async_client_is_shared_within_a_loop(fake_openai):
+    async def clients():
+        return client_utils.get_async_client(), client_utils.get_async_client()
+
+    first, second = asyncio.run(clients())
+    other_loop, _ = asyncio.run(clients())
+
+    assert first is second
+    # httpx.AsyncClient connections belong to the loop that opened them
+    assert other_loop is not first
+
+def test_set_api_key_rebuilds_clients(fake_openai, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    client = client_utils.get_client()
+
+    client_utils.set_api_key("rotated")
+
+    assert client_utils.get_client() is not client
+    assert client_utils.get_client().api_key == "rotated"
+
+def test_async_chat_completion(fake_openai):
+    fake_openai.reply("chat/completions", fake_openai.chat_completion("Hello there"))
+
+    text = asyncio.run(async_api_utils.async_chat_completion("Hi"))
+
+    assert text == "Hello there"
+    assert fake_openai.calls("chat/completions")[0]["messages"][-1] == {"role": "user", "content": "Hi"}
+
+def test_async_calls_run_concurrently_on_one_loop(fake_openai):
+    async def ask_all():
+        answers = await asyncio.gather(*(async_api_utils.async_get_response(f"Question {i}") for i in range(20)))
+        await client_utils.close_async_client()
+        return answers
+
+    answers = asyncio.run(ask_all())
+
+    assert answers == ["Fake answer"] * 20
+    assert sorted(body["input"] for body in fake_openai.calls("responses")) == sorted(f"Question {i}" for i in range(20))
+
+def test_async_errors_become_error_text(fake_openai):
+    fake_openai.reply("responses", fake_openai.error(400, "Bad input"))
+
+    text = asyncio.run(async_api_utils.async_web_search("weather"))
+
+    assert text.startswith("Error:")
@@ -0,0 +1,96 @@
+from utils import api_utils, conversation_chain
+
+def _history(turns, words=50):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}. " + "word " * words})
+        history.append({"role": "assistant", "content": f"Answer {i}. " + "word " * words})
+    return history
+
+def test_chaining_is_off_by_default():
+    assert conversation_chain.CONVERSATION_CHAINING is False
+
+def test_short_history_is_sent_verbatim():
+    history = _history(2, words=5)
+
+    items = conversation_chain.build_history_input(history, "Next question", budget=8000)
+
+    assert items[:-1] == [{"role": message["role"], "content": message["content"]} for message in history]
+    assert items[-1] == {"role": "user", "content": "Next question"}
+
+def test_older_turns_are_summarized_within_the_budget():
+    history = _history(20)
+    budget = 1000
+
+    items = conversation_chain.build_history_input(history, "Next question", budget=budget)
+
+    summary, recent = items[0], items[1:-1]
+    assert summary["role"] == "developer"
+    assert "user: Question" in summary["content"]
+    # Summaries keep only the first sentence
+    assert "word" not in summary["content"]
+    # The newest turns are verbatim and in order
+    assert recent == [{"role": message["role"], "content": message["content"]} for message in history[-len(recent):]]
+    assert items[-1] == {"role": "user", "content": "Next question"}
+    used = sum(conversation_chain._tokens(item["content"]) for item in items)
+    assert used <= budget + conversation_chain._tokens(summary["content"].split("\n")[0])
+
+def test_oversized_history_is_dropped():
+    history = _history(3, words=5000)
+
+    items = conversation_chain.build_history_input(history, "Next question", budget=100)
+
+    assert items[-1] == {"role": "user", "content": "Next question"}
+    assert all(len(item["content"]) < 2000 for item in items)
+
+def test_chain_reset():
+    chain = conversation_chain.new_chain()
+    chain.update(response_id="resp_1", context_tokens=500)
+
+    conversation_chain.reset(chain)
+
+    assert chain["response_id"] is None
+    assert chain["context_tokens"] == 0
+
+def _chained_turn(fake_openai):
+    chain = conversation_chain.new_chain()
+    chain["response_id"] = "resp_gone"
+    history = [{"role": "user", "content": "Earlier question"}, {"role": "assistant", "content": "Earlier answer"}]
+    return api_utils.use_tool_response("news today", {"web_search": True}, chain=chain, history=history)
+
+def test_missing_previous_response_rebuilds_the_chain(fake_openai):
+    fake_openai.reply("responses", fake_openai.error(400, "Previous response with id 'resp_gone' not found.", param="previous_response_id"))
+
+    text, _ = _chained_turn(fake_openai)
+
+    first, retry = fake_openai.calls("responses")
+    assert text == "Fake answer"
+    assert first["previous_response_id"] == "resp_gone"
+    assert "previous_response_id" not in retry
+    assert retry["input"][0] == {"role": "user", "content": "Earlier question"}
+
+def test_other_not_found_errors_are_not_retried(fake_openai):
+    fake_openai.reply("responses", fake_openai.error(404, "The model 'gpt-x' was not found", code="model_not_found", param="model"))
+
+    text, _ = _chained_turn(fake_openai)
+
+    assert text.startswith("Error with tools")
+    assert len(fake_openai.calls("responses")) == 1
+
+def test_context_tokens_count_turns_not_retrieved_chunks(fake_openai):
+    response = fake_openai.response("Twenty-one days.", filenames=["ebola.pdf"])
+    # File search results make up most of the billed input
+    response["usage"]["input_tokens"] = 6000
+    fake_openai.reply("responses", response)
+    chain = conversation_chain.new_chain()
+    history = [{"role": "user", "content": "Earlier question"}, {"role": "assistant", "content": "Earlier answer"}]
+    question = "What is the incubation period?"
+
+    api_utils.use_tool_response(question, {"file_search": True, "vector_store_id": "vs_hosted"}, chain=chain, history=history)
+
+    expected = sum(conversation_chain._tokens(text) for text in ["Earlier question", "Earlier answer", question, "Twenty-one days."])
+    assert chain["context_tokens"] == expected
+    assert chain["context_tokens"] < 100
+
+    api_utils.use_tool_response("And the fatality rate?", {"file_search": True, "vector_store_id": "vs_hosted"}, chain=chain, history=history)
+    assert fake_openai.calls("responses")[-1]["previous_response_id"] == response["id"]
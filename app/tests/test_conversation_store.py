@@ -0,0 +1,66 @@
+from utils import conversation_store
+
+def _conversation(message_count):
+    conversation_id = conversation_store.new_conversation_id()
+    for i in range(message_count):
+        role = "user" if i % 2 == 0 else "assistant"
+        conversation_store.append_message(conversation_id, {
+            "role": role, "content": f"message {i}", "timestamp": "2026-01-01 00:00:00",
+            "metadata": {"index": i} if role == "assistant" else None,
+        })
+    return conversation_id
+
+def test_new_conversation_ids_are_unique():
+    assert len({conversation_store.new_conversation_id() for _ in range(1000)}) == 1000
+
+def test_append_returns_sequence_numbers():
+    conversation_id = conversation_store.new_conversation_id()
+
+    seqs = [conversation_store.append_message(conversation_id, {"role": "user", "content": str(i)}) for i in range(3)]
+
+    assert seqs == [0, 1, 2]
+
+def test_latest_page_is_loaded_by_default():
+    conversation_id = _conversation(25)
+
+    page = conversation_store.load_messages(conversation_id, limit=10)
+
+    assert [message["seq"] for message in page] == list(range(15, 25))
+    assert page[-1]["content"] == "message 24"
+    assert page[-2]["metadata"] == {"index": 23}
+    assert "metadata" not in page[-1]
+
+def test_earlier_pages_are_loaded_before_a_sequence_number():
+    conversation_id = _conversation(25)
+
+    older = conversation_store.load_messages(conversation_id, limit=10, before_seq=15)
+    oldest = conversation_store.load_messages(conversation_id, limit=10, before_seq=older[0]["seq"])
+
+    assert [message["seq"] for message in older] == list(range(5, 15))
+    assert [message["seq"] for message in oldest] == list(range(0, 5))
+    assert conversation_store.load_messages(conversation_id, limit=10, before_seq=0) == []
+
+def test_iter_messages_streams_the_whole_conversation():
+    conversation_id = _conversation(7)
+
+    assert [message["content"] for message in conversation_store.iter_messages(conversation_id)] == [
+        f"message {i}" for i in range(7)
+    ]
+
+def test_conversation_summary_and_listing():
+    conversation_id = _conversation(4)
+
+    conversation = conversation_store.get_conversation(conversation_id)
+
+    assert conversation["message_count"] == 4
+    assert conversation["title"] == "message 0"
+    assert conversation_id in [item["id"] for item in conversation_store.list_conversations(limit=1000)]
+
+def test_delete_conversation():
+    conversation_id = _conversation(3)
+
+    assert conversation_store.delete_conversation(conversation_id)
+    assert not conversation_store.get_conversation(conversation_id)
+    assert conversation_store.load_messages(conversation_id) == []
+    # The connection is usable again afterwards
+    assert conversation_store.append_message(conversation_id, {"role": "user", "content": "again"}) == 0
@@ -0,0 +1,70 @@
+import pytest
+from utils import document_utils
+
+def test_iter_pdf_pages_yields_numbered_pages(make_pdf):
+    path = make_pdf("paper.pdf", ["Introduction", "Methods", "Results"])
+
+    assert list(document_utils.iter_pdf_pages(path)) == [
+        (path, 1, "Introduction"), (path, 2, "Methods"), (path, 3, "Results")
+    ]
+    assert list(document_utils.iter_pdf_pages(path, 1, 10)) == [(path, 2, "Methods"), (path, 3, "Results")]
+
+def test_extract_text_from_pdf(make_pdf, tmp_path):
+    path = make_pdf("paper.pdf", ["Hello", "World"])
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+
+    assert document_utils.extract_text_from_pdf(path) == "HelloWorld"
+    assert document_utils.extract_text_from_pdf(str(broken)) == ""
+
+def test_parallel_extraction_keeps_file_and_page_order(make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(document_utils, "PDF_PARALLEL_MIN_PAGES", 0)
+    first = make_pdf("first.pdf", [f"First page {i}" for i in range(5)])
+    second = make_pdf("second.pdf", [f"Second page {i}" for i in range(3)])
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+
+    records = list(document_utils.iter_pdf_pages_parallel([first, str(broken), second], max_workers=2, pages_per_task=2))
+
+    assert [(path, page) for path, page, _ in records] == \
+        [(first, page) for page in range(1, 6)] + [(second, page) for page in range(1, 4)]
+    assert records[-1][2] == "Second page 2"
+
+def test_few_pages_are_extracted_without_a_pool(make_pdf, monkeypatch):
+    first = make_pdf("first.pdf", ["One", "Two"])
+    second = make_pdf("second.pdf", ["Three"])
+    monkeypatch.setattr(document_utils, "ProcessPoolExecutor", None)
+
+    records = list(document_utils.iter_pdf_pages_parallel([first, second], max_workers=4))
+
+    assert [text for _, _, text in records] == ["One", "Two", "Three"]
+
+def test_page_ranges_split_one_long_file_across_workers():
+    ranges = list(document_utils._page_ranges(["long.pdf"], [400], max_workers=8))
+
+    assert len(ranges) == 8
+    assert ranges[0] == ("long.pdf", 0, 50)
+    assert ranges[-1] == ("long.pdf", 350, 400)
+
+def test_page_ranges_are_capped_and_stay_within_a_file():
+    ranges = list(document_utils._page_ranges(["a.pdf", "b.pdf"], [3, 1000], max_workers=2, pages_per_task=64))
+
+    assert ranges[0] == ("a.pdf", 0, 3)
+    assert all(stop - start <= 64 for _, start, stop in ranges)
+    assert ranges[-1] == ("b.pdf", 960, 1000)
+
+def test_chunk_text_overlaps_windows():
+    words = " ".join(f"w{i}" for i in range(10))
+
+    assert document_utils.chunk_text(words, chunk_words=4, overlap_words=1) == [
+        "w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"
+    ]
+    assert document_utils.chunk_text("") == []
+
+def test_read_document_text(tmp_path):
+    note = tmp_path / "notes.md"
+    note.write_text("# Notes")
+
+    assert document_utils.read_document_text(str(note)) == "# Notes"
+    with pytest.raises(ValueError):
+        document_utils.read_document_text(str(tmp_path / "image.png"))
@@ -0,0 +1,87 @@
+import gzip
+import pytest
+from utils import gazetteer
+
+def _row(geonameid, name, alternates, lat, lon, country, population):
+    # The 19 columns of a GeoNames cities dump
+    return "\t".join([
+        str(geonameid), name, name, ",".join(alternates), str(lat), str(lon), "P", "PPL", country, "", "", "", "", "",
+        str(population), "", "", "Etc/UTC", "2024-01-01"
+    ])
+
+@pytest.fixture
+def small_index(tmp_path, monkeypatch):
+    source = tmp_path / "cities.txt.gz"
+    with gzip.open(source, "wt", encoding="utf-8") as f:
+        f.write("\n".join([
+            _row(1, "Paris", ["Lutetia", "Paname"], 48.85, 2.35, "FR", 2100000),
+            _row(2, "Paris", [], 33.66, -95.55, "US", 25000),
+            _row(3, "Springfield", [], 39.80, -89.64, "US", 114000),
+            _row(4, "Springfield", [], 37.22, -93.30, "US", 169000),
+            _row(5, "Sankt Petersburg", ["Saint Petersburg", "Leningrad"], 59.94, 30.31, "RU", 5350000),
+            _row(6, "Santiago", [], -33.46, -70.65, "CL", 4837000),
+            _row(7, "Sanaa", [], 15.35, 44.21, "YE", 1937000),
+            _row(8, "Lisbon", ["Santiago Alt"], 38.72, -9.14, "PT", 517000),
+        ]) + "\n")
+    directory = str(tmp_path / "index")
+
+    header = gazetteer.build_index(str(source), directory)
+
+    monkeypatch.setattr(gazetteer, "_index", gazetteer._open_index(directory))
+    return header
+
+def test_build_counts_places_and_names(small_index):
+    assert small_index["places"] == 8
+    # Each place's name, plus its alternates
+    assert small_index["keys"] == 8 + 5
+
+def test_lookup_prefers_primary_names_then_population(small_index):
+    lat, lon, display_name = gazetteer.lookup("paris")
+
+    assert (round(lat, 2), round(lon, 2)) == (48.85, 2.35)
+    assert display_name == "Paris, France"
+    assert gazetteer.lookup("Springfield")[:2] == pytest.approx((37.22, -93.30), abs=0.01)
+
+def test_lookup_by_alternate_name(small_index):
+    assert gazetteer.lookup("Leningrad")[2] == "Sankt Petersburg, Russia"
+    assert gazetteer.lookup("saint petersburg")[2] == "Sankt Petersburg, Russia"
+
+@pytest.mark.parametrize("query, country", [
+    ("Paris, France", "France"), ("paris, fr", "France"), ("Paris, United States", "United States"), ("Paris, US", "United States"),
+])
+def test_country_qualifier_narrows_the_match(small_index, query, country):
+    assert gazetteer.lookup(query)[2] == f"Paris, {country}"
+
+def test_unknown_places_and_qualifiers_miss(small_index):
+    assert gazetteer.lookup("Nowhereville") is None
+    assert gazetteer.lookup("Paris, Texas") is None
+    assert gazetteer.lookup("Paris, Japan") is None
+    assert gazetteer.lookup("") is None
+    assert not gazetteer.contains("Nowhereville")
+    assert gazetteer.contains("Paname")
+
+def test_complete_ranks_primary_names_before_alternates(small_index):
+    suggestions = gazetteer.complete("san", limit=5)
+
+    assert [name for name, *_ in suggestions] == [
+        "Sankt Petersburg, Russia", "Santiago, Chile", "Sanaa, Yemen", "Lisbon, Portugal"
+    ]
+    assert suggestions[0][3] == 5350000
+    assert gazetteer.complete("zzz") == []
+
+def test_rebuild_replaces_the_index(small_index, tmp_path):
+    source = tmp_path / "other.txt"
+    source.write_text(_row(9, "Oslo", [], 59.91, 10.75, "NO", 700000) + "\n", encoding="utf-8")
+    directory = str(tmp_path / "index")
+
+    header = gazetteer.build_index(str(source), directory)
+
+    assert header["places"] == 1
+    assert gazetteer._open_index(directory)["header"]["places"] == 1
+
+def test_bundled_gazetteer_knows_common_places():
+    # Built from the bundled GeoNames subset on first use
+    assert gazetteer.lookup("München")[2] == "Munich, Germany"
+    assert gazetteer.lookup("New York")[2] == "New York City, United States"
+    assert gazetteer.lookup("São Paulo") == gazetteer.lookup("sao paulo")
+    assert gazetteer.stats()["places"] > 6000
@@ -0,0 +1,54 @@
+import os
+import time
+import threading
+import pytest
+from utils import geocode_cache
+from utils.cache_utils import MISSING
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(geocode_cache, "GEOCODE_CACHE_PATH", str(tmp_path / "geocode.sqlite3"))
+    monkeypatch.setattr(geocode_cache, "_local", threading.local())
+    monkeypatch.setattr(geocode_cache, "_schema_ready", False)
+    geocode_cache._memory_cache.clear()
+
+def test_normalize_query_merges_equivalent_spellings():
+    assert geocode_cache.normalize_query("  Paris ,France. ") == "paris, france"
+    assert geocode_cache.normalize_query("ＰＡＲＩＳ") == "paris"
+
+def test_results_survive_the_memory_tier():
+    geocode_cache.set_cached("Paris, France", (48.85, 2.35, "Paris"))
+    geocode_cache._memory_cache.clear()
+
+    assert geocode_cache.get_cached("paris ,  france") == (48.85, 2.35, "Paris")
+    assert geocode_cache.cache_stats()["size"] == 1
+
+def test_negative_results_are_cached_and_expire(monkeypatch):
+    monkeypatch.setattr(geocode_cache, "GEOCODE_NEGATIVE_TTL", 0.05)
+    geocode_cache.set_cached("Atlantis", None)
+
+    assert geocode_cache.get_cached("Atlantis") is None
+    time.sleep(0.06)
+    geocode_cache._memory_cache.clear()
+    assert geocode_cache.get_cached("Atlantis") is MISSING
+
+def test_unknown_places_are_missing():
+    assert geocode_cache.get_cached("Nowhere") is MISSING
+
+def test_throttle_spaces_requests(monkeypatch):
+    monkeypatch.setattr(geocode_cache, "NOMINATIM_MIN_INTERVAL", 0.05)
+    started = time.monotonic()
+    for _ in range(3):
+        geocode_cache.throttle()
+
+    assert time.monotonic() - started >= 0.1
+
+def test_unusable_cache_directory_degrades_to_a_miss(monkeypatch, tmp_path):
+    blocker = tmp_path / "not_a_directory"
+    blocker.write_text("")
+    monkeypatch.setattr(geocode_cache, "GEOCODE_CACHE_PATH", str(blocker / "geocode.sqlite3"))
+
+    geocode_cache.set_cached("Paris", (48.85, 2.35, "Paris"))
+    geocode_cache._memory_cache.clear()
+
+    assert geocode_cache.get_cached("Paris") is MISSING
@@ -0,0 +1,99 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from utils import http_utils
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.clients.append(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_utils, "HTTP_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(http_utils, "_session", None)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.statuses = []
+    httpd.clients = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}/forecast"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_retries_transient_statuses(server):
+    server.statuses = [503, 429]
+
+    response = http_utils.http_get(server.url)
+
+    assert response.status_code == 200
+    assert len(server.clients) == 3
+
+def test_returns_the_last_response_when_retries_run_out(server):
+    server.statuses = [503, 503, 503, 503]
+
+    response = http_utils.http_get(server.url, max_retries=1)
+
+    assert response.status_code == 503
+    assert len(server.clients) == 2
+
+def test_negative_retry_limit_still_sends_one_request(server):
+    server.statuses = [503]
+
+    response = http_utils.http_get(server.url, max_retries=-1)
+
+    assert response.status_code == 503
+    assert len(server.clients) == 1
+
+def test_connections_are_reused(server):
+    for _ in range(3):
+        http_utils.http_get(server.url)
+
+    assert len(set(server.clients)) == 1
+
+def test_before_attempt_runs_before_every_attempt(server):
+    server.statuses = [500]
+    attempts = []
+
+    http_utils.http_get(server.url, before_attempt=lambda: attempts.append(1))
+
+    assert len(attempts) == 2
+
+def test_connection_errors_raise_after_retries(monkeypatch):
+    monkeypatch.setattr(http_utils, "HTTP_BACKOFF_BASE", 0.001)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    with pytest.raises(requests.ConnectionError):
+        http_utils.http_get(f"http://127.0.0.1:{port}/", max_retries=1)
+
+def test_timeouts_per_host(monkeypatch):
+    monkeypatch.setattr(http_utils, "HOST_TIMEOUTS", dict(http_utils.HOST_TIMEOUTS))
+    http_utils.set_host_timeout("slow.example.com", 1, 30)
+
+    assert http_utils.get_timeout("https://slow.example.com/x") == (1, 30)
+    assert http_utils.get_timeout("https://other.example.com/x") == (http_utils.HTTP_CONNECT_TIMEOUT, http_utils.HTTP_READ_TIMEOUT)
+    assert http_utils.get_timeout("https://api.open-meteo.com/v1/forecast") == (http_utils.HTTP_CONNECT_TIMEOUT, http_utils.HTTP_READ_TIMEOUT)
+
+def test_backoff_delay_honors_and_caps_retry_after():
+    assert http_utils.backoff_delay(0, "2") == 2
+    assert http_utils.backoff_delay(0, "3600") == http_utils.HTTP_BACKOFF_MAX
+    assert 0 <= http_utils.backoff_delay(10) <= http_utils.HTTP_BACKOFF_MAX
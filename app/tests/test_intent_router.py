@@ -0,0 +1,73 @@
+import pytest
+from utils import intent_router
+
+WEATHER_TOOLS = {"function_calling": True}
+ALL_TOOLS = {"function_calling": True, "file_search": True, "vector_store_id": "vs_test", "web_search": True}
+
+@pytest.mark.parametrize("text, locations", [
+    ("What's the weather in Paris?", ["Paris"]),
+    ("Paris weather", ["Paris"]),
+    ("what's the forecast for New York like tomorrow", ["New York"]),
+    ("weather in the city of London this weekend", ["London"]),
+    ("In Tokyo, what's the temperature?", ["Tokyo"]),
+    ("compare the weather in Berlin, Madrid and Rome", ["Berlin", "Madrid", "Rome"]),
+    ("weather in Paris, France", ["Paris, France"]),
+    ("What's the weather in München?", ["München"]),
+])
+def test_known_places_are_confident(text, locations):
+    routed = intent_router.route(text, WEATHER_TOOLS)
+
+    assert routed["intent"] == intent_router.WEATHER
+    assert routed["locations"] == locations
+    assert intent_router.is_confident(routed)
+
+@pytest.mark.parametrize("text, locations", [
+    ("weather in Smallville", ["Smallville"]),
+    ("weather in st. petersburg russia", ["st. petersburg russia"]),
+    # A region after a known city stays with it
+    ("weather in Mobile, Alabama", ["Mobile, Alabama"]),
+    ("weather in Washington, D.C.", ["Washington, D.C"]),
+    ("weather in Trinidad and Tobago", ["Trinidad", "Tobago"]),
+])
+def test_unknown_places_are_left_to_the_model(text, locations):
+    routed = intent_router.route(text, WEATHER_TOOLS)
+
+    assert routed["intent"] == intent_router.WEATHER
+    assert routed["locations"] == locations
+    assert not intent_router.is_confident(routed)
+
+@pytest.mark.parametrize("text", ["I hate this weather", "Tell me the weather forecast", "weather at my place"])
+def test_non_places_are_not_extracted(text):
+    routed = intent_router.route(text, WEATHER_TOOLS)
+
+    assert routed["locations"] == []
+    assert not intent_router.is_confident(routed)
+
+def test_unit_slot():
+    assert intent_router.route("weather in Oslo in fahrenheit", WEATHER_TOOLS)["unit"] == "fahrenheit"
+    assert intent_router.route("weather in Oslo", WEATHER_TOOLS)["unit"] == "celsius"
+
+@pytest.mark.parametrize("text, intent", [
+    ("Summarize the papers on climate change", intent_router.FILE_SEARCH),
+    ("weather forecast in the uploaded report", intent_router.FILE_SEARCH),
+    ("latest news about the temperature of the oceans", intent_router.WEB_SEARCH),
+    ("climate in Tokyo", intent_router.WEATHER),
+])
+def test_soft_weather_words_give_way_to_other_tools(text, intent):
+    assert intent_router.route(text, ALL_TOOLS)["intent"] == intent
+
+def test_temperature_of_an_unknown_thing_is_chat():
+    assert intent_router.route("what's the temperature of the sun", WEATHER_TOOLS)["intent"] == intent_router.CHAT
+
+def test_disabled_tools_are_never_chosen():
+    assert intent_router.route("What's the weather in Paris?", {})["intent"] == intent_router.CHAT
+    assert intent_router.route("Find it in the uploaded documents", {"file_search": True})["intent"] == intent_router.CHAT
+
+@pytest.mark.parametrize("candidate, cleaned", [
+    ("Paris right now?", "Paris"),
+    ("the Hague tomorrow", "Hague"),
+    ("Berlin this weekend please", "Berlin"),
+    ("  'Rome'  ", "Rome"),
+])
+def test_clean_location(candidate, cleaned):
+    assert intent_router.clean_location(candidate) == cleaned
@@ -0,0 +1,33 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import pytest
+from benchmarks import load
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_parse_mix():
+    assert load.parse_mix("plain=3, weather") == {"plain": 3.0, "weather": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        load.parse_mix("images=1")
+
+def test_turns_are_unique_so_caches_never_answer():
+    inputs = {load.make_turn(kind, n, "vs_1")[0] for kind in load.QUERY_KINDS for n in range(100)}
+
+    assert len(inputs) == 400
+    assert load.make_turn("file_search", 1, "vs_1")[1] == {"file_search": True, "vector_store_id": "vs_1"}
+
+def test_sessions_drive_the_chat_pipeline_against_the_stub():
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load", "--json", "--sessions", "3", "--turns", "2",
+         "--think-time", "0", "--latency", "0", "--jitter", "0", "--multi-turn"],
+        cwd=APP_DIR, capture_output=True, text=True, timeout=300
+    )
+    assert completed.returncode == 0, completed.stderr
+    report = json.loads(completed.stdout[completed.stdout.index("{\n"):])
+
+    assert report["overall"]["turns"] == 6
+    assert report["overall"]["errors"] == 0
+    assert sum(kind["turns"] for kind in report["by_kind"].values()) == 6
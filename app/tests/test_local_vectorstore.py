@@ -0,0 +1,78 @@
+from utils import document_utils, local_vectorstore
+
+def _store():
+    return local_vectorstore.create_vector_store("test store")["id"]
+
+def test_create_vector_store_is_local_and_empty():
+    details = local_vectorstore.get_vector_store_details(_store())
+
+    assert local_vectorstore.is_local_store_id(details["id"])
+    assert details["name"] == "test store"
+    assert details["file_count"] == 0
+
+def test_search_ranks_the_matching_document_first():
+    store = _store()
+    local_vectorstore.add_document(store, "ebola.txt", "Ebola virus disease spreads through bodily fluids.")
+    local_vectorstore.add_document(store, "weather.txt", "Sunny skies and light winds are forecast for the weekend.")
+
+    results = local_vectorstore.search(store, "How does the ebola virus spread?", max_results=2)
+
+    assert [result["filename"] for result in results][0] == "ebola.txt"
+    assert local_vectorstore.get_vector_store_details(store)["file_count"] == 2
+
+def test_search_returns_attributes():
+    store = _store()
+    local_vectorstore.add_document(store, "paper.txt", "Convalescent plasma trials", {"year": 2016})
+
+    results = local_vectorstore.search(store, "convalescent plasma")
+
+    assert results[0]["attributes"] == {"year": 2016}
+
+def test_deleted_file_no_longer_matches():
+    store = _store()
+    kept = local_vectorstore.add_document(store, "kept.txt", "Monoclonal antibodies for treatment.")
+    deleted = local_vectorstore.add_document(store, "deleted.txt", "Vaccine trials in Guinea and Sierra Leone.")
+
+    assert local_vectorstore.delete_file(store, deleted)
+
+    file_ids = {result["file_id"] for result in local_vectorstore.search(store, "vaccine trials in Guinea", max_results=5)}
+    assert deleted not in file_ids
+    assert kept in file_ids
+    assert local_vectorstore.get_vector_store_details(store)["file_count"] == 1
+
+def test_deleted_rows_do_not_take_result_slots():
+    store = _store()
+    for i in range(3):
+        local_vectorstore.add_document(store, f"deleted{i}.txt", "Ebola vaccine trials.")
+    deleted = [result["file_id"] for result in local_vectorstore.search(store, "Ebola vaccine trials")]
+    kept = [local_vectorstore.add_document(store, f"kept{i}.txt", f"Malaria bed nets, batch {i}.") for i in range(2)]
+
+    for file_id in deleted:
+        assert local_vectorstore.delete_file(store, file_id)
+
+    results = local_vectorstore.search(store, "Ebola vaccine trials", max_results=2)
+    assert sorted(result["file_id"] for result in results) == sorted(kept)
+    assert local_vectorstore.search(store, "Ebola vaccine trials", candidate_rows=[0, 1, 2]) == []
+
+def test_search_can_be_restricted_to_candidate_rows():
+    store = _store()
+    local_vectorstore.add_document(store, "a.txt", "Ebola outbreak response.")
+    local_vectorstore.add_document(store, "b.txt", "Ebola outbreak response in detail.")
+
+    results = local_vectorstore.search(store, "Ebola outbreak", candidate_rows=[1])
+
+    assert [result["filename"] for result in results] == ["b.txt"]
+
+def test_ingest_pdfs_indexes_pages_from_the_process_pool(make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(document_utils, "PDF_PARALLEL_MIN_PAGES", 0)
+    store = _store()
+    first = make_pdf("outbreak.pdf", ["Ebola outbreak in West Africa", "Case fatality rates"])
+    second = make_pdf("plasma.pdf", ["Convalescent plasma trial results"])
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"not a pdf")
+
+    results = dict(local_vectorstore.ingest_pdfs([first, second, str(empty)], store, max_workers=2))
+
+    assert results[first]["status"] == results[second]["status"] == "success"
+    assert results[str(empty)] == {"file": "empty.pdf", "status": "failed", "error": "No text could be extracted"}
+    assert local_vectorstore.search(store, "convalescent plasma trial")[0]["filename"] == "plasma.pdf"
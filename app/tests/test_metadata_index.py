@@ -0,0 +1,104 @@
+import uuid
+import pytest
+from utils import metadata_index, vectorstore_utils
+
+ITEMS = [
+    {"key": "FOCOSI01", "title": "Convalescent plasma for Ebola virus disease", "year": 2015, "tags": ["Public Health"],
+     "authors": ["Daniele Focosi", "Julian W Tang"]},
+    {"key": "FOCOSI02", "title": "Monoclonal antibodies against Ebola", "year": 2016, "tags": [],
+     "authors": ["Daniele Focosi", "Marco Tuccori"]},
+    {"key": "TAYLOR01", "title": "Baricitinib treatment trial", "year": 2020, "tags": [],
+     "authors": ["Peter C. Taylor", "Inmaculada De La Torre"]},
+    {"key": "ENDE0001", "title": "Ebola survivors follow-up", "year": 2018, "tags": ["follow-up"],
+     "authors": ["A. J. Van Der Ende"]},
+    {"key": "FISHER01", "title": "Ebola vaccine regulation", "year": 2019, "tags": [], "authors": ["Robert Fisher"]},
+]
+
+@pytest.fixture(scope="module")
+def store():
+    vector_store_id = f"vs_test_{uuid.uuid4().hex}"
+    for item in ITEMS:
+        metadata_index.index_item(vector_store_id, item, file_id=f"file_{item['key']}", filename=f"{item['key']}.txt")
+    return vector_store_id
+
+@pytest.mark.parametrize("query, year_range, years", [
+    ("papers from 2015", None, {2015}),
+    ("studies between 2014 and 2016", (2014, 2016), set()),
+    ("results 2018-2015", (2015, 2018), set()),
+    ("since 2019", (2019, 9999), set()),
+    ("after 2019", (2020, 9999), set()),
+    ("before 2016", (0, 2015), set()),
+    ("until 2016", (0, 2016), set()),
+    ("no years here", None, set()),
+    ("papers from 2014 to 2016", (2014, 2016), set()),
+    ("trials in 2018", None, {2018}),
+    # Numbers without a cue are not years
+    ("ISO 9001:2015 audit checklist", None, set()),
+    ("top 2000 genes by expression", None, set()),
+    ("compare 2015 and 2016 results", None, set()),
+])
+def test_parse_query_years(query, year_range, years):
+    parsed = metadata_index.parse_query(query)
+
+    assert parsed["year_range"] == year_range
+    assert parsed["years"] == years
+
+def test_parse_query_keys_authors_tags_and_terms():
+    parsed = metadata_index.parse_query("Item FOCOSI01 by Daniele Focosi tagged public health about plasma")
+
+    assert parsed["keys"] == {"focosi01"}
+    assert parsed["authors"] == ["Daniele Focosi"]
+    assert parsed["tags"] == ["public health about"]
+    assert {"plasma", "daniele", "focosi"} <= parsed["terms"]
+    assert "about" not in parsed["terms"]
+
+def test_prefilter_by_year(store):
+    assert metadata_index.prefilter(store, "Ebola papers from 2016") == ["FOCOSI02"]
+    assert metadata_index.prefilter(store, "Which were published since 2019?") == ["FISHER01", "TAYLOR01"]
+    assert metadata_index.prefilter(store, "Ebola papers since 2019") == ["FISHER01"]
+
+def test_prefilter_by_named_author(store):
+    assert metadata_index.prefilter(store, "What did Daniele Focosi publish?") == ["FOCOSI01", "FOCOSI02"]
+    assert metadata_index.prefilter(store, "Papers by Van Der Ende") == ["ENDE0001"]
+
+def test_title_terms_narrow_the_candidates(store):
+    assert metadata_index.prefilter(store, "Focosi on convalescent plasma") == ["FOCOSI01"]
+
+def test_prefilter_by_key_and_tag(store):
+    assert metadata_index.prefilter(store, "Summarize FISHER01") == ["FISHER01"]
+    assert metadata_index.prefilter(store, "Papers tagged public health") == ["FOCOSI01"]
+
+@pytest.mark.parametrize("query", [
+    # Name particles, lone first names and ordinary words are not author filters
+    "What is the de facto standard treatment for Ebola?",
+    "Can Ebola survive on surfaces like a van seat?",
+    "Who is Peter Piot?",
+    # A surname alone that matches a single item is too narrow to trust
+    "What did Fisher say about regulation?",
+    # An untagged mention of a tag word is not a tag filter
+    "What is the public health impact of Ebola?",
+    # A bare number is not a year filter
+    "Which papers list the top 2015 Ebola genes?",
+])
+def test_incidental_matches_do_not_filter(store, query):
+    assert metadata_index.prefilter(store, query) is None
+
+def test_unknown_store_is_unfiltered():
+    assert metadata_index.prefilter("vs_unknown", "papers from 2016") is None
+
+def test_file_lookups(store):
+    assert metadata_index.file_ids_for_items(store, ["FISHER01"]) == ["file_FISHER01"]
+    assert metadata_index.item_keys_for_files([store], ["TAYLOR01.txt"]) == ["TAYLOR01"]
+
+def test_detach_keeps_the_index_entry_until_the_store_drops_the_file(fake_openai):
+    vector_store_id = f"vs_test_{uuid.uuid4().hex}"
+    metadata_index.index_item(vector_store_id, ITEMS[0], file_id="file_1", filename="plasma.pdf")
+
+    assert not vectorstore_utils.detach_file(vector_store_id, "file_1")
+    assert metadata_index.file_ids_for_items(vector_store_id, ["FOCOSI01"]) == ["file_1"]
+
+    fake_openai.reply(f"vector_stores/{vector_store_id}/files/file_1", {"id": "file_1", "object": "vector_store.file.deleted", "deleted": True})
+    fake_openai.reply("files/file_1", {"id": "file_1", "object": "file", "deleted": True})
+
+    assert vectorstore_utils.detach_file(vector_store_id, "file_1")
+    assert metadata_index.file_ids_for_items(vector_store_id, ["FOCOSI01"]) == []
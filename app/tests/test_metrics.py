@@ -0,0 +1,91 @@
+import socket
+import urllib.request
+from types import SimpleNamespace
+import pytest
+from utils import api_utils, metrics
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test", (1, 2, 4))
+    for value in (0.5, 1.5, 1.5, 3):
+        histogram.observe(value, model="a")
+    histogram.observe(100, model="b")
+
+    assert histogram.quantile(0.5, model="a") == pytest.approx(1.5)
+    assert histogram.quantile(1.0, model="b") == 4
+    assert histogram.quantile(0.5, model="c") is None
+    assert 'test_seconds_bucket{model="a",le="2"} 3' in histogram.render()
+
+def test_counter_totals_and_escapes_labels():
+    counter = metrics.Counter("test_total", "Test")
+    counter.inc(model="a", status="ok")
+    counter.inc(2, model="a", status='bad "quote"')
+
+    assert counter.total() == 3
+    assert counter.total(status="ok") == 1
+    assert 'test_total{model="a",status="bad \\"quote\\""} 2' in counter.render()
+
+def test_usage_from_every_endpoint_is_normalized():
+    responses = SimpleNamespace(input_tokens=100, output_tokens=20, input_tokens_details=SimpleNamespace(cached_tokens=40))
+    chat = SimpleNamespace(prompt_tokens=50, completion_tokens=10, prompt_tokens_details=None)
+
+    assert metrics.usage_tokens(responses) == {"input": 100, "cached_input": 40, "output": 20}
+    assert metrics.usage_tokens(chat) == {"input": 50, "cached_input": 0, "output": 10}
+    assert metrics.usage_tokens(None) == {"input": 0, "cached_input": 0, "output": 0}
+
+def test_cost_uses_cached_prices_and_dated_snapshots():
+    tokens = {"input": 1_000_000, "cached_input": 500_000, "output": 1_000_000}
+
+    assert metrics.estimate_cost("gpt-4o-mini-2024-07-18", tokens) == pytest.approx(0.075 + 0.0375 + 0.60)
+    assert metrics.estimate_cost("unknown-model", tokens) == 0.0
+
+def test_openai_calls_are_recorded(fake_openai):
+    before = metrics.summary()
+
+    api_utils.get_response("Hi")
+
+    after = metrics.summary()
+    assert after["requests"] == before["requests"] + 1
+    assert after["input_tokens"] == before["input_tokens"] + 10
+    assert after["output_tokens"] == before["output_tokens"] + 5
+    assert after["cost_usd"] >= before["cost_usd"]
+
+def test_streamed_calls_record_time_to_first_token(fake_openai):
+    count = sum(series["count"] for series in metrics.openai_ttft._series.values())
+
+    list(api_utils.stream_chat_completion("Hi"))
+
+    assert sum(series["count"] for series in metrics.openai_ttft._series.values()) == count + 1
+
+def test_metrics_server_serves_prometheus_text(monkeypatch):
+    monkeypatch.setattr(metrics, "_server", None)
+    server = metrics.start_server(_free_port())
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            body = response.read().decode("utf-8")
+        assert "# TYPE openai_requests_total counter" in body
+        assert server.server_address[0] == "127.0.0.1"
+        assert metrics.start_server(server.server_port) is server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_write_file(tmp_path):
+    path = tmp_path / "metrics" / "app.prom"
+
+    assert metrics.write_file(str(path))
+    assert "openai_request_duration_seconds" in path.read_text()
+
+def test_series_with_mixed_label_types_render():
+    counter = metrics.Counter("test_http_total", "Test")
+    counter.inc(host="example.com", status=200)
+    counter.inc(host="example.com", status="ConnectionError")
+
+    assert counter.render()[2:] == [
+        'test_http_total{host="example.com",status="200"} 1',
+        'test_http_total{host="example.com",status="ConnectionError"} 1',
+    ]
@@ -0,0 +1,109 @@
+import httpx
+import openai
+import pytest
+from utils import rate_limit
+
+def _response(status_code, headers=None):
+    return httpx.Response(status_code, headers=headers or {}, request=httpx.Request("POST", "https://api.openai.com/v1/responses"))
+
+def _rate_limit_error(headers=None, code=None):
+    return openai.RateLimitError("Rate limited", response=_response(429, headers), body={"code": code} if code else None)
+
+@pytest.fixture(autouse=True)
+def fresh_limiter(monkeypatch):
+    # Each test gets its own buckets, pause and counters
+    monkeypatch.setattr(rate_limit, "_requests", rate_limit.TokenBucket())
+    monkeypatch.setattr(rate_limit, "_tokens", rate_limit.TokenBucket())
+    monkeypatch.setattr(rate_limit, "_paused_until", 0.0)
+    monkeypatch.setattr(rate_limit, "_stats", {"throttled": 0, "retries": 0, "waited_seconds": 0.0})
+    monkeypatch.setattr(rate_limit, "OPENAI_BACKOFF_BASE", 0.001)
+
+@pytest.mark.parametrize("value, seconds", [
+    ("1s", 1.0), ("20ms", 0.02), ("6m0s", 360.0), ("1h2m3.5s", 3723.5), ("2.5", 2.5), ("", None), ("soon", None), (None, None),
+])
+def test_parse_duration(value, seconds):
+    parsed = rate_limit.parse_duration(value)
+
+    if seconds is None:
+        assert parsed is None
+    else:
+        assert parsed == pytest.approx(seconds)
+
+def test_bucket_without_a_limit_never_waits():
+    bucket = rate_limit.TokenBucket()
+
+    assert bucket.reserve(10 ** 9) == 0.0
+
+def test_bucket_waits_once_capacity_is_spent():
+    bucket = rate_limit.TokenBucket(60)
+
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
+
+def test_bucket_follows_server_headers():
+    bucket = rate_limit.TokenBucket()
+    bucket.observe(limit=600, remaining=0, reset_seconds=6)
+
+    # Exhausted until the reset, then one request per 0.1s
+    assert bucket.reserve(1) == pytest.approx(6.1, abs=0.05)
+    assert bucket.snapshot()["capacity"] == 600
+
+def test_observe_headers_feeds_buckets_and_pauses_on_429():
+    rate_limit.observe_headers({
+        "x-ratelimit-limit-requests": "60", "x-ratelimit-remaining-requests": "30",
+        "x-ratelimit-limit-tokens": "6000", "x-ratelimit-remaining-tokens": "100",
+        "retry-after-ms": "1500",
+    }, status_code=429)
+
+    stats = rate_limit.stats()
+    assert stats["requests"]["capacity"] == 60
+    assert stats["tokens"]["level"] <= 101
+    assert stats["throttled"] == 1
+    assert 1.0 < stats["paused_seconds"] <= 1.5
+
+def test_backoff_honors_retry_after():
+    assert rate_limit.backoff_delay(_rate_limit_error({"retry-after-ms": "250"}), 0) == pytest.approx(0.25)
+    assert rate_limit.backoff_delay(_rate_limit_error({"retry-after": "2"}), 3) == pytest.approx(2.0)
+
+def test_backoff_never_retries_insufficient_quota_or_client_errors():
+    bad_request = openai.BadRequestError("Bad request", response=_response(400), body=None)
+
+    assert rate_limit.backoff_delay(_rate_limit_error(code="insufficient_quota"), 0) is None
+    assert rate_limit.backoff_delay(bad_request, 0) is None
+    assert rate_limit.backoff_delay(ValueError("not an API error"), 0) is None
+
+def test_backoff_retries_transient_errors_with_bounded_jitter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "OPENAI_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(rate_limit, "OPENAI_BACKOFF_MAX", 4.0)
+    server_error = openai.InternalServerError("Server error", response=_response(500), body=None)
+    connection_error = openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+
+    for attempt in range(6):
+        for error in (server_error, connection_error, _rate_limit_error()):
+            assert 0.0 <= rate_limit.backoff_delay(error, attempt) <= min(4.0, 2 ** attempt)
+
+def test_call_retries_transient_errors_and_reserves_once():
+    rate_limit._tokens.observe(limit=6000, remaining=6000)
+    attempts = []
+    def flaky(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) < 3:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+        return "ok"
+
+    assert rate_limit.call(flaky, estimated_tokens=1000, model="test") == "ok"
+    assert len(attempts) == 3
+    assert rate_limit.stats()["retries"] == 2
+    # Charged for one request's tokens, not one per attempt
+    assert rate_limit._tokens.snapshot()["level"] == pytest.approx(5000, abs=5)
+
+def test_call_raises_non_retryable_errors_immediately():
+    attempts = []
+    def rejected():
+        attempts.append(1)
+        raise openai.BadRequestError("Bad request", response=_response(400), body=None)
+
+    with pytest.raises(openai.BadRequestError):
+        rate_limit.call(rejected)
+    assert len(attempts) == 1
@@ -0,0 +1,78 @@
+import pytest
+from utils import api_utils, response_cache
+from utils.cache_utils import MISSING
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "_enabled", True)
+    monkeypatch.setattr(response_cache, "_stats", {})
+    response_cache.clear()
+    yield response_cache
+    response_cache.clear()
+
+def test_disabled_cache_has_no_keys():
+    assert response_cache.make_key("chat", "gpt-4o", "", "Hi") is None
+    assert response_cache.get(None) is MISSING
+
+def test_keys_cover_everything_that_shapes_the_answer(cache):
+    key = cache.make_key("chat", "gpt-4o", "Be brief", "Hi")
+
+    assert key == cache.make_key("chat", "gpt-4o", "Be brief", "Hi")
+    assert key != cache.make_key("chat", "gpt-4o-mini", "Be brief", "Hi")
+    assert key != cache.make_key("chat", "gpt-4o", "Be long", "Hi")
+    assert key != cache.make_key("chat", "gpt-4o", "Be brief", "Hello")
+    assert cache.make_key("file_search", "m", "", "q", vector_store_ids=["a", "b"]) == \
+        cache.make_key("file_search", "m", "", "q", vector_store_ids=["b", "a"])
+
+def test_cached_values_are_copies(cache):
+    key = cache.make_key("file_search", "gpt-4o", "", "q")
+    value = ("Answer", {"source_files": ["a.pdf"]})
+    cache.put(key, value)
+
+    cached = cache.get(key)
+    cached[1]["source_files"].append("b.pdf")
+
+    assert cache.get(key) == value
+
+def test_kind_for_tools_picks_the_shortest_ttl():
+    assert response_cache.kind_for_tools([]) == "chat"
+    assert response_cache.kind_for_tools([{"type": "file_search"}]) == "file_search"
+    assert response_cache.kind_for_tools([{"type": "file_search"}, {"type": "web_search_preview"}]) == "web_search"
+    assert response_cache.kind_for_tools([{"type": "function", "name": "get_weather"}]) == "weather"
+
+def test_entries_expire_with_their_kind(cache, monkeypatch):
+    monkeypatch.setitem(response_cache.RESPONSE_CACHE_TTLS, "web_search", 0)
+    key = cache.make_key("web_search", "gpt-4o", "", "news")
+    cache.put(key, "Headlines")
+
+    assert cache.get(key) is MISSING
+
+def test_repeat_calls_are_served_from_the_cache(cache, fake_openai):
+    assert api_utils.chat_completion("Hi") == "Fake answer"
+    assert api_utils.chat_completion("Hi") == "Fake answer"
+    assert api_utils.get_response("Hi") == "Fake answer"
+    assert api_utils.get_response("Hi") == "Fake answer"
+
+    assert len(fake_openai.calls("chat/completions")) == 1
+    assert len(fake_openai.calls("responses")) == 1
+    assert cache.stats()["by_kind"] == {"chat": {"hits": 2, "misses": 2}}
+
+def test_failed_calls_are_not_cached(cache, fake_openai):
+    fake_openai.reply("responses", fake_openai.error(400, "Bad request"))
+
+    assert api_utils.web_search("news").startswith("Error")
+    assert api_utils.web_search("news") == "Fake answer"
+    assert len(fake_openai.calls("responses")) == 2
+
+def test_weather_answers_with_a_failed_location_are_not_cached(cache, monkeypatch):
+    answers = iter([("Error: weather unavailable", False), ("Sunny in Paris", True)])
+    monkeypatch.setattr(api_utils, "_get_weather", lambda location, unit="celsius", model="gpt-4o": next(answers))
+
+    text, metadata = api_utils.use_tool_response("What's the weather in Paris?", {"function_calling": True})
+    assert text == "Error: weather unavailable"
+    assert metadata["failed_locations"] == ["Paris"]
+    assert cache.stats()["size"] == 0
+
+    assert api_utils.use_tool_response("What's the weather in Paris?", {"function_calling": True})[0] == "Sunny in Paris"
+    assert api_utils.use_tool_response("What's the weather in Paris?", {"function_calling": True})[0] == "Sunny in Paris"
+    assert cache.stats()["size"] == 1
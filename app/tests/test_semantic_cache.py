@@ -0,0 +1,75 @@
+import pytest
+from utils import api_utils, local_vectorstore, semantic_cache
+from utils.cache_utils import MISSING
+from utils.embedding_utils import HashingEmbedder
+
+QUESTION = "What is the incubation period of ebola?"
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "_enabled", True)
+    monkeypatch.setattr(semantic_cache, "_scopes", {})
+    monkeypatch.setattr(semantic_cache, "_stats", {"hits": 0, "misses": 0, "invalidations": 0})
+    monkeypatch.setattr(semantic_cache, "_embedders", {})
+    monkeypatch.setattr(semantic_cache, "get_embedder", lambda name=None: HashingEmbedder())
+    return semantic_cache
+
+def test_disabled_cache_never_embeds(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "_embed", lambda vector_store_id, user_input: pytest.fail("embedded"))
+
+    assert semantic_cache.lookup("vs_1", "v", QUESTION) == (None, MISSING)
+
+def test_similar_inputs_share_an_answer(cache):
+    embedding, cached = cache.lookup("vs_1", "v", QUESTION)
+    assert cached is MISSING
+    cache.store("vs_1", "v", QUESTION, ("21 days", {"ebola.pdf"}), embedding)
+
+    _, cached = cache.lookup("vs_1", "v", "what is the incubation period of Ebola")
+    assert cached == ("21 days", {"ebola.pdf"})
+    assert cache.lookup("vs_1", "v", "Who maintains the zotero library?")[1] is MISSING
+    assert cache.stats() == {"hits": 1, "misses": 2, "invalidations": 0, "entries": 1}
+
+def test_local_stores_embed_with_their_own_embedder(cache, fake_openai, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "get_embedder", lambda name=None: pytest.fail("default embedder"))
+    store_id = local_vectorstore.create_vector_store("notes", embedder="hashing")["id"]
+
+    cache.store(store_id, "v", QUESTION, "21 days")
+
+    assert cache.lookup(store_id, "v", QUESTION)[1] == "21 days"
+    assert fake_openai.calls("embeddings") == []
+
+def test_answers_are_scoped_per_store_and_variant(cache):
+    cache.store("vs_1", "v", QUESTION, "21 days")
+
+    assert cache.lookup("vs_2", "v", QUESTION)[1] is MISSING
+    assert cache.lookup("vs_1", "other", QUESTION)[1] is MISSING
+
+def test_invalidate_drops_every_scope_of_a_store(cache):
+    cache.store("vs_1", "v", QUESTION, "21 days")
+    cache.store("vs_0,vs_1", "v", QUESTION, "21 days")
+    cache.store("vs_2", "v", QUESTION, "21 days")
+
+    cache.invalidate("vs_1")
+
+    assert cache.lookup("vs_1", "v", QUESTION)[1] is MISSING
+    assert cache.lookup("vs_0,vs_1", "v", QUESTION)[1] is MISSING
+    assert cache.lookup("vs_2", "v", QUESTION)[1] == "21 days"
+
+def test_full_index_overwrites_the_oldest_entry(cache, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_MAX_ENTRIES", 20)
+    for i in range(25):
+        cache.store("vs_1", "v", f"question number {i}", i)
+
+    index = cache._scopes["vs_1"]["v"]
+    assert len(index.entries) == 20
+    assert cache.lookup("vs_1", "v", "question number 0")[1] != 0
+    assert cache.lookup("vs_1", "v", "question number 24")[1] == 24
+
+def test_file_search_answers_are_reused_for_paraphrases(cache, fake_openai):
+    fake_openai.reply("responses", fake_openai.response("21 days", filenames=["ebola.pdf"]))
+
+    first = api_utils.file_search_response(QUESTION, ["vs_hosted"])
+    second = api_utils.file_search_response("what is the incubation period of Ebola", ["vs_hosted"])
+
+    assert first == second == ("21 days", {"ebola.pdf"})
+    assert len(fake_openai.calls("responses")) == 1
@@ -0,0 +1,142 @@
+import json
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import server
+from utils import conversation_store, service_client
+
+@pytest.fixture
+def client(fake_openai):
+    # Without the context manager, the app's lifespan (which shuts the turn pool down) never runs
+    return TestClient(server.app)
+
+def _events(response):
+    return list(service_client.iter_sse(response.iter_lines()))
+
+def test_health(client):
+    assert client.get("/health").json() == {"status": "ok"}
+
+def test_chat_turns_are_stored(client):
+    first = client.post("/v1/chat", json={"message": "Hi", "stream": False}).json()
+    conversation_id = first["conversation_id"]
+    second = client.post("/v1/chat", json={"message": "Again", "conversation_id": conversation_id, "stream": False}).json()
+
+    assert first["assistant"]["content"] == second["assistant"]["content"] == "Fake answer"
+    messages = client.get(f"/v1/conversations/{conversation_id}/messages").json()["messages"]
+    assert [message["content"] for message in messages] == ["Hi", "Fake answer", "Again", "Fake answer"]
+
+def test_chat_streams_server_sent_events(client):
+    with client.stream("POST", "/v1/chat", json={"message": "Hi"}) as response:
+        events = _events(response)
+
+    names = [name for name, _ in events]
+    assert names[0] == "conversation"
+    assert names[-2:] == ["done", "turn_completed"]
+    assert "".join(event["delta"] for name, event in events if name == "text") == "Fake answer"
+    completed = events[-1][1]
+    assert completed["user"]["content"] == "Hi"
+    assert completed["conversation_id"] == events[0][1]["conversation_id"]
+
+def test_service_client_streams_turns(client, monkeypatch):
+    monkeypatch.setattr(service_client, "_client", client)
+    conversation_id = conversation_store.new_conversation_id()
+
+    events = list(service_client.stream_turn(conversation_id, "Hi", {}))
+
+    assert events[-1]["type"] == "turn_completed"
+    assert events[-1]["assistant"]["content"] == "Fake answer"
+
+def test_multi_turn_chat_rebuilds_from_the_whole_conversation(client, fake_openai, monkeypatch):
+    monkeypatch.setattr(conversation_store, "CONVERSATION_PAGE_SIZE", 10)
+    conversation_id = conversation_store.new_conversation_id()
+    for i in range(30):
+        conversation_store.append_message(conversation_id, {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"})
+
+    client.post("/v1/chat", json={
+        "message": "Next", "conversation_id": conversation_id, "stream": False, "tools_config": {"multi_turn": True}
+    })
+
+    request_input = fake_openai.calls("responses")[-1]["input"]
+    assert [item["content"] for item in request_input] == [f"message {i}" for i in range(30)] + ["Next"]
+
+def test_busy_service_turns_requests_away(client, monkeypatch):
+    monkeypatch.setattr(server, "_admission", threading.BoundedSemaphore(1))
+    server._admission.acquire()
+
+    response = client.post("/v1/chat", json={"message": "Hi", "stream": False})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_tool_responses_and_file_search(client, fake_openai):
+    fake_openai.reply("responses", fake_openai.response("From the file", filenames=["paper.pdf"]))
+
+    searched = client.post("/v1/file-search", json={"query": "methods", "vector_store_ids": ["vs_hosted"]}).json()
+    answered = client.post("/v1/responses", json={"message": "Hello"}).json()
+
+    assert searched == {"text": "From the file", "source_files": ["paper.pdf"]}
+    assert answered["text"] == "Fake answer"
+
+def test_busy_service_turns_tool_and_search_requests_away(client, monkeypatch):
+    monkeypatch.setattr(server, "_admission", threading.BoundedSemaphore(1))
+    server._admission.acquire()
+
+    searched = client.post("/v1/file-search", json={"query": "methods", "vector_store_ids": ["vs_hosted"]})
+    answered = client.post("/v1/responses", json={"message": "Hello"})
+
+    assert searched.status_code == 503
+    assert answered.status_code == 503
+
+def test_tool_responses_release_their_admission_slot(client, monkeypatch):
+    monkeypatch.setattr(server, "_admission", threading.BoundedSemaphore(1))
+
+    for _ in range(3):
+        assert client.post("/v1/responses", json={"message": "Hello"}).status_code == 200
+
+def test_unknown_conversation_is_not_found(client):
+    assert client.get("/v1/conversations/missing/messages").status_code == 404
+
+def test_uploads_keep_same_named_files_apart(client):
+    store = client.post("/v1/vector-stores", json={"name": "uploads"}).json()
+
+    stats = client.post(
+        f"/v1/vector-stores/{store['id']}/files",
+        files=[("files", ("notes.txt", b"Ebola incubation notes")), ("files", ("notes.txt", b"Plasma trial notes"))],
+        data={"attributes": json.dumps({"year": 2016})}
+    ).json()
+
+    assert stats["successful_uploads"] == 2
+    assert client.get(f"/v1/vector-stores/{store['id']}").json()["file_count"] == 2
+
+def test_malformed_upload_attributes_are_rejected(client):
+    response = client.post(
+        "/v1/vector-stores/vs_local_x/files",
+        files=[("files", ("notes.txt", b"text"))],
+        data={"attributes": "[1, 2]"}
+    )
+
+    assert response.status_code == 400
+
+def test_conversation_state_is_bounded(monkeypatch):
+    monkeypatch.setattr(server, "_conversations", server.LRUCache(max_size=2))
+
+    with server._conversation_state("a") as first:
+        pass
+    for conversation_id in ("b", "c"):
+        with server._conversation_state(conversation_id):
+            pass
+
+    assert len(server._conversations) == 2
+    with server._conversation_state("a") as state:
+        assert state is not first
+
+def test_conversation_state_in_flight_is_not_evicted(monkeypatch):
+    monkeypatch.setattr(server, "_conversations", server.LRUCache(max_size=1))
+
+    with server._conversation_state("a") as first:
+        with server._conversation_state("b"):
+            pass
+        with server._conversation_state("a") as second:
+            assert second is first
+
+    assert server._active == {}
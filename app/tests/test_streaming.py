@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+from utils import api_utils
+
+WEB_SEARCH = {"web_search": True}
+FILE_SEARCH = {"file_search": True, "vector_store_id": "vs_hosted"}
+
+def _split(events):
+    events = list(events)
+    return events[:-1], events[-1]
+
+def test_consume_response_stream_translates_events():
+    stream = [
+        SimpleNamespace(type="response.output_item.added", item=SimpleNamespace(type="web_search_call")),
+        SimpleNamespace(type="response.output_text.delta", delta="Hello"),
+        SimpleNamespace(type="response.output_text.delta", delta=" world"),
+        SimpleNamespace(type="response.output_text.annotation.added", annotation={"filename": "a.pdf"}),
+        SimpleNamespace(type="response.output_text.annotation.added", annotation=SimpleNamespace(filename="a.pdf")),
+    ]
+
+    events = []
+    consumer = api_utils._consume_response_stream(stream)
+    while True:
+        try:
+            events.append(next(consumer))
+        except StopIteration as stop:
+            result = stop.value
+            break
+
+    assert events == [
+        {"type": "tool_call", "name": "web_search_call", "arguments": None},
+        {"type": "text", "delta": "Hello"},
+        {"type": "text", "delta": " world"},
+        {"type": "annotation", "filename": "a.pdf"},
+    ]
+    assert result[:3] == ("Hello world", {"a.pdf"}, [])
+
+def test_stream_chat_completion_yields_deltas_then_the_whole_text(fake_openai):
+    fake_openai.text = "Streaming is fast"
+
+    deltas, done = _split(api_utils.stream_chat_completion("Hi"))
+
+    assert [event["delta"] for event in deltas] == ["Streaming", " is", " fast"]
+    assert done == {"type": "done", "text": "Streaming is fast", "metadata": {}}
+    assert fake_openai.calls("chat/completions")[0]["stream"] is True
+
+def test_stream_web_search(fake_openai):
+    deltas, done = _split(api_utils.stream_web_search("news"))
+
+    assert "".join(event["delta"] for event in deltas if event["type"] == "text") == "Fake answer"
+    assert done["text"] == "Fake answer"
+
+def test_stream_tool_response_reports_cited_files(fake_openai):
+    fake_openai.reply("responses", fake_openai.response_events(fake_openai.response("From the file", filenames=["paper.pdf"])))
+
+    events, done = _split(api_utils.stream_tool_response("What does the paper say?", FILE_SEARCH))
+
+    assert {"type": "annotation", "filename": "paper.pdf"} in events
+    assert done["text"] == "From the file"
+    assert done["metadata"]["source_files"] == {"paper.pdf"}
+
+def test_stream_tool_response_resolves_weather_calls(fake_openai, monkeypatch):
+    fake_openai.reply("responses", fake_openai.response_events(
+        fake_openai.response(function_calls=[("get_weather", {"location": "Paris"})])
+    ))
+    monkeypatch.setattr(api_utils, "_get_weather", lambda location, unit="celsius", model="gpt-4o": (f"Sunny in {location}", True))
+
+    events, done = _split(api_utils.stream_tool_response("Is it going to rain?", {"function_calling": True}))
+
+    assert {"type": "tool_call", "name": "get_weather", "arguments": '{"location": "Paris"}'} in events
+    assert done["text"] == "Sunny in Paris"
+    assert done["metadata"]["function"] == "weather"
+
+def test_stream_that_fails_before_any_text_falls_back(fake_openai):
+    fake_openai.reply("responses", fake_openai.error(400, "Streaming unavailable"))
+
+    events, done = _split(api_utils.stream_tool_response("news today", WEB_SEARCH))
+
+    assert done["text"] == "Fake answer"
+    assert [body.get("stream") for body in fake_openai.calls("responses")] == [True, None]
+
+def test_stream_interrupted_after_text_keeps_the_partial_answer(fake_openai):
+    events = fake_openai.response_events(fake_openai.response("Partial answer here"))[:2]
+    fake_openai.reply("responses", events + [{"type": "error", "error": {"message": "connection reset"}}])
+
+    _, done = _split(api_utils.stream_tool_response("news today", WEB_SEARCH))
+
+    assert done["text"].startswith("Partial answer\n\n*Response interrupted")
+    assert len(fake_openai.calls("responses")) == 1
@@ -0,0 +1,87 @@
+import json
+import asyncio
+import threading
+import pytest
+from utils import api_utils, tracing
+
+def test_nested_spans_export_once_with_the_root(exported_traces):
+    with tracing.span("turn") as root:
+        with tracing.span("tool") as child:
+            child.set_attribute("tool", "weather")
+        assert exported_traces == []
+
+    assert len(exported_traces) == 1
+    tool, turn = exported_traces[0]
+    assert (turn["name"], turn["parent_id"]) == ("turn", None)
+    assert tool["parent_id"] == turn["span_id"]
+    assert tool["trace_id"] == turn["trace_id"] == root.trace_id
+    assert tool["attributes"] == {"tool": "weather"}
+    assert turn["duration_ms"] >= tool["duration_ms"]
+
+def test_spans_ending_after_the_root_are_exported_as_a_follow_up(exported_traces):
+    with tracing.span("turn") as root:
+        background = tracing.start_span("summarize")
+
+    background.end()
+
+    assert [[span["name"] for span in trace] for trace in exported_traces] == [["turn"], ["summarize"]]
+    assert exported_traces[1][0]["trace_id"] == root.trace_id
+    assert exported_traces[1][0]["parent_id"] == root.span_id
+
+def test_exceptions_are_recorded_and_reraised(exported_traces):
+    with pytest.raises(ValueError):
+        with tracing.span("turn"):
+            raise ValueError("bad input")
+
+    turn = exported_traces[0][0]
+    assert turn["status"] == "error"
+    assert turn["status_message"] == "ValueError: bad input"
+    assert turn["events"][0]["name"] == "exception"
+
+def _geocode():
+    with tracing.span("geocode"):
+        pass
+
+def test_wrapped_callables_keep_their_parent_in_other_threads(exported_traces):
+    with tracing.span("turn"):
+        thread = threading.Thread(target=tracing.wrap(_geocode))
+        thread.start()
+        thread.join()
+
+    geocode, turn = exported_traces[0]
+    assert geocode["parent_id"] == turn["span_id"]
+
+def test_asyncio_tasks_inherit_the_active_span(exported_traces):
+    async def turn():
+        async def stage(name):
+            with tracing.span(name):
+                await asyncio.sleep(0)
+
+        with tracing.span("turn"):
+            await asyncio.gather(stage("a"), stage("b"))
+
+    asyncio.run(turn())
+
+    spans = {span["name"]: span for span in exported_traces[0]}
+    assert spans["a"]["parent_id"] == spans["b"]["parent_id"] == spans["turn"]["span_id"]
+
+def test_openai_calls_are_traced_with_their_attempts(exported_traces, fake_openai):
+    with tracing.span("turn"):
+        api_utils.get_response("Hi")
+
+    names = [span["name"] for span in exported_traces[0]]
+    assert names == ["attempt", "openai responses.create", "turn"]
+
+def test_file_exporters_write_one_line_per_trace(tmp_path):
+    span = tracing.Span("turn", attributes={"intent": "weather", "confidence": 0.9, "cached": False})
+    span.end_ns = span.start_ns + 1_000_000
+    json_path, otlp_path = tmp_path / "traces.jsonl", tmp_path / "otlp.jsonl"
+
+    tracing.JsonFileExporter(str(json_path)).export([span])
+    tracing.OtlpFileExporter(str(otlp_path)).export([span])
+
+    assert json.loads(json_path.read_text())["spans"][0]["duration_ms"] == 1.0
+    otlp_span = json.loads(otlp_path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["traceId"] == span.trace_id
+    assert {"key": "cached", "value": {"boolValue": False}} in otlp_span["attributes"]
+    assert {"key": "confidence", "value": {"doubleValue": 0.9}} in otlp_span["attributes"]
@@ -0,0 +1,105 @@
+import os
+import pytest
+from utils import local_vectorstore, upload_manifest, vectorstore_utils
+
+@pytest.fixture
+def store():
+    return local_vectorstore.create_vector_store("sync test")["id"]
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+def test_upload_skips_contents_already_in_the_store(store, tmp_path):
+    first = _write(tmp_path / "a.txt", "Ebola treatment guidelines.")
+    copy = _write(tmp_path / "copy.txt", "Ebola treatment guidelines.")
+
+    stats = vectorstore_utils.upload_files_to_vector_store([first, copy], store)
+    again = vectorstore_utils.upload_files_to_vector_store([first], store)
+
+    assert stats["successful_uploads"] == 1
+    assert stats["skipped"] == 1
+    assert again["successful_uploads"] == 0
+    assert again["skipped"] == 1
+    assert len(upload_manifest.load(store)) == 1
+
+def test_sync_uploads_only_new_files_and_detaches_removed_ones(store, tmp_path):
+    folder = tmp_path / "docs"
+    _write(folder / "a.txt", "Alpha document about vaccines.")
+    removed = _write(folder / "b.txt", "Beta document about antibodies.")
+
+    first = vectorstore_utils.sync_directory(str(folder), store)
+    unchanged = vectorstore_utils.sync_directory(str(folder), store)
+    os.remove(removed)
+    after_removal = vectorstore_utils.sync_directory(str(folder), store)
+
+    assert first["successful_uploads"] == 2
+    assert unchanged["successful_uploads"] == 0
+    assert unchanged["unchanged"] == 2
+    assert after_removal["detached"] == 1
+    assert [entry["path"] for entry in upload_manifest.load(store).values()] == [str(folder / "a.txt")]
+
+def test_sync_replaces_a_changed_file(store, tmp_path):
+    folder = tmp_path / "docs"
+    path = _write(folder / "a.txt", "First version.")
+    vectorstore_utils.sync_directory(str(folder), store)
+
+    _write(folder / "a.txt", "Second version.")
+    stats = vectorstore_utils.sync_directory(str(folder), store)
+
+    assert stats["successful_uploads"] == 1
+    assert stats["detached"] == 1
+    assert upload_manifest.file_sha256(path) in upload_manifest.load(store)
+
+def test_sync_leaves_files_from_elsewhere_attached(store, tmp_path):
+    imported = _write(tmp_path / "imports" / "zotero.txt", "Imported Zotero item.")
+    vectorstore_utils.upload_files_to_vector_store([imported], store)
+    folder = tmp_path / "docs"
+    _write(folder / "a.txt", "A synced document.")
+
+    stats = vectorstore_utils.sync_directory(str(folder), store)
+
+    assert stats["detached"] == 0
+    assert len(upload_manifest.load(store)) == 2
+
+def test_sync_of_a_missing_directory_detaches_nothing(store, tmp_path):
+    folder = tmp_path / "docs"
+    _write(folder / "a.txt", "A synced document.")
+    vectorstore_utils.sync_directory(str(folder), store)
+
+    stats = vectorstore_utils.sync_directory(str(tmp_path / "dcos"), store)
+
+    assert stats["detached"] == 0
+    assert stats["errors"]
+    assert len(upload_manifest.load(store)) == 1
+
+def test_sync_of_an_empty_listing_detaches_nothing(store, tmp_path):
+    folder = tmp_path / "docs"
+    _write(folder / "a.txt", "A synced document.")
+    vectorstore_utils.sync_directory(str(folder), store)
+
+    stats = vectorstore_utils.sync_vector_store([], store)
+
+    assert stats["detached"] == 0
+    assert len(upload_manifest.load(store)) == 1
+
+def test_sync_keeps_files_that_fail_to_hash(store, tmp_path, monkeypatch):
+    folder = tmp_path / "docs"
+    _write(folder / "a.txt", "Readable document.")
+    unreadable = _write(folder / "b.txt", "Soon unreadable document.")
+    vectorstore_utils.sync_directory(str(folder), store)
+
+    file_sha256 = upload_manifest.file_sha256
+    def failing_sha256(file_path):
+        if os.path.abspath(file_path) == unreadable:
+            raise PermissionError("Permission denied")
+        return file_sha256(file_path)
+    monkeypatch.setattr(upload_manifest, "file_sha256", failing_sha256)
+
+    stats = vectorstore_utils.sync_directory(str(folder), store)
+
+    assert stats["failed_uploads"] == 1
+    assert stats["detached"] == 0
+    assert len(upload_manifest.load(store)) == 2
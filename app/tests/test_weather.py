@@ -0,0 +1,58 @@
+import json
+import pytest
+from utils import api_utils
+
+PLACES = {
+    "Paris": (48.85, 2.35, "Paris, France"),
+    "Tokyo": (35.68, 139.69, "Tokyo, Japan"),
+}
+
+@pytest.fixture
+def weather_apis(monkeypatch):
+    batches = []
+
+    def fetch_forecasts(coordinates, unit="celsius"):
+        batches.append(list(coordinates))
+        return [{"current": {"temperature_2m": lat, "weather_code": 0, "wind_speed_10m": 5}} for lat, lon in coordinates]
+
+    monkeypatch.setattr(api_utils, "get_location_coordinates", PLACES.get)
+    monkeypatch.setattr(api_utils, "fetch_forecasts", fetch_forecasts)
+    monkeypatch.setattr(api_utils, "_get_weather", lambda location, unit="celsius", model="gpt-4o": (f"Fallback for {location}", location != "Atlantis"))
+    return batches
+
+def test_several_locations_cost_one_forecast_request(weather_apis):
+    text = api_utils.get_weather_multi(["Paris", "Tokyo"])
+
+    assert weather_apis == [[(48.85, 2.35), (35.68, 139.69)]]
+    paris, tokyo = text.split("\n\n")
+    assert paris.startswith("## Weather in Paris, France")
+    assert tokyo.startswith("## Weather in Tokyo, Japan")
+
+def test_unknown_locations_fall_back_individually(weather_apis):
+    text = api_utils.get_weather_multi(["Paris", "Atlantis"])
+
+    assert weather_apis == [[(48.85, 2.35)]]
+    assert text.endswith("Fallback for Atlantis")
+
+def test_failed_locations_are_reported(weather_apis):
+    text, metadata = api_utils.weather_for_locations(["Paris", "Atlantis", "Tokyo"])
+
+    assert metadata["failed_locations"] == ["Atlantis"]
+    assert "failed_locations" not in api_utils.weather_for_locations(["Paris", "Tokyo"])[1]
+
+def test_function_calls_are_answered_together(weather_apis):
+    calls = [
+        ("get_weather", json.dumps({"location": "Paris", "unit": "fahrenheit"})),
+        ("get_weather", json.dumps({"locations": ["Tokyo", "Paris"]})),
+        ("get_weather", "{not json"),
+    ]
+
+    text, metadata = api_utils.weather_from_function_calls(calls)
+
+    assert len(weather_apis) == 1
+    assert "°F" in text
+    assert metadata == {"function": "weather", "location": "Paris, Tokyo", "locations": ["Paris", "Tokyo"]}
+
+def test_function_calls_without_a_location_are_ignored(weather_apis):
+    assert api_utils.weather_from_function_calls([("other_tool", "{}")]) is None
+    assert weather_apis == []
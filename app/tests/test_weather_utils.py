@@ -0,0 +1,91 @@
+import time
+import threading
+import pytest
+from utils import weather_utils
+
+FORECAST = {
+    "current": {"temperature_2m": 21.5, "weather_code": 61, "wind_speed_10m": 12},
+    "hourly": {"precipitation_probability": [0, 40, 80]}
+}
+
+@pytest.fixture
+def requests_made(monkeypatch):
+    weather_utils._forecast_cache.clear()
+    made = []
+
+    def request_forecast(lat, lon, unit):
+        made.append((lat, lon, unit))
+        if isinstance(lat, str):
+            return [dict(FORECAST, latitude=float(value)) for value in lat.split(",")]
+        return dict(FORECAST, latitude=lat)
+
+    monkeypatch.setattr(weather_utils, "_request_forecast", request_forecast)
+    return made
+
+def test_nearby_coordinates_share_a_cached_forecast(requests_made):
+    first = weather_utils.fetch_forecast(48.8566, 2.3522)
+    second = weather_utils.fetch_forecast(48.8571, 2.3519)
+
+    assert first is second
+    assert requests_made == [(48.86, 2.35, "celsius")]
+    assert weather_utils.fetch_forecast(48.8566, 2.3522, "fahrenheit") is not first
+
+def test_failed_fetches_are_not_cached(monkeypatch):
+    weather_utils._forecast_cache.clear()
+    calls = []
+    monkeypatch.setattr(weather_utils, "_request_forecast", lambda lat, lon, unit: calls.append(lat))
+
+    assert weather_utils.fetch_forecast(10, 20) is None
+    assert weather_utils.fetch_forecast(10, 20) is None
+    assert len(calls) == 2
+
+def test_concurrent_misses_cost_one_request(monkeypatch):
+    weather_utils._forecast_cache.clear()
+    calls = []
+
+    def slow_request(lat, lon, unit):
+        calls.append(lat)
+        time.sleep(0.05)
+        return FORECAST
+
+    monkeypatch.setattr(weather_utils, "_request_forecast", slow_request)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(weather_utils.fetch_forecast(1.0, 2.0))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [FORECAST] * 8
+    assert calls == [1.0]
+
+def test_entries_expire_at_the_next_update_boundary():
+    remaining = weather_utils._seconds_until_next_update()
+    boundary = time.time() + remaining
+
+    assert 0 < remaining <= weather_utils.FORECAST_TTL
+    assert boundary % weather_utils.FORECAST_TTL == pytest.approx(0, abs=0.01) or \
+        boundary % weather_utils.FORECAST_TTL == pytest.approx(weather_utils.FORECAST_TTL, abs=0.01)
+
+def test_format_weather():
+    text = weather_utils.format_weather("Paris", FORECAST)
+
+    assert text.startswith("## Weather in Paris")
+    assert "21.5°C" in text
+    assert "Slight rain" in text
+    assert "80% (next 12 hours)" in text
+    assert weather_utils.format_weather("Paris", {}) is None
+
+def test_fetch_forecasts_batches_only_uncached_locations(requests_made):
+    weather_utils.fetch_forecast(1.0, 2.0)
+
+    forecasts = weather_utils.fetch_forecasts([(1.0, 2.0), (3.0, 4.0), (5.0, 6.0), (3.0, 4.0)])
+
+    assert [forecast["latitude"] for forecast in forecasts] == [1.0, 3.0, 5.0, 3.0]
+    assert requests_made == [(1.0, 2.0, "celsius"), ("3.0,5.0", "4.0,6.0", "celsius")]
+
+def test_fetch_forecasts_with_a_bad_batch_returns_none(monkeypatch):
+    weather_utils._forecast_cache.clear()
+    monkeypatch.setattr(weather_utils, "_request_forecast", lambda lat, lon, unit: {"error": True})
+
+    assert weather_utils.fetch_forecasts([(7.0, 8.0), (9.0, 10.0)]) == [None, None]
@@ -0,0 +1,62 @@
+import os
+import json
+import pytest
+from utils import zotero_import
+
+EBOLA_EXPORT = os.path.join(os.path.dirname(__file__), "..", "..", "ebola_virus_zotero_items.json")
+
+ITEMS = [
+    {"key": "AAAA1111", "title": "Tricky \"quoted\" title with ] and } inside", "creators": [
+        {"firstName": "Peter", "lastName": "Piot"}, {"name": "World Health Organization"}
+    ], "date": "2014-08-08", "tags": [{"tag": "ebola"}, {"tag": "outbreak"}]},
+    {"key": "BBBB2222", "title": "Ünïcødé and escapes \\n [nested]", "authors": ["A. J. Van Der Ende"], "date": "May 2019",
+     "tags": ["vaccines"], "abstractNote": "x" * 5000},
+    {"key": "CCCC3333", "title": "", "creators": [], "date": ""},
+]
+
+def _write(tmp_path, text):
+    path = tmp_path / "export.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("read_size", [1, 7, 64, 65536])
+def test_items_stream_across_any_read_size(tmp_path, read_size):
+    path = _write(tmp_path, json.dumps(ITEMS, indent=2, ensure_ascii=False))
+
+    assert list(zotero_import.iter_zotero_items(path, read_size=read_size)) == ITEMS
+
+def test_empty_array_yields_nothing(tmp_path):
+    assert list(zotero_import.iter_zotero_items(_write(tmp_path, " [ ] "))) == []
+
+def test_non_array_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="not a JSON array"):
+        list(zotero_import.iter_zotero_items(_write(tmp_path, json.dumps(ITEMS[0]))))
+
+def test_truncated_export_is_rejected(tmp_path):
+    text = json.dumps(ITEMS)[:-40]
+
+    with pytest.raises(ValueError):
+        list(zotero_import.iter_zotero_items(_write(tmp_path, text), read_size=16))
+
+def test_items_before_a_malformed_one_are_still_yielded(tmp_path):
+    path = _write(tmp_path, '[{"key": "AAAA1111"}, {"key": oops}]')
+    items = zotero_import.iter_zotero_items(path, read_size=8)
+
+    assert next(items) == {"key": "AAAA1111"}
+    with pytest.raises(ValueError, match="Malformed"):
+        next(items)
+
+def test_item_metadata_normalizes_creators_dates_and_tags():
+    metadata = zotero_import.item_metadata(ITEMS[0])
+
+    assert metadata["authors"] == ["Peter Piot", "World Health Organization"]
+    assert metadata["year"] == 2014
+    assert metadata["tags"] == ["ebola", "outbreak"]
+    assert zotero_import.item_metadata(ITEMS[2])["year"] is None
+
+@pytest.mark.skipif(not os.path.exists(EBOLA_EXPORT), reason="sample export not present")
+def test_sample_export_matches_json_load():
+    with open(EBOLA_EXPORT, encoding="utf-8") as f:
+        expected = json.load(f)
+
+    assert list(zotero_import.iter_zotero_items(EBOLA_EXPORT, read_size=1024)) == expected
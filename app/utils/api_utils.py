@@ -1,27 +1,264 @@
 import os
 import json
-import requests
+import openai
 import urllib.parse
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv, find_dotenv
 from .prompts import DEVELOPER_PROMPT, SYSTEM_MESSAGE
+from .client_utils import get_client, set_api_key as _set_client_api_key
+from .cache_utils import MISSING
+from . import geocode_cache
+from . import gazetteer
+from . import response_cache
+from . import semantic_cache
+from . import local_vectorstore
+from . import metadata_index
+from . import rate_limit
+from . import conversation_chain
+from . import tracing
+from . import intent_router
+from .weather_utils import fetch_forecast, fetch_forecasts, format_weather
+from .http_utils import http_get
 
 # Load environment variables
 _ = load_dotenv(find_dotenv())
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# Weather function exposed to the model for function calling
+WEATHER_FUNCTION = {
+    "type": "function",
+    "name": "get_weather",
+    "description": "Get current weather information for a given location",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "location": {
+                "type": "string",
+                "description": "City and country (if known), e.g., 'Paris, France' or just 'Paris'"
+            },
+            "locations": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "All locations when the user asks about several places, e.g., ['Paris', 'Berlin', 'Rome']"
+            },
+            "unit": {
+                "type": "string",
+                "enum": ["celsius", "fahrenheit"],
+                "description": "Temperature unit"
+            }
+        },
+        "required": ["location"]
+    }
+}
+
+# Geocoding endpoint, overridable e.g. to point at a local stand-in
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
+# Number of local vector store excerpts added to the prompt for file search
+LOCAL_CONTEXT_RESULTS = int(os.environ.get("LOCAL_CONTEXT_RESULTS", "5"))
 
 def set_api_key(api_key: str):
     """
     Set the OpenAI API key.
-    
+
     Args:
         api_key: OpenAI API key
     """
-    os.environ["OPENAI_API_KEY"] = api_key
-    global client
-    client = OpenAI(api_key=api_key)
+    _set_client_api_key(api_key)
+
+def is_weather_query(user_input: str) -> bool:
+    """
+    Check whether the user input looks like a weather query.
+
+    Args:
+        user_input: User input text
+
+    Returns:
+        bool: True if the input mentions a weather keyword
+    """
+    return intent_router.is_weather_query(user_input)
+
+def file_search_tool(vector_store_ids: list, user_input: str = None) -> dict:
+    """
+    Build a file_search tool, prefiltered through the metadata index.
+    
+    Args:
+        vector_store_ids: Hosted vector store IDs
+        user_input: User input text used to pick candidate items
+        
+    Returns:
+        dict: Tool definition
+    """
+    tool = {
+        "type": "file_search",
+        "vector_store_ids": vector_store_ids
+        # Note: chunk_size is not supported by the OpenAI API
+    }
+    if user_input:
+        item_keys = set()
+        for vs_id in vector_store_ids:
+            item_keys.update(metadata_index.prefilter(vs_id, user_input) or [])
+        filters = metadata_index.hosted_filter(sorted(item_keys))
+        if filters:
+            tool["filters"] = filters
+    return tool
+
+@tracing.traced("build_tools")
+def build_tools(tools_config: dict, user_input: str = None) -> list:
+    """
+    Build the Responses API tool list for the enabled tools.
+
+    Args:
+        tools_config: Dictionary of enabled tools
+        user_input: User input text, used to prefilter file search
+
+    Returns:
+        list: Tool definitions
+    """
+    tools = []
+
+    if tools_config.get("web_search"):
+        tools.append({"type": "web_search_preview"})
+
+    # Local stores are searched in-process by local_retrieval_context instead
+    if (tools_config.get("file_search") and tools_config.get("vector_store_id")
+            and not local_vectorstore.is_local_store_id(tools_config.get("vector_store_id"))):
+        tools.append(file_search_tool([tools_config.get("vector_store_id")], user_input))
+
+    if tools_config.get("function_calling"):
+        tools.append(WEATHER_FUNCTION)
+
+    return tools
+
+def extract_source_files(response) -> set:
+    """
+    Extract the source filenames cited in a Responses API response.
+
+    Args:
+        response: Responses API response object
+
+    Returns:
+        set: Cited filenames
+    """
+    source_files = set()
+    if hasattr(response, 'output') and len(response.output) > 1:
+        for item in response.output:
+            if hasattr(item, 'content') and item.content:
+                for content_item in item.content:
+                    if hasattr(content_item, 'annotations'):
+                        annotations = content_item.annotations
+                        for annotation in annotations:
+                            if hasattr(annotation, 'filename'):
+                                source_files.add(annotation.filename)
+    return source_files
+
+def extract_function_calls(response) -> list:
+    """
+    Extract the function calls made in a Responses API response.
+    
+    Args:
+        response: Responses API response object
+        
+    Returns:
+        list: (name, arguments) tuples
+    """
+    function_calls = []
+    for item in getattr(response, 'output', None) or []:
+        if getattr(item, 'type', None) == "function_call":
+            function_calls.append((item.name, item.arguments))
+    if not function_calls and hasattr(response, 'tool_calls') and response.tool_calls:
+        for tool_call in response.tool_calls:
+            function_calls.append((tool_call.name, tool_call.arguments))
+    return function_calls
+
+def tool_cache_key(user_input: str, tools_config: dict, tools: list, model: str):
+    """
+    Build the response cache key for a tool response.
+    
+    Args:
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        tools: Tool definitions sent with the request
+        model: Requested model
+        
+    Returns:
+        tuple: Cache key (None when caching is disabled) and cache kind
+    """
+    kind = response_cache.kind_for_tools(tools)
+    vector_store_ids = [tools_config["vector_store_id"]] if tools_config.get("file_search") and tools_config.get("vector_store_id") else []
+    key = response_cache.make_key(kind, model, DEVELOPER_PROMPT, user_input, tools, vector_store_ids)
+    return key, kind
+
+@tracing.traced("file_search.local")
+def local_retrieval_context(user_input: str, vector_store_ids: list):
+    """
+    Search local vector stores and prepend the best excerpts to the input.
+    
+    The hosted file_search tool cannot see local stores, so their results are
+    given to the model as context instead. Each search is prefiltered through
+    the metadata index.
+    
+    Args:
+        user_input: User input text
+        vector_store_ids: Vector store IDs; only local ones are searched
+        
+    Returns:
+        tuple: Model input and the set of source files the excerpts came from
+    """
+    local_ids = [vs_id for vs_id in vector_store_ids if local_vectorstore.is_local_store_id(vs_id)]
+    if not local_ids:
+        return user_input, set()
+    
+    results = []
+    for vs_id in local_ids:
+        try:
+            candidate_rows = local_vectorstore.prefiltered_rows(vs_id, user_input)
+            results.extend(local_vectorstore.search(vs_id, user_input, LOCAL_CONTEXT_RESULTS, candidate_rows))
+        except Exception as e:
+            print(f"Error searching local vector store {vs_id}: {e}")
+    results = sorted(results, key=lambda result: result["score"], reverse=True)[:LOCAL_CONTEXT_RESULTS]
+    if not results:
+        return user_input, set()
+    
+    excerpts = "\n\n".join(f"[{result['filename']}]\n{result['text']}" for result in results)
+    model_input = (
+        "Answer using these excerpts from the user's files and cite the filenames you use.\n\n"
+        f"{excerpts}\n\nQuestion: {user_input}"
+    )
+    return model_input, {result["filename"] for result in results}
+
+def semantic_scope(user_input: str, tools_config: dict, model: str):
+    """
+    Get the semantic cache scope for a tool response.
+    
+    Only retrieval answers are cached semantically; turns that may use web
+    search or weather data are time-sensitive and never are.
+    
+    Args:
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        model: Requested model
+        
+    Returns:
+        tuple: Vector store ID and variant, or (None, None) if not cacheable
+    """
+    if not (tools_config.get("file_search") and tools_config.get("vector_store_id")):
+        return None, None
+    if tools_config.get("web_search") or (tools_config.get("function_calling") and is_weather_query(user_input)):
+        return None, None
+    return tools_config["vector_store_id"], f"tools:{model}:{bool(tools_config.get('function_calling'))}"
+
+def source_item_keys(vector_store_ids: list, source_files) -> list:
+    """
+    Get the item keys of the cited source files.
+    
+    Args:
+        vector_store_ids: Vector store IDs that were searched
+        source_files: Cited filenames
+        
+    Returns:
+        list: Sorted item keys of indexed items among the sources
+    """
+    return metadata_index.item_keys_for_files(vector_store_ids, source_files)
 
 def chat_completion(user_input: str, model="gpt-4o"):
     """
@@ -34,14 +271,22 @@ def chat_completion(user_input: str, model="gpt-4o"):
     Returns:
         str: Model response
     """
+    cache_key = response_cache.make_key("chat", model, SYSTEM_MESSAGE, user_input)
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+    
     try:
-        completion = client.chat.completions.create(
+        completion = rate_limit.call(
+            get_client().chat.completions.create,
+            estimated_tokens=rate_limit.estimate_tokens(SYSTEM_MESSAGE, user_input),
             model=model,
             messages=[
                 {"role": "system", "content": SYSTEM_MESSAGE},
                 {"role": "user", "content": user_input}
             ]
         )
+        response_cache.put(cache_key, completion.choices[0].message.content)
         return completion.choices[0].message.content
     except Exception as e:
         print(f"Error getting chat completion: {e}")
@@ -58,12 +303,20 @@ def get_response(user_input: str, model="gpt-4o"):
     Returns:
         str: Model response text
     """
+    cache_key = response_cache.make_key("chat", model, DEVELOPER_PROMPT, user_input)
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+    
     try:
-        response = client.responses.create(
+        response = rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, user_input),
             model=model,
             instructions=DEVELOPER_PROMPT,
             input=user_input
         )
+        response_cache.put(cache_key, response.output_text)
         return response.output_text
     except Exception as e:
         print(f"Error getting response: {e}")
@@ -80,22 +333,51 @@ def web_search(query: str, model="gpt-4o"):
     Returns:
         str: Search results
     """
+    return _web_search(query, model)[0]
+
+@tracing.traced("web_search")
+def _web_search(query: str, model="gpt-4o"):
+    """
+    Perform a web search, reporting whether it succeeded.
+    
+    Args:
+        query: Search query
+        model: Model to use
+    
+    Returns:
+        tuple: Search results or error text, and True if the search succeeded
+    """
+    tools = [{"type": "web_search_preview"}]
+    cache_key = response_cache.make_key("web_search", model, DEVELOPER_PROMPT, query, tools)
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached, True
+    
     try:
-        response = client.responses.create(
+        response = rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, query),
             model=model,
             instructions=DEVELOPER_PROMPT,
             input=query,
-            tools=[{"type": "web_search_preview"}]
+            tools=tools
         )
-        return response.output_text
+        response_cache.put(cache_key, response.output_text)
+        return response.output_text, True
     except Exception as e:
         print(f"Error performing web search: {e}")
-        return f"Error: {str(e)}"
+        return f"Error: {str(e)}", False
 
+@tracing.traced("geocode")
 def get_location_coordinates(location: str):
     """
     Get coordinates (latitude, longitude) for a location using OpenStreetMap Nominatim API.
     
+    Common places are answered from the offline gazetteer, then from the
+    geocode cache, and only unknown places reach Nominatim. Places Nominatim
+    cannot find are cached briefly as negative results; network errors are
+    not cached.
+    
     Args:
         location: Location name to search for
         
@@ -103,17 +385,25 @@ def get_location_coordinates(location: str):
         tuple: (latitude, longitude, display_name) as floats and string, or None if location not found
     """
     try:
+        place = gazetteer.lookup(location)
+        tracing.current_span().set_attribute("gazetteer_hit", place is not None)
+        if place is not None:
+            return place
+        
+        cached = geocode_cache.get_cached(location)
+        tracing.current_span().set_attribute("cache_hit", cached is not MISSING)
+        if cached is not MISSING:
+            return cached
+        
         # URL encode the location for the API request
         encoded_location = urllib.parse.quote(location)
-        url = f"https://nominatim.openstreetmap.org/search?q={encoded_location}&format=json&limit=1"
+        url = f"{NOMINATIM_URL}?q={encoded_location}&format=json&limit=1"
         
-        # Add a user agent to be nice to the API
-        headers = {
-            "User-Agent": "RAGAgentic/1.0",
-            "Accept": "application/json"
-        }
+        # The shared session sends our user agent to be nice to the API
+        headers = {"Accept": "application/json"}
         
-        response = requests.get(url, headers=headers)
+        # Keep to Nominatim's one request per second policy, including retries
+        response = http_get(url, headers=headers, before_attempt=geocode_cache.throttle)
         
         if response.status_code == 200:
             data = response.json()
@@ -121,7 +411,9 @@ def get_location_coordinates(location: str):
                 lat = float(data[0]['lat'])
                 lon = float(data[0]['lon'])
                 display_name = data[0].get('display_name', location)
+                geocode_cache.set_cached(location, (lat, lon, display_name))
                 return lat, lon, display_name
+            geocode_cache.set_cached(location, None)
         
         return None
     except Exception as e:
@@ -140,95 +432,51 @@ def get_weather(location: str, unit="celsius", model="gpt-4o"):
     Returns:
         str: Weather information
     """
+    return _get_weather(location, unit, model)[0]
+
+@tracing.traced("get_weather")
+def _get_weather(location: str, unit="celsius", model="gpt-4o"):
+    """
+    Get weather information for a location, reporting whether it was found.
+    
+    Args:
+        location: Location to get weather for
+        unit: Temperature unit (celsius or fahrenheit)
+        model: Model to use for generating response
+    
+    Returns:
+        tuple: Weather information or error text, and True if the lookup succeeded
+    """
     try:
         # Get coordinates for the location
         coordinates = get_location_coordinates(location)
         
+        # Phrases like "Paris this weekend" still hold a place once cleaned up
+        cleaned = intent_router.clean_location(location)
+        if not coordinates and cleaned and cleaned != location:
+            coordinates = get_location_coordinates(cleaned)
+        
         if not coordinates:
             # Try with function calling if direct lookup fails
-            return get_weather_with_function_calling(location, unit, model)
+            return _get_weather_with_function_calling(location, unit, model)
         
         lat, lon, display_name = coordinates
         
-        # Get weather data from Open-Meteo API
-        weather_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,weather_code,wind_speed_10m&hourly=temperature_2m,precipitation_probability,weather_code&temperature_unit={unit}&wind_speed_unit=km/h"
-        
-        weather_response = requests.get(weather_url)
-        
-        if weather_response.status_code == 200:
-            weather_data = weather_response.json()
-            
-            # Current weather data
-            current = weather_data.get('current', {})
-            
-            if current:
-                temperature = current.get('temperature_2m')
-                windspeed = current.get('wind_speed_10m')
-                weathercode = current.get('weather_code')
-                
-                # Map weather codes to descriptions
-                weather_descriptions = {
-                    0: "Clear sky",
-                    1: "Mainly clear",
-                    2: "Partly cloudy",
-                    3: "Overcast",
-                    45: "Fog",
-                    48: "Depositing rime fog",
-                    51: "Light drizzle",
-                    53: "Moderate drizzle",
-                    55: "Dense drizzle",
-                    56: "Light freezing drizzle",
-                    57: "Dense freezing drizzle",
-                    61: "Slight rain",
-                    63: "Moderate rain",
-                    65: "Heavy rain",
-                    66: "Light freezing rain",
-                    67: "Heavy freezing rain",
-                    71: "Slight snow fall",
-                    73: "Moderate snow fall",
-                    75: "Heavy snow fall",
-                    77: "Snow grains",
-                    80: "Slight rain showers",
-                    81: "Moderate rain showers",
-                    82: "Violent rain showers",
-                    85: "Slight snow showers",
-                    86: "Heavy snow showers",
-                    95: "Thunderstorm",
-                    96: "Thunderstorm with slight hail",
-                    99: "Thunderstorm with heavy hail"
-                }
-                
-                weather_description = weather_descriptions.get(weathercode, "Unknown")
-                
-                # Get hourly forecast for precipitation probability
-                hourly = weather_data.get('hourly', {})
-                precipitation_probs = hourly.get('precipitation_probability', [])
-                next_hours_precip = precipitation_probs[:12] if precipitation_probs else []
-                
-                # Calculate chance of precipitation
-                if next_hours_precip:
-                    max_precip_prob = max(next_hours_precip)
-                    precip_info = f"\n- **Precipitation Chance:** {max_precip_prob}% (next 12 hours)" if max_precip_prob > 0 else ""
-                else:
-                    precip_info = ""
-                
-                # Format the weather information
-                formatted_weather = f"""
-## Weather in {display_name}
-- **Temperature:** {temperature}°{unit[0].upper()}
-- **Conditions:** {weather_description}
-- **Wind Speed:** {windspeed} km/h{precip_info}
-                """
-                
-                return formatted_weather.strip()
-            
+        # Get weather data from Open-Meteo API (cached per rounded coordinate)
+        weather_data = fetch_forecast(lat, lon, unit)
+        
+        if weather_data:
+            formatted_weather = format_weather(display_name, weather_data, unit)
+            if formatted_weather:
+                return formatted_weather, True
+        
         # Fallback to using web search if API fails or returns unexpected data
-        return get_weather_with_function_calling(location, unit, model)
+        return _get_weather_with_function_calling(location, unit, model)
     
     except Exception as e:
         print(f"Error getting weather: {e}")
         # Fallback to function calling on error
-        return get_weather_with_function_calling(location, unit, model)
+        return _get_weather_with_function_calling(location, unit, model)
 
 def get_weather_with_function_calling(location: str, unit="celsius", model="gpt-4o"):
     """
@@ -242,126 +490,209 @@ def get_weather_with_function_calling(location: str, unit="celsius", model="gpt-
     Returns:
         str: Weather information
     """
+    return _get_weather_with_function_calling(location, unit, model)[0]
+
+@tracing.traced("get_weather_with_function_calling")
+def _get_weather_with_function_calling(location: str, unit="celsius", model="gpt-4o"):
+    """
+    Get weather information through function calling, reporting whether it succeeded.
+    
+    Args:
+        location: Location to get weather for
+        unit: Temperature unit (celsius or fahrenheit)
+        model: Model to use for generating response
+    
+    Returns:
+        tuple: Weather information or error text, and True if the lookup succeeded
+    """
     try:
-        # Define the weather function
-        weather_function = {
-            "type": "function",
-            "name": "get_weather",
-            "description": "Get current weather information for a given location",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                        "type": "string",
-                        "description": "City and country (if known), e.g., 'Paris, France' or just 'Paris'"
-                    },
-                    "unit": {
-                        "type": "string",
-                        "enum": ["celsius", "fahrenheit"],
-                        "description": "Temperature unit"
-                    }
-                },
-                "required": ["location"]
-            }
-        }
-        
         # Call the API with function calling
-        response = client.responses.create(
+        response = rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(location),
             model=model,
             input=f"What is the weather like in {location}?",
-            tools=[weather_function],
+            tools=[WEATHER_FUNCTION],
             tool_choice={"type": "function", "name": "get_weather"}
         )
         
         # Extract the extracted location from function call
         extracted_location = location  # Default to original location
         
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            for tool_call in response.tool_calls:
-                if tool_call.name == "get_weather" and tool_call.arguments:
-                    args = json.loads(tool_call.arguments)
-                    if "location" in args:
-                        extracted_location = args["location"]
-                        # Try again with the extracted location
-                        coordinates = get_location_coordinates(extracted_location)
-                        if coordinates:
-                            lat, lon, display_name = coordinates
-                            # Now get the weather data with these coordinates
-                            weather_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,weather_code,wind_speed_10m&hourly=temperature_2m,precipitation_probability,weather_code&temperature_unit={unit}&wind_speed_unit=km/h"
-                            weather_response = requests.get(weather_url)
-                            
-                            if weather_response.status_code == 200:
-                                weather_data = weather_response.json()
-                                current = weather_data.get('current', {})
-                                
-                                if current:
-                                    temperature = current.get('temperature_2m')
-                                    windspeed = current.get('wind_speed_10m')
-                                    weathercode = current.get('weather_code')
-                                    
-                                    # Map weather codes to descriptions
-                                    weather_descriptions = {
-                                        0: "Clear sky",
-                                        1: "Mainly clear",
-                                        2: "Partly cloudy",
-                                        3: "Overcast",
-                                        45: "Fog",
-                                        48: "Depositing rime fog",
-                                        51: "Light drizzle",
-                                        53: "Moderate drizzle",
-                                        55: "Dense drizzle",
-                                        56: "Light freezing drizzle",
-                                        57: "Dense freezing drizzle",
-                                        61: "Slight rain",
-                                        63: "Moderate rain",
-                                        65: "Heavy rain",
-                                        66: "Light freezing rain",
-                                        67: "Heavy freezing rain",
-                                        71: "Slight snow fall",
-                                        73: "Moderate snow fall",
-                                        75: "Heavy snow fall",
-                                        77: "Snow grains",
-                                        80: "Slight rain showers",
-                                        81: "Moderate rain showers",
-                                        82: "Violent rain showers",
-                                        85: "Slight snow showers",
-                                        86: "Heavy snow showers",
-                                        95: "Thunderstorm",
-                                        96: "Thunderstorm with slight hail",
-                                        99: "Thunderstorm with heavy hail"
-                                    }
-                                    
-                                    weather_description = weather_descriptions.get(weathercode, "Unknown")
-                                    
-                                    # Get hourly forecast for precipitation probability
-                                    hourly = weather_data.get('hourly', {})
-                                    precipitation_probs = hourly.get('precipitation_probability', [])
-                                    next_hours_precip = precipitation_probs[:12] if precipitation_probs else []
-                                    
-                                    # Calculate chance of precipitation
-                                    if next_hours_precip:
-                                        max_precip_prob = max(next_hours_precip)
-                                        precip_info = f"\n- **Precipitation Chance:** {max_precip_prob}% (next 12 hours)" if max_precip_prob > 0 else ""
-                                    else:
-                                        precip_info = ""
-                                    
-                                    # Format the weather information
-                                    formatted_weather = f"""
-## Weather in {display_name}
-- **Temperature:** {temperature}°{unit[0].upper()}
-- **Conditions:** {weather_description}
-- **Wind Speed:** {windspeed} km/h{precip_info}
-                                    """
-                                    
-                                    return formatted_weather.strip()
+        for name, arguments in extract_function_calls(response):
+            if name == "get_weather" and arguments:
+                args = json.loads(arguments)
+                if "location" in args:
+                    extracted_location = args["location"]
+                    # Try again with the extracted location
+                    coordinates = get_location_coordinates(extracted_location)
+                    if coordinates:
+                        lat, lon, display_name = coordinates
+                        # Now get the weather data with these coordinates
+                        weather_data = fetch_forecast(lat, lon, unit)
+                        if weather_data:
+                            formatted_weather = format_weather(display_name, weather_data, unit)
+                            if formatted_weather:
+                                return formatted_weather, True
         
         # Fallback to web search
-        return web_search(f"What's the current weather in {extracted_location}?", model)
+        return _web_search(f"What's the current weather in {extracted_location}?", model)
     
     except Exception as e:
         print(f"Error with function calling for weather: {e}")
-        return web_search(f"What's the current weather in {location}?", model)
+        return _web_search(f"What's the current weather in {location}?", model)
 
+def get_weather_multi(locations: list, unit="celsius", model="gpt-4o"):
+    """
+    Get weather information for several locations at once.
+    
+    Locations are geocoded concurrently and their forecasts come from a single
+    Open-Meteo request, so N cities cost about as much as one. Locations that
+    cannot be geocoded fall back to get_weather individually.
+    
+    Args:
+        locations: Locations to get weather for
+        unit: Temperature unit (celsius or fahrenheit)
+        model: Model to use for fallback lookups
+    
+    Returns:
+        str: Weather information for every location
+    """
+    return _get_weather_multi(locations, unit, model)[0]
+
+@tracing.traced("get_weather_multi")
+def _get_weather_multi(locations: list, unit="celsius", model="gpt-4o"):
+    """
+    Get weather information for several locations, reporting which failed.
+    
+    Args:
+        locations: Locations to get weather for
+        unit: Temperature unit (celsius or fahrenheit)
+        model: Model to use for fallback lookups
+    
+    Returns:
+        tuple: Weather information for every location, and the locations
+        whose section is error text
+    """
+    if len(locations) == 1:
+        text, ok = _get_weather(locations[0], unit, model)
+        return text, [] if ok else list(locations)
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(locations))) as executor:
+        coordinates = list(executor.map(tracing.wrap(get_location_coordinates), locations))
+        
+        resolved = [i for i, coords in enumerate(coordinates) if coords]
+        try:
+            forecasts = fetch_forecasts([coordinates[i][:2] for i in resolved], unit)
+        except Exception as e:
+            print(f"Error getting batched forecasts: {e}")
+            forecasts = [None] * len(resolved)
+        
+        sections = [None] * len(locations)
+        for i, weather_data in zip(resolved, forecasts):
+            if weather_data:
+                sections[i] = format_weather(coordinates[i][2], weather_data, unit)
+        
+        # Anything still missing goes through the single-location fallback chain
+        fallbacks = {
+            i: executor.submit(tracing.wrap(_get_weather), location, unit, model)
+            for i, location in enumerate(locations) if not sections[i]
+        }
+        failed = []
+        for i, future in fallbacks.items():
+            sections[i], ok = future.result()
+            if not ok:
+                failed.append(locations[i])
+    
+    return "\n\n".join(sections), failed
+
+@tracing.traced("weather_from_function_calls")
+def weather_from_function_calls(function_calls: list, model="gpt-4o"):
+    """
+    Resolve get_weather function calls into weather information.
+    
+    Every location across all get_weather calls is collected, so parallel
+    calls and multi-location calls are answered together.
+    
+    Args:
+        function_calls: (name, arguments) tuples from the model
+        model: Model to use for fallback lookups
+        
+    Returns:
+        tuple: Weather text and metadata, or None if there was no usable call
+    """
+    locations = []
+    unit = "celsius"
+    for name, arguments in function_calls:
+        if name != "get_weather" or not arguments:
+            continue
+        try:
+            args = json.loads(arguments)
+        except json.JSONDecodeError as e:
+            print(f"JSON decode error in tool call arguments: {e}")
+            print(f"Raw arguments: {arguments}")
+            continue
+        unit = args.get("unit", unit)
+        for location in [args.get("location")] + list(args.get("locations") or []):
+            if location and location not in locations:
+                locations.append(location)
+    
+    if not locations:
+        return None
+    
+    return weather_for_locations(locations, unit, model)
+
+def weather_for_locations(locations: list, unit="celsius", model="gpt-4o"):
+    """
+    Get weather information and its metadata for one or more locations.
+    
+    Args:
+        locations: Locations to get weather for
+        unit: Temperature unit (celsius or fahrenheit)
+        model: Model to use for fallback lookups
+        
+    Returns:
+        tuple: Weather text and metadata, with failed_locations listing any
+        location that could not be looked up
+    """
+    weather_response, failed = _get_weather_multi(locations, unit, model)
+    metadata = {"function": "weather", "location": ", ".join(locations)}
+    if len(locations) > 1:
+        metadata["locations"] = locations
+    if failed:
+        metadata["failed_locations"] = failed
+    return weather_response, metadata
+
+def _cache_weather(cache_key, weather_result):
+    # An answer with a failed lookup is shown, but the next turn tries again
+    if not weather_result[1].get("failed_locations"):
+        response_cache.put(cache_key, weather_result, "weather")
+
+@tracing.traced("route")
+def local_weather(user_input: str, tools_config: dict, model="gpt-4o"):
+    """
+    Route a turn, answering it from the weather APIs when the router is confident.
+    
+    Confident weather turns skip the model round-trip that would only
+    extract the location.
+    
+    Args:
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        model: Model to use for fallback lookups
+        
+    Returns:
+        tuple: The route, and weather text and metadata or None
+    """
+    routed = intent_router.route(user_input, tools_config)
+    current = tracing.current_span()
+    current.set_attribute("intent", routed["intent"])
+    current.set_attribute("confidence", routed["confidence"])
+    if routed["intent"] != intent_router.WEATHER or not intent_router.is_confident(routed):
+        return routed, None
+    return routed, weather_for_locations(routed["locations"], routed["unit"], model)
+
+@tracing.traced("file_search_response")
 def file_search_response(user_input: str, vector_store_ids: list, model="gpt-4o-mini"):
     """
     Get a response from the OpenAI API using file search.
@@ -374,77 +705,112 @@ def file_search_response(user_input: str, vector_store_ids: list, model="gpt-4o-
     Returns:
         tuple: Response text and source files used
     """
-    import time
+    cache_key = response_cache.make_key(
+        "file_search", model, DEVELOPER_PROMPT, user_input,
+        [{"type": "file_search"}], vector_store_ids
+    )
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
     
-    # Maximum number of retries
-    max_retries = 3
-    retry_count = 0
-    base_delay = 2  # Base delay in seconds
+    # Paraphrases of earlier questions against the same store reuse their answer
+    semantic_store_id = ",".join(sorted(vector_store_ids))
+    semantic_embedding, cached = semantic_cache.lookup(semantic_store_id, f"file_search:{model}", user_input)
+    if cached is not MISSING:
+        return cached
     
-    while retry_count < max_retries:
-        try:
-            # Use a more efficient model for file search to save on tokens
-            # If model is explicitly set to gpt-4o, we'll still use it, but default to a smaller model
-            search_model = model if model == "gpt-4o" else "gpt-4o-mini"
-            
-            # Create API request
-            response = client.responses.create(
-                input=user_input,
-                model=search_model,
-                instructions=DEVELOPER_PROMPT,
-                tools=[{
-                    "type": "file_search",
-                    "vector_store_ids": vector_store_ids,
-                }],
-                temperature=0.7,  # Lower temperature for more focused responses
-            )
-            
-            # Extract annotations to get source filenames
-            source_files = set()
-            if hasattr(response, 'output') and len(response.output) > 1:
-                for item in response.output:
-                    if hasattr(item, 'content') and item.content:
-                        for content_item in item.content:
-                            if hasattr(content_item, 'annotations'):
-                                annotations = content_item.annotations
-                                for annotation in annotations:
-                                    if hasattr(annotation, 'filename'):
-                                        source_files.add(annotation.filename)
-            
-            return response.output_text, source_files
-            
-        except Exception as e:
-            error_message = str(e)
-            print(f"Error with file search (attempt {retry_count+1}/{max_retries}): {error_message}")
-            
-            # Check if it's a rate limit error or parameter error
-            if ("rate_limit_exceeded" in error_message or 
-                "Request too large" in error_message or
-                "unknown_parameter" in error_message):
-                retry_count += 1
-                if retry_count < max_retries:
-                    # Calculate delay with exponential backoff
-                    delay = base_delay * (2 ** (retry_count - 1))
-                    print(f"Error detected. Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                    
-                    # If we're hitting token limits, try with an even smaller model on next attempt
-                    if "gpt-4" in search_model:
-                        search_model = "gpt-3.5-turbo"
-                    elif search_model == "gpt-3.5-turbo" and retry_count > 1:
-                        search_model = "gpt-3.5-turbo-16k"
-                    continue
-                else:
-                    # If we've exhausted retries, return a helpful error message
-                    return "I apologize, but I'm having trouble searching through the files due to API limitations. Could you try again with a more specific question or wait a moment before asking again?", set()
-            else:
-                # For other errors, return immediately
-                return f"Error with file search: {error_message}", set()
-    
-    # If we've exhausted retries
-    return "I'm sorry, but I'm currently experiencing technical difficulties and can't complete the file search. Please try again later.", set()
-
-def use_tool_response(user_input: str, tools_config: dict, model="gpt-4o"):
+    model_input, local_sources = local_retrieval_context(user_input, vector_store_ids)
+    hosted_ids = [vs_id for vs_id in vector_store_ids if not local_vectorstore.is_local_store_id(vs_id)]
+    tools = [file_search_tool(hosted_ids, user_input)] if hosted_ids else []
+    
+    # Use a more efficient model for file search to save on tokens
+    # If model is explicitly set to gpt-4o, we'll still use it, but default to a smaller model
+    search_model = model if model == "gpt-4o" else "gpt-4o-mini"
+    
+    try:
+        response = rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, model_input),
+            input=model_input,
+            model=search_model,
+            instructions=DEVELOPER_PROMPT,
+            tools=tools,
+            temperature=0.7,  # Lower temperature for more focused responses
+        )
+    except openai.RateLimitError as e:
+        print(f"Error with file search: {e}")
+        return "I apologize, but I'm having trouble searching through the files due to API limitations. Could you try again with a more specific question or wait a moment before asking again?", set()
+    except Exception as e:
+        print(f"Error with file search: {e}")
+        return f"Error with file search: {str(e)}", set()
+    
+    # Extract annotations to get source filenames
+    source_files = extract_source_files(response) | local_sources
+    
+    response_cache.put(cache_key, (response.output_text, source_files))
+    semantic_cache.store(
+        semantic_store_id, f"file_search:{model}", user_input,
+        (response.output_text, source_files), semantic_embedding
+    )
+    return response.output_text, source_files
+
+def flatten_input(model_input) -> str:
+    """
+    Flatten Responses API input into text for token estimates.
+    
+    Args:
+        model_input: Input string or list of input messages
+        
+    Returns:
+        str: Concatenated text
+    """
+    if isinstance(model_input, str):
+        return model_input
+    return "\n".join(item["content"] for item in model_input)
+
+def create_response(request: dict, chain: dict = None, history: list = None):
+    """
+    Send a Responses API request, chained onto the conversation when given.
+    
+    If the server no longer knows the previous response, the chain is
+    rebuilt from history and the request sent once more.
+    
+    Args:
+        request: responses.create arguments
+        chain: Chain state for the conversation, or None for a standalone turn
+        history: Earlier messages of the conversation, oldest first
+        
+    Returns:
+        The response, or a stream when request has stream=True
+    """
+    turn_input = request["input"]
+    if chain is not None:
+        conversation_chain.prepare_request(chain, history, request, turn_input)
+    try:
+        return rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, flatten_input(request["input"])),
+            **request
+        )
+    except Exception as e:
+        if chain is None or "previous_response_id" not in request or not conversation_chain.is_stale_chain_error(e):
+            raise
+        print(f"Rebuilding conversation context: {e}")
+        conversation_chain.reset(chain)
+        request["input"] = turn_input
+        conversation_chain.prepare_request(chain, history, request, turn_input)
+        return rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, flatten_input(request["input"])),
+            **request
+        )
+
+def _has_context(chain: dict, history: list) -> bool:
+    # Answers that depend on earlier turns must not be cached or served from cache
+    return chain is not None and bool(chain["response_id"] or history)
+
+@tracing.traced("use_tool_response")
+def use_tool_response(user_input: str, tools_config: dict, model="gpt-4o", chain: dict = None, history: list = None):
     """
     Get a response using enabled tools.
     
@@ -452,51 +818,39 @@ def use_tool_response(user_input: str, tools_config: dict, model="gpt-4o"):
         user_input: User input text
         tools_config: Dictionary of enabled tools 
         model: Model to use
+        chain: Chain state for multi-turn context, or None for a standalone turn
+        history: Earlier messages of the conversation, used to rebuild the chain
         
     Returns:
         tuple: Response text and metadata
     """
-    import time
+    tools = build_tools(tools_config, user_input)
     
-    # Setup for retries
-    max_retries = 3
-    retry_count = 0
-    base_delay = 2  # Base delay in seconds
+    cache_key, cache_kind = tool_cache_key(user_input, tools_config, tools, model)
+    if _has_context(chain, history):
+        cache_key = None
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
     
-    tools = []
+    semantic_store_id, semantic_variant = semantic_scope(user_input, tools_config, model)
+    if _has_context(chain, history):
+        semantic_store_id, semantic_variant = None, None
+    semantic_embedding, cached = semantic_cache.lookup(semantic_store_id, semantic_variant, user_input)
+    if cached is not MISSING:
+        return cached
     
-    if tools_config.get("web_search"):
-        tools.append({"type": "web_search_preview"})
+    routed, weather_result = local_weather(user_input, tools_config, model)
+    if weather_result:
+        # Answered without the model, so the next turn rebuilds from history
+        if chain is not None:
+            conversation_chain.reset(chain)
+        _cache_weather(cache_key, weather_result)
+        return weather_result
     
+    model_input, local_sources = user_input, set()
     if tools_config.get("file_search") and tools_config.get("vector_store_id"):
-        tools.append({
-            "type": "file_search",
-            "vector_store_ids": [tools_config.get("vector_store_id")]
-            # Note: chunk_size is not supported by the OpenAI API
-        })
-    
-    if tools_config.get("function_calling"):
-        # Add the weather function
-        tools.append({
-            "type": "function",
-            "name": "get_weather",
-            "description": "Get current weather information for a given location",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                        "type": "string",
-                        "description": "City and country (if known), e.g., 'Paris, France' or just 'Paris'"
-                    },
-                    "unit": {
-                        "type": "string",
-                        "enum": ["celsius", "fahrenheit"],
-                        "description": "Temperature unit"
-                    }
-                },
-                "required": ["location"]
-            }
-        })
+        model_input, local_sources = local_retrieval_context(user_input, [tools_config["vector_store_id"]])
     
     # If we have many tools enabled, use a smaller model by default to avoid rate limits
     if len(tools) > 1 and model == "gpt-4o":
@@ -505,96 +859,306 @@ def use_tool_response(user_input: str, tools_config: dict, model="gpt-4o"):
     else:
         response_model = model
     
-    while retry_count < max_retries:
-        try:
-            # Check if this might be a weather query
-            is_weather_query = any(keyword in user_input.lower() for keyword in ["weather", "temperature", "forecast", "climate"])
-            
-            # Create the response
-            if tools_config.get("function_calling") and is_weather_query:
-                # For likely weather queries, explicitly set tool_choice
-                response = client.responses.create(
-                    model=response_model,
-                    input=user_input,
-                    instructions=DEVELOPER_PROMPT,
-                    tools=tools,
-                    tool_choice={"type": "function", "name": "get_weather"},
-                    temperature=0.7,  # Lower temperature
-                )
-            else:
-                # For general queries, let the model decide which tool to use
-                response = client.responses.create(
-                    model=response_model,
-                    input=user_input,
-                    instructions=DEVELOPER_PROMPT,
-                    tools=tools,
-                    temperature=0.7,  # Lower temperature
-                )
-            
-            # Check for any tool calls in the response
-            metadata = {}
-            
-            # Handle function calls if present
-            if hasattr(response, 'tool_calls') and response.tool_calls:
-                for tool_call in response.tool_calls:
-                    if tool_call.name == "get_weather" and tool_call.arguments:
-                        try:
-                            args = json.loads(tool_call.arguments)
-                            if "location" in args:
-                                location = args["location"]
-                                unit = args.get("unit", "celsius")
-                                # Get weather for the extracted location
-                                weather_response = get_weather(location, unit, model)
-                                return weather_response, {"function": "weather", "location": location}
-                        except json.JSONDecodeError as e:
-                            print(f"JSON decode error in tool call arguments: {e}")
-                            print(f"Raw arguments: {tool_call.arguments}")
-                        except Exception as e:
-                            print(f"Error processing weather function call: {e}")
-            
-            # Extract source files if file search was used
-            source_files = set()
-            if tools_config.get("file_search") and hasattr(response, 'output') and len(response.output) > 1:
-                for item in response.output:
-                    if hasattr(item, 'content') and item.content:
-                        for content_item in item.content:
-                            if hasattr(content_item, 'annotations'):
-                                annotations = content_item.annotations
-                                for annotation in annotations:
-                                    if hasattr(annotation, 'filename'):
-                                        source_files.add(annotation.filename)
-                metadata["source_files"] = source_files
-            
-            return response.output_text, metadata
+    request = {
+        "model": response_model,
+        "input": model_input,
+        "instructions": DEVELOPER_PROMPT,
+        "tools": tools,
+        "temperature": 0.7,  # Lower temperature
+    }
+    if routed["intent"] == intent_router.WEATHER:
+        # The router could not pin down the location, so the model extracts it
+        request["tool_choice"] = {"type": "function", "name": "get_weather"}
+    
+    try:
+        response = create_response(request, chain, history)
+    except openai.RateLimitError as e:
+        print(f"Error with tool response: {e}")
+        return "I apologize, but I'm experiencing API limitations. Please try asking a more specific question or wait a moment before trying again.", {}
+    except Exception as e:
+        print(f"Error with tool response: {e}")
+        return f"Error with tools: {str(e)}", {}
+    
+    # Check for any tool calls in the response
+    metadata = {}
+    
+    # Handle function calls if present
+    try:
+        weather_result = weather_from_function_calls(extract_function_calls(response), model)
+        if weather_result:
+            # The function call is answered locally, so the next turn rebuilds from history
+            if chain is not None:
+                conversation_chain.reset(chain)
+            _cache_weather(cache_key, weather_result)
+            return weather_result
+    except Exception as e:
+        print(f"Error processing weather function call: {e}")
+    
+    # Extract source files if file search was used
+    if tools_config.get("file_search"):
+        metadata["source_files"] = extract_source_files(response) | local_sources
+        item_keys = source_item_keys([tools_config.get("vector_store_id")], metadata["source_files"])
+        if item_keys:
+            metadata["item_keys"] = item_keys
+    
+    if chain is not None:
+        conversation_chain.record_response(chain, response, user_input)
+    response_cache.put(cache_key, (response.output_text, metadata), cache_kind)
+    semantic_cache.store(
+        semantic_store_id, semantic_variant, user_input,
+        (response.output_text, metadata), semantic_embedding
+    )
+    return response.output_text, metadata
+
+def _consume_response_stream(stream):
+    """
+    Translate a Responses API event stream into chat events.
+    
+    Yields text, annotation and tool-call events as they arrive and returns
+    the accumulated text, cited source files, function calls and the
+    completed response.
+    
+    Args:
+        stream: Stream returned by responses.create(stream=True)
         
+    Returns:
+        tuple: Output text, source files, function calls (name, arguments)
+        and the completed response, or None if the stream did not complete
+    """
+    text_parts = []
+    source_files = set()
+    function_calls = []
+    completed = None
+    
+    for event in stream:
+        if event.type == "response.output_text.delta":
+            text_parts.append(event.delta)
+            yield {"type": "text", "delta": event.delta}
+        elif event.type == "response.output_text.annotation.added":
+            filename = getattr(event.annotation, "filename", None)
+            if filename is None and isinstance(event.annotation, dict):
+                filename = event.annotation.get("filename")
+            if filename and filename not in source_files:
+                source_files.add(filename)
+                yield {"type": "annotation", "filename": filename}
+        elif event.type == "response.output_item.added":
+            item = event.item
+            if item.type in ("web_search_call", "file_search_call"):
+                yield {"type": "tool_call", "name": item.type, "arguments": None}
+        elif event.type == "response.output_item.done":
+            item = event.item
+            if item.type == "function_call":
+                function_calls.append((item.name, item.arguments))
+                yield {"type": "tool_call", "name": item.name, "arguments": item.arguments}
+        elif event.type == "response.completed":
+            completed = event.response
+        elif event.type == "error":
+            raise RuntimeError(event.message)
+    
+    return "".join(text_parts), source_files, function_calls, completed
+
+def stream_chat_completion(user_input: str, model="gpt-4o"):
+    """
+    Stream a chat completion response from OpenAI.
+    
+    Args:
+        user_input: User input text
+        model: Model to use for completion
+    
+    Yields:
+        dict: Text delta events followed by a final done event
+    """
+    cache_key = response_cache.make_key("chat", model, SYSTEM_MESSAGE, user_input)
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        yield {"type": "text", "delta": cached}
+        yield {"type": "done", "text": cached, "metadata": {}}
+        return
+    
+    text_parts = []
+    try:
+        stream = rate_limit.call(
+            get_client().chat.completions.create,
+            estimated_tokens=rate_limit.estimate_tokens(SYSTEM_MESSAGE, user_input),
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": user_input}
+            ],
+            stream=True,
+            # The final chunk then carries token usage for metrics
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                delta = chunk.choices[0].delta.content
+                text_parts.append(delta)
+                yield {"type": "text", "delta": delta}
+        response_cache.put(cache_key, "".join(text_parts))
+        yield {"type": "done", "text": "".join(text_parts), "metadata": {}}
+    except Exception as e:
+        print(f"Error streaming chat completion: {e}")
+        if text_parts:
+            yield {"type": "done", "text": "".join(text_parts), "metadata": {}}
+        else:
+            yield {"type": "done", "text": f"Error: {str(e)}", "metadata": {}}
+
+def stream_web_search(query: str, model="gpt-4o"):
+    """
+    Stream a web search answer from the OpenAI API.
+    
+    Args:
+        query: Search query
+        model: Model to use
+    
+    Yields:
+        dict: Text, annotation and tool-call events followed by a final done event
+    """
+    tools = [{"type": "web_search_preview"}]
+    cache_key = response_cache.make_key("web_search", model, DEVELOPER_PROMPT, query, tools)
+    cached = response_cache.get(cache_key)
+    if cached is not MISSING:
+        yield {"type": "text", "delta": cached}
+        yield {"type": "done", "text": cached, "metadata": {}}
+        return
+    
+    try:
+        stream = rate_limit.call(
+            get_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, query),
+            model=model,
+            instructions=DEVELOPER_PROMPT,
+            input=query,
+            tools=tools,
+            stream=True
+        )
+        text, _, _, _ = yield from _consume_response_stream(stream)
+        response_cache.put(cache_key, text)
+        yield {"type": "done", "text": text, "metadata": {}}
+    except Exception as e:
+        print(f"Error streaming web search: {e}")
+        yield {"type": "done", "text": f"Error: {str(e)}", "metadata": {}}
+
+def stream_tool_response(user_input: str, tools_config: dict, model="gpt-4o", chain: dict = None, history: list = None):
+    """
+    Stream a response using enabled tools.
+    
+    Text deltas are yielded as soon as the model produces them. Weather
+    function calls are resolved once the model has emitted them, and their
+    result is yielded as a single text event. If the stream breaks before
+    any text was produced, the answer is fetched with the non-streaming
+    use_tool_response instead.
+    
+    Args:
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        model: Model to use
+        chain: Chain state for multi-turn context, or None for a standalone turn
+        history: Earlier messages of the conversation, used to rebuild the chain
+        
+    Yields:
+        dict: Text, annotation and tool-call events followed by a final done event
+    """
+    tools = build_tools(tools_config, user_input)
+    
+    cache_key, cache_kind = tool_cache_key(user_input, tools_config, tools, model)
+    semantic_store_id, semantic_variant = semantic_scope(user_input, tools_config, model)
+    if _has_context(chain, history):
+        cache_key, semantic_store_id, semantic_variant = None, None, None
+    cached = response_cache.get(cache_key)
+    if cached is MISSING:
+        semantic_embedding, cached = semantic_cache.lookup(semantic_store_id, semantic_variant, user_input)
+    if cached is not MISSING:
+        cached_text, cached_metadata = cached
+        yield {"type": "text", "delta": cached_text}
+        yield {"type": "done", "text": cached_text, "metadata": cached_metadata}
+        return
+    
+    routed, weather_result = local_weather(user_input, tools_config, model)
+    if weather_result:
+        weather_response, weather_metadata = weather_result
+        if chain is not None:
+            conversation_chain.reset(chain)
+        _cache_weather(cache_key, weather_result)
+        yield {"type": "text", "delta": weather_response}
+        yield {"type": "done", "text": weather_response, "metadata": weather_metadata}
+        return
+    
+    model_input, local_sources = user_input, set()
+    if tools_config.get("file_search") and tools_config.get("vector_store_id"):
+        model_input, local_sources = local_retrieval_context(user_input, [tools_config["vector_store_id"]])
+    
+    # If we have many tools enabled, use a smaller model by default to avoid rate limits
+    if len(tools) > 1 and model == "gpt-4o":
+        response_model = "gpt-4o-mini"
+    else:
+        response_model = model
+    
+    request = {
+        "model": response_model,
+        "input": model_input,
+        "instructions": DEVELOPER_PROMPT,
+        "tools": tools,
+        "temperature": 0.7,
+        "stream": True,
+    }
+    if routed["intent"] == intent_router.WEATHER:
+        request["tool_choice"] = {"type": "function", "name": "get_weather"}
+    
+    partial_text = []
+    try:
+        stream = create_response(request, chain, history)
+        # Not made active: the consumer runs between yields
+        stream_span = tracing.start_span("response_stream", model=response_model)
+        try:
+            events = _consume_response_stream(stream)
+            while True:
+                try:
+                    event = next(events)
+                except StopIteration as stop:
+                    text, source_files, function_calls, completed = stop.value
+                    break
+                if event["type"] == "text":
+                    partial_text.append(event["delta"])
+                yield event
         except Exception as e:
-            error_message = str(e)
-            print(f"Error with tool response (attempt {retry_count+1}/{max_retries}): {error_message}")
-            
-            # Check if it's a rate limit error or unknown parameter error
-            if ("rate_limit_exceeded" in error_message or 
-                "Request too large" in error_message or
-                "unknown_parameter" in error_message):
-                retry_count += 1
-                if retry_count < max_retries:
-                    # Calculate delay with exponential backoff
-                    delay = base_delay * (2 ** (retry_count - 1))
-                    print(f"Error detected. Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                    
-                    # If we're hitting token limits, downgrade to an even smaller model
-                    if "gpt-4" in response_model:
-                        response_model = "gpt-3.5-turbo"
-                    elif response_model == "gpt-3.5-turbo" and retry_count > 1:
-                        response_model = "gpt-3.5-turbo-16k"
-                    
-                    continue
-                else:
-                    # If we've exhausted retries
-                    return "I apologize, but I'm experiencing API limitations. Please try asking a more specific question or wait a moment before trying again.", {}
-            else:
-                # For other errors, return immediately
-                return f"Error with tools: {error_message}", {}
-    
-    # If we've exhausted retries
-    return "I'm sorry, but I'm currently experiencing technical difficulties and can't complete your request. Please try again later with a more specific question.", {}
+            stream_span.record_exception(e)
+            raise
+        finally:
+            stream_span.end()
+        
+        metadata = {}
+        
+        # Resolve weather function calls now that the model has emitted them
+        weather_result = weather_from_function_calls(function_calls, model)
+        if weather_result:
+            weather_response, weather_metadata = weather_result
+            if chain is not None:
+                conversation_chain.reset(chain)
+            _cache_weather(cache_key, weather_result)
+            yield {"type": "text", "delta": weather_response}
+            yield {"type": "done", "text": weather_response, "metadata": weather_metadata}
+            return
+        
+        if tools_config.get("file_search"):
+            metadata["source_files"] = source_files | local_sources
+            item_keys = source_item_keys([tools_config.get("vector_store_id")], metadata["source_files"])
+            if item_keys:
+                metadata["item_keys"] = item_keys
+        
+        if chain is not None and completed is not None:
+            conversation_chain.record_response(chain, completed, user_input)
+        response_cache.put(cache_key, (text, metadata), cache_kind)
+        semantic_cache.store(semantic_store_id, semantic_variant, user_input, (text, metadata), semantic_embedding)
+        yield {"type": "done", "text": text, "metadata": metadata}
+    
+    except Exception as e:
+        print(f"Error streaming tool response: {e}")
+        if not partial_text:
+            # Nothing reached the user yet, so fall back to a non-streaming request
+            response_text, metadata = use_tool_response(user_input, tools_config, model, chain, history)
+            yield {"type": "text", "delta": response_text}
+            yield {"type": "done", "text": response_text, "metadata": metadata}
+        else:
+            interrupted = "".join(partial_text) + f"\n\n*Response interrupted: {str(e)}*"
+            yield {"type": "done", "text": interrupted, "metadata": {}}
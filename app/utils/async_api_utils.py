@@ -0,0 +1,249 @@
+"""
+Async counterparts of the functions in api_utils.
+
+Every coroutine here goes through the shared, connection-pooled AsyncOpenAI
+client from client_utils, so a single event loop can keep many requests in
+flight without a thread per request.
+"""
+import asyncio
+import openai
+from .prompts import DEVELOPER_PROMPT, SYSTEM_MESSAGE
+from .client_utils import get_async_client
+from . import rate_limit
+from . import conversation_chain
+from . import intent_router
+from .api_utils import (
+    build_tools, extract_source_files, extract_function_calls,
+    weather_from_function_calls, local_weather, local_retrieval_context, file_search_tool, source_item_keys, flatten_input
+)
+from .local_vectorstore import is_local_store_id
+
+async def async_chat_completion(user_input: str, model="gpt-4o"):
+    """
+    Get a chat completion response from OpenAI without blocking the event loop.
+
+    Args:
+        user_input: User input text
+        model: Model to use for completion
+
+    Returns:
+        str: Model response
+    """
+    try:
+        completion = await rate_limit.acall(
+            get_async_client().chat.completions.create,
+            estimated_tokens=rate_limit.estimate_tokens(SYSTEM_MESSAGE, user_input),
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": user_input}
+            ]
+        )
+        return completion.choices[0].message.content
+    except Exception as e:
+        print(f"Error getting chat completion: {e}")
+        return f"Error: {str(e)}"
+
+async def async_get_response(user_input: str, model="gpt-4o"):
+    """
+    Get a response from the Responses API without blocking the event loop.
+
+    Args:
+        user_input: User input text
+        model: Model to use for response
+
+    Returns:
+        str: Model response text
+    """
+    try:
+        response = await rate_limit.acall(
+            get_async_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, user_input),
+            model=model,
+            instructions=DEVELOPER_PROMPT,
+            input=user_input
+        )
+        return response.output_text
+    except Exception as e:
+        print(f"Error getting response: {e}")
+        return f"Error: {str(e)}"
+
+async def async_web_search(query: str, model="gpt-4o"):
+    """
+    Perform a web search using the OpenAI API without blocking the event loop.
+
+    Args:
+        query: Search query
+        model: Model to use
+
+    Returns:
+        str: Search results
+    """
+    try:
+        response = await rate_limit.acall(
+            get_async_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, query),
+            model=model,
+            instructions=DEVELOPER_PROMPT,
+            input=query,
+            tools=[{"type": "web_search_preview"}]
+        )
+        return response.output_text
+    except Exception as e:
+        print(f"Error performing web search: {e}")
+        return f"Error: {str(e)}"
+
+async def async_file_search_response(user_input: str, vector_store_ids: list, model="gpt-4o-mini"):
+    """
+    Get a response from the OpenAI API using file search without blocking the event loop.
+
+    Args:
+        user_input: User input text
+        vector_store_ids: List of vector store IDs to search
+        model: Model to use
+
+    Returns:
+        tuple: Response text and source files used
+    """
+    search_model = model if model == "gpt-4o" else "gpt-4o-mini"
+
+    # Local stores are searched in a worker thread and passed as context
+    model_input, local_sources = await asyncio.to_thread(local_retrieval_context, user_input, vector_store_ids)
+    hosted_ids = [vs_id for vs_id in vector_store_ids if not is_local_store_id(vs_id)]
+    tools = [await asyncio.to_thread(file_search_tool, hosted_ids, user_input)] if hosted_ids else []
+
+    try:
+        response = await rate_limit.acall(
+            get_async_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, model_input),
+            input=model_input,
+            model=search_model,
+            instructions=DEVELOPER_PROMPT,
+            tools=tools,
+            temperature=0.7,
+        )
+    except openai.RateLimitError as e:
+        print(f"Error with file search: {e}")
+        return "I apologize, but I'm having trouble searching through the files due to API limitations. Could you try again with a more specific question or wait a moment before asking again?", set()
+    except Exception as e:
+        print(f"Error with file search: {e}")
+        return f"Error with file search: {str(e)}", set()
+
+    return response.output_text, extract_source_files(response) | local_sources
+
+async def async_create_response(request: dict, chain: dict = None, history: list = None):
+    """
+    Async version of api_utils.create_response.
+
+    Args:
+        request: responses.create arguments
+        chain: Chain state for the conversation, or None for a standalone turn
+        history: Earlier messages of the conversation, oldest first
+
+    Returns:
+        The response
+    """
+    turn_input = request["input"]
+    if chain is not None:
+        conversation_chain.prepare_request(chain, history, request, turn_input)
+    try:
+        return await rate_limit.acall(
+            get_async_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, flatten_input(request["input"])),
+            **request
+        )
+    except Exception as e:
+        if chain is None or "previous_response_id" not in request or not conversation_chain.is_stale_chain_error(e):
+            raise
+        print(f"Rebuilding conversation context: {e}")
+        conversation_chain.reset(chain)
+        request["input"] = turn_input
+        conversation_chain.prepare_request(chain, history, request, turn_input)
+        return await rate_limit.acall(
+            get_async_client().responses.create,
+            estimated_tokens=rate_limit.estimate_tokens(DEVELOPER_PROMPT, flatten_input(request["input"])),
+            **request
+        )
+
+async def async_use_tool_response(user_input: str, tools_config: dict, model="gpt-4o", chain: dict = None, history: list = None):
+    """
+    Get a response using enabled tools without blocking the event loop.
+
+    Weather lookups still use the blocking HTTP helpers, so they are run in
+    a worker thread.
+
+    Args:
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        model: Model to use
+        chain: Chain state for multi-turn context, or None for a standalone turn
+        history: Earlier messages of the conversation, used to rebuild the chain
+
+    Returns:
+        tuple: Response text and metadata
+    """
+    # Prefiltering file search reads the metadata index from disk
+    tools = await asyncio.to_thread(build_tools, tools_config, user_input)
+
+    routed, weather_result = await asyncio.to_thread(local_weather, user_input, tools_config, model)
+    if weather_result:
+        # Answered without the model, so the next turn rebuilds from history
+        if chain is not None:
+            conversation_chain.reset(chain)
+        return weather_result
+
+    model_input, local_sources = user_input, set()
+    if tools_config.get("file_search") and tools_config.get("vector_store_id"):
+        model_input, local_sources = await asyncio.to_thread(
+            local_retrieval_context, user_input, [tools_config["vector_store_id"]]
+        )
+
+    # If we have many tools enabled, use a smaller model by default to avoid rate limits
+    if len(tools) > 1 and model == "gpt-4o":
+        response_model = "gpt-4o-mini"
+    else:
+        response_model = model
+
+    request = {
+        "model": response_model,
+        "input": model_input,
+        "instructions": DEVELOPER_PROMPT,
+        "tools": tools,
+        "temperature": 0.7,
+    }
+    if routed["intent"] == intent_router.WEATHER:
+        request["tool_choice"] = {"type": "function", "name": "get_weather"}
+
+    try:
+        response = await async_create_response(request, chain, history)
+    except openai.RateLimitError as e:
+        print(f"Error with tool response: {e}")
+        return "I apologize, but I'm experiencing API limitations. Please try asking a more specific question or wait a moment before trying again.", {}
+    except Exception as e:
+        print(f"Error with tool response: {e}")
+        return f"Error with tools: {str(e)}", {}
+
+    metadata = {}
+
+    try:
+        weather_result = await asyncio.to_thread(
+            weather_from_function_calls, extract_function_calls(response), model
+        )
+        if weather_result:
+            if chain is not None:
+                conversation_chain.reset(chain)
+            return weather_result
+    except Exception as e:
+        print(f"Error processing weather function call: {e}")
+
+    if tools_config.get("file_search"):
+        metadata["source_files"] = extract_source_files(response) | local_sources
+        item_keys = await asyncio.to_thread(
+            source_item_keys, [tools_config.get("vector_store_id")], metadata["source_files"]
+        )
+        if item_keys:
+            metadata["item_keys"] = item_keys
+
+    if chain is not None:
+        conversation_chain.record_response(chain, response, user_input)
+    return response.output_text, metadata
@@ -0,0 +1,379 @@
+"""
+Adaptive bulk upload of files to hosted vector stores.
+
+Files are uploaded by a worker pool whose effective concurrency follows an
+AIMD (additive increase, multiplicative decrease) limit: it grows while
+uploads succeed at steady per-megabyte latency, is halved on every 429 and
+backs off by one when latency inflates, which signals queueing. Uploaded
+files are attached through the file batches endpoint, up to
+BULK_UPLOAD_BATCH_SIZE at a time and as soon as each batch fills, and their
+attributes are set in the same pool under the same limit. Batch status is
+then polled with exponential backoff, and a batch's files are listed once it
+has finished. Every call goes through rate_limit.call.
+
+Every file handle is closed as soon as its upload returns.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
+from dotenv import load_dotenv, find_dotenv
+from .client_utils import get_client
+from . import rate_limit
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+BULK_UPLOAD_INITIAL_CONCURRENCY = int(os.environ.get("BULK_UPLOAD_INITIAL_CONCURRENCY", "8"))
+BULK_UPLOAD_MIN_CONCURRENCY = int(os.environ.get("BULK_UPLOAD_MIN_CONCURRENCY", "1"))
+BULK_UPLOAD_MAX_CONCURRENCY = int(os.environ.get("BULK_UPLOAD_MAX_CONCURRENCY", "64"))
+BULK_UPLOAD_MAX_RETRIES = int(os.environ.get("BULK_UPLOAD_MAX_RETRIES", "5"))
+# Seconds per MB above this multiple of the best seen counts as congestion
+BULK_UPLOAD_LATENCY_FACTOR = float(os.environ.get("BULK_UPLOAD_LATENCY_FACTOR", "3"))
+# The file batches endpoint accepts at most 500 file IDs per call
+BULK_UPLOAD_BATCH_SIZE = min(int(os.environ.get("BULK_UPLOAD_BATCH_SIZE", "500")), 500)
+BULK_UPLOAD_POLL_INTERVAL = float(os.environ.get("BULK_UPLOAD_POLL_INTERVAL", "1"))
+BULK_UPLOAD_POLL_MAX_INTERVAL = float(os.environ.get("BULK_UPLOAD_POLL_MAX_INTERVAL", "30"))
+BULK_UPLOAD_POLL_TIMEOUT = float(os.environ.get("BULK_UPLOAD_POLL_TIMEOUT", "1800"))
+
+_MEGABYTE = 1024 * 1024
+# Floor on the size used to normalize latency, so tiny files do not set the baseline
+_MIN_LATENCY_SIZE = 0.1
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted from upload outcomes.
+
+    Starts in slow start, adding one slot per success until the first
+    congestion signal, then adds one slot per full window of successes.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        """
+        Args:
+            initial: Starting concurrency
+            minimum: Lowest concurrency
+            maximum: Highest concurrency
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.peak = 0
+        self.throttled = 0
+        self._slow_start = True
+        self._best_rate = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait for a free slot.
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self):
+        """
+        Free a slot.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, seconds: float, size_bytes: int):
+        """
+        Record a successful upload.
+
+        Args:
+            seconds: Time the upload took
+            size_bytes: Size of the uploaded file
+        """
+        rate = seconds / max(size_bytes / _MEGABYTE, _MIN_LATENCY_SIZE)
+        with self._condition:
+            if self._best_rate is None or rate < self._best_rate:
+                self._best_rate = rate
+            if rate > self._best_rate * BULK_UPLOAD_LATENCY_FACTOR:
+                self._slow_start = False
+                self.limit = max(self.minimum, self.limit - 1)
+            elif self._slow_start:
+                self.limit = min(self.maximum, self.limit + 1)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        """
+        Record a 429 response.
+        """
+        with self._condition:
+            self._slow_start = False
+            self.throttled += 1
+            self.limit = max(self.minimum, self.limit / 2)
+
+def _create_file(file_path: str, limiter: AdaptiveLimiter, size_bytes: int):
+    """
+    Make one upload attempt in a limiter slot and report its outcome to the limiter.
+
+    Args:
+        file_path: Path to the file, opened afresh so retries resend the whole file
+        limiter: Shared concurrency limit
+        size_bytes: Size of the file
+
+    Returns:
+        tuple: (FileObject, upload_seconds)
+    """
+    limiter.acquire()
+    try:
+        started = time.monotonic()
+        with open(file_path, "rb") as f:
+            response = get_client().files.create(file=f, purpose="assistants")
+        elapsed = time.monotonic() - started
+    except openai.RateLimitError:
+        limiter.on_throttle()
+        raise
+    finally:
+        limiter.release()
+    limiter.on_success(elapsed, size_bytes)
+    return response, elapsed
+
+def _upload_file(file_path: str, limiter: AdaptiveLimiter):
+    """
+    Upload one file, retrying throttled and transient failures.
+
+    The request budget is reserved once through rate_limit.call, so retries
+    are not charged again; every attempt still takes a limiter slot.
+
+    Args:
+        file_path: Path to the file
+        limiter: Shared concurrency limit
+
+    Returns:
+        tuple: (file_id, upload_seconds)
+    """
+    size_bytes = os.path.getsize(file_path)
+    response, elapsed = rate_limit.call(_create_file, file_path, limiter, size_bytes, max_retries=BULK_UPLOAD_MAX_RETRIES)
+    return response.id, elapsed
+
+def _attach_batch(vector_store_id: str, file_ids: list) -> str:
+    """
+    Attach uploaded files to a vector store in one batch.
+
+    Args:
+        vector_store_id: ID of the vector store
+        file_ids: IDs of uploaded files
+
+    Returns:
+        str: ID of the file batch
+    """
+    batch = rate_limit.call(get_client().vector_stores.file_batches.create, vector_store_id=vector_store_id, file_ids=file_ids)
+    return batch.id
+
+def _list_batch_files(vector_store_id: str, batch_id: str) -> list:
+    """
+    List every file of a file batch, one rate-limited call per page.
+
+    Args:
+        vector_store_id: ID of the vector store
+        batch_id: ID of the file batch
+
+    Returns:
+        list: Vector store file objects
+    """
+    client = get_client()
+    files = []
+    after = None
+    while True:
+        page_args = {"after": after} if after else {}
+        page = rate_limit.call(
+            client.vector_stores.file_batches.list_files,
+            batch_id=batch_id, vector_store_id=vector_store_id, limit=100, **page_args
+        )
+        files.extend(page.data)
+        if not page.has_more or not page.data:
+            return files
+        after = page.data[-1].id
+
+def _poll_batches(vector_store_id: str, batch_ids: list, attached_at: dict) -> dict:
+    """
+    Wait for file batches to finish indexing.
+
+    Only the batch status is polled; a batch's files are listed once, after
+    it has finished.
+
+    Args:
+        vector_store_id: ID of the vector store
+        batch_ids: IDs of the file batches
+        attached_at: Monotonic time each file ID was attached
+
+    Returns:
+        dict: Final state per file ID, with status, indexing_seconds and error
+    """
+    client = get_client()
+    states = {}
+    pending = set(batch_ids)
+    interval = BULK_UPLOAD_POLL_INTERVAL
+    deadline = time.monotonic() + BULK_UPLOAD_POLL_TIMEOUT
+
+    while pending and time.monotonic() < deadline:
+        time.sleep(interval)
+        for batch_id in list(pending):
+            try:
+                batch = rate_limit.call(client.vector_stores.file_batches.retrieve, batch_id=batch_id, vector_store_id=vector_store_id)
+                if batch.status == "in_progress":
+                    continue
+                # Indexing time runs to when the finished batch was seen
+                now = time.monotonic()
+                for vs_file in _list_batch_files(vector_store_id, batch_id):
+                    if vs_file.status == "in_progress":
+                        continue
+                    states[vs_file.id] = {
+                        "status": vs_file.status,
+                        "indexing_seconds": round(now - attached_at[vs_file.id], 3),
+                        "error": vs_file.last_error.message if vs_file.last_error else None
+                    }
+                pending.discard(batch_id)
+            except Exception as e:
+                print(f"Error polling file batch {batch_id}: {e}")
+        interval = min(interval * 2, BULK_UPLOAD_POLL_MAX_INTERVAL)
+    return states
+
+def _update_attributes(vector_store_id: str, file_id: str, attributes: dict, limiter: AdaptiveLimiter):
+    """
+    Make one attribute update attempt in a limiter slot.
+
+    Args:
+        vector_store_id: ID of the vector store
+        file_id: ID of the attached file
+        attributes: Attributes to set
+        limiter: Shared concurrency limit
+    """
+    limiter.acquire()
+    try:
+        return get_client().vector_stores.files.update(file_id, vector_store_id=vector_store_id, attributes=attributes)
+    except openai.RateLimitError:
+        limiter.on_throttle()
+        raise
+    finally:
+        limiter.release()
+
+def _set_attributes(vector_store_id: str, file_id: str, attributes: dict, limiter: AdaptiveLimiter):
+    """
+    Set the filterable attributes of an attached file, logging failures.
+
+    Args:
+        vector_store_id: ID of the vector store
+        file_id: ID of the attached file
+        attributes: Up to 16 string, number or boolean values
+        limiter: Shared concurrency limit
+    """
+    try:
+        rate_limit.call(_update_attributes, vector_store_id, file_id, attributes, limiter)
+    except Exception as e:
+        print(f"Error setting attributes on {file_id}: {e}")
+
+def _delete_uploaded_file(file_id: str, vector_store_id: str = None):
+    """
+    Delete an uploaded file that could not be indexed, ignoring errors.
+
+    Args:
+        file_id: ID of the uploaded file
+        vector_store_id: Vector store to detach it from first, if it was attached
+    """
+    try:
+        if vector_store_id is not None:
+            rate_limit.call(get_client().vector_stores.files.delete, vector_store_id=vector_store_id, file_id=file_id)
+        rate_limit.call(get_client().files.delete, file_id)
+    except Exception as e:
+        print(f"Error deleting {file_id}: {e}")
+
+def upload_files(file_paths: list, vector_store_id: str, attributes: dict = None) -> dict:
+    """
+    Upload files to a hosted vector store and wait for them to be indexed.
+
+    Args:
+        file_paths: List of distinct file paths
+        vector_store_id: ID of the vector store
+        attributes: Optional attributes per file path, set on each file once attached
+
+    Returns:
+        dict: Report with results as (file_path, result) pairs, where each
+        result has file, status, file_id, upload_seconds and indexing_seconds,
+        plus elapsed_seconds, peak_concurrency, final_concurrency, throttled
+        and batch_ids
+    """
+    started = time.monotonic()
+    limiter = AdaptiveLimiter(BULK_UPLOAD_INITIAL_CONCURRENCY, BULK_UPLOAD_MIN_CONCURRENCY, BULK_UPLOAD_MAX_CONCURRENCY)
+    results = {}
+    path_by_file_id = {}
+    attached_at = {}
+    batch_ids = []
+    ready = []
+
+    attributes = attributes or {}
+
+    def attach(file_ids):
+        try:
+            batch_ids.append(_attach_batch(vector_store_id, file_ids))
+            now = time.monotonic()
+            attached_at.update((file_id, now) for file_id in file_ids)
+        except Exception as e:
+            print(f"Error attaching files to {vector_store_id}: {e}")
+            for file_id in file_ids:
+                results[path_by_file_id[file_id]].update(status="failed", error=str(e))
+                _delete_uploaded_file(file_id)
+            return
+        # Attribute updates share the pool and the limiter with the uploads still running
+        for file_id in file_ids:
+            file_attributes = attributes.get(path_by_file_id[file_id])
+            if file_attributes:
+                executor.submit(_set_attributes, vector_store_id, file_id, file_attributes, limiter)
+
+    with ThreadPoolExecutor(max_workers=limiter.maximum) as executor:
+        futures = {executor.submit(_upload_file, file_path, limiter): file_path for file_path in file_paths}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            file_name = os.path.basename(file_path)
+            try:
+                file_id, upload_seconds = future.result()
+            except Exception as e:
+                print(f"Error with {file_name}: {str(e)}")
+                results[file_path] = {"file": file_name, "status": "failed", "error": str(e)}
+                continue
+            results[file_path] = {
+                "file": file_name, "status": "success", "file_id": file_id,
+                "upload_seconds": round(upload_seconds, 3), "indexing_seconds": None
+            }
+            path_by_file_id[file_id] = file_path
+            ready.append(file_id)
+            if len(ready) == BULK_UPLOAD_BATCH_SIZE:
+                attach(ready)
+                ready = []
+        if ready:
+            attach(ready)
+
+    states = _poll_batches(vector_store_id, batch_ids, attached_at)
+    for file_id in attached_at:
+        result = results[path_by_file_id[file_id]]
+        state = states.get(file_id)
+        if state is None:
+            # Not in the manifest, so leaving it attached would duplicate it on the next sync
+            result.update(status="failed", error="Timed out waiting for indexing")
+            _delete_uploaded_file(file_id, vector_store_id)
+            continue
+        result["indexing_seconds"] = state["indexing_seconds"]
+        if state["status"] != "completed":
+            result.update(status="failed", error=state["error"] or f"Indexing {state['status']}")
+            _delete_uploaded_file(file_id, vector_store_id)
+
+    return {
+        "results": [(file_path, results[file_path]) for file_path in file_paths],
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "peak_concurrency": limiter.peak,
+        "final_concurrency": int(limiter.limit),
+        "throttled": limiter.throttled,
+        "batch_ids": batch_ids
+    }
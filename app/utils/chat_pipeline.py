@@ -0,0 +1,121 @@
+"""
+The chat turn pipeline, independent of the UI.
+
+A turn routes the user's message to the right backend, streams its events
+to the caller and stores both messages. The Streamlit chat interface and
+the headless load generator in benchmarks/ drive the same run_turn, so what
+is measured headless is what users get. The caller owns the conversation
+state, a message list and an optional response chain, and renders events
+through a callback.
+"""
+from datetime import datetime
+from . import conversation_store
+from .api_utils import stream_chat_completion, stream_tool_response
+from .tracing import span
+
+def get_response_events(user_input, tools_config, chain=None, history=None):
+    """
+    Route a user message to the right backend and stream its events.
+
+    Args:
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        chain: Response chain for multi-turn context, or None for standalone turns
+        history: Earlier messages of the conversation, oldest first
+
+    Yields:
+        dict: Text, annotation and tool-call events followed by a final done event
+    """
+    model = tools_config.get("model", "gpt-4o")
+
+    # Weather turns are routed locally inside stream_tool_response, which only
+    # asks the model for the location when the intent router is unsure
+    if any([tools_config.get("web_search"),
+           tools_config.get("file_search") and tools_config.get("vector_store_id"),
+           tools_config.get("function_calling")]):
+        yield from stream_tool_response(user_input, tools_config, model=model, chain=chain, history=history)
+    elif chain is not None:
+        # Plain chat goes through the Responses API too, so it can be chained
+        yield from stream_tool_response(user_input, tools_config, model=model, chain=chain, history=history)
+    else:
+        # Just use plain chat completion
+        yield from stream_chat_completion(user_input, model=model)
+
+def add_message(conversation_id, messages, role, content, metadata=None):
+    """
+    Append a message to a conversation's history and to the store.
+
+    Args:
+        conversation_id: ID of the conversation
+        messages: The conversation's loaded messages, appended to in place
+        role: Role of the message (user or assistant)
+        content: Content of the message
+        metadata: Additional metadata for the message
+
+    Returns:
+        dict: The stored message
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    message = {
+        "role": role,
+        "content": content,
+        "timestamp": timestamp
+    }
+
+    if metadata:
+        message["metadata"] = metadata
+
+    seq = conversation_store.append_message(conversation_id, message)
+    if seq >= 0:
+        message["seq"] = seq
+    messages.append(message)
+    return message
+
+def run_turn(conversation_id, messages, user_input, tools_config, chain=None, on_event=None):
+    """
+    Run one chat turn: store the user message, stream the answer and store it.
+
+    Events reach on_event as they arrive. The final done event is delivered
+    inside a "render" span, so the trace shows how long the caller took to
+    draw the answer. A failed turn stores its error message as the answer
+    and delivers it as an error event.
+
+    Args:
+        conversation_id: ID of the conversation
+        messages: The conversation's loaded messages, appended to in place
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+        chain: Response chain for multi-turn context, or None for standalone turns
+        on_event: Optional callback taking each event
+
+    Returns:
+        dict: The stored assistant message
+    """
+    on_event = on_event or (lambda event: None)
+
+    # The whole turn is one trace, from input to the stored answer
+    with span("turn", model=tools_config.get("model", "gpt-4o")) as turn_span:
+        trace_metadata = {"trace_id": turn_span.trace_id}
+
+        # Earlier turns, used to rebuild the response chain when needed
+        history = list(messages) if chain is not None else None
+
+        add_message(conversation_id, messages, "user", user_input, trace_metadata)
+
+        try:
+            done = {"type": "done", "text": "", "metadata": {}}
+            for event in get_response_events(user_input, tools_config, chain, history):
+                if event["type"] == "done":
+                    done = event
+                else:
+                    on_event(event)
+
+            with span("render"):
+                on_event(done)
+
+            return add_message(conversation_id, messages, "assistant", done["text"], dict(done["metadata"], **trace_metadata))
+        except Exception as e:
+            turn_span.record_exception(e)
+            error_message = f"Error: {str(e)}"
+            on_event({"type": "error", "text": error_message})
+            return add_message(conversation_id, messages, "assistant", error_message, trace_metadata)
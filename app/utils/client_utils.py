@@ -0,0 +1,125 @@
+import os
+import asyncio
+import threading
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from dotenv import load_dotenv, find_dotenv
+from . import rate_limit
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+# Connection pool settings shared by every OpenAI client in the app
+MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "120"))
+
+_lock = threading.Lock()
+_http_client = None
+_client = None
+_client_key = None
+
+# httpx.AsyncClient connections are bound to the event loop that opened them,
+# so the async pool is kept per running loop
+_async_clients = weakref.WeakKeyDictionary()
+
+def _limits():
+    """
+    Build the connection pool limits for the shared HTTP clients.
+
+    Returns:
+        httpx.Limits: Pool limits
+    """
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+def _timeout():
+    """
+    Build the timeout configuration for the shared HTTP clients.
+
+    Returns:
+        httpx.Timeout: Connect and request timeouts
+    """
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+def get_client() -> OpenAI:
+    """
+    Get the shared synchronous OpenAI client.
+
+    The underlying connection pool is created once per process. The client
+    wrapper is rebuilt on top of the same pool whenever the API key changes.
+    Retries are left to rate_limit.call, and every response feeds the shared
+    rate limiter.
+
+    Returns:
+        OpenAI: Shared OpenAI client
+    """
+    global _http_client, _client, _client_key
+    api_key = os.environ.get("OPENAI_API_KEY")
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=_limits(), timeout=_timeout(),
+                event_hooks={"response": [rate_limit.observe_response]}
+            )
+        if _client is None or _client_key != api_key:
+            _client = OpenAI(api_key=api_key, http_client=_http_client, max_retries=0)
+            _client_key = api_key
+        return _client
+
+def get_async_client() -> AsyncOpenAI:
+    """
+    Get the shared asynchronous OpenAI client for the running event loop.
+
+    Must be called from inside a coroutine. All coroutines on the same loop
+    share one connection pool, so many requests can be in flight at once
+    without a thread per request.
+
+    Returns:
+        AsyncOpenAI: Shared async OpenAI client
+    """
+    loop = asyncio.get_running_loop()
+    api_key = os.environ.get("OPENAI_API_KEY")
+    with _lock:
+        entry = _async_clients.get(loop)
+        if entry is None:
+            http_client = httpx.AsyncClient(
+                limits=_limits(), timeout=_timeout(),
+                event_hooks={"response": [rate_limit.aobserve_response]}
+            )
+            entry = {"http_client": http_client, "client": None, "api_key": None}
+            _async_clients[loop] = entry
+        if entry["client"] is None or entry["api_key"] != api_key:
+            entry["client"] = AsyncOpenAI(api_key=api_key, http_client=entry["http_client"], max_retries=0)
+            entry["api_key"] = api_key
+        return entry["client"]
+
+async def close_async_client():
+    """
+    Close the async connection pool for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        entry = _async_clients.pop(loop, None)
+    if entry:
+        await entry["http_client"].aclose()
+
+def set_api_key(api_key: str):
+    """
+    Set the OpenAI API key used by the shared clients.
+
+    Args:
+        api_key: OpenAI API key
+    """
+    global _client
+    os.environ["OPENAI_API_KEY"] = api_key
+    with _lock:
+        _client = None
+        for entry in _async_clients.values():
+            entry["client"] = None
@@ -0,0 +1,171 @@
+"""
+Multi-turn context through server-side response chaining.
+
+Instead of resending the transcript every turn, each request points at the
+previous turn's response with previous_response_id and sends only the new
+user message. The server already holds the earlier turns.
+
+A chain is a small dict kept per conversation by the caller (in session
+state for the Streamlit app). It records the last response ID and how many
+tokens of conversation that response carried, counted from the turns' text
+so retrieved excerpts and file search results do not use up the budget.
+When the chain is missing, e.g. after resuming a stored conversation, when
+the server no longer knows the response, or when its context would exceed
+CONVERSATION_TOKEN_BUDGET, it is rebuilt from local history. The most recent turns are sent verbatim, older
+turns are cut down to their first sentence, and anything beyond the budget
+is dropped.
+
+Chaining stores responses on the server, so it is off by default. Enable it
+with CONVERSATION_CHAINING=true or per session from the sidebar.
+"""
+import os
+import re
+import openai
+from dotenv import load_dotenv, find_dotenv
+from . import rate_limit
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+CONVERSATION_CHAINING = os.environ.get("CONVERSATION_CHAINING", "false").lower() in ("1", "true", "yes")
+# Context tokens a chain may carry before it is rebuilt from local history
+CONVERSATION_TOKEN_BUDGET = int(os.environ.get("CONVERSATION_TOKEN_BUDGET", "8000"))
+# Share of the budget spent on older turns summarized to their first sentence
+CONVERSATION_SUMMARY_SHARE = float(os.environ.get("CONVERSATION_SUMMARY_SHARE", "0.25"))
+
+_SUMMARY_LENGTH = 200
+_sentence_end_re = re.compile(r"(?<=[.!?])\s")
+
+def new_chain() -> dict:
+    """
+    Create an empty chain.
+
+    Returns:
+        dict: response_id, context_tokens, history_tokens and rebuilds
+    """
+    return {"response_id": None, "context_tokens": 0, "history_tokens": 0, "rebuilds": 0}
+
+def _tokens(text: str) -> int:
+    return rate_limit.estimate_tokens(text, output_tokens=0)
+
+def _summary(content: str) -> str:
+    first = _sentence_end_re.split(content.strip(), maxsplit=1)[0]
+    return first if len(first) <= _SUMMARY_LENGTH else first[:_SUMMARY_LENGTH].rstrip() + "..."
+
+def build_history_input(history: list, user_input: str, budget: int = None) -> list:
+    """
+    Rebuild the conversation as Responses API input within a token budget.
+
+    Args:
+        history: Earlier messages with role and content, oldest first
+        user_input: New user message
+        budget: Token budget, defaults to CONVERSATION_TOKEN_BUDGET
+
+    Returns:
+        list: Input messages ending with the new user message
+    """
+    budget = budget or CONVERSATION_TOKEN_BUDGET
+    remaining = budget - _tokens(user_input)
+    summary_budget = int(budget * CONVERSATION_SUMMARY_SHARE)
+
+    # Keep the newest turns verbatim while they fit, leaving room for the summary
+    recent = []
+    index = len(history)
+    while index > 0:
+        message = history[index - 1]
+        cost = _tokens(message["content"])
+        if cost > remaining - summary_budget:
+            break
+        recent.append({"role": message["role"], "content": message["content"]})
+        remaining -= cost
+        index -= 1
+    recent.reverse()
+
+    # Summarize older turns, newest first, until the rest of the budget is spent
+    summaries = []
+    for message in reversed(history[:index]):
+        line = f"{message['role']}: {_summary(message['content'])}"
+        cost = _tokens(line)
+        if cost > remaining:
+            break
+        summaries.append(line)
+        remaining -= cost
+    summaries.reverse()
+
+    items = []
+    if summaries:
+        items.append({
+            "role": "developer",
+            "content": "Summary of earlier turns in this conversation:\n" + "\n".join(summaries)
+        })
+    return items + recent + [{"role": "user", "content": user_input}]
+
+def prepare_request(chain: dict, history: list, request: dict, user_input: str):
+    """
+    Point a request at the previous turn, or rebuild its context.
+
+    The request's input is left as is when chaining and replaced by the
+    rebuilt history otherwise. Its original input may differ from user_input,
+    e.g. when retrieved excerpts were added.
+
+    Args:
+        chain: Chain state for the conversation
+        history: Earlier messages of the conversation, oldest first
+        request: responses.create arguments, updated in place
+        user_input: The input as sent this turn
+    """
+    request["store"] = True
+    if chain["response_id"] and chain["context_tokens"] + _tokens(user_input) <= CONVERSATION_TOKEN_BUDGET:
+        request["previous_response_id"] = chain["response_id"]
+        chain["history_tokens"] = chain["context_tokens"]
+        return
+    request.pop("previous_response_id", None)
+    chain["history_tokens"] = 0
+    if history:
+        chain["rebuilds"] += 1
+        request["input"] = build_history_input(history, user_input)
+        chain["history_tokens"] = sum(_tokens(item["content"]) for item in request["input"][:-1])
+
+def record_response(chain: dict, response, user_input: str):
+    """
+    Advance a chain to a completed response.
+
+    Only the conversation is counted: the earlier turns the request carried,
+    the user's message and the answer. Usage tokens are not used, as they
+    also count retrieved excerpts and file search results.
+
+    Args:
+        chain: Chain state for the conversation
+        response: Completed Responses API response
+        user_input: The user's message, without retrieved excerpts
+    """
+    chain["response_id"] = response.id
+    chain["context_tokens"] = chain["history_tokens"] + _tokens(user_input) + _tokens(response.output_text)
+
+def is_stale_chain_error(error: Exception) -> bool:
+    """
+    Check whether a request failed because the previous response is unknown.
+
+    Only an error about previous_response_id itself qualifies; other bad
+    requests and missing resources are not retried.
+
+    Args:
+        error: Exception raised by responses.create
+
+    Returns:
+        bool: True if the chain should be rebuilt and the request retried
+    """
+    if not isinstance(error, (openai.NotFoundError, openai.BadRequestError)):
+        return False
+    return error.param == "previous_response_id" or error.code == "previous_response_not_found"
+
+def reset(chain: dict):
+    """
+    Drop a chain's server-side state so the next turn rebuilds it.
+
+    Args:
+        chain: Chain state for the conversation
+    """
+    chain["response_id"] = None
+    chain["context_tokens"] = 0
+    chain["history_tokens"] = 0
@@ -0,0 +1,252 @@
+"""
+Persistent, append-only conversation store.
+
+Conversations live in a SQLite database. Each message is one row, written
+by a single INSERT when it is added, so saving costs the same however long
+the conversation is. History is read a page at a time from the end, and
+conversations are listed from a summary table without touching their
+messages.
+
+Message metadata is stored as JSON. Sets, such as source_files, are
+written as sorted lists.
+"""
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+CONVERSATION_DB_PATH = os.path.expanduser(os.environ.get(
+    "CONVERSATION_DB_PATH",
+    os.path.join("~", ".cache", "rag_agentic", "conversations.sqlite3")
+))
+CONVERSATION_PAGE_SIZE = int(os.environ.get("CONVERSATION_PAGE_SIZE", "50"))
+
+_TITLE_LENGTH = 80
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _get_connection():
+    """
+    Get this thread's SQLite connection, creating the tables on first use.
+
+    Returns:
+        sqlite3.Connection: Connection to the conversation database
+    """
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CONVERSATION_DB_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CONVERSATION_DB_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id TEXT PRIMARY KEY, title TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL, "
+                "message_count INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "conversation_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+                "timestamp TEXT, metadata TEXT, PRIMARY KEY (conversation_id, seq))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at)")
+            _schema_ready = True
+    return conn
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+def dumps(value) -> str:
+    """
+    Serialize a value to JSON, writing sets as sorted lists.
+
+    Args:
+        value: Value to serialize
+
+    Returns:
+        str: JSON text
+    """
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+def _row_to_message(row) -> dict:
+    seq, role, content, timestamp, metadata = row
+    message = {"role": role, "content": content, "timestamp": timestamp, "seq": seq}
+    if metadata:
+        message["metadata"] = json.loads(metadata)
+    return message
+
+def new_conversation_id() -> str:
+    """
+    Generate a conversation ID.
+
+    IDs are random rather than time-based, so conversations started in the
+    same second never share a stored history.
+
+    Returns:
+        str: New conversation ID
+    """
+    return f"conversation_{os.urandom(8).hex()}"
+
+def append_message(conversation_id: str, message: dict) -> int:
+    """
+    Append a message to a conversation, creating the conversation if needed.
+
+    Args:
+        conversation_id: ID of the conversation
+        message: Message with role, content, timestamp and optional metadata
+
+    Returns:
+        int: Sequence number of the message, or -1 if it could not be stored
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    title = message["content"][:_TITLE_LENGTH] if message["role"] == "user" else None
+    metadata = dumps(message["metadata"]) if message.get("metadata") else None
+    try:
+        conn = _get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO conversations (id, title, created_at, updated_at, message_count) "
+                "VALUES (?, NULL, ?, ?, 0)",
+                (conversation_id, now, now)
+            )
+            seq = conn.execute("SELECT message_count FROM conversations WHERE id = ?", (conversation_id,)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO messages (conversation_id, seq, role, content, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, seq, message["role"], message["content"], message.get("timestamp"), metadata)
+            )
+            conn.execute(
+                "UPDATE conversations SET message_count = message_count + 1, updated_at = ?, "
+                "title = COALESCE(title, ?) WHERE id = ?",
+                (now, title, conversation_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+    except sqlite3.Error as e:
+        print(f"Error saving message: {e}")
+        return -1
+
+def load_messages(conversation_id: str, limit: int = None, before_seq: int = None) -> list:
+    """
+    Load one page of a conversation, ending at the newest message by default.
+
+    Args:
+        conversation_id: ID of the conversation
+        limit: Page size, defaults to CONVERSATION_PAGE_SIZE
+        before_seq: Only load messages older than this sequence number
+
+    Returns:
+        list: Messages in chronological order, each with its seq
+    """
+    limit = limit or CONVERSATION_PAGE_SIZE
+    try:
+        rows = _get_connection().execute(
+            "SELECT seq, role, content, timestamp, metadata FROM messages "
+            "WHERE conversation_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (conversation_id, before_seq if before_seq is not None else 2 ** 62, limit)
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Error loading messages: {e}")
+        return []
+    return [_row_to_message(row) for row in reversed(rows)]
+
+def iter_messages(conversation_id: str):
+    """
+    Stream every message of a conversation in order.
+
+    Args:
+        conversation_id: ID of the conversation
+
+    Yields:
+        dict: Messages in chronological order
+    """
+    rows = _get_connection().execute(
+        "SELECT seq, role, content, timestamp, metadata FROM messages WHERE conversation_id = ? ORDER BY seq",
+        (conversation_id,)
+    )
+    for row in rows:
+        yield _row_to_message(row)
+
+def get_conversation(conversation_id: str) -> dict:
+    """
+    Get a conversation's summary.
+
+    Args:
+        conversation_id: ID of the conversation
+
+    Returns:
+        dict: id, title, created_at, updated_at and message_count, or {} if unknown
+    """
+    try:
+        row = _get_connection().execute(
+            "SELECT id, title, created_at, updated_at, message_count FROM conversations WHERE id = ?",
+            (conversation_id,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Error reading conversation: {e}")
+        return {}
+    if row is None:
+        return {}
+    return dict(zip(("id", "title", "created_at", "updated_at", "message_count"), row))
+
+def list_conversations(limit: int = 20, offset: int = 0) -> list:
+    """
+    List conversations, most recently updated first.
+
+    Args:
+        limit: Number of conversations to return
+        offset: Number of conversations to skip
+
+    Returns:
+        list: Conversation summaries
+    """
+    try:
+        rows = _get_connection().execute(
+            "SELECT id, title, created_at, updated_at, message_count FROM conversations "
+            "ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Error listing conversations: {e}")
+        return []
+    return [dict(zip(("id", "title", "created_at", "updated_at", "message_count"), row)) for row in rows]
+
+def delete_conversation(conversation_id: str) -> bool:
+    """
+    Delete a conversation and its messages.
+
+    Args:
+        conversation_id: ID of the conversation
+
+    Returns:
+        bool: True on success
+    """
+    try:
+        conn = _get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+    except sqlite3.Error as e:
+        print(f"Error deleting conversation: {e}")
+        return False
@@ -1,6 +1,9 @@
 import streamlit as st
 from datetime import datetime
 import json
+from . import conversation_store
+from . import conversation_chain
+from . import chat_pipeline
 
 def init_session_state():
     """
@@ -10,7 +13,15 @@ def init_session_state():
         st.session_state.messages = []
     
     if "conversation_id" not in st.session_state:
-        st.session_state.conversation_id = f"conversation_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        st.session_state.conversation_id = conversation_store.new_conversation_id()
+    
+    # Response chain per conversation, for multi-turn context
+    if "response_chains" not in st.session_state:
+        st.session_state.response_chains = {}
+    
+    # Sequence number of the oldest message loaded, 0 once the whole history is loaded
+    if "history_start_seq" not in st.session_state:
+        st.session_state.history_start_seq = 0
     
     if "tools_config" not in st.session_state:
         st.session_state.tools_config = {
@@ -22,24 +33,14 @@ def init_session_state():
 
 def add_message(role, content, metadata=None):
     """
-    Add a message to the conversation history.
+    Add a message to the conversation history and append it to the store.
     
     Args:
         role: Role of the message (user or assistant)
         content: Content of the message
         metadata: Additional metadata for the message
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    message = {
-        "role": role,
-        "content": content,
-        "timestamp": timestamp
-    }
-    
-    if metadata:
-        message["metadata"] = metadata
-    
-    st.session_state.messages.append(message)
+    chat_pipeline.add_message(st.session_state.conversation_id, st.session_state.messages, role, content, metadata)
 
 def get_messages_history():
     """
@@ -50,48 +51,153 @@ def get_messages_history():
     """
     return st.session_state.messages
 
+def get_response_chain():
+    """
+    Get the response chain of the current conversation.
+    
+    Returns:
+        dict: Chain state, created empty on first use
+    """
+    chains = st.session_state.response_chains
+    if st.session_state.conversation_id not in chains:
+        chains[st.session_state.conversation_id] = conversation_chain.new_chain()
+    return chains[st.session_state.conversation_id]
+
 def clear_conversation():
     """
     Clear the conversation history.
     """
     st.session_state.messages = []
-    st.session_state.conversation_id = f"conversation_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    st.session_state.conversation_id = conversation_store.new_conversation_id()
+    st.session_state.history_start_seq = 0
+
+def resume_conversation(conversation_id, page_size=None):
+    """
+    Make a stored conversation current, loading only its latest page.
+    
+    Args:
+        conversation_id: ID of the conversation
+        page_size: Messages to load, defaults to CONVERSATION_PAGE_SIZE
+    
+    Returns:
+        bool: True if the conversation exists
+    """
+    if not conversation_store.get_conversation(conversation_id):
+        return False
+    messages = conversation_store.load_messages(conversation_id, limit=page_size)
+    st.session_state.conversation_id = conversation_id
+    st.session_state.messages = messages
+    st.session_state.history_start_seq = messages[0]["seq"] if messages else 0
+    return True
+
+def has_earlier_messages():
+    """
+    Check whether older messages of the current conversation are not loaded yet.
+    
+    Returns:
+        bool: True if there are earlier messages in the store
+    """
+    return st.session_state.get("history_start_seq", 0) > 0
+
+def load_earlier_messages(page_size=None):
+    """
+    Prepend the previous page of the current conversation's history.
+    
+    Args:
+        page_size: Messages to load, defaults to CONVERSATION_PAGE_SIZE
+    
+    Returns:
+        int: Number of messages loaded
+    """
+    if not has_earlier_messages():
+        return 0
+    messages = conversation_store.load_messages(
+        st.session_state.conversation_id,
+        limit=page_size,
+        before_seq=st.session_state.history_start_seq
+    )
+    st.session_state.messages = messages + st.session_state.messages
+    st.session_state.history_start_seq = messages[0]["seq"] if messages else 0
+    return len(messages)
 
 def save_conversation(filepath):
     """
-    Save the conversation history to a file.
+    Export the conversation history to a JSONL file.
+    
+    The first line holds the conversation's id and export time, each further
+    line one message. Messages are streamed from the store, so the export
+    does not need the whole history in memory.
     
     Args:
         filepath: Path to save the file to
     """
     conversation_data = {
         "id": st.session_state.conversation_id,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "messages": st.session_state.messages
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
     
     try:
-        with open(filepath, "w") as f:
-            json.dump(conversation_data, f, indent=2)
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(conversation_store.dumps(conversation_data) + "\n")
+            for message in conversation_store.iter_messages(st.session_state.conversation_id):
+                message.pop("seq", None)
+                f.write(conversation_store.dumps(message) + "\n")
         return True
     except Exception as e:
         print(f"Error saving conversation: {e}")
         return False
 
+def _read_conversation_file(filepath):
+    """
+    Read an exported conversation, either JSONL or the older single JSON document.
+    
+    Args:
+        filepath: Path to the file
+    
+    Returns:
+        tuple: (conversation_id, iterator of messages)
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        first_line = f.readline()
+    try:
+        header = json.loads(first_line)
+    except json.JSONDecodeError:
+        header = None
+    
+    if header is None or "messages" in header:
+        with open(filepath, "r", encoding="utf-8") as f:
+            conversation_data = json.load(f)
+        return conversation_data.get("id"), iter(conversation_data.get("messages", []))
+    
+    def messages():
+        with open(filepath, "r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    return header.get("id"), messages()
+
 def load_conversation(filepath):
     """
     Load a conversation history from a file.
     
+    The conversation is imported into the store, unless it is already there,
+    and resumed with its latest page of messages loaded.
+    
     Args:
         filepath: Path to load the file from
     """
     try:
-        with open(filepath, "r") as f:
-            conversation_data = json.load(f)
+        conversation_id, messages = _read_conversation_file(filepath)
+        conversation_id = conversation_id or conversation_store.new_conversation_id()
         
-        st.session_state.conversation_id = conversation_data.get("id", st.session_state.conversation_id)
-        st.session_state.messages = conversation_data.get("messages", [])
-        return True
+        if not conversation_store.get_conversation(conversation_id):
+            for message in messages:
+                message.pop("seq", None)
+                conversation_store.append_message(conversation_id, message)
+        
+        return resume_conversation(conversation_id)
     except Exception as e:
         print(f"Error loading conversation: {e}")
         return False
@@ -0,0 +1,195 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+
+# Default chunking for local retrieval, in words
+CHUNK_WORDS = int(os.environ.get("CHUNK_WORDS", "200"))
+CHUNK_OVERLAP_WORDS = int(os.environ.get("CHUNK_OVERLAP_WORDS", "40"))
+# Most pages extracted per process-pool task; ranges are sized to spread the
+# pages over the workers, so each worker opens a file as few times as possible
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "64"))
+# Fewer pages than this in total are extracted in-process, without a pool
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "16"))
+
+TEXT_EXTENSIONS = {".txt", ".md", ".markdown", ".csv", ".json", ".html", ".htm"}
+
+_word_re = re.compile(r"\S+")
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: int = None):
+    """
+    Extract text from a PDF one page at a time.
+
+    Only one page of text is held in memory at once.
+
+    Args:
+        file_path: Path to the PDF file
+        start: Zero-based index of the first page
+        stop: Zero-based index after the last page, defaults to the end
+
+    Yields:
+        tuple: (file_path, page_no, text) with 1-based page numbers, for pages with text
+    """
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for page_index in range(start, stop):
+            page_text = reader.pages[page_index].extract_text()
+            if page_text:
+                yield file_path, page_index + 1, page_text
+
+def extract_text_from_pdf(file_path):
+    """
+    Extract text from a PDF file.
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        str: Extracted text
+    """
+    page_texts = []
+    try:
+        for _, _, page_text in iter_pdf_pages(file_path):
+            page_texts.append(page_text)
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+    return "".join(page_texts)
+
+def _count_pdf_pages(file_path: str) -> int:
+    """
+    Count the pages in a PDF, returning 0 if it cannot be read.
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        int: Number of pages
+    """
+    try:
+        with open(file_path, "rb") as f:
+            return len(PyPDF2.PdfReader(f).pages)
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+        return 0
+
+def _extract_page_range(task: tuple) -> list:
+    """
+    Extract a range of pages in a worker process.
+
+    Args:
+        task: (file_path, start, stop) page range
+
+    Returns:
+        list: (file_path, page_no, text) records
+    """
+    file_path, start, stop = task
+    try:
+        return list(iter_pdf_pages(file_path, start, stop))
+    except Exception as e:
+        print(f"Error reading pages {start + 1}-{stop} of {file_path}: {e}")
+        return []
+
+def _page_ranges(file_paths: list, page_counts: list, max_workers: int, pages_per_task: int = None):
+    """
+    Split files into page ranges of about an equal share of pages per worker.
+
+    Args:
+        file_paths: Paths to PDF files
+        page_counts: Number of pages in each file
+        max_workers: Worker processes sharing the ranges
+        pages_per_task: Most pages per range, defaults to PDF_PAGES_PER_TASK
+
+    Yields:
+        tuple: (file_path, start, stop) zero-based page ranges
+    """
+    share = -(-sum(page_counts) // max_workers)
+    pages_per_task = max(1, min(pages_per_task or PDF_PAGES_PER_TASK, share))
+    for file_path, page_count in zip(file_paths, page_counts):
+        for start in range(0, page_count, pages_per_task):
+            yield file_path, start, min(start + pages_per_task, page_count)
+
+def iter_pdf_pages_parallel(file_paths: list, max_workers: int = None, pages_per_task: int = None):
+    """
+    Extract text from PDFs across a process pool.
+
+    The decision is made on the total page count, not the number of files,
+    so a single long PDF is split across every core while a few short ones
+    are read in-process. Each file is split into page ranges of about an
+    equal share of the pages per worker, capped at pages_per_task. Only a
+    bounded window of ranges is in flight at once, so memory stays flat
+    however large the documents are. Records are yielded in file and page
+    order.
+
+    Args:
+        file_paths: Paths to PDF files
+        max_workers: Worker processes, defaults to the CPU count
+        pages_per_task: Most pages extracted per task, defaults to PDF_PAGES_PER_TASK
+
+    Yields:
+        tuple: (file_path, page_no, text) with 1-based page numbers
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    page_counts = [_count_pdf_pages(file_path) for file_path in file_paths]
+    total_pages = sum(page_counts)
+
+    if max_workers < 2 or total_pages < PDF_PARALLEL_MIN_PAGES:
+        for file_path, page_count in zip(file_paths, page_counts):
+            if page_count:
+                yield from _extract_page_range((file_path, 0, page_count))
+        return
+
+    window = max_workers * 2
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for task in _page_ranges(file_paths, page_counts, max_workers, pages_per_task):
+            pending.append(executor.submit(_extract_page_range, task))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def read_document_text(file_path: str) -> str:
+    """
+    Read the text of a document for local indexing.
+
+    Args:
+        file_path: Path to a PDF or plain-text document
+
+    Returns:
+        str: Document text
+
+    Raises:
+        ValueError: If the file type is not supported
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".pdf":
+        return extract_text_from_pdf(file_path)
+    if extension in TEXT_EXTENSIONS:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    raise ValueError(f"Unsupported file type for local indexing: {extension}")
+
+def chunk_text(text: str, chunk_words: int = None, overlap_words: int = None) -> list:
+    """
+    Split text into overlapping word windows.
+
+    Args:
+        text: Text to split
+        chunk_words: Words per chunk
+        overlap_words: Words shared by consecutive chunks
+
+    Returns:
+        list: Chunk strings
+    """
+    chunk_words = chunk_words or CHUNK_WORDS
+    overlap_words = CHUNK_OVERLAP_WORDS if overlap_words is None else overlap_words
+    step = max(1, chunk_words - overlap_words)
+    words = _word_re.findall(text)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
@@ -0,0 +1,134 @@
+import os
+import re
+import hashlib
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+from .client_utils import get_client
+from . import rate_limit
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
+# Embedder used by the local vector store backend
+LOCAL_EMBEDDER = os.environ.get("LOCAL_EMBEDDER", "openai")
+
+_token_re = re.compile(r"\w+")
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale each row to unit length so dot products are cosine similarities.
+
+    Args:
+        vectors: 2-D array of vectors
+
+    Returns:
+        np.ndarray: Row-normalized float32 array
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def embed_texts(texts: list, model: str = None) -> np.ndarray:
+    """
+    Embed texts with the OpenAI embeddings API.
+
+    Args:
+        texts: Texts to embed
+        model: Embedding model, defaults to EMBEDDING_MODEL
+
+    Returns:
+        np.ndarray: Unit-length float32 embeddings, one row per text
+    """
+    response = rate_limit.call(
+        get_client().embeddings.create,
+        estimated_tokens=rate_limit.estimate_tokens(*texts, output_tokens=0),
+        model=model or EMBEDDING_MODEL,
+        input=texts
+    )
+    vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return normalize_rows(vectors)
+
+class OpenAIEmbedder:
+    """
+    Embedder backed by the OpenAI embeddings API.
+    """
+
+    def __init__(self, model: str = None):
+        """
+        Args:
+            model: Embedding model, defaults to EMBEDDING_MODEL
+        """
+        self.model = model or EMBEDDING_MODEL
+        self.name = f"openai:{self.model}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: Unit-length float32 embeddings, one row per text
+        """
+        return embed_texts(texts, self.model)
+
+class HashingEmbedder:
+    """
+    Deterministic, offline embedder using signed feature hashing.
+
+    Word unigrams and bigrams are hashed into a fixed number of dimensions.
+    It needs no network or model weights, so tests and offline runs get
+    stable, reproducible vectors.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        """
+        Args:
+            dimensions: Size of the embedding vectors
+        """
+        self.dimensions = dimensions
+        self.name = f"hashing:{dimensions}"
+
+    def _features(self, text: str) -> list:
+        tokens = _token_re.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: Unit-length float32 embeddings, one row per text
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dimensions] += sign
+        return normalize_rows(vectors)
+
+def get_embedder(name: str = None):
+    """
+    Get an embedder by name.
+
+    Args:
+        name: "openai", "openai:<model>", "hashing" or "hashing:<dimensions>";
+            defaults to LOCAL_EMBEDDER
+
+    Returns:
+        Embedder with an embed(texts) method and a name attribute
+    """
+    name = name or LOCAL_EMBEDDER
+    kind, _, option = name.partition(":")
+    if kind == "hashing":
+        return HashingEmbedder(int(option) if option else 512)
+    if kind == "openai":
+        return OpenAIEmbedder(option or None)
+    raise ValueError(f"Unknown embedder: {name}")
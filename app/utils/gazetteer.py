@@ -0,0 +1,380 @@
+"""
+Offline gazetteer for geocoding common places without a network call.
+
+Built from a GeoNames cities dump (cities500/1000/5000/15000, as .txt, .zip
+or .gz) set by GAZETTEER_SOURCE. The default is the bundled subset in
+assets/gazetteer: every city of 100,000 or more people, with its Latin-script
+alternate names. The first use builds an index in GAZETTEER_DIR, and later
+runs memory-map it, so start-up reads only a small JSON header. The index
+is rebuilt when the source file changes.
+
+The index is a handful of flat files:
+- places.bin: latitude, longitude, population, country and display name
+  offsets per place, as fixed-size records
+- names.bin: display names ("Paris, France"), UTF-8, back to back
+- keys.bin and key_index.bin: every normalized name and alternate name,
+  sorted, each pointing at its place
+
+The sorted key array works as a compact prefix trie: all names starting
+with a prefix form one contiguous range, found by binary search. Within a
+name, primary names come before alternate names, and more populous places
+come first, so the first hit is the most likely meaning.
+"""
+import os
+import io
+import json
+import gzip
+import mmap
+import zipfile
+import threading
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+from .geocode_cache import normalize_query
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+_ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "gazetteer")
+
+GAZETTEER_ENABLED = os.environ.get("GAZETTEER_ENABLED", "true").lower() in ("1", "true", "yes")
+GAZETTEER_SOURCE = os.path.expanduser(os.environ.get("GAZETTEER_SOURCE", os.path.join(_ASSETS_DIR, "cities100000.txt.gz")))
+GAZETTEER_COUNTRIES = os.path.expanduser(os.environ.get("GAZETTEER_COUNTRIES", os.path.join(_ASSETS_DIR, "countryInfo.txt")))
+GAZETTEER_DIR = os.path.expanduser(os.environ.get(
+    "GAZETTEER_DIR",
+    os.path.join("~", ".cache", "rag_agentic", "gazetteer")
+))
+# Places smaller than this are left out of the index
+GAZETTEER_MIN_POPULATION = int(os.environ.get("GAZETTEER_MIN_POPULATION", "0"))
+
+_FORMAT_VERSION = 1
+
+PLACE_DTYPE = np.dtype([
+    ("lat", "<f4"), ("lon", "<f4"), ("population", "<u4"),
+    ("country", "S2"), ("name_start", "<u4"), ("name_end", "<u4")
+])
+KEY_DTYPE = np.dtype([("start", "<u4"), ("end", "<u4"), ("place", "<u4"), ("alternate", "u1")])
+
+_index = None
+_index_lock = threading.Lock()
+
+def _read_lines(path: str):
+    """
+    Read a text file that may be gzipped or the single file of a GeoNames zip.
+
+    Yields:
+        str: Lines without their newline
+    """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next(name for name in archive.namelist() if name.endswith(".txt"))
+            with archive.open(member) as raw:
+                for line in io.TextIOWrapper(raw, encoding="utf-8"):
+                    yield line.rstrip("\n")
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+def _read_countries(path: str) -> dict:
+    """
+    Read GeoNames countryInfo.txt.
+
+    Returns:
+        dict: Country name per ISO code
+    """
+    countries = {}
+    if not os.path.exists(path):
+        return countries
+    for line in _read_lines(path):
+        if line.startswith("#") or not line.strip():
+            continue
+        fields = line.split("\t")
+        if len(fields) > 4:
+            countries[fields[0]] = fields[4]
+    return countries
+
+def _source_signature(source: str) -> dict:
+    stat = os.stat(source)
+    return {
+        "version": _FORMAT_VERSION, "source": os.path.abspath(source), "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns, "min_population": GAZETTEER_MIN_POPULATION
+    }
+
+def build_index(source: str = None, directory: str = None) -> dict:
+    """
+    Build the index files from a GeoNames cities dump.
+
+    The files are written to a temporary directory and swapped in, so readers
+    never see a half-built index.
+
+    Args:
+        source: GeoNames dump, defaults to GAZETTEER_SOURCE
+        directory: Index directory, defaults to GAZETTEER_DIR
+
+    Returns:
+        dict: The index header, with place and key counts
+    """
+    source = source or GAZETTEER_SOURCE
+    directory = directory or GAZETTEER_DIR
+    countries = _read_countries(GAZETTEER_COUNTRIES)
+
+    places, names, keys = [], bytearray(), []
+    for line in _read_lines(source):
+        fields = line.split("\t")
+        if len(fields) < 15 or line.startswith("#"):
+            continue
+        population = int(fields[14] or 0)
+        if population < GAZETTEER_MIN_POPULATION:
+            continue
+        name, country = fields[1], fields[8]
+        display_name = f"{name}, {countries[country]}" if country in countries else name
+        encoded = display_name.encode("utf-8")
+        index = len(places)
+        places.append((float(fields[4]), float(fields[5]), population, country.encode("ascii", "ignore")[:2],
+                       len(names), len(names) + len(encoded)))
+        names += encoded
+
+        seen = set()
+        for is_alternate, candidate in [(0, name), (0, fields[2])] + [(1, alt) for alt in fields[3].split(",")]:
+            key = normalize_query(candidate) if candidate else ""
+            if key and key not in seen:
+                seen.add(key)
+                keys.append((key.encode("utf-8"), is_alternate, -population, index))
+
+    # Primary names first, then the most populous place
+    keys.sort()
+    key_blob = bytearray()
+    key_records = np.empty(len(keys), dtype=KEY_DTYPE)
+    for i, (key, is_alternate, _, index) in enumerate(keys):
+        key_records[i] = (len(key_blob), len(key_blob) + len(key), index, is_alternate)
+        key_blob += key
+
+    header = dict(_source_signature(source), places=len(places), keys=len(keys))
+    os.makedirs(os.path.dirname(directory) or ".", exist_ok=True)
+    temp_dir = f"{directory}.tmp{os.getpid()}_{threading.get_ident()}"
+    os.makedirs(temp_dir, exist_ok=True)
+    np.array(places, dtype=PLACE_DTYPE).tofile(os.path.join(temp_dir, "places.bin"))
+    key_records.tofile(os.path.join(temp_dir, "key_index.bin"))
+    with open(os.path.join(temp_dir, "names.bin"), "wb") as f:
+        f.write(names)
+    with open(os.path.join(temp_dir, "keys.bin"), "wb") as f:
+        f.write(key_blob)
+    with open(os.path.join(temp_dir, "gazetteer.json"), "w", encoding="utf-8") as f:
+        json.dump(header, f)
+
+    # Swap the new index in; an old one is moved aside first, as directories cannot be replaced
+    old_dir = f"{directory}.old{os.getpid()}_{threading.get_ident()}"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(temp_dir, directory)
+    if os.path.exists(old_dir):
+        for file_name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, file_name))
+        os.rmdir(old_dir)
+    return header
+
+def _open_index(directory: str) -> dict:
+    """
+    Memory-map an index.
+
+    The record files are mapped as numpy arrays and the text files as plain
+    mmaps, whose slices are bytes, which keeps the binary search cheap.
+
+    Returns:
+        dict: The header and the mapped arrays
+    """
+    with open(os.path.join(directory, "gazetteer.json"), encoding="utf-8") as f:
+        header = json.load(f)
+
+    def mapped(file_name, dtype):
+        path = os.path.join(directory, file_name)
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.asarray(np.memmap(path, dtype=dtype, mode="r"))
+
+    def mapped_text(file_name):
+        with open(os.path.join(directory, file_name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    key_index = mapped("key_index.bin", KEY_DTYPE)
+    return {
+        "header": header,
+        "places": mapped("places.bin", PLACE_DTYPE),
+        "names": mapped_text("names.bin"),
+        "keys": mapped_text("keys.bin"),
+        "key_index": key_index,
+        # Field views over the mapped records, read per step of the binary search
+        "key_starts": key_index["start"],
+        "key_ends": key_index["end"],
+        "countries": _country_codes_by_name(),
+    }
+
+def _country_codes_by_name() -> dict:
+    codes = {}
+    for code, name in _read_countries(GAZETTEER_COUNTRIES).items():
+        codes[normalize_query(name)] = code
+        codes[code.casefold()] = code
+    return codes
+
+def load():
+    """
+    Get the memory-mapped index, building it on first use or when its source changed.
+
+    Returns:
+        dict or None: The index, or None if the gazetteer is disabled or unavailable
+    """
+    global _index
+    if _index is not None or not GAZETTEER_ENABLED:
+        return _index or None
+    with _index_lock:
+        if _index is not None:
+            return _index or None
+        try:
+            header_path = os.path.join(GAZETTEER_DIR, "gazetteer.json")
+            header = None
+            if os.path.exists(header_path):
+                with open(header_path, encoding="utf-8") as f:
+                    header = json.load(f)
+            signature = _source_signature(GAZETTEER_SOURCE)
+            if header is None or any(header.get(key) != value for key, value in signature.items()):
+                print(f"Building gazetteer index from {GAZETTEER_SOURCE}")
+                build_index()
+            _index = _open_index(GAZETTEER_DIR)
+        except Exception as e:
+            print(f"Error loading gazetteer: {e}")
+            # Remember the failure so lookups fall back to the network without retrying
+            _index = False
+    return _index or None
+
+def _key_at(index: dict, position: int) -> bytes:
+    return index["keys"][int(index["key_starts"][position]):int(index["key_ends"][position])]
+
+def _key_range(index: dict, key: bytes, prefix: bool = False) -> tuple:
+    """
+    Find the keys equal to, or starting with, key by binary search.
+
+    Returns:
+        tuple: (start, end) positions in the sorted key index
+    """
+    def bisect(target: bytes, right: bool) -> int:
+        lo, hi = 0, len(index["key_index"])
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = _key_at(index, mid)
+            if current < target or (right and current == target):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    start = bisect(key, right=False)
+    if prefix:
+        # 0xff never occurs in UTF-8, so it sorts after every continuation
+        return start, bisect(key + b"\xff", right=False)
+    return start, bisect(key, right=True)
+
+def _place(index: dict, position: int) -> tuple:
+    record = index["places"][position]
+    display_name = index["names"][int(record["name_start"]):int(record["name_end"])].decode("utf-8")
+    return float(record["lat"]), float(record["lon"]), display_name
+
+def _candidates(index: dict, location: str):
+    """
+    Places matching a location, best first.
+
+    A trailing ", <country>" or ", <ISO code>" narrows the match to that
+    country. Other qualifiers, such as states, are not indexed, so nothing
+    matches and the caller falls back to the network.
+
+    Returns:
+        numpy.ndarray: Place positions
+    """
+    name, *qualifiers = normalize_query(location).split(", ")
+    if not name:
+        return np.empty(0, dtype=np.uint32)
+    start, end = _key_range(index, name.encode("utf-8"))
+    positions = index["key_index"]["place"][start:end]
+    if qualifiers and len(positions):
+        codes = [index["countries"].get(qualifier) for qualifier in qualifiers]
+        if not all(codes):
+            return np.empty(0, dtype=np.uint32)
+        countries = index["places"]["country"][positions]
+        positions = positions[np.isin(countries, [code.encode("ascii") for code in codes])]
+    return positions
+
+def lookup(location: str):
+    """
+    Geocode a location from the gazetteer.
+
+    Args:
+        location: Location name, optionally followed by ", <country>"
+
+    Returns:
+        tuple or None: (latitude, longitude, display_name), or None if the place is not indexed
+    """
+    index = load()
+    if index is None:
+        return None
+    positions = _candidates(index, location)
+    return _place(index, int(positions[0])) if len(positions) else None
+
+def contains(location: str) -> bool:
+    """
+    Check whether a location is a known place.
+
+    Args:
+        location: Location name
+
+    Returns:
+        bool: True if the gazetteer can geocode it
+    """
+    index = load()
+    return index is not None and len(_candidates(index, location)) > 0
+
+def complete(prefix: str, limit: int = 10) -> list:
+    """
+    Suggest places whose name starts with a prefix.
+
+    Places whose own name matches come first, then those matched by an
+    alternate name, each by population.
+
+    Args:
+        prefix: Start of a place name
+        limit: Number of suggestions
+
+    Returns:
+        list: (display_name, latitude, longitude, population) tuples
+    """
+    index = load()
+    key = normalize_query(prefix)
+    if index is None or not key:
+        return []
+    start, end = _key_range(index, key.encode("utf-8"), prefix=True)
+    matches = index["key_index"][start:end]
+    if not len(matches):
+        return []
+    # Rank each place by its best match: primary name before alternate, then population
+    order = np.lexsort((-index["places"]["population"][matches["place"]].astype(np.int64), matches["alternate"]))
+    positions, first = np.unique(matches["place"][order], return_index=True)
+    best = positions[np.argsort(first)][:limit]
+    suggestions = []
+    for position in best:
+        lat, lon, display_name = _place(index, int(position))
+        suggestions.append((display_name, lat, lon, int(index["places"]["population"][position])))
+    return suggestions
+
+def stats() -> dict:
+    """
+    Describe the loaded index.
+
+    Returns:
+        dict: Source, place and key counts, or {} if the gazetteer is unavailable
+    """
+    index = load()
+    if index is None:
+        return {}
+    header = index["header"]
+    return {"source": header["source"], "places": header["places"], "keys": header["keys"]}
@@ -0,0 +1,158 @@
+"""
+Two-tier cache for geocoding results.
+
+Lookups are normalized, then served from an in-memory LRU and, behind it,
+an on-disk SQLite table that survives restarts. Places Nominatim could not
+find are cached for a short time as negative results. Network lookups go
+through a process-wide throttle that keeps to Nominatim's usage policy of
+at most one request per second.
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+from dotenv import load_dotenv, find_dotenv
+from .cache_utils import LRUCache, MISSING
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+GEOCODE_CACHE_PATH = os.path.expanduser(os.environ.get(
+    "GEOCODE_CACHE_PATH",
+    os.path.join("~", ".cache", "rag_agentic", "geocode.sqlite3")
+))
+GEOCODE_CACHE_SIZE = int(os.environ.get("GEOCODE_CACHE_SIZE", "2048"))
+GEOCODE_TTL = float(os.environ.get("GEOCODE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.environ.get("GEOCODE_NEGATIVE_TTL", "600"))
+NOMINATIM_MIN_INTERVAL = float(os.environ.get("NOMINATIM_MIN_INTERVAL", "1.0"))
+
+_memory_cache = LRUCache(max_size=GEOCODE_CACHE_SIZE)
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+_throttle_lock = threading.Lock()
+_last_request_at = 0.0
+
+_whitespace_re = re.compile(r"\s+")
+_comma_re = re.compile(r"\s*,\s*")
+_edge_punctuation_re = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+
+def normalize_query(location: str) -> str:
+    """
+    Normalize a location query so equivalent spellings share a cache entry.
+
+    Args:
+        location: Location name as typed
+
+    Returns:
+        str: Normalized query
+    """
+    text = unicodedata.normalize("NFKC", location).casefold()
+    text = _whitespace_re.sub(" ", text)
+    text = _comma_re.sub(", ", text)
+    return _edge_punctuation_re.sub("", text)
+
+def _get_connection():
+    """
+    Get this thread's SQLite connection, creating the table on first use.
+
+    Returns:
+        sqlite3.Connection: Connection to the cache database
+    """
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(GEOCODE_CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(GEOCODE_CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                "query TEXT PRIMARY KEY, lat REAL, lon REAL, display_name TEXT, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            _schema_ready = True
+    return conn
+
+def get_cached(location: str):
+    """
+    Look up a location in the memory tier, then the disk tier.
+
+    Args:
+        location: Location name
+
+    Returns:
+        tuple or None or MISSING: Cached (lat, lon, display_name), None for a
+        cached negative result, or MISSING if the location is not cached
+    """
+    key = normalize_query(location)
+    value = _memory_cache.get(key)
+    if value is not MISSING:
+        return value
+
+    try:
+        row = _get_connection().execute(
+            "SELECT lat, lon, display_name, expires_at FROM geocode WHERE query = ?", (key,)
+        ).fetchone()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error reading geocode cache: {e}")
+        return MISSING
+
+    if row is None:
+        return MISSING
+    lat, lon, display_name, expires_at = row
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        return MISSING
+
+    value = (lat, lon, display_name) if lat is not None else None
+    _memory_cache.set(key, value, ttl=remaining)
+    return value
+
+def set_cached(location: str, value):
+    """
+    Store a geocoding result in both tiers.
+
+    Args:
+        location: Location name
+        value: (lat, lon, display_name), or None to record a negative result
+    """
+    key = normalize_query(location)
+    ttl = GEOCODE_TTL if value is not None else GEOCODE_NEGATIVE_TTL
+    _memory_cache.set(key, value, ttl=ttl)
+
+    lat, lon, display_name = value if value is not None else (None, None, None)
+    try:
+        conn = _get_connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO geocode (query, lat, lon, display_name, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (key, lat, lon, display_name, time.time() + ttl)
+        )
+        conn.commit()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error writing geocode cache: {e}")
+
+def throttle():
+    """
+    Block until a Nominatim request is allowed by the process-wide rate limit.
+    """
+    global _last_request_at
+    with _throttle_lock:
+        wait = _last_request_at + NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request_at = time.monotonic()
+
+def cache_stats() -> dict:
+    """
+    Get memory tier counters.
+
+    Returns:
+        dict: Size, hits, misses and evictions
+    """
+    return _memory_cache.stats()
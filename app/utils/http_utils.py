@@ -0,0 +1,168 @@
+"""
+Shared HTTP transport for outbound tool calls.
+
+All tool HTTP traffic goes through one pooled requests.Session, so repeat
+calls to the same host reuse keep-alive connections instead of paying a new
+TCP and TLS handshake. Every request has connect and read timeouts, which
+can be set per host. Connection errors, timeouts and retryable status codes
+get a bounded number of retries with jittered exponential backoff. Each
+request's latency, final status and retries are recorded in metrics and
+on a tracing span.
+"""
+import os
+import time
+import random
+import threading
+import urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv, find_dotenv
+from . import metrics
+from . import tracing
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "20"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "8"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+
+USER_AGENT = "RAGAgentic/1.0"
+
+# Status codes worth retrying: throttling and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# (connect, read) timeouts in seconds per host; hosts not listed use the
+# defaults too, and set_host_timeout overrides one
+HOST_TIMEOUTS = {
+    "nominatim.openstreetmap.org": (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    "api.open-meteo.com": (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Get the shared, connection-pooled session.
+
+    Returns:
+        requests.Session: Shared session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are handled in http_get so they can add jitter and honor Retry-After
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+                max_retries=0
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT})
+            _session = session
+        return _session
+
+def set_host_timeout(host: str, connect: float, read: float):
+    """
+    Set the connect and read timeouts for a host.
+
+    Args:
+        host: Host name, e.g. "api.open-meteo.com"
+        connect: Connect timeout in seconds
+        read: Read timeout in seconds
+    """
+    HOST_TIMEOUTS[host] = (connect, read)
+
+def get_timeout(url: str) -> tuple:
+    """
+    Get the (connect, read) timeout for a URL's host.
+
+    Args:
+        url: Request URL
+
+    Returns:
+        tuple: Connect and read timeouts in seconds
+    """
+    host = urllib.parse.urlsplit(url).hostname or ""
+    return HOST_TIMEOUTS.get(host, (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+def backoff_delay(attempt: int, retry_after=None) -> float:
+    """
+    Get the delay before the next attempt.
+
+    Uses full jitter over an exponential ceiling. A numeric Retry-After header
+    is honored, capped at the maximum backoff.
+
+    Args:
+        attempt: Zero-based number of the attempt that just failed
+        retry_after: Value of the Retry-After header, if any
+
+    Returns:
+        float: Delay in seconds
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            pass
+    ceiling = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def http_get(url: str, params=None, headers=None, timeout=None, max_retries=None, before_attempt=None):
+    """
+    Send a GET request through the shared session with timeouts and retries.
+
+    Args:
+        url: Request URL
+        params: Query parameters
+        headers: Extra request headers
+        timeout: (connect, read) timeout override; defaults to the host's timeout
+        max_retries: Retry limit override; defaults to HTTP_MAX_RETRIES
+        before_attempt: Optional callable run before every attempt, e.g. a rate limiter
+
+    Returns:
+        requests.Response: The last response received
+
+    Raises:
+        requests.RequestException: If every attempt failed without a response
+    """
+    with tracing.span("http GET") as http_span:
+        timeout = timeout or get_timeout(url)
+        max_retries = max(0, HTTP_MAX_RETRIES if max_retries is None else max_retries)
+        session = get_session()
+        host = urllib.parse.urlsplit(url).hostname or ""
+        started = time.monotonic()
+        http_span.set_attribute("host", host)
+
+        for attempt in range(max_retries + 1):
+            if before_attempt is not None:
+                before_attempt()
+            try:
+                response = session.get(url, params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= max_retries:
+                    metrics.record_http(host, time.monotonic() - started, type(e).__name__, attempt)
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"HTTP error for {url} (attempt {attempt+1}/{max_retries+1}): {e}. Retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < max_retries:
+                delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+                print(f"HTTP {response.status_code} for {url} (attempt {attempt+1}/{max_retries+1}). Retrying in {delay:.2f}s")
+                response.close()
+                time.sleep(delay)
+                continue
+
+            metrics.record_http(host, time.monotonic() - started, response.status_code, attempt)
+            http_span.set_attribute("status", response.status_code)
+            http_span.set_attribute("retries", attempt)
+            return response
@@ -0,0 +1,256 @@
+"""
+Local intent and slot router for chat turns.
+
+Classifies a turn as weather, file search, web search or chat, and pulls
+out the weather slots (locations and unit) with patterns compiled once at
+import. Each route carries a confidence. When a weather route is confident,
+the caller answers it directly from the weather APIs. Otherwise it asks the
+model with a forced get_weather tool choice.
+
+A location is only trusted, and the route confident, when it is a known
+place: one in the offline gazetteer or one the geocode cache has already
+resolved. Other short runs of name-like words are likely places too, but
+are left for the model to confirm. Trailing time phrases ("tomorrow",
+"this weekend") and filler words are stripped first.
+
+"Climate" and "temperature of" often appear in questions that are not
+about weather ("papers on climate change", "the temperature of the sun"),
+so they only make a weather route when they name a known place.
+"""
+import os
+import re
+from dotenv import load_dotenv, find_dotenv
+from .cache_utils import MISSING
+from . import geocode_cache
+from . import gazetteer
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+# Routes at or above this confidence are acted on without asking the model
+ROUTER_CONFIDENCE_THRESHOLD = float(os.environ.get("ROUTER_CONFIDENCE_THRESHOLD", "0.7"))
+
+WEATHER = "weather"
+FILE_SEARCH = "file_search"
+WEB_SEARCH = "web_search"
+CHAT = "chat"
+
+_MAX_LOCATION_WORDS = 5
+
+_weather_re = re.compile(r"\b(?:weather|temperature|forecast|climate)\b", re.IGNORECASE)
+# Weather keywords that are weather questions on their own
+_strong_weather_re = re.compile(r"\b(?:weather|forecast|temperature(?!\s+of\b))\b", re.IGNORECASE)
+_fahrenheit_re = re.compile(r"\b(?:fahrenheit|imperial)\b|°\s*f\b", re.IGNORECASE)
+
+# Place text: stops at sentence punctuation, but keeps the periods of short
+# abbreviations such as "St." and "D.C."
+_PLACE = r"(?:[^?!.;]|(?<=\b\w)\.|(?<=\b\w{2})\.|(?<=\b\w{3})\.)"
+
+# Location slot patterns, tried in order; each captures the place
+_location_patterns = [
+    # "weather in Paris", "what's the forecast for New York like"
+    re.compile(
+        r"\b(?:weather|temperature|forecast|climate)\b(?:\s+(?:like|going\s+to\s+be|be))?"
+        rf"\s+(?:in|for|at|of|around|near)\s+(?P<place>{_PLACE}+)",
+        re.IGNORECASE
+    ),
+    # "in Paris, what's the weather"
+    re.compile(r"^\s*(?:in|at|for)\s+(?P<place>[^?!.;,]+),?\s+.*\b(?:weather|temperature|forecast|climate)\b", re.IGNORECASE),
+    # "Paris weather", "paris and rome forecast"
+    re.compile(
+        r"^\s*(?:(?:what(?:'s|\s+is)|how(?:'s|\s+is))\s+)?(?:the\s+)?(?:current\s+|today'?s\s+)?"
+        rf"(?P<place>{_PLACE}+?)\s+(?:weather|temperature|forecast|climate)\b",
+        re.IGNORECASE
+    ),
+]
+_time_suffix_re = re.compile(
+    r"\s+(?:(?:right\s+)?now|today|tonight|tomorrow|currently|at\s+the\s+moment|this\s+(?:morning|afternoon|evening|week(?:end)?)|"
+    r"next\s+(?:week|weekend|few\s+days)|in\s+(?:celsius|fahrenheit)|like|please)\s*$",
+    re.IGNORECASE
+)
+_leading_filler_re = re.compile(r"^(?:the\s+city\s+of|the)\s+", re.IGNORECASE)
+# Splits places apart, capturing the separator
+_location_split_re = re.compile(r"\s*(,|;|&|\band\b|\bvs\.?|\bversus\b|\bor\b)\s*", re.IGNORECASE)
+_word_split_re = re.compile(r"[\s,]+")
+_compare_re = re.compile(r"^\s*compare\s+(?:the\s+)?", re.IGNORECASE)
+_name_word_re = re.compile(r"^[^\W\d_][\w'\-.]*$", re.UNICODE)
+
+_STOPWORDS = frozenset({
+    "what", "what's", "whats", "how", "how's", "is", "the", "a", "an", "it", "there", "here", "outside",
+    "today", "tomorrow", "now", "like", "current", "currently", "my", "me", "our", "your", "this", "that",
+    "will", "be", "going", "to", "please", "tell", "show", "give", "get", "check", "weather", "forecast",
+    "temperature", "climate", "rain", "raining", "sunny", "cold", "hot", "warm", "do", "does", "should", "i", "we",
+})
+
+_web_re = re.compile(
+    r"\b(?:latest|news|today|current(?:ly)?|recent(?:ly)?|this\s+(?:week|month|year)|price|stock|score|who\s+won|search\s+the\s+web|online)\b",
+    re.IGNORECASE
+)
+_file_re = re.compile(
+    r"\b(?:document|documents|file|files|pdf|paper|papers|upload(?:ed)?|according\s+to|cite|citation|source|sources|study|report)\b",
+    re.IGNORECASE
+)
+
+def is_weather_query(text: str) -> bool:
+    """
+    Check whether text mentions a weather keyword.
+
+    Args:
+        text: User input text
+
+    Returns:
+        bool: True for weather-like text
+    """
+    return _weather_re.search(text) is not None
+
+def clean_location(candidate: str) -> str:
+    """
+    Strip time phrases, filler and punctuation around a location candidate.
+
+    Args:
+        candidate: Text captured as a location
+
+    Returns:
+        str: Cleaned location, possibly empty
+    """
+    location = candidate.strip(" \t\"'`?!.,;:")
+    previous = None
+    while previous != location:
+        previous = location
+        location = _time_suffix_re.sub("", location).strip(" ,")
+    return _leading_filler_re.sub("", location).strip(" ,")
+
+def _is_known_place(location: str) -> bool:
+    return gazetteer.contains(location) or geocode_cache.get_cached(location) not in (MISSING, None)
+
+def _same_place(first: str, second: str) -> bool:
+    place = gazetteer.lookup(first)
+    return place is not None and place == gazetteer.lookup(second)
+
+def _looks_like_place(location: str) -> bool:
+    if _is_known_place(location):
+        return True
+    words = [word for word in _word_split_re.split(location) if word]
+    if not words or len(words) > _MAX_LOCATION_WORDS:
+        return False
+    # "I hate this", "my place": ordinary words are not part of place names
+    if any(word.casefold() in _STOPWORDS for word in words):
+        return False
+    return all(_name_word_re.match(word) for word in words)
+
+def _split_locations(location: str) -> list:
+    """
+    Split "Paris, Berlin and Rome" into places, unless the whole phrase is a known place.
+
+    A part after a comma stays with the place before it when that place is
+    known and the part is not, or names the same place, as in "Mobile,
+    Alabama" or "Washington, D.C.".
+    """
+    location = _compare_re.sub("", location)
+    if _is_known_place(location):
+        return [location]
+    pieces = _location_split_re.split(location)
+    locations = []
+    for i in range(0, len(pieces), 2):
+        part = clean_location(pieces[i])
+        if not part:
+            continue
+        head = locations[-1].split(",")[0] if locations else ""
+        if pieces[i - 1:i] == [","] and _is_known_place(head) and (not _is_known_place(part) or _same_place(head, part)):
+            locations[-1] = f"{locations[-1]}, {part}"
+        else:
+            locations.append(part)
+    return locations
+
+def extract_locations(text: str) -> tuple:
+    """
+    Extract the locations of a weather query.
+
+    Args:
+        text: User input text
+
+    Only known places score at or above ROUTER_CONFIDENCE_THRESHOLD.
+
+    Returns:
+        tuple: (locations, confidence between 0 and 1)
+    """
+    for pattern in _location_patterns:
+        match = pattern.search(text)
+        if not match:
+            continue
+        locations = _split_locations(clean_location(match.group("place")))
+        if not locations:
+            continue
+        if not all(_looks_like_place(location) for location in locations):
+            # Something was captured, but it does not read as a place
+            return [], 0.3
+        if all(_is_known_place(location) for location in locations):
+            return locations, 0.95
+        # Likely places, but the model should confirm them
+        return locations, 0.6 if len(locations) == 1 else 0.5
+    return [], 0.0
+
+def extract_location(text: str) -> str:
+    """
+    Extract the first location of a weather query.
+
+    Args:
+        text: User input text
+
+    Returns:
+        str: Location, or empty string if none found
+    """
+    locations, _ = extract_locations(text)
+    return locations[0] if locations else ""
+
+def route(text: str, tools_config: dict) -> dict:
+    """
+    Classify a turn and extract its slots.
+
+    Only intents whose tool is enabled are chosen; with no tools enabled
+    every turn is chat. A weather keyword without a known place gives way
+    to file or web search when the turn also reads like one, and "climate"
+    or "temperature of" without a known place is not a weather turn at all.
+
+    Args:
+        text: User input text
+        tools_config: Dictionary of enabled tools
+
+    Returns:
+        dict: intent, confidence, and for weather, locations and unit
+    """
+    file_enabled = tools_config.get("file_search") and tools_config.get("vector_store_id")
+    web_enabled = tools_config.get("web_search")
+
+    if tools_config.get("function_calling") and is_weather_query(text):
+        locations, confidence = extract_locations(text)
+        weather = {
+            "intent": WEATHER,
+            "confidence": confidence,
+            "locations": locations,
+            "unit": "fahrenheit" if _fahrenheit_re.search(text) else "celsius",
+        }
+        other_intent = (file_enabled and _file_re.search(text)) or (web_enabled and _web_re.search(text))
+        if confidence >= ROUTER_CONFIDENCE_THRESHOLD or (_strong_weather_re.search(text) and not other_intent):
+            return weather
+    if file_enabled and _file_re.search(text):
+        return {"intent": FILE_SEARCH, "confidence": 0.8}
+    if web_enabled and _web_re.search(text):
+        return {"intent": WEB_SEARCH, "confidence": 0.8}
+    if file_enabled:
+        return {"intent": FILE_SEARCH, "confidence": 0.5}
+    if web_enabled:
+        return {"intent": WEB_SEARCH, "confidence": 0.5}
+    return {"intent": CHAT, "confidence": 0.9}
+
+def is_confident(routed: dict) -> bool:
+    """
+    Check whether a route can be acted on without the model.
+
+    Args:
+        routed: Result of route()
+
+    Returns:
+        bool: True at or above ROUTER_CONFIDENCE_THRESHOLD
+    """
+    return routed["confidence"] >= ROUTER_CONFIDENCE_THRESHOLD
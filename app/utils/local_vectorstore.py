@@ -0,0 +1,522 @@
+"""
+Offline vector store backend with the same API as vectorstore_utils.
+Uploads of many files go through vectorstore_utils, which dispatches each
+file here.
+
+Each store is a directory holding:
+- store.json: store name, creation time and the embedder it was built with
+- embeddings.f32: a float32 matrix of unit-length chunk embeddings, one row
+  per chunk, appended to on upload and memory-mapped for queries
+- metadata.sqlite3: a sidecar table mapping each row to its file and text
+
+Queries are a single vectorized NumPy matrix-vector product over the
+memory-mapped matrix, followed by a partial sort for the top k.
+"""
+import os
+import json
+import time
+import itertools
+import uuid
+import sqlite3
+import threading
+from types import SimpleNamespace
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+from .embedding_utils import get_embedder
+from . import metadata_index
+from .document_utils import read_document_text, chunk_text, iter_pdf_pages, iter_pdf_pages_parallel
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+LOCAL_VECTOR_STORE_DIR = os.path.expanduser(os.environ.get(
+    "LOCAL_VECTOR_STORE_DIR",
+    os.path.join("~", ".cache", "rag_agentic", "vector_stores")
+))
+LOCAL_EMBED_BATCH_SIZE = int(os.environ.get("LOCAL_EMBED_BATCH_SIZE", "64"))
+
+LOCAL_STORE_PREFIX = "vs_local_"
+
+_locks = {}
+_locks_guard = threading.Lock()
+# Mapped matrix and live-row mask per store, shared by concurrent searches
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+def is_local_store_id(vector_store_id: str) -> bool:
+    """
+    Check whether a vector store ID belongs to the local backend.
+
+    Args:
+        vector_store_id: ID of the vector store
+
+    Returns:
+        bool: True for local store IDs
+    """
+    return bool(vector_store_id) and vector_store_id.startswith(LOCAL_STORE_PREFIX)
+
+def _store_dir(vector_store_id: str) -> str:
+    return os.path.join(LOCAL_VECTOR_STORE_DIR, vector_store_id)
+
+def _store_lock(vector_store_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(vector_store_id, threading.Lock())
+
+def _connect(vector_store_id: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(_store_dir(vector_store_id), "metadata.sqlite3"), timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS files ("
+        "file_id TEXT PRIMARY KEY, filename TEXT NOT NULL, created_at INTEGER NOT NULL, "
+        "chunk_count INTEGER NOT NULL, attributes TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS chunks ("
+        "row INTEGER PRIMARY KEY, file_id TEXT NOT NULL, filename TEXT NOT NULL, "
+        "chunk_index INTEGER NOT NULL, text TEXT NOT NULL)"
+    )
+    return conn
+
+def _read_store_info(vector_store_id: str) -> dict:
+    with open(os.path.join(_store_dir(vector_store_id), "store.json"), "r") as f:
+        return json.load(f)
+
+def _details(vector_store_id: str) -> dict:
+    info = _read_store_info(vector_store_id)
+    conn = _connect(vector_store_id)
+    try:
+        file_count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        "id": info["id"],
+        "name": info["name"],
+        "created_at": info["created_at"],
+        "file_count": file_count
+    }
+
+def create_vector_store(store_name: str, embedder: str = None) -> dict:
+    """
+    Create a new local vector store.
+
+    Args:
+        store_name: Name for the vector store
+        embedder: Embedder name, defaults to LOCAL_EMBEDDER
+
+    Returns:
+        dict: Details of the created vector store
+    """
+    try:
+        vector_store_id = f"{LOCAL_STORE_PREFIX}{uuid.uuid4().hex}"
+        os.makedirs(_store_dir(vector_store_id))
+        info = {
+            "id": vector_store_id,
+            "name": store_name,
+            "created_at": int(time.time()),
+            "embedder": get_embedder(embedder).name,
+            "dimensions": None
+        }
+        with open(os.path.join(_store_dir(vector_store_id), "store.json"), "w") as f:
+            json.dump(info, f)
+        _connect(vector_store_id).close()
+        return _details(vector_store_id)
+    except Exception as e:
+        print(f"Error creating local vector store: {e}")
+        return {}
+
+def get_store_embedder(vector_store_id: str):
+    """
+    Get the embedder a local vector store was built with.
+
+    Args:
+        vector_store_id: ID of the vector store
+
+    Returns:
+        Embedder with an embed(texts) method and a name attribute
+    """
+    return get_embedder(_read_store_info(vector_store_id)["embedder"])
+
+def get_vector_store_details(vector_store_id: str) -> dict:
+    """
+    Get details about a local vector store.
+
+    Args:
+        vector_store_id: ID of the vector store
+
+    Returns:
+        dict: Details of the vector store
+    """
+    try:
+        return _details(vector_store_id)
+    except Exception as e:
+        print(f"Error retrieving local vector store: {e}")
+        return {}
+
+def _append_batch(vector_store_id: str, file_id: str, filename: str, first_index: int, chunks: list, embedder):
+    """
+    Embed a batch of chunks and append them to the matrix and metadata table.
+
+    Args:
+        vector_store_id: ID of the vector store
+        file_id: ID of the file the chunks belong to
+        filename: Name of the file
+        first_index: Index of the first chunk within the file
+        chunks: Chunk texts
+        embedder: Embedder the store was built with
+    """
+    # Embed outside the lock; only the append is serialized
+    matrix = np.ascontiguousarray(embedder.embed(chunks), dtype=np.float32)
+
+    with _store_lock(vector_store_id):
+        info = _read_store_info(vector_store_id)
+        if info["dimensions"] is None:
+            info["dimensions"] = int(matrix.shape[1])
+            with open(os.path.join(_store_dir(vector_store_id), "store.json"), "w") as f:
+                json.dump(info, f)
+        conn = _connect(vector_store_id)
+        try:
+            path = os.path.join(_store_dir(vector_store_id), "embeddings.f32")
+            first_row = os.path.getsize(path) // (4 * info["dimensions"]) if os.path.exists(path) else 0
+            with open(path, "ab") as f:
+                f.write(matrix.tobytes())
+            conn.executemany(
+                "INSERT INTO chunks (row, file_id, filename, chunk_index, text) VALUES (?, ?, ?, ?, ?)",
+                [(first_row + i, file_id, filename, first_index + i, chunk) for i, chunk in enumerate(chunks)]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+def add_document_chunks(vector_store_id: str, filename: str, chunks, attributes: dict = None) -> str:
+    """
+    Embed and append a stream of chunks as one document.
+
+    Chunks are consumed in batches of LOCAL_EMBED_BATCH_SIZE, so memory use
+    does not depend on the document size.
+
+    Args:
+        vector_store_id: ID of the vector store
+        filename: Name reported in search results
+        chunks: Iterable of chunk texts
+        attributes: Optional metadata returned with search results
+
+    Returns:
+        str: ID of the added file
+
+    Raises:
+        ValueError: If there were no chunks
+    """
+    embedder = get_embedder(_read_store_info(vector_store_id)["embedder"])
+    file_id = f"file_local_{uuid.uuid4().hex}"
+
+    chunk_count = 0
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == LOCAL_EMBED_BATCH_SIZE:
+            _append_batch(vector_store_id, file_id, filename, chunk_count, batch, embedder)
+            chunk_count += len(batch)
+            batch = []
+    if batch:
+        _append_batch(vector_store_id, file_id, filename, chunk_count, batch, embedder)
+        chunk_count += len(batch)
+
+    if chunk_count == 0:
+        raise ValueError("No text could be extracted")
+
+    conn = _connect(vector_store_id)
+    try:
+        conn.execute(
+            "INSERT INTO files (file_id, filename, created_at, chunk_count, attributes) VALUES (?, ?, ?, ?, ?)",
+            (file_id, filename, int(time.time()), chunk_count, json.dumps(attributes or {}))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return file_id
+
+def add_document(vector_store_id: str, filename: str, text: str, attributes: dict = None) -> str:
+    """
+    Chunk, embed and append a document to a local vector store.
+
+    Args:
+        vector_store_id: ID of the vector store
+        filename: Name reported in search results
+        text: Document text
+        attributes: Optional metadata returned with search results
+
+    Returns:
+        str: ID of the added file
+    """
+    return add_document_chunks(vector_store_id, filename, chunk_text(text), attributes)
+
+def _page_chunks(pages):
+    """
+    Chunk (file_path, page_no, text) records page by page.
+
+    Args:
+        pages: Iterable of page records
+
+    Yields:
+        str: Chunk texts
+    """
+    for _, _, page_text in pages:
+        yield from chunk_text(page_text)
+
+def upload_single_file(file_path: str, vector_store_id: str, attributes: dict = None):
+    """
+    Index a single file into a local vector store.
+
+    PDFs are streamed page by page rather than read whole.
+
+    Args:
+        file_path: Path to the file
+        vector_store_id: ID of the vector store
+        attributes: Optional metadata returned with search results
+
+    Returns:
+        dict: Status of the upload
+    """
+    file_name = os.path.basename(file_path)
+    try:
+        if file_path.lower().endswith(".pdf"):
+            chunks = _page_chunks(iter_pdf_pages(file_path))
+        else:
+            chunks = chunk_text(read_document_text(file_path))
+        file_id = add_document_chunks(vector_store_id, file_name, chunks, attributes)
+        return {"file": file_name, "status": "success", "file_id": file_id}
+    except Exception as e:
+        print(f"Error with {file_name}: {str(e)}")
+        return {"file": file_name, "status": "failed", "error": str(e)}
+
+def ingest_pdfs(file_paths: list, vector_store_id: str, max_workers: int = None) -> list:
+    """
+    Index PDFs, extracting their pages across a process pool.
+
+    Extraction runs on every core through iter_pdf_pages_parallel, once there
+    are enough pages to be worth it, while this process chunks, embeds and
+    appends the pages as they arrive.
+
+    Args:
+        file_paths: Paths to distinct PDF files
+        vector_store_id: ID of the vector store
+        max_workers: Extraction processes, defaults to the CPU count
+
+    Returns:
+        list: (file_path, result) pairs, with results shaped like upload_single_file's
+    """
+    results = {}
+    records = iter_pdf_pages_parallel(file_paths, max_workers=max_workers)
+    for file_path, pages in itertools.groupby(records, key=lambda record: record[0]):
+        file_name = os.path.basename(file_path)
+        try:
+            file_id = add_document_chunks(vector_store_id, file_name, _page_chunks(pages))
+            results[file_path] = {"file": file_name, "status": "success", "file_id": file_id}
+        except Exception as e:
+            print(f"Error with {file_name}: {str(e)}")
+            results[file_path] = {"file": file_name, "status": "failed", "error": str(e)}
+
+    # Files with no extractable pages never show up in the record stream
+    return [
+        (file_path, results.get(file_path) or {
+            "file": os.path.basename(file_path), "status": "failed", "error": "No text could be extracted"
+        })
+        for file_path in file_paths
+    ]
+
+def delete_file(vector_store_id: str, file_id: str) -> bool:
+    """
+    Remove a file from a local vector store.
+
+    Its metadata rows are deleted and its embedding rows are zeroed in place,
+    so it can no longer match a query. The matrix is not compacted.
+
+    Args:
+        vector_store_id: ID of the vector store
+        file_id: ID of the file
+
+    Returns:
+        bool: True if the file was removed
+    """
+    try:
+        with _store_lock(vector_store_id):
+            info = _read_store_info(vector_store_id)
+            conn = _connect(vector_store_id)
+            try:
+                rows = [row for (row,) in conn.execute("SELECT row FROM chunks WHERE file_id = ?", (file_id,))]
+                deleted = conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,)).rowcount
+                conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+                conn.commit()
+            finally:
+                conn.close()
+
+            if rows and info.get("dimensions"):
+                path = os.path.join(_store_dir(vector_store_id), "embeddings.f32")
+                matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(os.path.getsize(path) // (4 * info["dimensions"]), info["dimensions"]))
+                matrix[rows] = 0.0
+                matrix.flush()
+                del matrix
+                # The cached live-row mask no longer matches
+                with _matrices_lock:
+                    _matrices.pop(vector_store_id, None)
+        return deleted > 0
+    except Exception as e:
+        print(f"Error deleting {file_id} from local vector store: {e}")
+        return False
+
+def _get_matrix(vector_store_id: str, dimensions: int) -> tuple:
+    """
+    Get the memory-mapped embedding matrix, remapping if it has grown.
+
+    Rows of deleted files are zeroed, so they are found by their zero norm
+    once per mapping rather than on every query.
+
+    Args:
+        vector_store_id: ID of the vector store
+        dimensions: Embedding size
+
+    Returns:
+        tuple: Read-only (rows, dimensions) np.memmap and a boolean mask of
+        live rows, None when no row is deleted; (None, None) if empty
+    """
+    path = os.path.join(_store_dir(vector_store_id), "embeddings.f32")
+    if not os.path.exists(path):
+        return None, None
+    rows = os.path.getsize(path) // (4 * dimensions)
+    if rows == 0:
+        return None, None
+    with _matrices_lock:
+        cached = _matrices.get(vector_store_id)
+    if cached is not None and cached[0].shape[0] == rows:
+        return cached
+    # Mapped outside the lock; a concurrent remap of the same store is harmless
+    matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dimensions))
+    live = np.einsum("ij,ij->i", matrix, matrix) > 0
+    cached = (matrix, None if live.all() else live)
+    with _matrices_lock:
+        _matrices[vector_store_id] = cached
+    return cached
+
+def prefiltered_rows(vector_store_id: str, query: str):
+    """
+    Get the chunk rows a query is restricted to by the metadata index.
+
+    Args:
+        vector_store_id: ID of the vector store
+        query: Query string
+
+    Returns:
+        list or None: Row numbers, or None to search every row
+    """
+    item_keys = metadata_index.prefilter(vector_store_id, query)
+    if not item_keys:
+        return None
+    file_ids = metadata_index.file_ids_for_items(vector_store_id, item_keys)
+    if not file_ids:
+        return None
+    conn = _connect(vector_store_id)
+    try:
+        placeholders = ",".join("?" * len(file_ids))
+        rows = [row for (row,) in conn.execute(f"SELECT row FROM chunks WHERE file_id IN ({placeholders})", file_ids)]
+    finally:
+        conn.close()
+    return rows or None
+
+def search(vector_store_id: str, query: str, max_results: int = 5, candidate_rows=None) -> list:
+    """
+    Find the chunks most similar to a query.
+
+    Args:
+        vector_store_id: ID of the vector store
+        query: Query string
+        max_results: Maximum number of results
+        candidate_rows: Optional array of row numbers to restrict the search to
+
+    Returns:
+        list: Result dicts with row, file_id, filename, score, text and attributes
+    """
+    info = _read_store_info(vector_store_id)
+    if not info.get("dimensions"):
+        return []
+    matrix, live = _get_matrix(vector_store_id, info["dimensions"])
+    if matrix is None:
+        return []
+
+    query_vector = get_embedder(info["embedder"]).embed([query])[0]
+    # Deleted rows are masked before ranking, so they never take a top-k slot
+    if candidate_rows is not None:
+        candidate_rows = np.asarray(candidate_rows, dtype=np.int64)
+        candidate_rows = candidate_rows[candidate_rows < matrix.shape[0]]
+        if live is not None:
+            candidate_rows = candidate_rows[live[candidate_rows]]
+        if candidate_rows.size == 0:
+            return []
+        scores = matrix[candidate_rows] @ query_vector
+        live_count = scores.shape[0]
+    else:
+        scores = matrix @ query_vector
+        live_count = scores.shape[0]
+        if live is not None:
+            scores[~live] = -np.inf
+            live_count = int(np.count_nonzero(live))
+            if live_count == 0:
+                return []
+
+    k = min(max_results, live_count)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    rows = candidate_rows[top] if candidate_rows is not None else top
+
+    conn = _connect(vector_store_id)
+    try:
+        results = []
+        for row, score in zip(rows.tolist(), scores[top].tolist()):
+            record = conn.execute(
+                "SELECT c.file_id, c.filename, c.text, f.attributes FROM chunks c "
+                "JOIN files f ON f.file_id = c.file_id WHERE c.row = ?", (row,)
+            ).fetchone()
+            if record is None:
+                continue
+            file_id, filename, text, attributes = record
+            results.append({
+                "row": row,
+                "file_id": file_id,
+                "filename": filename,
+                "score": float(score),
+                "text": text,
+                "attributes": json.loads(attributes or "{}")
+            })
+        return results
+    finally:
+        conn.close()
+
+def query_vector_store(vector_store_id: str, query: str, max_results: int = 5):
+    """
+    Query a local vector store.
+
+    Results mirror the shape of the hosted vector store search response, with
+    file_id, filename, score, attributes and content on each item. The query
+    is prefiltered through the metadata index first.
+
+    Args:
+        vector_store_id: ID of the vector store
+        query: Query string
+        max_results: Maximum number of results
+
+    Returns:
+        SimpleNamespace: Search results in .data
+    """
+    try:
+        data = [
+            SimpleNamespace(
+                file_id=result["file_id"],
+                filename=result["filename"],
+                score=result["score"],
+                attributes=result["attributes"],
+                content=[SimpleNamespace(type="text", text=result["text"])]
+            )
+            for result in search(vector_store_id, query, max_results, prefiltered_rows(vector_store_id, query))
+        ]
+        return SimpleNamespace(data=data, search_query=query)
+    except Exception as e:
+        print(f"Error querying local vector store: {e}")
+        return None
@@ -0,0 +1,395 @@
+"""
+Inverted metadata index for Zotero-sourced documents.
+
+At ingestion time every item's title terms, author name parts, author
+surnames, year, tags and item key are written to postings in a SQLite
+table, keyed by vector store. At query time the question is parsed for
+cued years ("from 2020", "2015-2018", "since 2019"; a bare "2000" is not
+one), item keys, authors, tags and title terms. The matching item keys become the candidate set that vector
+search is restricted to: chunk rows for local stores, an attribute filter
+for hosted ones.
+
+Structured constraints (key, year, author, tag) are intersected. Authors
+and tags only count when the question names them explicitly ("by Peter
+Piot", "tagged vaccines"), or, for authors, when a question word is an
+author's surname. Name particles ("de", "van") and lone first names never
+do, since they are ordinary words too often. A surname match that leaves
+fewer than METADATA_MIN_CANDIDATES items is more likely a coincidence than
+a request, so it is dropped. Title terms only narrow the result further,
+and only when some candidate has one. If nothing matches, None is returned
+and search runs unfiltered. A misparsed question therefore costs recall on
+the filter, never the whole answer.
+"""
+import os
+import re
+import sqlite3
+import threading
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+METADATA_INDEX_PATH = os.path.expanduser(os.environ.get(
+    "METADATA_INDEX_PATH",
+    os.path.join("~", ".cache", "rag_agentic", "metadata_index.sqlite3")
+))
+# Hosted searches filter on at most this many item keys, otherwise run unfiltered
+METADATA_FILTER_MAX_KEYS = int(os.environ.get("METADATA_FILTER_MAX_KEYS", "50"))
+# Surname matches without an explicit "by ..." must leave at least this many items
+METADATA_MIN_CANDIDATES = int(os.environ.get("METADATA_MIN_CANDIDATES", "2"))
+
+STOPWORDS = {
+    "a", "about", "after", "all", "an", "and", "any", "are", "article", "articles", "as", "at",
+    "be", "before", "between", "by", "can", "did", "do", "does", "during", "find", "for",
+    "from", "give", "has", "have", "how", "i", "in", "into", "is", "it", "its", "me", "my",
+    "of", "on", "or", "paper", "papers", "published", "show", "since", "study", "studies",
+    "than", "that", "the", "their", "there", "these", "this", "those", "to", "until", "use",
+    "using", "was", "were", "what", "when", "where", "which", "who", "why", "will", "with",
+    "written", "year", "years"
+}
+
+# Name particles, never matched on their own
+NAME_PARTICLES = {
+    "al", "bin", "da", "das", "de", "del", "della", "der", "di", "do", "dos", "du", "el", "la", "le",
+    "st", "ten", "ter", "van", "von"
+}
+
+_term_re = re.compile(r"[a-z0-9]+")
+_author_cue_re = re.compile(r"\b(?:[Bb]y|[Aa]uthored by|[Ww]ritten by|[Aa]uthors?)\s+((?:[A-Z][\w'’.-]*\s*){1,4})")
+_tag_cue_re = re.compile(r"\b(?:tagged(?:\s+(?:with|as))?|tags?)\s+[\"“']?([\w-]+(?:\s+[\w-]+){0,2})", re.IGNORECASE)
+_key_re = re.compile(r"\b[A-Z0-9]{8}\b")
+_year = r"(1[5-9]\d\d|2\d\d\d)"
+# Years only count with a cue: a range or a preposition. A bare number such
+# as "ISO 9001:2015" or "top 2000 genes" is not a year filter.
+_year_range_re = re.compile(
+    rf"\b(?:between\s+{_year}\s+and\s+{_year}|(?:from\s+)?{_year}\s*(?:-|–|\s(?:to|through)\s)\s*{_year})\b",
+    re.IGNORECASE
+)
+_year_bound_re = re.compile(rf"\b(since|after|from|in|before|until|prior to)\s+{_year}\b", re.IGNORECASE)
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _get_connection():
+    """
+    Get this thread's SQLite connection, creating the tables on first use.
+
+    Returns:
+        sqlite3.Connection: Connection to the index database
+    """
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(METADATA_INDEX_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(METADATA_INDEX_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "vector_store_id TEXT NOT NULL, item_key TEXT NOT NULL, file_id TEXT, filename TEXT, "
+                "year INTEGER, PRIMARY KEY (vector_store_id, item_key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "vector_store_id TEXT NOT NULL, field TEXT NOT NULL, term TEXT NOT NULL, item_key TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_term ON postings (vector_store_id, field, term)")
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_item ON postings (vector_store_id, item_key)")
+            conn.commit()
+            _schema_ready = True
+    return conn
+
+def terms(text: str) -> set:
+    """
+    Split text into lowercase index terms, dropping stopwords.
+
+    Args:
+        text: Text to split
+
+    Returns:
+        set: Terms
+    """
+    return {term for term in _term_re.findall((text or "").lower()) if term not in STOPWORDS and len(term) > 1}
+
+def index_item(vector_store_id: str, metadata: dict, file_id: str = None, filename: str = None):
+    """
+    Add or replace an item's postings.
+
+    Args:
+        vector_store_id: ID of the vector store the item was uploaded to
+        metadata: Item metadata with key, title, authors, year and tags
+        file_id: ID of the file holding the item
+        filename: Name of that file, as cited in answers
+    """
+    key = metadata["key"]
+    postings = [("key", key.lower())]
+    postings += [("title", term) for term in terms(metadata.get("title"))]
+    postings += [("author", term) for author in metadata.get("authors") or [] for term in terms(author)]
+    postings += [("surname", term) for author in metadata.get("authors") or [] for term in [_surname(author)] if term]
+    postings += [("tag", term) for tag in metadata.get("tags") or [] for term in terms(tag) | {tag.lower()}]
+    if metadata.get("year") is not None:
+        postings.append(("year", str(metadata["year"])))
+
+    try:
+        conn = _get_connection()
+        conn.execute("DELETE FROM postings WHERE vector_store_id = ? AND item_key = ?", (vector_store_id, key))
+        conn.execute(
+            "INSERT OR REPLACE INTO items (vector_store_id, item_key, file_id, filename, year) VALUES (?, ?, ?, ?, ?)",
+            (vector_store_id, key, file_id, filename, metadata.get("year"))
+        )
+        conn.executemany(
+            "INSERT INTO postings (vector_store_id, field, term, item_key) VALUES (?, ?, ?, ?)",
+            [(vector_store_id, field, term, key) for field, term in set(postings)]
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error indexing item {key}: {e}")
+
+def remove_file(vector_store_id: str, file_id: str):
+    """
+    Drop the items held in a file, e.g. after it is detached.
+
+    Args:
+        vector_store_id: ID of the vector store
+        file_id: ID of the file
+    """
+    try:
+        conn = _get_connection()
+        conn.execute(
+            "DELETE FROM postings WHERE vector_store_id = ? AND item_key IN "
+            "(SELECT item_key FROM items WHERE vector_store_id = ? AND file_id = ?)",
+            (vector_store_id, vector_store_id, file_id)
+        )
+        conn.execute("DELETE FROM items WHERE vector_store_id = ? AND file_id = ?", (vector_store_id, file_id))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Error removing {file_id} from metadata index: {e}")
+
+def _surname(author: str) -> str:
+    """
+    Get the index term of an author's surname, from "Last, First" or "First Last".
+    """
+    family = author.split(",")[0] if "," in author else author
+    names = [term for term in _term_re.findall(family.lower()) if term not in NAME_PARTICLES and len(term) > 1]
+    if not names:
+        return ""
+    return names[0] if "," in author else names[-1]
+
+def _name_terms(name: str) -> set:
+    return {term for term in terms(name) if term not in NAME_PARTICLES}
+
+def parse_query(query: str) -> dict:
+    """
+    Pull structured constraints out of a question.
+
+    Args:
+        query: User question
+
+    Returns:
+        dict: year_range as (low, high) inclusive bounds or None, years as a
+        set of exact years, keys as candidate item keys, authors and tags as
+        explicitly named ones, and terms as the remaining query terms
+    """
+    year_range = None
+    years = set()
+    range_match = _year_range_re.search(query)
+    bounds = [(word.lower(), int(year)) for word, year in _year_bound_re.findall(query)]
+    # "from 2020" and "in 2020" mean that year
+    open_bounds = [(word, year) for word, year in bounds if word not in ("from", "in")]
+    if range_match:
+        year_range = tuple(sorted(int(year) for year in range_match.groups() if year))
+    elif open_bounds:
+        word, year = open_bounds[0]
+        year_range = {
+            "since": (year, 9999),
+            "after": (year + 1, 9999),
+            "before": (0, year - 1),
+            "until": (0, year),
+        }.get(word, (0, year - 1))
+    else:
+        years = {year for _, year in bounds}
+    # Cued years are constraints, not title terms
+    cue_years = {str(year) for _, year in bounds}
+    if range_match:
+        cue_years |= {year for year in range_match.groups() if year}
+
+    return {
+        "year_range": year_range,
+        "years": years,
+        "keys": {key.lower() for key in _key_re.findall(query)},
+        "authors": [name.strip() for name in _author_cue_re.findall(query)],
+        "tags": [tag.strip() for tag in _tag_cue_re.findall(query)],
+        "terms": {term for term in terms(query) if term not in cue_years}
+    }
+
+def _items_for(conn, vector_store_id: str, field: str, values) -> set:
+    values = list(values)
+    if not values:
+        return set()
+    placeholders = ",".join("?" * len(values))
+    rows = conn.execute(
+        f"SELECT DISTINCT item_key FROM postings WHERE vector_store_id = ? AND field = ? AND term IN ({placeholders})",
+        [vector_store_id, field] + values
+    )
+    return {item_key for (item_key,) in rows}
+
+def _all_items(conn, vector_store_id: str, field: str, query_terms: set):
+    # Items having every term, or None if some term matches nothing
+    items = None
+    for term in query_terms:
+        term_items = _items_for(conn, vector_store_id, field, [term])
+        if not term_items:
+            return None
+        items = term_items if items is None else items & term_items
+    return items
+
+def _author_items(conn, vector_store_id: str, parsed: dict) -> tuple:
+    """
+    Match the question's authors.
+
+    Returns:
+        tuple: (items or None, whether they were named explicitly)
+    """
+    named = [_all_items(conn, vector_store_id, "author", _name_terms(name)) for name in parsed["authors"]]
+    named = [items for items in named if items]
+    if named:
+        return set.union(*named), True
+    # Without a cue, only surnames count, and every one must belong to the same item
+    items = None
+    for term in parsed["terms"] - NAME_PARTICLES:
+        term_items = _items_for(conn, vector_store_id, "surname", [term])
+        if term_items:
+            items = term_items if items is None else items & term_items
+    return items, False
+
+def _tag_items(conn, vector_store_id: str, parsed: dict):
+    # "tagged public health" may run into the rest of the question, so try the longest matching phrase
+    matched = []
+    for phrase in parsed["tags"]:
+        words = phrase.split()
+        for length in range(len(words), 0, -1):
+            items = _items_for(conn, vector_store_id, "tag", [" ".join(words[:length]).lower()])
+            if items:
+                matched.append(items)
+                break
+    return set.union(*matched) if matched else None
+
+def prefilter(vector_store_id: str, query: str):
+    """
+    Get the item keys a question is restricted to.
+
+    Args:
+        vector_store_id: ID of the vector store
+        query: User question
+
+    Returns:
+        list or None: Sorted candidate item keys, or None to search unfiltered
+    """
+    try:
+        conn = _get_connection()
+        if conn.execute("SELECT 1 FROM items WHERE vector_store_id = ? LIMIT 1", (vector_store_id,)).fetchone() is None:
+            return None
+        parsed = parse_query(query)
+
+        constraints = []
+        if parsed["keys"]:
+            key_items = _items_for(conn, vector_store_id, "key", parsed["keys"])
+            if key_items:
+                constraints.append(key_items)
+        if parsed["year_range"]:
+            low, high = parsed["year_range"]
+            rows = conn.execute(
+                "SELECT item_key FROM items WHERE vector_store_id = ? AND year BETWEEN ? AND ?",
+                (vector_store_id, low, high)
+            )
+            constraints.append({item_key for (item_key,) in rows})
+        elif parsed["years"]:
+            constraints.append(_items_for(conn, vector_store_id, "year", [str(year) for year in parsed["years"]]))
+        explicit = bool(constraints)
+        author_items, named = _author_items(conn, vector_store_id, parsed)
+        if author_items is not None:
+            constraints.append(author_items)
+            explicit = explicit or named
+        tag_items = _tag_items(conn, vector_store_id, parsed)
+        if tag_items:
+            constraints.append(tag_items)
+            explicit = True
+
+        if not constraints:
+            return None
+        candidates = set.intersection(*constraints)
+        if not candidates:
+            return None
+        if not explicit and len(candidates) < METADATA_MIN_CANDIDATES:
+            # Only a surname matched; too narrow to trust
+            return None
+
+        title_items = _items_for(conn, vector_store_id, "title", parsed["terms"]) & candidates
+        return sorted(title_items or candidates)
+    except sqlite3.Error as e:
+        print(f"Error reading metadata index: {e}")
+        return None
+
+def file_ids_for_items(vector_store_id: str, item_keys: list) -> list:
+    """
+    Get the files holding a set of items.
+
+    Args:
+        vector_store_id: ID of the vector store
+        item_keys: Item keys
+
+    Returns:
+        list: File IDs
+    """
+    if not item_keys:
+        return []
+    placeholders = ",".join("?" * len(item_keys))
+    rows = _get_connection().execute(
+        f"SELECT DISTINCT file_id FROM items WHERE vector_store_id = ? AND item_key IN ({placeholders}) AND file_id IS NOT NULL",
+        [vector_store_id] + list(item_keys)
+    )
+    return [file_id for (file_id,) in rows]
+
+def item_keys_for_files(vector_store_ids: list, filenames) -> list:
+    """
+    Map cited filenames back to item keys.
+
+    Args:
+        vector_store_ids: IDs of the vector stores searched
+        filenames: Cited filenames
+
+    Returns:
+        list: Sorted item keys
+    """
+    filenames = list(filenames or [])
+    if not filenames or not vector_store_ids:
+        return []
+    try:
+        rows = _get_connection().execute(
+            f"SELECT DISTINCT item_key FROM items WHERE vector_store_id IN ({','.join('?' * len(vector_store_ids))}) "
+            f"AND filename IN ({','.join('?' * len(filenames))})",
+            list(vector_store_ids) + filenames
+        )
+        return sorted(item_key for (item_key,) in rows)
+    except sqlite3.Error as e:
+        print(f"Error reading metadata index: {e}")
+        return []
+
+def hosted_filter(item_keys: list):
+    """
+    Build a hosted file_search attribute filter for a candidate set.
+
+    Args:
+        item_keys: Candidate item keys
+
+    Returns:
+        dict or None: Filter matching any of the keys, or None when there are
+        too many to list
+    """
+    if not item_keys or len(item_keys) > METADATA_FILTER_MAX_KEYS:
+        return None
+    filters = [{"type": "eq", "key": "zotero_key", "value": key} for key in item_keys]
+    return filters[0] if len(filters) == 1 else {"type": "or", "filters": filters}
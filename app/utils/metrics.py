@@ -0,0 +1,534 @@
+"""
+In-process metrics for OpenAI and outbound HTTP calls.
+
+Every OpenAI call made through rate_limit.call/acall and every request sent
+through http_utils.http_get is recorded here. Recorded values are wall time,
+time to first token for streams, input/output/cached tokens, model, tools
+invoked, retries and estimated cost. They are aggregated into
+Prometheus-style histograms and counters, not kept per request.
+
+The aggregates can be read with summary(), rendered in the Prometheus text
+format with render_prometheus(), written to METRICS_FILE, or served on
+METRICS_HOST:METRICS_PORT at /metrics.
+
+Costs are estimates from MODEL_PRICES, in USD per million tokens. Override
+or extend it with METRICS_MODEL_PRICES, a JSON object of
+{"model": [input, cached_input, output]}.
+"""
+import os
+import json
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+METRICS_FILE = os.path.expanduser(os.environ.get("METRICS_FILE", ""))
+# Minimum seconds between rewrites of METRICS_FILE
+METRICS_FILE_INTERVAL = float(os.environ.get("METRICS_FILE_INTERVAL", "10"))
+# Loopback only by default; set to 0.0.0.0 to let a remote scraper reach it
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# USD per million tokens: input, cached input, output
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.13, 0.0),
+}
+MODEL_PRICES.update({
+    model: tuple(prices) for model, prices in json.loads(os.environ.get("METRICS_MODEL_PRICES", "{}")).items()
+})
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed upper bounds, one series per label set.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        """
+        Args:
+            name: Metric name
+            help_text: Description for the Prometheus HELP line
+            buckets: Sorted bucket upper bounds
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        Record a value.
+
+        Args:
+            value: Observed value
+            **labels: Label values for the series
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def quantile(self, q: float, **labels):
+        """
+        Estimate a quantile by interpolating within buckets, as Prometheus does.
+
+        Args:
+            q: Quantile between 0 and 1
+            **labels: Only series with these label values are included
+
+        Returns:
+            float or None: Estimated value, or None with no observations
+        """
+        wanted = set(labels.items())
+        counts = [0] * (len(self.buckets) + 1)
+        with self._lock:
+            for key, series in self._series.items():
+                if wanted <= set(key):
+                    counts = [a + b for a, b in zip(counts, series["counts"])]
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count > 0:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self) -> list:
+        """
+        Render the histogram in the Prometheus text format.
+
+        Returns:
+            list: Lines
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items(), key=_series_order):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series['sum']:.6g}")
+                lines.append(f"{self.name}_count{_labels(key)} {series['count']}")
+        return lines
+
+class Counter:
+    """
+    Thread-safe counter, one series per label set.
+    """
+
+    def __init__(self, name: str, help_text: str):
+        """
+        Args:
+            name: Metric name
+            help_text: Description for the Prometheus HELP line
+        """
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Add to the counter.
+
+        Args:
+            amount: Amount to add
+            **labels: Label values for the series
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def total(self, **labels) -> float:
+        """
+        Sum the series matching some label values.
+
+        Args:
+            **labels: Label values to match
+
+        Returns:
+            float: Sum
+        """
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(value for key, value in self._series.items() if wanted <= set(key))
+
+    def render(self) -> list:
+        """
+        Render the counter in the Prometheus text format.
+
+        Returns:
+            list: Lines
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._series.items(), key=_series_order):
+                lines.append(f"{self.name}{_labels(key)} {value:.6g}")
+        return lines
+
+def _series_order(item) -> tuple:
+    # Label values may mix types, e.g. an HTTP status of 200 or "ConnectionError"
+    return tuple((name, str(value)) for name, value in item[0])
+
+def _labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+openai_latency = Histogram("openai_request_duration_seconds", "Wall time of OpenAI calls, including streaming", LATENCY_BUCKETS)
+openai_ttft = Histogram("openai_time_to_first_token_seconds", "Time to the first output token of streamed calls", LATENCY_BUCKETS)
+openai_input_tokens = Histogram("openai_request_input_tokens", "Input tokens per OpenAI call", TOKEN_BUCKETS)
+openai_requests = Counter("openai_requests_total", "OpenAI calls by endpoint, model and status")
+openai_tokens = Counter("openai_tokens_total", "Tokens by model and type (input, cached_input, output)")
+openai_retries = Counter("openai_retries_total", "Retried OpenAI attempts by endpoint")
+openai_cost = Counter("openai_cost_usd_total", "Estimated OpenAI cost in USD by model")
+tool_calls = Counter("tool_calls_total", "Tools invoked by the model")
+http_latency = Histogram("http_request_duration_seconds", "Wall time of outbound HTTP requests, including retries", LATENCY_BUCKETS)
+http_requests = Counter("http_requests_total", "Outbound HTTP requests by host and status")
+http_retries = Counter("http_retries_total", "Retried outbound HTTP attempts by host")
+
+_REGISTRY = (
+    openai_requests, openai_latency, openai_ttft, openai_input_tokens, openai_tokens, openai_retries,
+    openai_cost, tool_calls, http_requests, http_latency, http_retries
+)
+
+_file_lock = threading.Lock()
+_file_written_at = 0.0
+_server = None
+_server_lock = threading.Lock()
+
+def usage_tokens(usage) -> dict:
+    """
+    Normalize a usage object from any OpenAI endpoint.
+
+    Args:
+        usage: Responses, chat completions or embeddings usage, or None
+
+    Returns:
+        dict: input, cached_input and output token counts
+    """
+    if usage is None:
+        return {"input": 0, "cached_input": 0, "output": 0}
+    input_tokens = getattr(usage, "input_tokens", None)
+    if input_tokens is None:
+        input_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", None)
+    if output_tokens is None:
+        output_tokens = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    return {"input": input_tokens, "cached_input": cached, "output": output_tokens}
+
+def estimate_cost(model: str, tokens: dict) -> float:
+    """
+    Estimate the cost of a call from its token counts.
+
+    Args:
+        model: Model name; dated snapshots fall back to their base model
+        tokens: Output of usage_tokens
+
+    Returns:
+        float: Cost in USD, 0 for unknown models
+    """
+    prices = MODEL_PRICES.get(model)
+    if prices is None and model:
+        # e.g. gpt-4o-mini-2024-07-18, trying the longest matching base name first
+        for name in sorted(MODEL_PRICES, key=len, reverse=True):
+            if model.startswith(name):
+                prices = MODEL_PRICES[name]
+                break
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = tokens["input"] - tokens["cached_input"]
+    return (uncached * input_price + tokens["cached_input"] * cached_price + tokens["output"] * output_price) / 1_000_000
+
+def invoked_tools(response) -> list:
+    """
+    List the tools a Responses API response invoked.
+
+    Args:
+        response: Response object, or anything without output items
+
+    Returns:
+        list: Tool names, e.g. web_search_call, file_search_call or a function name
+    """
+    tools = []
+    for item in getattr(response, "output", None) or []:
+        item_type = getattr(item, "type", None)
+        if item_type == "function_call":
+            tools.append(item.name)
+        elif item_type and item_type.endswith("_call"):
+            tools.append(item_type)
+    return tools
+
+def record_openai(endpoint: str, model: str, seconds: float, usage=None, retries: int = 0,
+                  error: str = None, ttft: float = None, tools=()):
+    """
+    Record one OpenAI call.
+
+    Args:
+        endpoint: Client method, e.g. responses.create
+        model: Model requested
+        seconds: Wall time, including the whole stream for streamed calls
+        usage: Usage object from the response, if any
+        retries: Attempts retried before this outcome
+        error: Exception type name if the call failed
+        ttft: Seconds to the first output token, for streamed calls
+        tools: Tools the model invoked
+    """
+    model = model or "none"
+    openai_requests.inc(endpoint=endpoint, model=model, status=error or "ok")
+    openai_latency.observe(seconds, endpoint=endpoint, model=model)
+    if ttft is not None:
+        openai_ttft.observe(ttft, model=model)
+    if retries:
+        openai_retries.inc(retries, endpoint=endpoint)
+    for tool in tools:
+        tool_calls.inc(tool=tool)
+    if usage is not None:
+        tokens = usage_tokens(usage)
+        openai_input_tokens.observe(tokens["input"], model=model)
+        for kind, count in tokens.items():
+            if count:
+                openai_tokens.inc(count, model=model, type=kind)
+        openai_cost.inc(estimate_cost(model, tokens), model=model)
+    _maybe_write_file()
+
+def record_http(host: str, seconds: float, status, retries: int = 0):
+    """
+    Record one outbound HTTP request.
+
+    Args:
+        host: Host name
+        seconds: Wall time across all attempts
+        status: Final status code, or an exception type name
+        retries: Attempts retried
+    """
+    http_requests.inc(host=host, status=status)
+    http_latency.observe(seconds, host=host)
+    if retries:
+        http_retries.inc(retries, host=host)
+    _maybe_write_file()
+
+class InstrumentedStream:
+    """
+    Stream wrapper that records a streamed OpenAI call once it is consumed.
+
+    Time to first token is taken at the first text delta. Usage and invoked
+    tools come from the completed event of Responses API streams, or from
+    the final usage chunk of chat completion streams.
+    """
+
+    def __init__(self, stream, endpoint: str, model: str, started: float, retries: int = 0):
+        """
+        Args:
+            stream: Stream returned by the client
+            endpoint: Client method, e.g. responses.create
+            model: Model requested
+            started: Monotonic time the call started
+            retries: Attempts retried before the stream opened
+        """
+        self._stream = stream
+        self._endpoint = endpoint
+        self._model = model
+        self._started = started
+        self._retries = retries
+        self._ttft = None
+        self._usage = None
+        self._tools = []
+        self._recorded = False
+
+    def _observe(self, event):
+        if self._ttft is None and _is_text_delta(event):
+            self._ttft = time.monotonic() - self._started
+        event_type = getattr(event, "type", None)
+        if event_type == "response.completed":
+            self._usage = getattr(event.response, "usage", None)
+            self._tools = invoked_tools(event.response)
+        elif event_type is None and getattr(event, "usage", None) is not None:
+            self._usage = event.usage
+
+    def _finish(self, error: str = None):
+        if not self._recorded:
+            self._recorded = True
+            record_openai(
+                self._endpoint, self._model, time.monotonic() - self._started, self._usage,
+                self._retries, error, self._ttft, self._tools
+            )
+
+    def __iter__(self):
+        # Streams abandoned part way are recorded as cancelled
+        error = "cancelled"
+        try:
+            for event in self._stream:
+                self._observe(event)
+                yield event
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._finish(error)
+
+    async def __aiter__(self):
+        error = "cancelled"
+        try:
+            async for event in self._stream:
+                self._observe(event)
+                yield event
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._finish(error)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def _is_text_delta(event) -> bool:
+    if getattr(event, "type", None) == "response.output_text.delta":
+        return True
+    choices = getattr(event, "choices", None)
+    return bool(choices) and bool(getattr(choices[0].delta, "content", None))
+
+def render_prometheus() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics text
+    """
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def write_file(path: str = None) -> bool:
+    """
+    Write the metrics text to a file atomically, e.g. for node_exporter's textfile collector.
+
+    Args:
+        path: Destination, defaults to METRICS_FILE
+
+    Returns:
+        bool: True on success
+    """
+    path = path or METRICS_FILE
+    if not path:
+        return False
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        print(f"Error writing metrics file: {e}")
+        return False
+
+def _maybe_write_file():
+    global _file_written_at
+    if not METRICS_FILE:
+        return
+    with _file_lock:
+        now = time.monotonic()
+        if now - _file_written_at < METRICS_FILE_INTERVAL:
+            return
+        _file_written_at = now
+    write_file()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port: int = None, host: str = None):
+    """
+    Serve /metrics on a background thread, once per process.
+
+    Args:
+        port: Port to listen on, defaults to METRICS_PORT; 0 disables the server
+        host: Address to bind, defaults to METRICS_HOST
+
+    Returns:
+        ThreadingHTTPServer or None: The running server
+    """
+    global _server
+    port = METRICS_PORT if port is None else port
+    host = host or METRICS_HOST
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Error starting metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
+
+def summary() -> dict:
+    """
+    Summarize the metrics for display.
+
+    Returns:
+        dict: Request, error and retry counts, tokens, estimated cost, latency
+        and time-to-first-token percentiles, and HTTP request counts
+    """
+    def rounded(value):
+        return round(value, 3) if value is not None else None
+
+    return {
+        "requests": int(openai_requests.total()),
+        "errors": int(openai_requests.total() - openai_requests.total(status="ok")),
+        "retries": int(openai_retries.total()),
+        "input_tokens": int(openai_tokens.total(type="input")),
+        "cached_input_tokens": int(openai_tokens.total(type="cached_input")),
+        "output_tokens": int(openai_tokens.total(type="output")),
+        "cost_usd": round(openai_cost.total(), 4),
+        "latency_p50": rounded(openai_latency.quantile(0.5)),
+        "latency_p95": rounded(openai_latency.quantile(0.95)),
+        "ttft_p50": rounded(openai_ttft.quantile(0.5)),
+        "ttft_p95": rounded(openai_ttft.quantile(0.95)),
+        "tool_calls": int(tool_calls.total()),
+        "http_requests": int(http_requests.total()),
+        "http_retries": int(http_retries.total()),
+        "http_latency_p95": rounded(http_latency.quantile(0.95)),
+    }
@@ -0,0 +1,442 @@
+"""
+Process-wide rate limiting and retries for OpenAI calls.
+
+Two token buckets, one for requests and one for tokens, are shared by every
+thread and event loop in the process. They are fed by the
+x-ratelimit-limit-*, x-ratelimit-remaining-* and x-ratelimit-reset-* headers
+of every OpenAI response (through an httpx response hook installed by
+client_utils), so the client's view of the account's budget tracks the
+server's. Callers reserve capacity before sending. When the budget runs
+out, every caller waits its turn instead of all of them hitting 429s at
+once. A 429 or Retry-After header pauses all callers together.
+
+call and acall wrap a single API call in that reservation and in a retry
+policy keyed on exception types rather than error strings:
+
+- RateLimitError is retried after Retry-After, or jittered backoff, except
+  for insufficient_quota, which retrying cannot fix
+- connection errors, timeouts, 409s and 5xx are retried with jittered backoff
+- every other error is raised immediately
+
+The SDK's own retries are turned off in client_utils so attempts are not
+multiplied. Every call's outcome, latency and usage is recorded in metrics,
+and every call and attempt is a tracing span.
+"""
+import os
+import re
+import time
+import asyncio
+import random
+import threading
+import openai
+from dotenv import load_dotenv, find_dotenv
+from . import metrics
+from . import tracing
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE = float(os.environ.get("OPENAI_BACKOFF_BASE", "1"))
+OPENAI_BACKOFF_MAX = float(os.environ.get("OPENAI_BACKOFF_MAX", "30"))
+# Optional starting limits per minute, used until the first response headers arrive
+RATE_LIMIT_RPM = int(os.environ.get("RATE_LIMIT_RPM", "0"))
+RATE_LIMIT_TPM = int(os.environ.get("RATE_LIMIT_TPM", "0"))
+# Output tokens budgeted per request on top of the estimated input
+RATE_LIMIT_OUTPUT_TOKENS = int(os.environ.get("RATE_LIMIT_OUTPUT_TOKENS", "1000"))
+
+_duration_re = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that hands out reservations.
+
+    A reservation takes capacity immediately and returns how long the caller
+    must wait for it, so concurrent callers queue fairly without polling.
+    The bucket is inactive, and never makes anyone wait, until it learns a
+    limit.
+    """
+
+    def __init__(self, limit_per_minute: int = 0):
+        """
+        Args:
+            limit_per_minute: Starting limit, 0 to wait for response headers
+        """
+        self.capacity = float(limit_per_minute)
+        self.rate = limit_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take capacity from the bucket.
+
+        Args:
+            amount: Requests or tokens needed
+
+        Returns:
+            float: Seconds to wait before using the reservation
+        """
+        with self._lock:
+            if self.rate <= 0 or amount <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            self.level -= min(amount, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+    def observe(self, limit: float, remaining: float, reset_seconds: float = None):
+        """
+        Align the bucket with the server's rate limit headers.
+
+        Args:
+            limit: Limit per minute
+            remaining: Remaining capacity reported by the server
+            reset_seconds: Time until the server's budget is fully replenished
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._refill(now)
+            else:
+                self.level = remaining
+                self.updated = now
+            self.capacity = limit
+            self.rate = limit / 60.0
+            # Only ever lower the estimate: reservations still in flight are
+            # not yet counted by the server
+            self.level = min(self.level, remaining)
+            if remaining <= 0 and reset_seconds:
+                self.level = min(self.level, -reset_seconds * self.rate)
+
+    def snapshot(self) -> dict:
+        """
+        Get the bucket's current state.
+
+        Returns:
+            dict: capacity and level
+        """
+        with self._lock:
+            if self.rate > 0:
+                self._refill(time.monotonic())
+            return {"capacity": self.capacity, "level": round(self.level, 1)}
+
+_requests = TokenBucket(RATE_LIMIT_RPM)
+_tokens = TokenBucket(RATE_LIMIT_TPM)
+_pause_lock = threading.Lock()
+_paused_until = 0.0
+_stats = {"throttled": 0, "retries": 0, "waited_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def _count(name: str, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def parse_duration(value: str):
+    """
+    Parse a reset header such as "1s", "6m0s" or "20ms".
+
+    Args:
+        value: Header value
+
+    Returns:
+        float or None: Seconds, or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _duration_re.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+def retry_after_seconds(headers):
+    """
+    Read the server's requested delay from response headers.
+
+    Args:
+        headers: Response headers
+
+    Returns:
+        float or None: Seconds to wait, if the server said
+    """
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+def pause(seconds: float):
+    """
+    Hold back every caller for a while, e.g. after a 429.
+
+    Args:
+        seconds: How long to pause
+    """
+    global _paused_until
+    with _pause_lock:
+        _paused_until = max(_paused_until, time.monotonic() + seconds)
+
+def observe_headers(headers, status_code: int = 200):
+    """
+    Feed the buckets from an OpenAI response.
+
+    Args:
+        headers: Response headers
+        status_code: Response status code
+    """
+    for bucket, kind in ((_requests, "requests"), (_tokens, "tokens")):
+        limit = headers.get(f"x-ratelimit-limit-{kind}")
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        if limit is None or remaining is None:
+            continue
+        try:
+            bucket.observe(float(limit), float(remaining), parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+        except ValueError:
+            continue
+
+    if status_code == 429:
+        _count("throttled")
+        delay = retry_after_seconds(headers)
+        if delay:
+            pause(min(delay, OPENAI_BACKOFF_MAX))
+
+def observe_response(response):
+    """
+    httpx response hook for the synchronous client.
+
+    Args:
+        response: httpx.Response
+    """
+    observe_headers(response.headers, response.status_code)
+
+async def aobserve_response(response):
+    """
+    httpx response hook for the async client.
+
+    Args:
+        response: httpx.Response
+    """
+    observe_headers(response.headers, response.status_code)
+
+def estimate_tokens(*texts, output_tokens: int = None) -> int:
+    """
+    Roughly estimate the tokens a request will use, at four characters per token.
+
+    Args:
+        *texts: Prompt texts sent with the request
+        output_tokens: Output allowance, defaults to RATE_LIMIT_OUTPUT_TOKENS
+
+    Returns:
+        int: Estimated tokens
+    """
+    output_tokens = RATE_LIMIT_OUTPUT_TOKENS if output_tokens is None else output_tokens
+    return sum(len(text or "") for text in texts) // 4 + output_tokens
+
+def _paused_seconds() -> float:
+    with _pause_lock:
+        return max(0.0, _paused_until - time.monotonic())
+
+def reserve(estimated_tokens: int = 0) -> float:
+    """
+    Reserve one request and some tokens.
+
+    Args:
+        estimated_tokens: Tokens the request is expected to use
+
+    Returns:
+        float: Seconds to wait before sending
+    """
+    wait = max(_paused_seconds(), _requests.reserve(1), _tokens.reserve(estimated_tokens))
+    if wait > 0:
+        _count("waited_seconds", wait)
+    return wait
+
+def _attempt_wait(attempt: int, estimated_tokens: int) -> float:
+    """
+    Seconds to wait before an attempt.
+
+    Capacity is reserved once per call, so a retried call is not charged
+    again; retries only wait out a shared pause.
+    """
+    if attempt == 0:
+        return reserve(estimated_tokens)
+    wait = _paused_seconds()
+    if wait > 0:
+        _count("waited_seconds", wait)
+    return wait
+
+def backoff_delay(error: Exception, attempt: int):
+    """
+    Decide whether and when to retry a failed call.
+
+    Args:
+        error: Exception raised by the OpenAI client
+        attempt: Zero-based number of the attempt that failed
+
+    Returns:
+        float or None: Seconds to wait before retrying, or None to give up
+    """
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return None
+        delay = retry_after_seconds(error.response.headers)
+        if delay is not None:
+            return min(delay, OPENAI_BACKOFF_MAX)
+    elif isinstance(error, openai.APIStatusError):
+        if not (error.status_code == 409 or error.status_code >= 500):
+            return None
+    elif not isinstance(error, openai.APIConnectionError):
+        return None
+    return random.uniform(0, min(OPENAI_BACKOFF_MAX, OPENAI_BACKOFF_BASE * (2 ** attempt)))
+
+def _endpoint(fn) -> str:
+    # e.g. Responses.create -> responses.create
+    owner = getattr(fn, "__self__", None)
+    name = getattr(fn, "__name__", "call")
+    return f"{type(owner).__name__.lower()}.{name}" if owner is not None else name
+
+def _record(fn, kwargs: dict, started: float, attempt: int, result=None, error: Exception = None):
+    """
+    Record a finished call in metrics, or wrap its stream so it is recorded once consumed.
+
+    Args:
+        fn: Client method called
+        kwargs: Keyword arguments it was called with
+        started: Monotonic time of the first attempt
+        attempt: Zero-based number of the last attempt
+        result: Result of the call, if it succeeded
+        error: Exception raised, if it failed
+
+    Returns:
+        The result, wrapped when it is a stream
+    """
+    endpoint, model = _endpoint(fn), kwargs.get("model")
+    if error is not None:
+        metrics.record_openai(endpoint, model, time.monotonic() - started, retries=attempt, error=type(error).__name__)
+        return None
+    if kwargs.get("stream"):
+        return metrics.InstrumentedStream(result, endpoint, model, started, attempt)
+    metrics.record_openai(
+        endpoint, model, time.monotonic() - started, getattr(result, "usage", None),
+        attempt, tools=metrics.invoked_tools(result)
+    )
+    return result
+
+def call(fn, *args, estimated_tokens: int = 0, max_retries: int = None, **kwargs):
+    """
+    Make an OpenAI call under the shared limits, retrying transient failures.
+
+    Args:
+        fn: Client method to call
+        *args: Positional arguments for fn
+        estimated_tokens: Tokens the request is expected to use
+        max_retries: Retries after the first attempt, defaults to OPENAI_MAX_RETRIES
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The result of fn
+
+    Raises:
+        openai.OpenAIError: The last error, once it is not retryable or retries run out
+    """
+    max_retries = OPENAI_MAX_RETRIES if max_retries is None else max_retries
+    started = time.monotonic()
+    with tracing.span(f"openai {_endpoint(fn)}", model=kwargs.get("model"), stream=bool(kwargs.get("stream"))) as call_span:
+        for attempt in range(max_retries + 1):
+            wait = _attempt_wait(attempt, estimated_tokens)
+            if wait > 0:
+                call_span.add_event("rate_limit_wait", seconds=round(wait, 3))
+                time.sleep(wait)
+            try:
+                with tracing.span("attempt", attempt=attempt):
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = backoff_delay(e, attempt)
+                if delay is None or attempt == max_retries:
+                    _record(fn, kwargs, started, attempt, error=e)
+                    raise
+                _count("retries")
+                call_span.add_event("retry", attempt=attempt, error=type(e).__name__, delay=round(delay, 3))
+                print(f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                # A 429 holds back every caller; other failures only this one
+                if isinstance(e, openai.RateLimitError):
+                    pause(delay)
+                else:
+                    time.sleep(delay)
+            else:
+                call_span.set_attribute("retries", attempt)
+                return _record(fn, kwargs, started, attempt, result)
+
+async def acall(fn, *args, estimated_tokens: int = 0, max_retries: int = None, **kwargs):
+    """
+    Async version of call, for AsyncOpenAI client methods.
+
+    Args:
+        fn: Async client method to call
+        *args: Positional arguments for fn
+        estimated_tokens: Tokens the request is expected to use
+        max_retries: Retries after the first attempt, defaults to OPENAI_MAX_RETRIES
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The result of fn
+
+    Raises:
+        openai.OpenAIError: The last error, once it is not retryable or retries run out
+    """
+    max_retries = OPENAI_MAX_RETRIES if max_retries is None else max_retries
+    started = time.monotonic()
+    with tracing.span(f"openai {_endpoint(fn)}", model=kwargs.get("model"), stream=bool(kwargs.get("stream"))) as call_span:
+        for attempt in range(max_retries + 1):
+            wait = _attempt_wait(attempt, estimated_tokens)
+            if wait > 0:
+                call_span.add_event("rate_limit_wait", seconds=round(wait, 3))
+                await asyncio.sleep(wait)
+            try:
+                with tracing.span("attempt", attempt=attempt):
+                    result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = backoff_delay(e, attempt)
+                if delay is None or attempt == max_retries:
+                    _record(fn, kwargs, started, attempt, error=e)
+                    raise
+                _count("retries")
+                call_span.add_event("retry", attempt=attempt, error=type(e).__name__, delay=round(delay, 3))
+                print(f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                if isinstance(e, openai.RateLimitError):
+                    pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+            else:
+                call_span.set_attribute("retries", attempt)
+                return _record(fn, kwargs, started, attempt, result)
+
+def stats() -> dict:
+    """
+    Get limiter state and counters.
+
+    Returns:
+        dict: Bucket states, 429s seen, retries made and total time callers waited
+    """
+    with _stats_lock:
+        counters = dict(_stats)
+    return dict(
+        counters,
+        waited_seconds=round(counters["waited_seconds"], 3),
+        paused_seconds=round(_paused_seconds(), 3),
+        requests=_requests.snapshot(),
+        tokens=_tokens.snapshot()
+    )
@@ -0,0 +1,166 @@
+"""
+Opt-in exact-match cache for LLM responses.
+
+Entries are keyed on everything that determines the answer: model,
+instructions, input, tool list and vector store IDs. Each kind of call has
+its own TTL, so time-sensitive answers (web search, weather) expire quickly
+while pure chat answers are kept much longer. The cache is bounded by an
+LRU and keeps hit and miss counters per kind.
+
+Enable it with RESPONSE_CACHE_ENABLED=true.
+"""
+import os
+import copy
+import json
+import hashlib
+import threading
+from dotenv import load_dotenv, find_dotenv
+from .cache_utils import LRUCache, MISSING
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "2048"))
+
+# Time-to-live in seconds for each kind of call
+RESPONSE_CACHE_TTLS = {
+    "chat": float(os.environ.get("RESPONSE_CACHE_TTL_CHAT", str(24 * 3600))),
+    "file_search": float(os.environ.get("RESPONSE_CACHE_TTL_FILE_SEARCH", "3600")),
+    "weather": float(os.environ.get("RESPONSE_CACHE_TTL_WEATHER", "600")),
+    "web_search": float(os.environ.get("RESPONSE_CACHE_TTL_WEB_SEARCH", "300")),
+}
+
+_cache = LRUCache(max_size=RESPONSE_CACHE_SIZE)
+_stats_lock = threading.Lock()
+_stats = {}
+_enabled = RESPONSE_CACHE_ENABLED
+
+def is_enabled() -> bool:
+    """
+    Check whether response caching is on.
+
+    Returns:
+        bool: True if responses are cached
+    """
+    return _enabled
+
+def set_enabled(enabled: bool):
+    """
+    Turn response caching on or off.
+
+    Args:
+        enabled: Whether to cache responses
+    """
+    global _enabled
+    _enabled = enabled
+
+def kind_for_tools(tools: list) -> str:
+    """
+    Get the cache kind for a tool list, choosing the most time-sensitive tool.
+
+    Args:
+        tools: Responses API tool definitions
+
+    Returns:
+        str: Cache kind
+    """
+    kinds = ["chat"]
+    for tool in tools or []:
+        if tool.get("type") == "web_search_preview":
+            kinds.append("web_search")
+        elif tool.get("type") == "file_search":
+            kinds.append("file_search")
+        elif tool.get("name") == "get_weather":
+            kinds.append("weather")
+    return min(kinds, key=lambda kind: RESPONSE_CACHE_TTLS[kind])
+
+def make_key(kind: str, model: str, instructions: str, user_input: str, tools=None, vector_store_ids=None):
+    """
+    Build the cache key for a call.
+
+    Args:
+        kind: Kind of call, used for TTLs and counters
+        model: Model name
+        instructions: Instructions or system message
+        user_input: User input text
+        tools: Tool definitions, if any
+        vector_store_ids: Vector store IDs searched, if any
+
+    Returns:
+        str: Cache key, or None when caching is disabled
+    """
+    if not _enabled:
+        return None
+    payload = json.dumps({
+        "kind": kind,
+        "model": model,
+        "instructions": instructions,
+        "input": user_input,
+        "tools": tools or [],
+        "vector_store_ids": sorted(vector_store_ids or []),
+    }, sort_keys=True)
+    return f"{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def _count(kind: str, field: str):
+    with _stats_lock:
+        counters = _stats.setdefault(kind, {"hits": 0, "misses": 0})
+        counters[field] += 1
+
+def get(key):
+    """
+    Get a cached response.
+
+    Args:
+        key: Key from make_key
+
+    Returns:
+        A copy of the cached response, or MISSING
+    """
+    if key is None:
+        return MISSING
+    kind = key.split(":", 1)[0]
+    value = _cache.get(key)
+    if value is MISSING:
+        _count(kind, "misses")
+        return MISSING
+    _count(kind, "hits")
+    return copy.deepcopy(value)
+
+def put(key, value, kind: str = None):
+    """
+    Store a response. Callers only store successful results.
+
+    Args:
+        key: Key from make_key
+        value: Response to store
+        kind: Kind whose TTL applies; defaults to the kind the key was built with
+    """
+    if key is None:
+        return
+    kind = kind or key.split(":", 1)[0]
+    _cache.set(key, copy.deepcopy(value), ttl=RESPONSE_CACHE_TTLS.get(kind, RESPONSE_CACHE_TTLS["chat"]))
+
+def clear():
+    """
+    Remove every cached response.
+    """
+    _cache.clear()
+
+def stats() -> dict:
+    """
+    Get cache counters.
+
+    Returns:
+        dict: Cache size and evictions plus hits and misses per kind
+    """
+    cache_stats = _cache.stats()
+    with _stats_lock:
+        by_kind = {kind: dict(counters) for kind, counters in _stats.items()}
+    return {
+        "size": cache_stats["size"],
+        "evictions": cache_stats["evictions"],
+        "hits": sum(counters["hits"] for counters in by_kind.values()),
+        "misses": sum(counters["misses"] for counters in by_kind.values()),
+        "by_kind": by_kind,
+    }
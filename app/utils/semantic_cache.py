@@ -0,0 +1,228 @@
+"""
+Semantic response cache for retrieval answers.
+
+Paraphrased questions ("what is ebola's incubation period" vs "how long does
+ebola incubate") are matched by embedding the user input and comparing it
+with earlier inputs in a local in-process index using NumPy cosine
+similarity. Answers and their source files are returned when the best match
+is above SEMANTIC_CACHE_THRESHOLD.
+
+Entries are scoped per vector store, so an answer grounded in one store is
+never served for another. Uploading to a store invalidates its scope. Inputs
+are embedded with the embedder a local store was built with, and with
+LOCAL_EMBEDDER for hosted stores, so offline setups never call the
+embeddings API.
+
+Enable it with SEMANTIC_CACHE_ENABLED=true.
+"""
+import os
+import copy
+import time
+import threading
+import numpy as np
+from dotenv import load_dotenv, find_dotenv
+from .cache_utils import MISSING
+from .embedding_utils import get_embedder
+from . import local_vectorstore
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+SEMANTIC_CACHE_TTL = float(os.environ.get("SEMANTIC_CACHE_TTL", "3600"))
+
+class _ScopeIndex:
+    """
+    Nearest-neighbour index of cached inputs for one scope.
+
+    Embeddings live in a preallocated float32 matrix that doubles in size as
+    needed. When full, the oldest entry is overwritten.
+    """
+
+    def __init__(self):
+        self.vectors = None
+        self.entries = []
+        self.next_slot = 0
+
+    def search(self, embedding: np.ndarray):
+        """
+        Find the most similar live entry.
+
+        Args:
+            embedding: Unit-length query embedding
+
+        Returns:
+            tuple: (similarity, entry) of the best match, or (None, None)
+        """
+        if not self.entries:
+            return None, None
+        scores = self.vectors[:len(self.entries)] @ embedding
+        now = time.monotonic()
+        for slot in np.argsort(-scores):
+            entry = self.entries[slot]
+            if entry["expires_at"] > now:
+                return float(scores[slot]), entry
+        return None, None
+
+    def add(self, embedding: np.ndarray, entry: dict):
+        """
+        Add an entry, growing the matrix or overwriting the oldest entry.
+
+        Args:
+            embedding: Unit-length input embedding
+            entry: Cached input, value and expiry
+        """
+        if self.vectors is None:
+            self.vectors = np.zeros((16, embedding.shape[0]), dtype=np.float32)
+
+        if len(self.entries) < SEMANTIC_CACHE_MAX_ENTRIES:
+            if len(self.entries) == self.vectors.shape[0]:
+                capacity = min(self.vectors.shape[0] * 2, SEMANTIC_CACHE_MAX_ENTRIES)
+                grown = np.zeros((capacity, self.vectors.shape[1]), dtype=np.float32)
+                grown[:len(self.entries)] = self.vectors[:len(self.entries)]
+                self.vectors = grown
+            slot = len(self.entries)
+            self.entries.append(entry)
+        else:
+            slot = self.next_slot
+            self.next_slot = (self.next_slot + 1) % SEMANTIC_CACHE_MAX_ENTRIES
+            self.entries[slot] = entry
+        self.vectors[slot] = embedding
+
+_lock = threading.Lock()
+_scopes = {}
+# Embedder per scope, resolved on first use
+_embedders = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_enabled = SEMANTIC_CACHE_ENABLED
+
+def is_enabled() -> bool:
+    """
+    Check whether semantic caching is on.
+
+    Returns:
+        bool: True if semantic caching is on
+    """
+    return _enabled
+
+def set_enabled(enabled: bool):
+    """
+    Turn semantic caching on or off.
+
+    Args:
+        enabled: Whether to use the semantic cache
+    """
+    global _enabled
+    _enabled = enabled
+
+def _embed(vector_store_id: str, user_input: str) -> np.ndarray:
+    """
+    Embed an input with its scope's embedder.
+
+    A scope over several stores uses the first store's embedder.
+
+    Args:
+        vector_store_id: Vector store ID, comma-joined for several
+        user_input: User input text
+
+    Returns:
+        np.ndarray: Unit-length input embedding
+    """
+    with _lock:
+        embedder = _embedders.get(vector_store_id)
+    if embedder is None:
+        first_store_id = vector_store_id.split(",")[0]
+        if local_vectorstore.is_local_store_id(first_store_id):
+            embedder = local_vectorstore.get_store_embedder(first_store_id)
+        else:
+            embedder = get_embedder()
+        with _lock:
+            _embedders[vector_store_id] = embedder
+    return embedder.embed([user_input])[0]
+
+def lookup(vector_store_id: str, variant: str, user_input: str):
+    """
+    Find a cached answer for a semantically similar input.
+
+    Args:
+        vector_store_id: Vector store the answer must be grounded in (comma-joined for several)
+        variant: Sub-scope for calls with different tools or models
+        user_input: User input text
+
+    Returns:
+        tuple: The input embedding (pass it to store) and the cached value or
+        MISSING. The embedding is None when the cache is off or embedding failed.
+    """
+    if not _enabled or not vector_store_id:
+        return None, MISSING
+
+    try:
+        embedding = _embed(vector_store_id, user_input)
+    except Exception as e:
+        print(f"Error embedding input for semantic cache: {e}")
+        return None, MISSING
+
+    with _lock:
+        index = _scopes.get(vector_store_id, {}).get(variant)
+        similarity, entry = index.search(embedding) if index else (None, None)
+        if entry is not None and similarity >= SEMANTIC_CACHE_THRESHOLD:
+            _stats["hits"] += 1
+            return embedding, copy.deepcopy(entry["value"])
+        _stats["misses"] += 1
+    return embedding, MISSING
+
+def store(vector_store_id: str, variant: str, user_input: str, value, embedding=None):
+    """
+    Cache an answer for later semantic lookups.
+
+    Args:
+        vector_store_id: Vector store the answer is grounded in
+        variant: Sub-scope for calls with different tools or models
+        user_input: User input text
+        value: Answer to cache, e.g. (text, source_files)
+        embedding: Embedding returned by lookup, to avoid embedding twice
+    """
+    if not _enabled or not vector_store_id:
+        return
+    if embedding is None:
+        try:
+            embedding = _embed(vector_store_id, user_input)
+        except Exception as e:
+            print(f"Error embedding input for semantic cache: {e}")
+            return
+
+    entry = {
+        "input": user_input,
+        "value": copy.deepcopy(value),
+        "expires_at": time.monotonic() + SEMANTIC_CACHE_TTL,
+    }
+    with _lock:
+        index = _scopes.setdefault(vector_store_id, {}).setdefault(variant, _ScopeIndex())
+        index.add(embedding, entry)
+
+def invalidate(vector_store_id: str):
+    """
+    Drop every cached answer for a vector store, e.g. after its files change.
+
+    Args:
+        vector_store_id: ID of the vector store
+    """
+    with _lock:
+        # Scopes for multi-store searches are keyed on the comma-joined store IDs
+        for scope in [scope for scope in _scopes if vector_store_id in scope.split(",")]:
+            del _scopes[scope]
+            _embedders.pop(scope, None)
+            _stats["invalidations"] += 1
+
+def stats() -> dict:
+    """
+    Get cache counters.
+
+    Returns:
+        dict: Hits, misses, invalidations and the number of cached entries
+    """
+    with _lock:
+        entries = sum(len(index.entries) for variants in _scopes.values() for index in variants.values())
+        return dict(_stats, entries=entries)
@@ -0,0 +1,82 @@
+"""
+Client for the headless HTTP service in server.py.
+
+When SERVICE_URL is set, the Streamlit chat interface sends turns to the
+service and renders the Server-Sent Events it streams back, instead of
+running the pipeline in its own script thread.
+"""
+import os
+import json
+import httpx
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+SERVICE_URL = os.environ.get("SERVICE_URL", "").rstrip("/")
+SERVICE_TIMEOUT = float(os.environ.get("SERVICE_TIMEOUT", "300"))
+
+_client = None
+
+def is_enabled() -> bool:
+    """
+    Check whether turns should go to the service.
+
+    Returns:
+        bool: True if SERVICE_URL is set
+    """
+    return bool(SERVICE_URL)
+
+def _get_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        _client = httpx.Client(base_url=SERVICE_URL, timeout=httpx.Timeout(SERVICE_TIMEOUT, connect=5.0))
+    return _client
+
+def iter_sse(lines):
+    """
+    Parse Server-Sent Events.
+
+    Args:
+        lines: Iterator of text lines
+
+    Yields:
+        tuple: (event name, decoded JSON data)
+    """
+    event_type, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event_type, json.loads("\n".join(data))
+            event_type, data = "message", []
+        elif line.startswith("event:"):
+            event_type = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def stream_turn(conversation_id: str, user_input: str, tools_config: dict):
+    """
+    Run a chat turn on the service and stream its events.
+
+    Args:
+        conversation_id: ID of the conversation
+        user_input: User input text
+        tools_config: Dictionary of enabled tools
+
+    Yields:
+        dict: Pipeline events, ending with turn_completed, which carries the
+        stored user and assistant messages, or error
+    """
+    payload = {"message": user_input, "conversation_id": conversation_id, "tools_config": tools_config, "stream": True}
+    try:
+        with _get_client().stream("POST", "/v1/chat", json=payload) as response:
+            if response.status_code != 200:
+                response.read()
+                yield {"type": "error", "text": f"Error: service returned {response.status_code}: {response.text}"}
+                return
+            for event_type, event in iter_sse(response.iter_lines()):
+                if event_type != "conversation":
+                    yield event
+    except httpx.HTTPError as e:
+        print(f"Error calling service: {e}")
+        yield {"type": "error", "text": f"Error: {str(e)}"}
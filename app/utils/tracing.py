@@ -0,0 +1,388 @@
+"""
+Span-based tracing for the turn pipeline.
+
+A span times one stage of a turn: the turn itself, a tool response, an
+OpenAI call and each of its attempts, geocoding, a forecast, file search,
+rendering. The active span is tracked in a context variable, so spans nest
+without being passed around. That works across function calls, and across
+asyncio tasks, which copy the context. Work handed to a thread pool keeps
+its parent when the callable is wrapped with wrap().
+
+When a root span ends, its finished trace is handed to the configured
+exporters. A span that ends after its root, e.g. a background task that
+outlives the turn, is exported on its own as a follow-up batch with the
+same trace id. TRACE_EXPORTER selects the built-in ones, comma-separated:
+
+- json: one JSON object per trace, one line each, in TRACE_FILE
+- otlp: OTLP/JSON ExportTraceServiceRequest lines in TRACE_FILE, the format
+  of the OpenTelemetry collector's file exporter
+- none (default): spans are timed but not exported
+
+Other exporters can be registered with add_exporter. Any object with an
+export(spans) method works.
+"""
+import os
+import json
+import time
+import secrets
+import threading
+import functools
+import contextlib
+import contextvars
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.path.expanduser(os.environ.get(
+    "TRACE_FILE",
+    os.path.join("~", ".cache", "rag_agentic", "traces.jsonl")
+))
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "rag-agentic")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """
+    One timed stage of a trace.
+    """
+
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        """
+        Args:
+            name: Stage name
+            parent: Parent span, or None to start a new trace
+            attributes: Initial attributes
+        """
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = "ok"
+        self.status_message = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._started = time.perf_counter()
+        self._trace = parent._trace if parent else _Trace()
+
+    @property
+    def duration_ms(self):
+        """
+        Returns:
+            float or None: Duration in milliseconds, None while the span is open
+        """
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value):
+        """
+        Set an attribute.
+
+        Args:
+            key: Attribute name
+            value: String, number or boolean
+        """
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        """
+        Record a point-in-time event, e.g. a retry.
+
+        Args:
+            name: Event name
+            **attributes: Event attributes
+        """
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def record_exception(self, error: Exception):
+        """
+        Mark the span failed by an exception.
+
+        Args:
+            error: The exception
+        """
+        self.status = "error"
+        self.status_message = f"{type(error).__name__}: {error}"
+        self.add_event("exception", type=type(error).__name__, message=str(error))
+
+    def end(self):
+        """
+        Finish the span, exporting the trace once its root span ends.
+        """
+        if self.end_ns is not None:
+            return
+        # Durations come from the monotonic clock, so wall clock steps do not skew them
+        self.end_ns = self.start_ns + int((time.perf_counter() - self._started) * 1e9)
+        self._trace.closed(self, is_root=self.parent_id is None)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: The span as plain data
+        """
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3) if self.end_ns is not None else None,
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+class _Trace:
+    """
+    Finished spans of one trace, exported when the root span ends.
+
+    Spans that end later are exported as they end.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.exported = False
+        self._lock = threading.Lock()
+
+    def closed(self, span: Span, is_root: bool):
+        with self._lock:
+            self.spans.append(span)
+            if not (is_root or self.exported):
+                return
+            self.exported = True
+            spans, self.spans = self.spans, []
+        _export(spans)
+
+class JsonFileExporter:
+    """
+    Append each trace as one JSON line: {"trace_id": ..., "spans": [...]}.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: File to append to, defaults to TRACE_FILE
+        """
+        self.path = path or TRACE_FILE
+        self._lock = threading.Lock()
+
+    def _line(self, spans: list) -> dict:
+        return {"trace_id": spans[0].trace_id, "spans": [span.to_dict() for span in spans]}
+
+    def export(self, spans: list):
+        """
+        Write a finished trace.
+
+        Args:
+            spans: Spans of the trace, root last
+        """
+        line = json.dumps(self._line(spans), default=str)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+class OtlpFileExporter(JsonFileExporter):
+    """
+    Append each trace as an OTLP/JSON ExportTraceServiceRequest line.
+    """
+
+    def _line(self, spans: list) -> dict:
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "events": [
+                    {"name": event["name"], "timeUnixNano": str(event["time_ns"]), "attributes": _otlp_attributes(event["attributes"])}
+                    for event in span.events
+                ],
+                "status": {"code": 2, "message": span.status_message} if span.status == "error" else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": "rag_agentic.tracing"}, "spans": otlp_spans}]
+            }]
+        }
+
+class MemoryExporter:
+    """
+    Keep the most recent traces in memory, e.g. for benchmarks.
+    """
+
+    def __init__(self, max_traces: int = 100):
+        """
+        Args:
+            max_traces: Traces kept before the oldest are dropped
+        """
+        self.max_traces = max_traces
+        self.traces = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: list):
+        """
+        Keep a finished trace.
+
+        Args:
+            spans: Spans of the trace
+        """
+        with self._lock:
+            self.traces.append([span.to_dict() for span in spans])
+            del self.traces[:-self.max_traces]
+
+_BUILTIN_EXPORTERS = {"json": JsonFileExporter, "otlp": OtlpFileExporter}
+
+_exporters = [
+    _BUILTIN_EXPORTERS[name.strip()]()
+    for name in TRACE_EXPORTER.split(",") if name.strip() in _BUILTIN_EXPORTERS
+]
+_exporters_lock = threading.Lock()
+
+def add_exporter(exporter):
+    """
+    Register an exporter.
+
+    Args:
+        exporter: Object with an export(spans) method
+    """
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+def remove_exporter(exporter):
+    """
+    Unregister an exporter.
+
+    Args:
+        exporter: A registered exporter
+    """
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+def _export(spans: list):
+    with _exporters_lock:
+        exporters = list(_exporters)
+    for exporter in exporters:
+        try:
+            exporter.export(spans)
+        except Exception as e:
+            print(f"Error exporting trace: {e}")
+
+def current_span():
+    """
+    Returns:
+        Span or None: The active span
+    """
+    return _current_span.get()
+
+def current_trace_id():
+    """
+    Returns:
+        str or None: ID of the active trace
+    """
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+def start_span(name: str, **attributes) -> Span:
+    """
+    Start a child of the active span without making it active.
+
+    Useful for stages that span generator yields, where changing the active
+    span would leak into the consumer. Call end() when the stage finishes.
+
+    Args:
+        name: Stage name
+        **attributes: Initial attributes
+
+    Returns:
+        Span: The started span
+    """
+    return Span(name, _current_span.get(), attributes)
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span and make it the active span.
+
+    Exceptions are recorded on the span and re-raised.
+
+    Args:
+        name: Stage name
+        **attributes: Initial attributes
+
+    Yields:
+        Span: The active span
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def traced(name: str = None):
+    """
+    Decorate a function so every call is a span.
+
+    Args:
+        name: Span name, defaults to the function name
+
+    Returns:
+        Decorator
+    """
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def wrap(fn):
+    """
+    Bind a callable to the current context, so it keeps its parent span in another thread.
+
+    Args:
+        fn: Callable to run elsewhere, e.g. with ThreadPoolExecutor
+
+    Returns:
+        Callable that runs fn in a copy of the current context
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Each call gets its own copy, as a context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
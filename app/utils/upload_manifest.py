@@ -0,0 +1,111 @@
+"""
+Per-vector-store manifest of uploaded file contents.
+
+Each vector store gets a small JSON file mapping the SHA-256 of every
+uploaded file's bytes to the file ID it was attached as. Uploads consult it
+to skip content the store already has, and incremental syncs diff it against
+a directory to find new, changed and removed files without any API calls.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+UPLOAD_MANIFEST_DIR = os.path.expanduser(os.environ.get(
+    "UPLOAD_MANIFEST_DIR",
+    os.path.join("~", ".cache", "rag_agentic", "manifests")
+))
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hash a file's contents without reading it into memory at once.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _manifest_path(vector_store_id: str) -> str:
+    return os.path.join(UPLOAD_MANIFEST_DIR, f"{vector_store_id}.json")
+
+def store_lock(vector_store_id: str) -> threading.Lock:
+    """
+    Get the lock guarding a store's manifest for read-modify-write updates.
+
+    Args:
+        vector_store_id: ID of the vector store
+
+    Returns:
+        threading.Lock: Lock for the store
+    """
+    with _locks_guard:
+        return _locks.setdefault(vector_store_id, threading.Lock())
+
+def load(vector_store_id: str) -> dict:
+    """
+    Load a store's manifest.
+
+    Args:
+        vector_store_id: ID of the vector store
+
+    Returns:
+        dict: Entries keyed by SHA-256, each with file_id, path, size and uploaded_at
+    """
+    try:
+        with open(_manifest_path(vector_store_id), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error reading upload manifest for {vector_store_id}: {e}")
+        return {}
+
+def save(vector_store_id: str, manifest: dict):
+    """
+    Write a store's manifest atomically.
+
+    Args:
+        vector_store_id: ID of the vector store
+        manifest: Entries keyed by SHA-256
+    """
+    os.makedirs(UPLOAD_MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(vector_store_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def make_entry(file_id: str, file_path: str) -> dict:
+    """
+    Build a manifest entry for an uploaded file.
+
+    Args:
+        file_id: ID the file was attached as
+        file_path: Path the file was uploaded from
+
+    Returns:
+        dict: Manifest entry
+    """
+    return {
+        "file_id": file_id,
+        "path": os.path.abspath(file_path),
+        "size": os.path.getsize(file_path),
+        "uploaded_at": int(time.time())
+    }
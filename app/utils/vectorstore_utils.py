@@ -1,17 +1,30 @@
 import os
 import time
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
-import PyPDF2
-from openai import OpenAI
 from dotenv import load_dotenv, find_dotenv
+from .client_utils import get_client
+from . import semantic_cache
+from .document_utils import extract_text_from_pdf
+from . import local_vectorstore
+from . import upload_manifest
+from . import bulk_upload
+from . import metadata_index
+from . import rate_limit
 
 # Load environment variables
 _ = load_dotenv(find_dotenv())
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# "hosted" uses OpenAI vector stores, "local" uses the offline engine in local_vectorstore
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "hosted").lower()
+
+def is_local_backend() -> bool:
+    """
+    Check whether new vector stores are created locally.
+    
+    Returns:
+        bool: True if VECTOR_STORE_BACKEND is "local"
+    """
+    return VECTOR_STORE_BACKEND == "local"
 
 def create_vector_store(store_name: str) -> dict:
     """
@@ -23,8 +36,11 @@ def create_vector_store(store_name: str) -> dict:
     Returns:
         dict: Details of the created vector store
     """
+    if is_local_backend():
+        return local_vectorstore.create_vector_store(store_name)
+    
     try:
-        vector_store = client.vector_stores.create(name=store_name)
+        vector_store = rate_limit.call(get_client().vector_stores.create, name=store_name)
         details = {
             "id": vector_store.id,
             "name": vector_store.name,
@@ -46,8 +62,11 @@ def get_vector_store_details(vector_store_id: str) -> dict:
     Returns:
         dict: Details of the vector store
     """
+    if local_vectorstore.is_local_store_id(vector_store_id):
+        return local_vectorstore.get_vector_store_details(vector_store_id)
+    
     try:
-        vector_store = client.vector_stores.retrieve(vector_store_id=vector_store_id)
+        vector_store = rate_limit.call(get_client().vector_stores.retrieve, vector_store_id=vector_store_id)
         details = {
             "id": vector_store.id,
             "name": vector_store.name,
@@ -59,6 +78,19 @@ def get_vector_store_details(vector_store_id: str) -> dict:
         print(f"Error retrieving vector store: {e}")
         return {}
 
+def _create_file(file_path: str):
+    """
+    Upload a file's bytes, opening it afresh so retries resend the whole file.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        FileObject: The uploaded file
+    """
+    with open(file_path, 'rb') as f:
+        return get_client().files.create(file=f, purpose="assistants")
+
 def upload_single_file(file_path: str, vector_store_id: str):
     """
     Upload a single file to a vector store.
@@ -70,10 +102,14 @@ def upload_single_file(file_path: str, vector_store_id: str):
     Returns:
         dict: Status of the upload
     """
+    if local_vectorstore.is_local_store_id(vector_store_id):
+        return local_vectorstore.upload_single_file(file_path, vector_store_id)
+    
     file_name = os.path.basename(file_path)
     try:
-        file_response = client.files.create(file=open(file_path, 'rb'), purpose="assistants")
-        attach_response = client.vector_stores.files.create(
+        file_response = rate_limit.call(_create_file, file_path)
+        attach_response = rate_limit.call(
+            get_client().vector_stores.files.create,
             vector_store_id=vector_store_id,
             file_id=file_response.id
         )
@@ -82,57 +118,303 @@ def upload_single_file(file_path: str, vector_store_id: str):
         print(f"Error with {file_name}: {str(e)}")
         return {"file": file_name, "status": "failed", "error": str(e)}
 
-def upload_files_to_vector_store(file_paths: list, vector_store_id: str):
+def _upload_each(file_paths: list, vector_store_id: str, max_workers: int = None, attributes: dict = None) -> tuple:
+    """
+    Upload files with the store's backend.
+    
+    Local stores extract PDF text across a process pool once there are
+    enough pages to be worth it.
+    Hosted stores go through the adaptive bulk uploader, which also waits for
+    indexing to finish.
+    
+    Args:
+        file_paths: List of distinct file paths
+        vector_store_id: ID of the vector store
+        max_workers: Extraction processes for local stores, defaults to the CPU count
+        attributes: Optional metadata per file path, stored with the file
+        
+    Returns:
+        tuple: (file_path, result) pairs and a dict of pipeline stats
+    """
+    attributes = attributes or {}
+    if local_vectorstore.is_local_store_id(vector_store_id):
+        # Files with metadata skip the PDF pool, which does not carry attributes
+        pdf_paths = [
+            file_path for file_path in file_paths
+            if file_path.lower().endswith(".pdf") and file_path not in attributes
+        ]
+        results = local_vectorstore.ingest_pdfs(pdf_paths, vector_store_id, max_workers) if pdf_paths else []
+        pdf_set = set(pdf_paths)
+        results.extend(
+            (file_path, local_vectorstore.upload_single_file(file_path, vector_store_id, attributes.get(file_path)))
+            for file_path in file_paths if file_path not in pdf_set
+        )
+        return results, {}
+    
+    if not file_paths:
+        return [], {}
+    report = bulk_upload.upload_files(file_paths, vector_store_id, attributes)
+    results = report.pop("results")
+    return results, report
+
+def _hash_files(file_paths: list, stats: dict, failed: set = None) -> dict:
+    """
+    Hash files by content, recording unreadable files as failures.
+    
+    Args:
+        file_paths: List of file paths
+        stats: Stats dict to record failures in
+        failed: Optional set the absolute paths of unreadable files are added to
+        
+    Returns:
+        dict: First file path for each SHA-256, in input order
+    """
+    hashes = {}
+    for file_path in file_paths:
+        try:
+            sha256 = upload_manifest.file_sha256(file_path)
+        except Exception as e:
+            print(f"Error hashing {file_path}: {e}")
+            if failed is not None:
+                failed.add(os.path.abspath(file_path))
+            stats["failed_uploads"] += 1
+            stats["errors"].append({"file": os.path.basename(file_path), "status": "failed", "error": str(e)})
+            continue
+        if sha256 in hashes:
+            stats["skipped"] += 1
+        else:
+            hashes[sha256] = file_path
+    return hashes
+
+def _upload_new(hashes: dict, vector_store_id: str, stats: dict, max_workers: int = None, attributes: dict = None):
+    """
+    Upload files and record the successful ones in the store's manifest.
+    
+    Args:
+        hashes: File path for each SHA-256 to upload
+        vector_store_id: ID of the vector store
+        stats: Stats dict to update
+        max_workers: Extraction processes for local stores
+        attributes: Optional metadata per file path
+    """
+    sha_by_path = {file_path: sha256 for sha256, file_path in hashes.items()}
+    uploaded = {}
+    results, pipeline_stats = _upload_each(list(hashes.values()), vector_store_id, max_workers, attributes)
+    stats.update(pipeline_stats)
+    stats["files"] = [result for _, result in results]
+    for file_path, result in results:
+        if result["status"] == "success":
+            stats["successful_uploads"] += 1
+            uploaded[sha_by_path[file_path]] = upload_manifest.make_entry(result["file_id"], file_path)
+        else:
+            stats["failed_uploads"] += 1
+            stats["errors"].append(result)
+    
+    if uploaded:
+        with upload_manifest.store_lock(vector_store_id):
+            manifest = upload_manifest.load(vector_store_id)
+            manifest.update(uploaded)
+            upload_manifest.save(vector_store_id, manifest)
+
+def upload_files_to_vector_store(file_paths: list, vector_store_id: str, max_workers: int = None, attributes: dict = None):
     """
     Upload multiple files to a vector store in parallel.
     
+    Files whose contents are already attached to the store, according to its
+    upload manifest, are skipped, as are duplicates within file_paths.
+    
     Args:
         file_paths: List of file paths
         vector_store_id: ID of the vector store
+        max_workers: Extraction processes for local stores, defaults to the CPU count
+        attributes: Optional metadata per file path, stored with the file and
+            returned with search results
         
     Returns:
         dict: Stats about the upload
     """
-    stats = {"total_files": len(file_paths), "successful_uploads": 0, "failed_uploads": 0, "errors": []}
+    stats = {"total_files": len(file_paths), "successful_uploads": 0, "failed_uploads": 0, "skipped": 0, "errors": []}
+    
+    hashes = _hash_files(file_paths, stats)
+    manifest = upload_manifest.load(vector_store_id)
+    for sha256 in [sha256 for sha256 in hashes if sha256 in manifest]:
+        del hashes[sha256]
+        stats["skipped"] += 1
+    
+    _upload_new(hashes, vector_store_id, stats, max_workers, attributes)
+    
+    # Cached answers may no longer match the store's contents
+    if stats["successful_uploads"] > 0:
+        semantic_cache.invalidate(vector_store_id)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(upload_single_file, file_path, vector_store_id): file_path for file_path in file_paths}
-        for future in concurrent.futures.as_completed(futures):
-            result = future.result()
-            if result["status"] == "success":
-                stats["successful_uploads"] += 1
-            else:
-                stats["failed_uploads"] += 1
-                stats["errors"].append(result)
-
     return stats
 
-def extract_text_from_pdf(file_path):
+def detach_file(vector_store_id: str, file_id: str) -> bool:
     """
-    Extract text from a PDF file.
+    Remove a file from a vector store and delete the uploaded file.
     
     Args:
-        file_path: Path to the PDF file
+        vector_store_id: ID of the vector store
+        file_id: ID of the file
         
     Returns:
-        str: Extracted text
+        bool: True if the file was removed
     """
-    text = ""
+    # The index entry goes only once the store no longer has the file, so a
+    # failed detach keeps the file findable through metadata filters
+    if local_vectorstore.is_local_store_id(vector_store_id):
+        removed = local_vectorstore.delete_file(vector_store_id, file_id)
+        if removed:
+            metadata_index.remove_file(vector_store_id, file_id)
+        return removed
+    
     try:
-        with open(file_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
+        rate_limit.call(get_client().vector_stores.files.delete, vector_store_id=vector_store_id, file_id=file_id)
+        metadata_index.remove_file(vector_store_id, file_id)
+        rate_limit.call(get_client().files.delete, file_id)
+        return True
     except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-    return text
+        print(f"Error detaching {file_id}: {e}")
+        return False
+
+def _in_scope(path: str, roots: list, recursive: bool) -> bool:
+    """
+    Check whether a manifest entry's path lies under one of the synced directories.
+    """
+    if not path:
+        return False
+    if not recursive:
+        return os.path.dirname(path) in roots
+    return any(os.path.commonpath([path, root]) == root for root in roots)
+
+def sync_vector_store(file_paths: list, vector_store_id: str, detach_removed: bool = True, root: str = None):
+    """
+    Bring a vector store in line with a set of files.
+    
+    Only files whose contents are not in the store's upload manifest are
+    uploaded. Manifest entries whose contents are no longer among file_paths,
+    including the old version of a changed file, are detached, but only
+    those uploaded from the synced directory: root and its subdirectories,
+    or without root, the directories file_paths are in. Files added to the
+    store some other way, such as Zotero imports, are never detached. An
+    empty listing detaches nothing, since it more likely means a wrong
+    directory than an emptied one, and neither does a file that could not
+    be read. Re-syncing an unchanged set of files makes no API calls.
+    
+    Args:
+        file_paths: Files the store should contain
+        vector_store_id: ID of the vector store
+        detach_removed: Whether to detach files that are no longer present
+        root: Directory file_paths were listed from
+        
+    Returns:
+        dict: Stats about the sync
+    """
+    stats = {
+        "total_files": len(file_paths), "successful_uploads": 0, "failed_uploads": 0,
+        "skipped": 0, "unchanged": 0, "detached": 0, "errors": []
+    }
+    
+    unreadable = set()
+    hashes = _hash_files(file_paths, stats, unreadable)
+    manifest = upload_manifest.load(vector_store_id)
+    new_hashes = {sha256: file_path for sha256, file_path in hashes.items() if sha256 not in manifest}
+    stats["unchanged"] = len(hashes) - len(new_hashes)
+    
+    _upload_new(new_hashes, vector_store_id, stats)
+    
+    if detach_removed and not file_paths:
+        print("Nothing to sync; not detaching any files")
+    elif detach_removed:
+        if root is not None:
+            roots, recursive = [os.path.abspath(root)], True
+        else:
+            roots, recursive = {os.path.dirname(os.path.abspath(file_path)) for file_path in file_paths}, False
+        detached = [
+            sha256 for sha256, entry in manifest.items()
+            if sha256 not in hashes
+            and _in_scope(entry.get("path"), roots, recursive)
+            and entry.get("path") not in unreadable
+            and detach_file(vector_store_id, entry["file_id"])
+        ]
+        if detached:
+            with upload_manifest.store_lock(vector_store_id):
+                manifest = upload_manifest.load(vector_store_id)
+                for sha256 in detached:
+                    manifest.pop(sha256, None)
+                upload_manifest.save(vector_store_id, manifest)
+            stats["detached"] = len(detached)
+    
+    if stats["successful_uploads"] > 0 or stats["detached"] > 0:
+        semantic_cache.invalidate(vector_store_id)
+    
+    return stats
+
+def _list_files(directory: str, extensions: tuple = None) -> list:
+    """
+    List files under a directory, optionally filtered by extension.
+    
+    Args:
+        directory: Directory to scan recursively
+        extensions: Lowercase extensions to keep, e.g. (".pdf",)
+        
+    Returns:
+        list: Sorted file paths
+    """
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if extensions is None or os.path.splitext(name)[1].lower() in extensions
+    )
+
+def sync_directory(directory: str, vector_store_id: str, extensions: tuple = None, detach_removed: bool = True):
+    """
+    Incrementally sync a directory into a vector store.
+    
+    Args:
+        directory: Directory to scan recursively
+        vector_store_id: ID of the vector store
+        extensions: Lowercase extensions to keep, e.g. (".pdf",); defaults to all files
+        detach_removed: Whether to detach files that are no longer present
+        
+    Returns:
+        dict: Stats about the sync
+    """
+    if not os.path.isdir(directory):
+        print(f"Error syncing {directory}: not a directory")
+        return {
+            "total_files": 0, "successful_uploads": 0, "failed_uploads": 0, "skipped": 0, "unchanged": 0,
+            "detached": 0, "errors": [{"file": directory, "status": "failed", "error": "Not a directory"}]
+        }
+    return sync_vector_store(_list_files(directory, extensions), vector_store_id, detach_removed, root=directory)
+
+def ingest_pdf_directory(directory: str, vector_store_id: str, max_workers: int = None):
+    """
+    Ingest every PDF in a directory into a vector store.
+    
+    Local stores extract text with a process pool spread over every core and
+    stream pages into the index, so memory stays flat however large the
+    documents are. Hosted stores extract text server-side, so the files are
+    uploaded as they are.
+    
+    Args:
+        directory: Directory to scan recursively for PDFs
+        vector_store_id: ID of the vector store
+        max_workers: Extraction processes for local stores, defaults to the CPU count
+        
+    Returns:
+        dict: Stats about the ingestion
+    """
+    return upload_files_to_vector_store(_list_files(directory, (".pdf",)), vector_store_id, max_workers)
 
 def query_vector_store(vector_store_id: str, query: str, max_results: int = 5):
     """
     Query a vector store.
     
+    The query is first prefiltered through the metadata index, so questions
+    naming a year, author, tag or item key only search matching items.
+    
     Args:
         vector_store_id: ID of the vector store
         query: Query string
@@ -141,12 +423,15 @@ def query_vector_store(vector_store_id: str, query: str, max_results: int = 5):
     Returns:
         list: Search results
     """
+    if local_vectorstore.is_local_store_id(vector_store_id):
+        return local_vectorstore.query_vector_store(vector_store_id, query, max_results)
+    
     try:
-        response = client.vector_stores.search(
-            vector_store_id=vector_store_id,
-            query=query,
-            max_num_results=max_results
-        )
+        request = {"vector_store_id": vector_store_id, "query": query, "max_num_results": max_results}
+        filters = metadata_index.hosted_filter(metadata_index.prefilter(vector_store_id, query))
+        if filters:
+            request["filters"] = filters
+        response = rate_limit.call(get_client().vector_stores.search, **request)
         return response
     except Exception as e:
         print(f"Error querying vector store: {e}")
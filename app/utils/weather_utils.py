@@ -0,0 +1,231 @@
+"""
+Open-Meteo forecast fetching and formatting for the weather tool.
+
+Forecasts are cached per rounded coordinate and unit until Open-Meteo's next
+15-minute update, and concurrent requests for the same key share a single
+upstream fetch.
+"""
+import os
+import time
+from dotenv import load_dotenv, find_dotenv
+from .cache_utils import LRUCache, SingleFlight, MISSING
+from .http_utils import http_get
+from . import tracing
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Open-Meteo refreshes current conditions every 15 minutes
+FORECAST_TTL = float(os.environ.get("FORECAST_TTL", "900"))
+FORECAST_CACHE_SIZE = int(os.environ.get("FORECAST_CACHE_SIZE", "1024"))
+# Two decimal places is roughly 1 km, finer than the model grid
+FORECAST_COORD_PRECISION = int(os.environ.get("FORECAST_COORD_PRECISION", "2"))
+
+# Map weather codes to descriptions
+WEATHER_DESCRIPTIONS = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Fog",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    56: "Light freezing drizzle",
+    57: "Dense freezing drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    66: "Light freezing rain",
+    67: "Heavy freezing rain",
+    71: "Slight snow fall",
+    73: "Moderate snow fall",
+    75: "Heavy snow fall",
+    77: "Snow grains",
+    80: "Slight rain showers",
+    81: "Moderate rain showers",
+    82: "Violent rain showers",
+    85: "Slight snow showers",
+    86: "Heavy snow showers",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail"
+}
+
+_forecast_cache = LRUCache(max_size=FORECAST_CACHE_SIZE)
+_forecast_flight = SingleFlight()
+
+def forecast_key(lat: float, lon: float, unit: str) -> tuple:
+    """
+    Build the cache key for a forecast.
+
+    Args:
+        lat: Latitude
+        lon: Longitude
+        unit: Temperature unit
+
+    Returns:
+        tuple: Rounded latitude, rounded longitude and unit
+    """
+    return (round(lat, FORECAST_COORD_PRECISION), round(lon, FORECAST_COORD_PRECISION), unit)
+
+def _seconds_until_next_update() -> float:
+    """
+    Get the time left until Open-Meteo's next scheduled update.
+
+    Returns:
+        float: Seconds until the next TTL boundary
+    """
+    return FORECAST_TTL - (time.time() % FORECAST_TTL)
+
+def _request_forecast(lat, lon, unit: str):
+    """
+    Fetch a current and hourly forecast from Open-Meteo.
+
+    Args:
+        lat: Latitude, or comma-separated latitudes for several locations
+        lon: Longitude, or comma-separated longitudes for several locations
+        unit: Temperature unit (celsius or fahrenheit)
+
+    Returns:
+        dict or list: Forecast data (a list when several locations were
+        requested), or None if the request failed
+    """
+    weather_url = f"{OPEN_METEO_URL}?latitude={lat}&longitude={lon}&current=temperature_2m,weather_code,wind_speed_10m&hourly=temperature_2m,precipitation_probability,weather_code&temperature_unit={unit}&wind_speed_unit=km/h"
+    weather_response = http_get(weather_url)
+    if weather_response.status_code == 200:
+        return weather_response.json()
+    return None
+
+@tracing.traced("forecast")
+def fetch_forecast(lat: float, lon: float, unit="celsius"):
+    """
+    Get the forecast for a location, using the cache when possible.
+
+    Args:
+        lat: Latitude
+        lon: Longitude
+        unit: Temperature unit (celsius or fahrenheit)
+
+    Returns:
+        dict: Forecast data, or None if the request failed
+    """
+    key = forecast_key(lat, lon, unit)
+    cached = _forecast_cache.get(key)
+    tracing.current_span().set_attribute("cache_hit", cached is not MISSING)
+    if cached is not MISSING:
+        return cached
+
+    def load():
+        # Another caller may have filled the cache while we waited to lead
+        cached = _forecast_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        weather_data = _request_forecast(key[0], key[1], unit)
+        if weather_data is not None:
+            _forecast_cache.set(key, weather_data, ttl=_seconds_until_next_update())
+        return weather_data
+
+    return _forecast_flight.do(key, load)
+
+@tracing.traced("forecasts")
+def fetch_forecasts(coordinates: list, unit="celsius") -> list:
+    """
+    Get forecasts for several locations with at most one upstream request.
+
+    Cached locations are served from the cache. The rest are fetched together
+    using Open-Meteo's comma-separated multi-coordinate support.
+
+    Args:
+        coordinates: List of (lat, lon) tuples
+        unit: Temperature unit (celsius or fahrenheit)
+
+    Returns:
+        list: Forecast data for each location in input order, None where unavailable
+    """
+    keys = [forecast_key(lat, lon, unit) for lat, lon in coordinates]
+    results = {}
+    missing = []
+    for key in keys:
+        if key in results or key in missing:
+            continue
+        cached = _forecast_cache.get(key)
+        if cached is not MISSING:
+            results[key] = cached
+        else:
+            missing.append(key)
+
+    if len(missing) == 1:
+        results[missing[0]] = fetch_forecast(missing[0][0], missing[0][1], unit)
+    elif missing:
+        def load():
+            latitudes = ",".join(str(key[0]) for key in missing)
+            longitudes = ",".join(str(key[1]) for key in missing)
+            batch = _request_forecast(latitudes, longitudes, unit)
+            if not isinstance(batch, list) or len(batch) != len(missing):
+                return {}
+            ttl = _seconds_until_next_update()
+            for key, weather_data in zip(missing, batch):
+                _forecast_cache.set(key, weather_data, ttl=ttl)
+            return dict(zip(missing, batch))
+
+        results.update(_forecast_flight.do(tuple(missing), load))
+
+    return [results.get(key) for key in keys]
+
+def format_weather(display_name: str, weather_data: dict, unit="celsius"):
+    """
+    Format forecast data as markdown.
+
+    Args:
+        display_name: Name of the location
+        weather_data: Forecast data from Open-Meteo
+        unit: Temperature unit (celsius or fahrenheit)
+
+    Returns:
+        str: Formatted weather information, or None if there is no current data
+    """
+    current = weather_data.get('current', {})
+    if not current:
+        return None
+
+    temperature = current.get('temperature_2m')
+    windspeed = current.get('wind_speed_10m')
+    weathercode = current.get('weather_code')
+
+    weather_description = WEATHER_DESCRIPTIONS.get(weathercode, "Unknown")
+
+    # Get hourly forecast for precipitation probability
+    hourly = weather_data.get('hourly', {})
+    precipitation_probs = hourly.get('precipitation_probability', [])
+    next_hours_precip = precipitation_probs[:12] if precipitation_probs else []
+
+    # Calculate chance of precipitation
+    if next_hours_precip:
+        max_precip_prob = max(next_hours_precip)
+        precip_info = f"\n- **Precipitation Chance:** {max_precip_prob}% (next 12 hours)" if max_precip_prob > 0 else ""
+    else:
+        precip_info = ""
+
+    formatted_weather = f"""
+## Weather in {display_name}
+- **Temperature:** {temperature}°{unit[0].upper()}
+- **Conditions:** {weather_description}
+- **Wind Speed:** {windspeed} km/h{precip_info}
+    """
+
+    return formatted_weather.strip()
+
+def forecast_cache_stats() -> dict:
+    """
+    Get forecast cache counters.
+
+    Returns:
+        dict: Cache size, hits, misses, evictions and coalesced requests
+    """
+    stats = _forecast_cache.stats()
+    stats["coalesced"] = _forecast_flight.shared
+    return stats
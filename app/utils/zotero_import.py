@@ -0,0 +1,247 @@
+"""
+Streaming importer for Zotero JSON exports.
+
+An export is a JSON array of items with key, title, abstract, full_text and
+bibliographic fields such as authors and date. Items are decoded one at a
+time from a sliding read buffer with json.JSONDecoder.raw_decode, so memory
+is bounded by the largest single item rather than the whole export.
+
+Each item becomes one text document whose metadata (item key, title,
+authors, year, tags) is attached as file attributes and added to the
+metadata index used to prefilter searches. Documents are written
+to a scratch directory and handed to the vector store upload path
+ZOTERO_BATCH_SIZE at a time, then deleted.
+"""
+import os
+import re
+import json
+import tempfile
+from dotenv import load_dotenv, find_dotenv
+from .vectorstore_utils import upload_files_to_vector_store
+from . import metadata_index
+
+# Load environment variables
+_ = load_dotenv(find_dotenv())
+
+ZOTERO_BATCH_SIZE = int(os.environ.get("ZOTERO_BATCH_SIZE", "50"))
+ZOTERO_READ_SIZE = int(os.environ.get("ZOTERO_READ_SIZE", str(64 * 1024)))
+
+# Hosted vector store attributes are limited to 512-character strings
+_MAX_ATTRIBUTE_LENGTH = 512
+
+_year_re = re.compile(r"\b(1[5-9]\d\d|2\d\d\d)\b")
+_unsafe_filename_re = re.compile(r"[^\w\- ]+")
+_whitespace_re = re.compile(r"\s+")
+
+def iter_zotero_items(file_path: str, read_size: int = None):
+    """
+    Stream the items of a Zotero JSON export.
+
+    Args:
+        file_path: Path to the export, a JSON array of objects
+        read_size: Characters read per refill, defaults to ZOTERO_READ_SIZE
+
+    Yields:
+        dict: One item at a time
+
+    Raises:
+        ValueError: If the file is not a JSON array or is malformed
+    """
+    read_size = read_size or ZOTERO_READ_SIZE
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    started = False
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        def fill(size):
+            nonlocal buffer, position, eof
+            chunk = f.read(size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        while True:
+            # Skip whitespace and separators between items
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    raise ValueError(f"Unexpected end of Zotero export: {file_path}")
+                fill(read_size)
+                continue
+
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError(f"Zotero export is not a JSON array: {file_path}")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+
+            # Grow reads geometrically while an item spans the buffer, so a
+            # large item costs a linear number of decode attempts
+            size = read_size
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                    break
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError(f"Malformed Zotero export {file_path}: {e}")
+                    fill(size)
+                    size *= 2
+            position = end
+            yield item
+
+def _year(date: str):
+    match = _year_re.search(date or "")
+    return int(match.group(1)) if match else None
+
+def _tags(item: dict) -> list:
+    # Zotero API exports use [{"tag": ...}], simpler exports plain strings
+    return [tag.get("tag", "") if isinstance(tag, dict) else str(tag) for tag in item.get("tags") or []]
+
+def _authors(item: dict) -> list:
+    authors = item.get("authors")
+    if authors is None:
+        # Zotero API exports use creators with firstName/lastName or name
+        authors = [
+            creator.get("name") or " ".join(filter(None, [creator.get("firstName"), creator.get("lastName")]))
+            for creator in item.get("creators") or []
+        ]
+    return [author for author in authors if author]
+
+def item_metadata(item: dict) -> dict:
+    """
+    Extract normalized metadata from a Zotero item.
+
+    Args:
+        item: Zotero item
+
+    Returns:
+        dict: key, title, authors, year, tags, doi, item_type and url
+    """
+    return {
+        "key": item.get("key", ""),
+        "title": _whitespace_re.sub(" ", item.get("title") or "").strip(),
+        "authors": _authors(item),
+        "year": _year(item.get("date")),
+        "tags": [tag for tag in _tags(item) if tag],
+        "doi": item.get("doi") or "",
+        "item_type": item.get("item_type") or item.get("itemType") or "",
+        "url": item.get("url") or ""
+    }
+
+def item_attributes(metadata: dict) -> dict:
+    """
+    Flatten item metadata into vector store file attributes.
+
+    Args:
+        metadata: Output of item_metadata
+
+    Returns:
+        dict: String and number attributes, lists joined with "; "
+    """
+    attributes = {"source": "zotero", "zotero_key": metadata["key"]}
+    for name in ("title", "doi", "item_type", "url"):
+        if metadata[name]:
+            attributes[name] = metadata[name][:_MAX_ATTRIBUTE_LENGTH]
+    for name in ("authors", "tags"):
+        if metadata[name]:
+            attributes[name] = "; ".join(metadata[name])[:_MAX_ATTRIBUTE_LENGTH]
+    if metadata["year"] is not None:
+        attributes["year"] = metadata["year"]
+    return attributes
+
+def item_text(item: dict, metadata: dict) -> str:
+    """
+    Build the document text for a Zotero item.
+
+    Args:
+        item: Zotero item
+        metadata: Output of item_metadata
+
+    Returns:
+        str: Title, byline, abstract and full text
+    """
+    header = [metadata["title"]]
+    if metadata["authors"]:
+        header.append(", ".join(metadata["authors"]))
+    if metadata["year"] is not None:
+        header.append(str(metadata["year"]))
+    sections = ["\n".join(header)]
+    if item.get("abstract"):
+        sections.append(f"Abstract\n{item['abstract']}")
+    if item.get("full_text"):
+        sections.append(item["full_text"])
+    return "\n\n".join(sections)
+
+def _document_name(metadata: dict) -> str:
+    title = _unsafe_filename_re.sub("", metadata["title"])[:80].strip()
+    return f"{metadata['key']} - {title}.txt" if title else f"{metadata['key']}.txt"
+
+def _merge_stats(total: dict, stats: dict):
+    for name, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and name in total:
+            total[name] += value
+    total["errors"].extend(stats.get("errors", []))
+
+def import_zotero_export(file_path: str, vector_store_id: str, batch_size: int = None) -> dict:
+    """
+    Ingest a Zotero JSON export into a vector store.
+
+    Items are streamed from the export, written out as text documents and
+    uploaded batch_size at a time, so only one batch of documents is on disk
+    at once. Items already in the store are skipped by the upload manifest.
+
+    Args:
+        file_path: Path to the export
+        vector_store_id: ID of the vector store
+        batch_size: Items per upload batch, defaults to ZOTERO_BATCH_SIZE
+
+    Returns:
+        dict: Stats about the import
+    """
+    batch_size = batch_size or ZOTERO_BATCH_SIZE
+    stats = {"total_items": 0, "total_files": 0, "successful_uploads": 0, "failed_uploads": 0, "skipped": 0, "errors": []}
+
+    def flush(attributes, metadata_by_path):
+        upload_stats = upload_files_to_vector_store(list(attributes), vector_store_id, attributes=attributes)
+        _merge_stats(stats, upload_stats)
+        # Index the metadata of the items that made it into the store
+        metadata_by_name = {os.path.basename(path): metadata for path, metadata in metadata_by_path.items()}
+        for result in upload_stats.get("files", []):
+            if result["status"] == "success":
+                metadata_index.index_item(vector_store_id, metadata_by_name[result["file"]], result["file_id"], result["file"])
+        for path in attributes:
+            os.remove(path)
+        attributes.clear()
+        metadata_by_path.clear()
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="zotero_import_") as scratch_dir:
+            attributes = {}
+            metadata_by_path = {}
+            for item in iter_zotero_items(file_path):
+                stats["total_items"] += 1
+                metadata = item_metadata(item)
+                if not metadata["key"]:
+                    stats["failed_uploads"] += 1
+                    stats["errors"].append({"file": metadata["title"], "status": "failed", "error": "Item has no key"})
+                    continue
+                path = os.path.join(scratch_dir, _document_name(metadata))
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(item_text(item, metadata))
+                attributes[path] = item_attributes(metadata)
+                metadata_by_path[path] = metadata
+                if len(attributes) >= batch_size:
+                    flush(attributes, metadata_by_path)
+            if attributes:
+                flush(attributes, metadata_by_path)
+    except Exception as e:
+        print(f"Error importing {file_path}: {e}")
+        stats["errors"].append({"file": os.path.basename(file_path), "status": "failed", "error": str(e)})
+    return stats